@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+扩展加载基准测试
+对比立即导入全部扩展与按清单延迟加载时的启动耗时
+
+每次测量都在新的解释器进程中进行，避免模块缓存影响结果。
+
+用法:
+    python benchmarks/bench_extension_loading.py [次数]
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD_CODE = r"""
+import io, sys, json, time, contextlib
+start = time.perf_counter()
+from iflow_extensions import ExtensionManager
+manager = ExtensionManager(lazy={lazy})
+with contextlib.redirect_stdout(io.StringIO()):
+    manager.load_extensions()
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed': elapsed, 'modules': len(sys.modules)}}))
+"""
+
+
+def measure(lazy: bool) -> dict:
+    """在子进程中加载一次扩展，返回耗时和已导入模块数"""
+    output = subprocess.check_output(
+        [sys.executable, "-c", CHILD_CODE.format(lazy=lazy)],
+        cwd=ROOT
+    )
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print("=" * 70)
+    print("扩展加载基准测试")
+    print("=" * 70)
+    results = {}
+    for label, lazy in (("立即导入 (lazy=False)", False), ("延迟加载 (lazy=True)", True)):
+        samples = [measure(lazy) for _ in range(runs)]
+        best = min(s['elapsed'] for s in samples)
+        results[lazy] = best
+        print(f"{label:<24} 最快 {best * 1000:>8.1f} ms  已导入模块 {samples[0]['modules']:>5}")
+    if results[True] > 0:
+        print(f"加速 {results[False] / results[True]:.2f}x")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+工具调用解析器基准测试
+对比旧版双正则 + 排序的实现与新的单遍扫描器在长回复上的耗时
+
+用法:
+    python benchmarks/bench_tool_parser.py
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from iflow_tool_parser import find_last_tool_call
+
+
+def legacy_find_last(response: str):
+    """旧版实现：两次 re.finditer 后合并排序，取最后一个"""
+    cmd_pattern = r'@/(\w+)(?:\s+(.*))?'
+    tool_pattern = r'@(\w+)\((.*?)\)'
+    cmd_matches = list(re.finditer(cmd_pattern, response))
+    tool_matches = list(re.finditer(tool_pattern, response))
+    all_matches = []
+    for match in cmd_matches:
+        all_matches.append((match.start(), 'cmd', match))
+    for match in tool_matches:
+        all_matches.append((match.start(), 'tool', match))
+    all_matches.sort(key=lambda x: x[0])
+    if all_matches:
+        return all_matches[-1]
+    return None
+
+
+def build_response(paragraphs: int, mentions_per_paragraph: int) -> str:
+    """构造一段带有大量 @ 提及和示例调用的长回复"""
+    paragraph = (
+        "下面是对当前目录结构的分析，联系人 dev@example.com 可以提供更多帮助。"
+        "示例调用 @hello(张三) 仅用于说明，不会被执行。"
+    )
+    mention = " 参见 @/info 与 @calculate(1+(2*3)) 的输出。"
+    body = []
+    for _ in range(paragraphs):
+        body.append(paragraph + mention * mentions_per_paragraph)
+    body.append("最后执行命令：@cmd(dir c:\\ /s /o:s)")
+    return "\n".join(body)
+
+
+def run_case(label: str, text: str, number: int):
+    legacy = timeit.timeit(lambda: legacy_find_last(text), number=number)
+    scanner = timeit.timeit(lambda: find_last_tool_call(text), number=number)
+    print(f"{label:<28} {len(text):>9} 字符  旧版 {legacy / number * 1e6:>10.1f} us"
+          f"  新版 {scanner / number * 1e6:>10.1f} us  加速 {legacy / scanner:>5.2f}x")
+
+
+def main():
+    print("=" * 90)
+    print("工具调用解析器基准测试")
+    print("=" * 90)
+    cases = [
+        ("短回复 (无调用)", "好的，我已经完成了分析。" * 10, 20000),
+        ("短回复 (末尾调用)", "好的，我来查看一下。@cmd(dir)", 20000),
+        ("长回复 (1k 段)", build_response(1000, 1), 50),
+        ("长回复 (1k 段, 高密度 @)", build_response(1000, 8), 20),
+        ("超长回复 (10k 段)", build_response(10000, 1), 5),
+        ("长文本 (仅末尾调用)", "这是一段很长的分析说明。" * 20000 + "@cmd(dir)", 50),
+        ("长文本 (嵌套参数)", "说明。" * 20000 + "@cmd(echo (a (b)) \\) done)", 50),
+    ]
+    for label, text, number in cases:
+        run_case(label, text, number)
+    print("=" * 90)
+
+
+if __name__ == "__main__":
+    main()
@@ -264,11 +264,20 @@ class LifecycleBlock(BaseBlock):
         lifecycle_type = self.get_parameter('lifecycle_type', 'on_load')
         code = self.get_parameter('lifecycle_code', 'print("扩展已加载")')
         
-        header = f'{prefix}def {lifecycle_type}(self):'
+        # 工具调用钩子需要接收工具名和参数
+        signatures = {
+            'on_before_tool_call': '(self, tool_name, args)',
+            'on_after_tool_call': '(self, tool_name, args, result)',
+        }
+        header = f'{prefix}def {lifecycle_type}{signatures.get(lifecycle_type, "(self)")}:'
         docstring = f'{prefix}    """{lifecycle_type}"""'
-        code_lines = self._indent_code(code, indent + 2)
+        code_lines = self._indent_code(code, indent + 4)
+        lines = [header, docstring, code_lines]
+        if lifecycle_type == 'on_before_tool_call':
+            # 用户代码没有返回时默认允许调用
+            lines.append(f'{prefix}    return True, ""')
         
-        return '\n'.join([header, docstring, code_lines])
+        return '\n'.join(lines)
     
     def _indent_code(self, code: str, indent: int) -> str:
         """缩进代码"""
@@ -193,6 +193,9 @@ class ExtensionCodeGenerator:
             if lc_type in lifecycle_map:
                 code += lifecycle_map[lc_type].generate_code(indent=4)
                 code += '\n\n'
+            elif lc_type in ('on_before_tool_call', 'on_after_tool_call'):
+                # 未定义的工具调用钩子沿用基类实现，不生成空方法，避免每次工具调用都经过钩子
+                continue
             else:
                 # 生成空方法
                 code += f'    def {lc_type}(self):\n'
@@ -272,18 +275,8 @@ class ExtensionCodeGenerator:
             for dep in dependencies:
                 packages = dep.get_parameter('packages', '')
                 package_list = [f'"{p.strip()}"' for p in packages.split(',')]
-                code += f'        return [{", ".join(package_list)}]\n\n'
-            
-            code += '''    def check_dependencies(self) -> Tuple[bool, list]:
-        """检查依赖是否已安装"""
-        missing = []
-        for package in self.get_dependencies():
-            try:
-                __import__(package)
-            except ImportError:
-                missing.append(package)
-        return len(missing) == 0, missing
-'''
+                code += f'        return [{", ".join(package_list)}]\n'
+            # check_dependencies 使用基类实现（只查找不导入，结果缓存）
         else:
             code += '''    def get_dependencies(self) -> list:
         """返回依赖的包列表"""
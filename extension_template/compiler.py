@@ -15,10 +15,16 @@
 
 import os
 import sys
+import json
 import shutil
 import zipfile
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional, Tuple
+
+# 项目根目录，用于导入扩展系统（iflow_extensions、iflow_dependencies），只加入一次
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
 
 # 尝试导入 PyQt5
 try:
@@ -68,6 +74,9 @@ class ExtensionPackager:
             f"{self.extension_name}_v{version}_{timestamp}.zip"
         )
         
+        # 生成扩展清单，安装后无需导入代码即可注册工具（延迟加载）
+        manifest = self._build_manifest()
+        
         # 创建 zip 文件
         with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
             for root, dirs, files in os.walk(self.extension_dir):
@@ -80,10 +89,40 @@ class ExtensionPackager:
                     
                     file_path = os.path.join(root, file)
                     arcname = os.path.relpath(file_path, self.extension_dir)
+                    # 旧清单由新生成的清单替代
+                    if manifest is not None and arcname == 'manifest.json':
+                        continue
                     zipf.write(file_path, arcname)
+            
+            if manifest is not None:
+                zipf.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2) + "\n")
         
         return output_file
     
+    def _build_manifest(self) -> Optional[dict]:
+        """生成扩展清单，扩展系统不可用时返回 None"""
+        try:
+            from iflow_extensions import generate_manifest
+        except ImportError:
+            return None
+        try:
+            return generate_manifest(self.extension_dir, self.extension_name)
+        except Exception as e:
+            print(f"生成扩展清单失败: {e}")
+            return None
+    
+    @staticmethod
+    def check_dependencies(ext_instance) -> Tuple[bool, List[str]]:
+        """检查扩展声明的依赖是否已安装（与扩展管理器共用缓存，不导入依赖包）"""
+        packages = list(ext_instance.get_dependencies()) if hasattr(ext_instance, 'get_dependencies') else []
+        try:
+            from iflow_dependencies import check_packages
+        except ImportError:
+            import importlib.util
+            missing = [p for p in packages if importlib.util.find_spec(p.split('.')[0]) is None]
+            return len(missing) == 0, missing
+        return check_packages(packages)
+    
     def _validate_extension(self) -> bool:
         """验证扩展目录是否有效"""
         # 检查目录是否存在
@@ -386,6 +425,16 @@ class ExtensionCompilerGUI(QMainWindow):
             
             ext_instance = Extension()
             
+            # 依赖检查
+            dependencies = list(ext_instance.get_dependencies()) if hasattr(ext_instance, 'get_dependencies') else []
+            _, missing = packager.check_dependencies(ext_instance)
+            if not dependencies:
+                dependency_info = "无"
+            elif missing:
+                dependency_info = f"⚠️ 本机缺少 {', '.join(missing)}"
+            else:
+                dependency_info = f"已满足（{', '.join(dependencies)}）"
+            
             # 显示扩展信息
             info = f"""✅ 扩展验证成功
 
@@ -393,6 +442,7 @@ class ExtensionCompilerGUI(QMainWindow):
 描述: {ext_instance.description}
 版本: {ext_instance.version}
 作者: {ext_instance.author}
+依赖: {dependency_info}
 
 工具: {', '.join(ext_instance.get_tools().keys())}"""
             
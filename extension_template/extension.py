@@ -332,13 +332,8 @@ class YourExtension(BaseExtension):
         返回:
             Tuple[bool, list]: (是否全部已安装, 缺失的包列表)
         """
-        missing = []
-        for package in self.get_dependencies():
-            try:
-                __import__(package)
-            except ImportError:
-                missing.append(package)
-        return len(missing) == 0, missing
+        # 基类只查找不导入依赖包，并按 Python 环境缓存结果
+        return super().check_dependencies()
 
 
 # ========== 扩展实例（必须）==========
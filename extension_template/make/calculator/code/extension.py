@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+扩展名称：Your Extension
+扩展描述：Your Description
+作者：wzmwayne_and_iflow_ai
+版本：1.0.0
+"""
+
+import os
+import sys
+from typing import Dict, Callable, Tuple
+from datetime import datetime
+
+# 导入父目录的基类
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from base_extension import BaseExtension
+
+import math
+import random
+
+class Calculator(BaseExtension):
+    """
+    一个计算器扩展
+    """
+    
+    def __init__(self):
+        super().__init__()
+
+        self.name = "calculator"
+        self.description = "一个计算器扩展"
+        self.version = "2.0.0"
+        self.author = "Test User"
+
+        
+        # 扩展配置
+        self.config = {}
+        self.config["precision"] = int("10")
+
+    def on_load(self):
+        """on_load"""
+        print("计算器扩展已加载")
+
+    def on_unload(self):
+        """on_unload"""
+        pass
+
+    def get_prompt(self) -> str:
+        """返回扩展的提示词"""
+
+        prompt = """\n【计算器扩展】
+此扩展提供数学计算功能。
+
+可用工具：
+- @calculate(表达式) - 计算数学表达式
+- @square(数字) - 计算数字的平方
+
+使用说明：
+1. 用户要求计算时使用 @calculate
+2. 用户要求计算平方时使用 @square
+
+示例：
+- 用户说"计算 1+2*3" -> AI调用 @calculate("1+2*3")
+- 用户说"5的平方是多少" -> AI调用 @square("5")\n\n"""
+        return prompt.strip()
+
+    def get_tools(self) -> Dict[str, Callable]:
+        """返回工具处理函数字典"""
+        return {
+            'calculate': self.calculate,
+            'square': self.square,
+        }
+
+    def get_tool_descriptions(self) -> Dict[str, str]:
+        """返回工具描述字典"""
+        return {
+            'calculate': '计算数学表达式',
+            'square': '计算平方',
+        }
+
+    def calculate(self, args: str, confirm_callback: Callable = None) -> Tuple[bool, str]:
+        """计算数学表达式"""
+        try:
+      try:
+          result = eval(args)
+          return True, f"计算结果: {result}"
+      except Exception as e:
+          return False, f"计算错误: {str(e)}"
+        except Exception as e:
+            return False, f"操作失败: " + str(e)
+
+    def square(self, args: str, confirm_callback: Callable = None) -> Tuple[bool, str]:
+        """计算平方"""
+        try:
+      try:
+          num = float(args)
+          result = num ** 2
+          return True, f"{num} 的平方是 {result}"
+      except Exception as e:
+          return False, f"计算错误: {str(e)}"
+        except Exception as e:
+            return False, f"操作失败: " + str(e)
+
+    def get_dependencies(self) -> list:
+        """返回依赖的包列表"""
+        return ["math", "random"]
+
+
+# 扩展实例（必须）
+Extension = Calculator
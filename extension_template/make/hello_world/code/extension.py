@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+扩展名称：Your Extension
+扩展描述：Your Description
+作者：wzmwayne_and_iflow_ai
+版本：1.0.0
+"""
+
+import os
+import sys
+from typing import Dict, Callable, Tuple
+from datetime import datetime
+
+# 导入父目录的基类
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from base_extension import BaseExtension
+
+
+class HelloWorld(BaseExtension):
+    """
+    一个简单的打招呼扩展
+    """
+    
+    def __init__(self):
+        super().__init__()
+
+        self.name = "hello_world"
+        self.description = "一个简单的打招呼扩展"
+        self.version = "1.0.0"
+        self.author = "Test User"
+
+    def on_load(self):
+        """on_load"""
+        pass
+
+    def on_unload(self):
+        """on_unload"""
+        pass
+
+    def get_prompt(self) -> str:
+        """返回扩展的提示词"""
+
+        prompt = """\n【打招呼扩展】
+此扩展用于向用户打招呼。
+
+可用工具：
+- @hello() - 向用户打招呼
+
+示例：
+- 用户说"你好" -> AI调用 @hello()\n\n"""
+        return prompt.strip()
+
+    def get_tools(self) -> Dict[str, Callable]:
+        """返回工具处理函数字典"""
+        return {
+            'hello': self.hello,
+        }
+
+    def get_tool_descriptions(self) -> Dict[str, str]:
+        """返回工具描述字典"""
+        return {
+            'hello': '向用户打招呼',
+        }
+
+    def hello(self, args: str, confirm_callback: Callable = None) -> Tuple[bool, str]:
+        """向用户打招呼"""
+        try:
+      return True, "你好，世界！"
+        except Exception as e:
+            return False, f"操作失败: " + str(e)
+
+    def get_dependencies(self) -> list:
+        """返回依赖的包列表"""
+        return []
+
+
+# 扩展实例（必须）
+Extension = HelloWorld
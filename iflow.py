@@ -59,8 +59,19 @@ def run_cli(debug_mode=False):
         sys.exit(1)
 
 
-def run_gui(debug_mode=False):
-    """运行图形界面版本"""
+def print_startup_report():
+    """打印启动耗时（GUI 会把 print 的输出转到调试窗口，这里直接写到控制台）"""
+    from iflow_startup import get_startup_timer
+    from iflow_fonts import get_font_catalog
+    out = sys.__stdout__ or sys.stdout
+    for line in get_startup_timer().format():
+        print(f"[启动] {line}", file=out)
+    print(f"[字体] {get_font_catalog().format_stats()}", file=out)
+    out.flush()
+
+
+def run_gui(debug_mode=False, profile_startup=False):
+    """运行图形界面版本（profile_startup 为 True 时在初始化完成后打印各阶段耗时）"""
     if debug_mode:
         print("[调试] 开始初始化 GUI...")
         print(f"[调试] Python 版本: {sys.version}")
@@ -70,8 +81,11 @@ def run_gui(debug_mode=False):
         if debug_mode:
             print("[调试] 导入 PyQt5 模块...")
 
-        from PyQt5.QtWidgets import QApplication
-        from PyQt5.QtGui import QFont
+        from iflow_startup import get_startup_timer
+        timer = get_startup_timer()
+        with timer.phase("导入 PyQt5"):
+            from PyQt5.QtWidgets import QApplication
+            from PyQt5.QtGui import QFont
 
         if debug_mode:
             print("[调试] PyQt5 模块导入成功")
@@ -80,20 +94,23 @@ def run_gui(debug_mode=False):
         # 强制刷新输出
         sys.stdout.flush()
 
-        from iflow_chat_gui import IflowChatGUI, get_main_font_family
+        with timer.phase("导入 GUI 模块"):
+            from iflow_chat_gui import IflowChatGUI, get_main_font_family
 
         if debug_mode:
             print("[调试] iflow_chat_gui 模块导入成功")
             print("[调试] 创建 QApplication 实例...")
 
-        app = QApplication(sys.argv)
-        app.setStyle('Fusion')
+        with timer.phase("创建 QApplication"):
+            app = QApplication(sys.argv)
+            app.setStyle('Fusion')
 
         if debug_mode:
             print("[调试] 加载自定义字体...")
 
-        # 加载自定义字体
-        main_font_family, main_font_path = get_main_font_family()
+        # 加载自定义字体（彩蛋字体在第一次使用时才注册）
+        with timer.phase("加载字体"):
+            main_font_family, main_font_path = get_main_font_family()
 
         if debug_mode:
             print("[调试] 设置应用字体...")
@@ -140,12 +157,18 @@ def run_gui(debug_mode=False):
             print("[调试] 创建主窗口...")
 
         # 创建主窗口
-        window = IflowChatGUI()
+        with timer.phase("创建主窗口"):
+            window = IflowChatGUI()
+
+        # 扩展和对话历史在首次绘制后加载，全部完成后再打印
+        if debug_mode or profile_startup:
+            window.startup_finished.connect(print_startup_report)
 
         if debug_mode:
             print("[调试] 显示主窗口...")
 
-        window.show()
+        with timer.phase("显示主窗口"):
+            window.show()
 
         if debug_mode:
             print("[调试] 进入主事件循环...")
@@ -174,6 +197,7 @@ def main():
   %(prog)s --gui        # 强制使用图形界面模式
   %(prog)s --model gpt-4  # 指定模型
   %(prog)s --debug      # 启用调试模式，显示详细错误信息
+  %(prog)s --gui --profile-startup  # 打印 GUI 启动各阶段的耗时
         """
     )
 
@@ -202,6 +226,12 @@ def main():
         help='启用调试模式，显示详细错误堆栈信息'
     )
 
+    parser.add_argument(
+        '--profile-startup',
+        action='store_true',
+        help='打印 GUI 启动各阶段的耗时（包括首次绘制和之后的初始化）'
+    )
+
     parser.add_argument(
         '--version',
         action='version',
@@ -226,7 +256,7 @@ def main():
         print("[信息] 使用图形界面模式")
         if args.debug:
             print("[调试] 调试模式已启用")
-        run_gui(debug_mode=args.debug)
+        run_gui(debug_mode=args.debug, profile_startup=args.profile_startup)
     else:
         # 自动选择模式
         gui_available = check_gui_available()
@@ -236,7 +266,7 @@ def main():
             print("[提示] 使用 --cli 参数可强制使用命令行模式")
             if args.debug:
                 print("[调试] 调试模式已启用")
-            run_gui(debug_mode=args.debug)
+            run_gui(debug_mode=args.debug, profile_startup=args.profile_startup)
         else:
             print("[信息] 图形界面不可用，使用命令行模式")
             print("[提示] 安装 PyQt5 可使用图形界面: pip install PyQt5 PyQtWebEngine")
@@ -52,6 +52,15 @@ except ImportError:
     EXTENSIONS_AVAILABLE = False
     extension_manager = None
 
+# 工具调用解析器、工具注册表和截图后端（CLI 和 GUI 共用）
+from iflow_tool_parser import find_last_tool_call
+from iflow_tool_registry import ToolRegistry, CONFIRM_NEVER
+from iflow_tool_middleware import CacheMiddleware, ProfilerMiddleware
+from iflow_prompt_selector import PromptSelector
+from iflow_screen_capture import (
+    get_capturer, parse_region, remember_capture, recall_capture, CaptureError
+)
+
 
 class TerminalUI:
     """终端伪图形化界面"""
@@ -263,6 +272,16 @@ class IflowChatClient:
         self.extensions = {}
         self.extension_tools = {}
         self.extension_prompts = ""
+        self._added_extensions = set()
+        # 各扩展的提示词片段，热重载时按扩展替换
+        self._extension_prompt_parts = {}
+        # 按对话内容选择完整发送提示词的扩展，其余扩展只发送一行摘要
+        self.prompt_selector = PromptSelector()
+        self._extension_lock = threading.Lock()
+        
+        # 工具注册表（内置工具优先注册，扩展同名工具会被记录为冲突）
+        self.tool_registry = ToolRegistry()
+        self._register_builtin_tools()
         
         # 加载扩展
         self._load_extensions()
@@ -312,6 +331,7 @@ class IflowChatClient:
 - @mouse_click(left)
 - @keyboard(Hello World)
 - @screenshot()
+- @screenshot(0,0,800,600)  （只截取 x,y,宽,高 区域，更快，适合放大查看局部）
 - @view_screenshot(screenshot_20250101_120000.png)
 
 重要说明：
@@ -368,6 +388,9 @@ class IflowChatClient:
             '/history', '/clear',
             '/export', '/import',
             '/extension list', '/extension info', '/extension import', '/extension delete',
+            '/extension reload', '/extension watch on', '/extension watch off',
+            '/extension stats', '/extension stats export', '/extension stats reset',
+            '/extension stats memory on', '/extension stats memory off',
             '/stop', '/info', '/help', '/exit'
         ]
         
@@ -445,6 +468,11 @@ class IflowChatClient:
         print("  /export <file> - 导出当前对话到文件")
         print("  /import <file> - 从文件导入对话")
         print("  /extension     - 扩展管理（查看/导入/删除扩展）")
+        print("  /extension reload <扩展名> - 重新加载扩展，无需重启")
+        print("  /extension watch on/off    - 开启/关闭扩展热重载（修改扩展文件后自动重新加载）")
+        print("  /extension stats [扩展名]  - 按扩展和工具查看资源统计（调用次数/耗时/CPU/内存/结果大小）")
+        print("  /extension stats export <file> - 导出资源统计为JSON")
+        print("  /extension stats memory on/off - 开启/关闭内存分配统计（tracemalloc）")
         print("  /stop          - 停止当前输出")
         print("  /info          - 显示当前配置信息")
         print("  /help          - 显示此帮助信息")
@@ -469,6 +497,7 @@ class IflowChatClient:
         print("  @mouse_click(按钮) - AI点击鼠标（需权限）")
         print("  @keyboard(文本或key:按键)  - AI输入键盘文本或特殊按键（需权限）")
         print("  @screenshot()   - AI获取屏幕截图并保存到 iflow_screenshots 文件夹（AI可以看到）")
+        print("  @screenshot(x,y,宽,高) - AI只截取指定区域")
         print("  @view_screenshot(文件名) - AI分析指定截图的内容")
         print("  @wait(秒数)     - AI等待指定秒数")
         print("  @show_message(标题,内容) - AI显示普通信息框")
@@ -495,7 +524,7 @@ class IflowChatClient:
     def show_extension_manager(self):
         """显示扩展管理界面"""
         while True:
-            options = ["查看扩展列表", "查看扩展详情", "导入扩展", "删除扩展", "返回"]
+            options = ["查看扩展列表", "查看扩展详情", "导入扩展", "删除扩展", "资源统计", "返回"]
             selected = TerminalUI.show_menu("扩展管理", options)
             
             if selected == 0:
@@ -515,6 +544,11 @@ class IflowChatClient:
                 self._delete_extension()
                 input("\n按回车继续...")
             elif selected == 4:
+                # 资源统计
+                TerminalUI.clear_screen()
+                self._show_extension_stats([])
+                input("\n按回车继续...")
+            elif selected == 5:
                 # 返回
                 return
     
@@ -534,6 +568,11 @@ class IflowChatClient:
             print(f"   描述: {ext.description}")
             print(f"   版本: {ext.version}")
             print(f"   作者: {ext.author}")
+            if extension_manager is not None:
+                print(f"   加载: {extension_manager.format_load_stats(name)}")
+                missing = extension_manager.get_missing_dependencies(name)
+                if missing:
+                    print(f"   缺少依赖: {', '.join(missing)}")
         
         print(f"\n总计: {len(self.extensions)} 个扩展")
         print("=" * 50)
@@ -564,6 +603,10 @@ class IflowChatClient:
         print(f"描述: {ext.description}")
         print(f"版本: {ext.version}")
         print(f"作者: {ext.author}")
+        if extension_manager is not None:
+            print(f"加载: {extension_manager.format_load_stats(ext_name)}")
+            print(f"依赖: {extension_manager.format_dependencies(ext_name)}")
+        print(f"资源: {self.profiler.format_source(ext_name)}")
         
         # 显示工具
         tools = ext.get_tools()
@@ -579,6 +622,40 @@ class IflowChatClient:
         
         print("=" * 50)
     
+    def _show_extension_stats(self, args: List[str]):
+        """扩展资源统计: /extension stats [扩展名 | export <文件> | reset | memory on/off]"""
+        action = args[0].lower() if args else ""
+        if action == 'export':
+            filename = args[1] if len(args) > 1 else f"iflow_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            try:
+                self.profiler.export_json(filename)
+                print(f"\n✓ 资源统计已导出到: {filename}")
+            except OSError as e:
+                print(f"\n✗ 导出失败: {str(e)}")
+        elif action == 'reset':
+            self.profiler.reset()
+            print("\n✓ 资源统计已清空")
+        elif action == 'memory':
+            mode = args[1].lower() if len(args) > 1 else ""
+            if mode in ('on', 'off'):
+                self.profiler.set_memory_tracking(mode == 'on')
+                print(f"\n✓ 内存分配统计已{'开启' if mode == 'on' else '关闭'}")
+            else:
+                print(f"\n[系统] 内存分配统计: {'开启' if self.profiler.track_memory else '关闭'}")
+                print("用法: /extension stats memory on/off")
+        else:
+            source = args[0] if args else None
+            print("=" * 50)
+            print(f"扩展资源统计（自 {self.profiler.started_at.strftime('%Y-%m-%d %H:%M:%S')} 起，"
+                  f"内存分配统计: {'开启' if self.profiler.track_memory else '关闭'}）")
+            print("=" * 50)
+            lines = self.profiler.get_report(source)
+            if not lines:
+                print("暂无工具调用记录")
+            for line in lines:
+                print(line)
+            print("=" * 50)
+    
     def _import_extension(self):
         """导入扩展"""
         TerminalUI.clear_screen()
@@ -597,20 +674,17 @@ class IflowChatClient:
             print(f"错误: 文件不存在: {zip_path}")
             return
         
+        if extension_manager is None:
+            print("错误: 扩展系统不可用")
+            return
+        
         try:
-            import zipfile
-            import shutil
-            
-            # 获取扩展目录
-            extensions_dir = "iflow_extensions"
-            
-            # 解压扩展
-            print("正在解压...")
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(extensions_dir)
-            
-            print("✓ 扩展导入成功！")
-            print("请重启程序以加载新扩展。")
+            # 压缩包直接复制到扩展目录并立即加载，无需解压和重启
+            print("正在安装...")
+            success, message, ext_name = extension_manager.install_package(zip_path)
+            if success and ext_name:
+                self._add_extension(ext_name, extension_manager.extensions[ext_name])
+            print(f"{'✓' if success else '✗'} {message}")
             
         except Exception as e:
             print(f"✗ 导入失败: {str(e)}")
@@ -635,7 +709,7 @@ class IflowChatClient:
         
         # 确认删除
         print(f"\n确定要删除扩展 '{ext_name}' 吗？")
-        print("此操作将删除扩展文件夹，无法撤销。")
+        print("此操作将删除扩展文件夹或扩展压缩包，无法撤销。")
         confirm = input("确认删除？(y/n): ").strip().lower()
         
         if confirm != 'y':
@@ -643,15 +717,12 @@ class IflowChatClient:
             return
         
         try:
-            ext_dir = os.path.join("iflow_extensions", ext_name)
-            
-            if os.path.exists(ext_dir):
-                import shutil
-                shutil.rmtree(ext_dir)
+            success, message = extension_manager.remove_extension_files(ext_name)
+            if success:
                 print(f"✓ 扩展 '{ext_name}' 删除成功！")
                 print("请重启程序以生效。")
             else:
-                print(f"错误: 扩展目录不存在: {ext_dir}")
+                print(f"错误: {message}")
                 
         except Exception as e:
             print(f"✗ 删除失败: {str(e)}")
@@ -684,6 +755,25 @@ class IflowChatClient:
                 tools = ext.get_tools()
                 print(f"    工具: {', '.join(tools.keys())}")
         
+        # 扩展提示词选择
+        if self.prompt_selector.requests:
+            print("\n扩展提示词选择:")
+            print(f"  {self.prompt_selector.format_stats()}")
+            if self.prompt_selector.last is not None:
+                print(f"  最近一次: {self.prompt_selector.last.format()}")
+        
+        # 工具冲突信息
+        if self.tool_registry.conflicts:
+            print("\n工具冲突（同名工具已被忽略）:")
+            for tool_name, kept, ignored in self.tool_registry.conflicts:
+                print(f"  {tool_name}: 使用 {kept}，忽略 {ignored}")
+        
+        # 扩展加载报告
+        if EXTENSIONS_AVAILABLE and extension_manager is not None and extension_manager.load_stats:
+            print("\n扩展加载报告:")
+            for line in extension_manager.get_load_report():
+                print(f"  {line}")
+        
         print("=" * 50)
         input("\n按回车继续...")
     
@@ -899,6 +989,15 @@ class IflowChatClient:
         except Exception:
             pass
     
+    def _request_messages(self) -> List[dict]:
+        """本次请求发送的消息（与当前对话无关的扩展只发送提示词摘要）"""
+        messages, selection = self.prompt_selector.select_messages(self.messages)
+        if selection is not None:
+            self._log(selection.format())
+            if self.debug_mode:
+                print(f"[调试] {selection.format()}")
+        return messages
+    
     def _load_extensions(self):
         """加载扩展"""
         if not EXTENSIONS_AVAILABLE or extension_manager is None:
@@ -906,27 +1005,138 @@ class IflowChatClient:
             return
         
         try:
-            # 加载所有扩展
-            extension_manager.load_extensions()
+            # 加载所有扩展（超出时间预算的扩展在后台加载完成后再注册）
+            extension_manager.load_extensions(on_late_load=self._on_extension_loaded)
             self.extensions = extension_manager.extensions
             
             # 收集所有扩展的工具和提示词
-            for ext_name, ext in self.extensions.items():
-                # 收集工具
-                tools = ext.get_tools()
-                for tool_name, tool_func in tools.items():
-                    self.extension_tools[tool_name] = (ext, tool_func)
-                
-                # 收集提示词
-                prompt = ext.get_prompt()
-                if prompt:
-                    self.extension_prompts += prompt + "\n\n"
+            for ext_name, ext in list(self.extensions.items()):
+                self._add_extension(ext_name, ext)
             
             print(f"已加载 {len(self.extensions)} 个扩展")
             print(f"已加载 {len(self.extension_tools)} 个工具")
         except Exception as e:
             print(f"加载扩展失败: {e}")
     
+    def _add_extension(self, ext_name: str, ext) -> bool:
+        """收集扩展的工具和提示词，已收集过的扩展直接跳过"""
+        with self._extension_lock:
+            if ext_name in self._added_extensions:
+                return False
+            self._added_extensions.add(ext_name)
+            # 收集工具
+            tools = ext.get_tools()
+            for tool_name, tool_func in tools.items():
+                self.extension_tools[tool_name] = (ext, tool_func)
+            self.tool_registry.register_extension(ext_name, ext)
+            
+            # 收集提示词
+            prompt = ext.get_prompt()
+            if prompt:
+                self._extension_prompt_parts[ext_name] = prompt
+                self.extension_prompts += prompt + "\n\n"
+                self.prompt_selector.set_extension(ext_name, ext)
+                # system提示词已生成时追加到末尾
+                if self.messages and self.messages[0].get("role") == "system":
+                    self.messages[0]["content"] += "\n\n" + prompt
+            return True
+    
+    def _on_extension_loaded(self, ext_name: str, ext):
+        """后台加载的扩展完成（在加载线程中调用）"""
+        if self._add_extension(ext_name, ext):
+            self._log(f"扩展 {ext_name} 已在后台加载完成")
+    
+    def _replace_extension(self, ext_name: str, old, new):
+        """
+        热重载时替换扩展（new 为 None 表示移除）
+        
+        工具表整体替换，system提示词中只替换该扩展的片段，对话中的其他消息保持不变
+        """
+        with self._extension_lock:
+            extension_tools = {name: value for name, value in self.extension_tools.items()
+                               if value[0] is not old}
+            if new is not None:
+                for tool_name, tool_func in new.get_tools().items():
+                    extension_tools[tool_name] = (new, tool_func)
+            self.tool_registry.replace_extension(ext_name, new)
+            self.extension_tools = extension_tools
+            if new is None:
+                self._added_extensions.discard(ext_name)
+            else:
+                self._added_extensions.add(ext_name)
+            
+            # 重建提示词片段，保持各扩展原有顺序
+            old_prompt = self._extension_prompt_parts.get(ext_name, "")
+            new_prompt = new.get_prompt() if new is not None else ""
+            if new_prompt:
+                self._extension_prompt_parts[ext_name] = new_prompt
+                self.prompt_selector.set_extension(ext_name, new)
+            else:
+                self._extension_prompt_parts.pop(ext_name, None)
+                self.prompt_selector.remove_extension(ext_name)
+            self.extension_prompts = "".join(p + "\n\n" for p in self._extension_prompt_parts.values())
+            
+            if old_prompt != new_prompt and self.messages and self.messages[0].get("role") == "system":
+                content = self.messages[0]["content"]
+                fragment = "\n\n" + old_prompt
+                replacement = "\n\n" + new_prompt if new_prompt else ""
+                if old_prompt and fragment in content:
+                    content = content.replace(fragment, replacement, 1)
+                else:
+                    content += replacement
+                self.messages[0]["content"] = content
+    
+    def _on_extension_changed(self, ext_name: str, old, new):
+        """文件监视检测到扩展变化（在监视线程中调用）"""
+        if old is None:
+            self._add_extension(ext_name, new)
+        else:
+            self._replace_extension(ext_name, old, new)
+        self._log(f"扩展 {ext_name} 已热重载" if new is not None else f"扩展 {ext_name} 已移除")
+    
+    def _reload_extension(self, ext_name: str):
+        """手动重新加载扩展"""
+        if extension_manager is None:
+            print("错误: 扩展系统不可用")
+            return
+        old = self.extensions.get(ext_name)
+        success, message, new = extension_manager.reload_extension(ext_name)
+        if success:
+            self._replace_extension(ext_name, old, new)
+        print(f"{'✓' if success else '✗'} {message}")
+    
+    def _set_extension_watch(self, enabled: bool):
+        """开启或关闭扩展文件监视"""
+        if extension_manager is None:
+            print("错误: 扩展系统不可用")
+            return
+        if enabled:
+            extension_manager.start_watching(on_change=self._on_extension_changed)
+            print("✓ 已开启扩展热重载，修改扩展文件后会自动重新加载")
+        else:
+            extension_manager.stop_watching()
+            print("✓ 已关闭扩展热重载")
+    
+    def _register_builtin_tools(self):
+        """注册内置工具"""
+        registry = self.tool_registry
+        registry.register('cmd', self.execute_command, description='执行系统命令', timeout=30)
+        registry.register('mouse_move', self.mouse_move, description='移动鼠标到指定坐标')
+        registry.register('mouse_click', self.mouse_click, description='点击鼠标')
+        registry.register('keyboard', self.keyboard_input, description='键盘输入文本或特殊按键')
+        registry.register('screenshot', self.take_screenshot, description='获取屏幕截图，可指定区域 x,y,宽,高')
+        registry.register('view_screenshot', self.view_screenshot, description='分析指定截图的内容',
+                          cacheable=True)
+        registry.register('wait', self.wait, description='等待指定秒数')
+        # 权限请求自带确认窗口，不再额外询问
+        registry.register('request_control', self.request_computer_control,
+                          description='请求获得电脑操作权限', confirm=CONFIRM_NEVER)
+        # 按扩展和工具统计资源占用（/extension stats），放在最外层，缓存命中的调用也会计入
+        self.profiler = ProfilerMiddleware()
+        registry.add_middleware(self.profiler)
+        # 标记为 cacheable 的工具（如 view_screenshot）在有效期内直接返回上次的结果
+        registry.add_middleware(CacheMiddleware())
+    
     def set_model(self, model_name: str):
         """设置模型名称"""
         self.model = model_name
@@ -1047,33 +1257,22 @@ class IflowChatClient:
             return False, error_msg
     
     def handle_ai_tool_call(self, tool_name: str, tool_args: str) -> Tuple[bool, str]:
-        """处理AI工具调用"""
-        if tool_name == 'cmd':
-            return self.execute_command(tool_args)
-        elif tool_name == 'mouse_move':
-            return self.mouse_move(tool_args)
-        elif tool_name == 'mouse_click':
-            return self.mouse_click(tool_args)
-        elif tool_name == 'keyboard':
-            return self.keyboard_input(tool_args)
-        elif tool_name == 'screenshot':
-            return self.take_screenshot()
-        elif tool_name == 'view_screenshot':
-            return self.view_screenshot(tool_args)
-        elif tool_name == 'wait':
-            return self.wait(tool_args)
-        elif tool_name == 'request_control':
-            return self.request_computer_control()
-        elif tool_name in self.extension_tools:
-            # 处理扩展工具
-            ext, tool_func = self.extension_tools[tool_name]
-            confirm_callback = lambda title, message: self._confirm_action(title, message)
-            try:
-                return tool_func(tool_args, confirm_callback)
-            except Exception as e:
-                return False, f"扩展工具执行失败: {str(e)}"
-        else:
-            return False, f"未知工具: {tool_name}"
+        """处理AI工具调用（协程和生成器工具的阶段性输出实时显示在终端和状态窗口）"""
+        confirm_callback = lambda title, message: self._confirm_action(title, message)
+        streamed = []
+        
+        def output_callback(chunk: str):
+            if not streamed:
+                self.console_output = f"@{tool_name}({tool_args})\n"
+            streamed.append(chunk)
+            print(chunk, end="", flush=True)
+            # 状态窗口只显示末尾部分
+            self.console_output = (self.console_output + chunk)[-4000:]
+        
+        result = self.tool_registry.invoke(tool_name, tool_args, confirm_callback, output_callback)
+        if streamed and not streamed[-1].endswith("\n"):
+            print()
+        return result
     
     def _confirm_action(self, title: str, message: str) -> bool:
         """确认操作"""
@@ -1190,27 +1389,25 @@ class IflowChatClient:
             self.current_action = None
             return False, f"键盘输入失败: {str(e)}"
     
-    def take_screenshot(self) -> Tuple[bool, str]:
-        """获取屏幕截图"""
-        if pyautogui is None:
-            return False, "pyautogui模块未安装，无法执行截图操作"
+    def take_screenshot(self, args: str = "") -> Tuple[bool, str]:
+        """获取屏幕截图，args 为可选的区域 "x,y,宽,高"，省略时截取全屏"""
+        try:
+            region = parse_region(args)
+        except ValueError as e:
+            return False, str(e)
         try:
             self.current_action = "正在截图..."
-            screenshot = pyautogui.screenshot()
-            filename = f"screenshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+            capture = get_capturer().grab(region)
+            filename = f"screenshot_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.png"
             filepath = os.path.join(APIKeyManager.SCREENSHOT_DIR, filename)
-            screenshot.save(filepath)
+            remember_capture(filename, capture.save(filepath))
             self._log(f"AI获取屏幕截图: {filepath}")
-            
-            # 使用图像识别分析截图内容
-            try:
-                self.current_action = None
-                # 使用 image_read 工具让 AI 看到截图内容
-                return True, f"屏幕截图已保存到: {filepath}\n截图尺寸: {screenshot.size}\n[图像数据已准备好，请分析屏幕内容]"
-            except Exception as e:
-                self.current_action = None
-                return True, f"屏幕截图已保存到: {filepath}\n截图尺寸: {screenshot.size}"
-                
+            self.current_action = None
+            area = f"区域 {region}" if region else "全屏"
+            return True, f"屏幕截图已保存到: {filepath}\n截图范围: {area}\n截图尺寸: {capture.size}\n[图像数据已准备好，请分析屏幕内容]"
+        except CaptureError as e:
+            self.current_action = None
+            return False, f"获取屏幕截图失败: {str(e)}\n建议: pip install mss pillow"
         except Exception as e:
             self.current_action = None
             error_msg = str(e)
@@ -1222,7 +1419,9 @@ class IflowChatClient:
     def view_screenshot(self, filename: str) -> Tuple[bool, str]:
         """查看屏幕截图（让 AI 分析截图内容）"""
         filepath = os.path.join(APIKeyManager.SCREENSHOT_DIR, filename)
-        if not os.path.exists(filepath):
+        # 刚截取的图片直接从内存读取
+        img_data = recall_capture(filename)
+        if img_data is None and not os.path.exists(filepath):
             return False, f"截图文件不存在: {filepath}"
         
         try:
@@ -1230,8 +1429,9 @@ class IflowChatClient:
             from PIL import Image
             
             # 将截图转换为 base64
-            with open(filepath, 'rb') as f:
-                img_data = f.read()
+            if img_data is None:
+                with open(filepath, 'rb') as f:
+                    img_data = f.read()
             
             import base64
             img_base64 = base64.b64encode(img_data).decode('utf-8')
@@ -1335,7 +1535,7 @@ class IflowChatClient:
         
         payload = {
             "model": self.model,
-            "messages": self.messages,
+            "messages": self._request_messages(),
             "stream": True,
             "max_tokens": 4096,
             "temperature": 0.7,
@@ -1458,7 +1658,7 @@ class IflowChatClient:
         
         payload = {
             "model": self.model,
-            "messages": self.messages,
+            "messages": self._request_messages(),
             "stream": True,
             "max_tokens": 4096,
             "temperature": 0.7,
@@ -1588,39 +1788,14 @@ class IflowChatClient:
     
     def _execute_ai_commands(self, response: str) -> str:
         """执行AI回复中的指令和工具调用，返回执行结果"""
-        import re
-        
         execution_results = []
         
-        # 只提取回复末尾的指令（最后一个 @/ 或 @ 开头的指令）
-        # 先找到所有可能的指令位置
-        cmd_pattern = r'@/(\w+)(?:\s+(.*))?'
-        tool_pattern = r'@(\w+)\((.*?)\)'
-        
-        # 找到所有指令匹配
-        cmd_matches = list(re.finditer(cmd_pattern, response))
-        tool_matches = list(re.finditer(tool_pattern, response))
-        
-        # 合并所有匹配并按位置排序
-        all_matches = []
-        for match in cmd_matches:
-            all_matches.append((match.start(), 'cmd', match))
-        for match in tool_matches:
-            all_matches.append((match.start(), 'tool', match))
-        
-        all_matches.sort(key=lambda x: x[0])
-        
-        # 只处理最后一个指令（末尾的指令）
-        if all_matches:
-            last_match = all_matches[-1]
-            match_type, match_obj = last_match[1], last_match[2]
-            
-            if match_type == 'cmd':
-                cmd = match_obj.group(1)
-                args = match_obj.group(2) if match_obj.group(2) else ""
-                full_cmd = f"/{cmd}"
-                if args:
-                    full_cmd += f" {args}"
+        # 只处理回复末尾的指令（最后一个 @/ 或 @ 开头的调用）
+        last_call = find_last_tool_call(response)
+        if last_call:
+            if last_call.is_command():
+                cmd = last_call.name
+                full_cmd = last_call.full_command()
                 
                 # 退出指令需要特别确认
                 if cmd.lower() == 'exit':
@@ -1665,15 +1840,15 @@ class IflowChatClient:
                     else:
                         execution_results.append(f"[系统] 指令 {full_cmd} 执行完成")
             
-            elif match_type == 'tool':
-                tool_name = match_obj.group(1)
-                tool_args = match_obj.group(2) if match_obj.group(2) else ""
+            elif last_call.is_tool():
+                tool_name = last_call.name
+                tool_args = last_call.args
                 
                 print(f"\n[系统] AI请求调用工具: {tool_name}")
                 self._log(f"AI请求调用工具: {tool_name}({tool_args})")
                 
-                # 检查是否需要确认（AI控制权限下自动允许所有工具）
-                need_confirm = not self.ai_control_enabled
+                # 检查是否需要确认（由工具的确认策略决定，AI控制权限下默认自动允许）
+                need_confirm = self.tool_registry.needs_confirm(tool_name, self.ai_control_enabled)
                 
                 if need_confirm:
                     confirm = input("是否允许调用此工具？(y/n): ").strip().lower()
@@ -1724,9 +1899,7 @@ class IflowChatClient:
         
         if command == '/help':
             self.show_help()
-        elif command == '/extension':
-            self.show_help()
-        elif command == '/extension':
+        elif command in ('/extension', '/extensions'):
             if args:
                 # 处理扩展子命令
                 parts = args.split()
@@ -1747,6 +1920,7 @@ class IflowChatClient:
                             print(f"  作者: {ext.author}")
                             tools = ext.get_tools()
                             print(f"  工具: {', '.join(tools.keys())}")
+                            print(f"  资源: {self.profiler.format_source(ext_name)}")
                         else:
                             print(f"\n错误: 扩展不存在: {ext_name}")
                     else:
@@ -1761,21 +1935,34 @@ class IflowChatClient:
                             print(f"\n确定要删除扩展 '{ext_name}' 吗？")
                             confirm = input("确认删除？(y/n): ").strip().lower()
                             if confirm == 'y':
-                                ext_dir = os.path.join("iflow_extensions", ext_name)
-                                if os.path.exists(ext_dir):
-                                    import shutil
-                                    shutil.rmtree(ext_dir)
+                                success, message = extension_manager.remove_extension_files(ext_name)
+                                if success:
                                     print(f"✓ 扩展 '{ext_name}' 删除成功！")
                                     print("请重启程序以生效。")
                                 else:
-                                    print(f"错误: 扩展目录不存在: {ext_dir}")
+                                    print(f"错误: {message}")
                         else:
                             print(f"\n错误: 扩展不存在: {ext_name}")
                     else:
                         print("\n[系统] 用法: /extension delete <扩展名>")
+                elif sub_command == 'reload':
+                    if len(parts) > 1:
+                        self._reload_extension(parts[1])
+                    else:
+                        print("\n[系统] 用法: /extension reload <扩展名>")
+                elif sub_command == 'watch':
+                    mode = parts[1].lower() if len(parts) > 1 else ""
+                    if mode in ('on', 'off'):
+                        self._set_extension_watch(mode == 'on')
+                    else:
+                        watching = extension_manager is not None and extension_manager.watcher is not None
+                        print(f"\n[系统] 扩展热重载: {'开启' if watching else '关闭'}")
+                        print("用法: /extension watch on/off")
+                elif sub_command == 'stats':
+                    self._show_extension_stats(parts[1:])
                 else:
                     print("\n[系统] 未知子命令")
-                    print("可用子命令: list, info, import, delete")
+                    print("可用子命令: list, info, import, delete, reload, watch, stats")
             else:
                 # 显示扩展管理界面
                 self.show_extension_manager()
@@ -16,13 +16,18 @@
 """
 
 import sys
+import re
 import json
 import os
+import time
 import requests
 import threading
-import re
+import concurrent.futures
+from collections import deque
+from itertools import islice
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Optional, List, Tuple
+from typing import Callable, Dict, Optional, List, Tuple
 
 # PyQt5导入
 try:
@@ -32,14 +37,18 @@ try:
         QInputDialog, QMessageBox, QListWidget, QListWidgetItem, QMenu,
         QAction, QProgressBar, QStatusBar, QFileDialog, QComboBox,
         QCheckBox, QGroupBox, QLineEdit, QDialog, QDialogButtonBox,
-        QTabWidget, QPlainTextEdit, QToolButton
+        QTabWidget, QPlainTextEdit, QToolButton, QListView, QStyledItemDelegate,
+        QStyle, QAbstractItemView, QShortcut
+    )
+    from PyQt5.QtCore import (
+        Qt, QThread, pyqtSignal, QTimer, QSize, QPropertyAnimation, QEasingCurve, QPoint,
+        QPointF, QRect, QRectF, QAbstractListModel, QModelIndex, QPersistentModelIndex, QObject
     )
-    from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QSize, QPropertyAnimation, QEasingCurve, QPoint
     from PyQt5.QtGui import (
         QTextCursor, QTextCharFormat, QColor, QFont, QIcon, QPalette,
-        QTextDocument, QTextBlockFormat, QTextImageFormat, QCursor
+        QTextDocument, QTextBlockFormat, QTextImageFormat, QCursor,
+        QPainter, QFontMetrics, QLinearGradient, QBrush, QKeySequence, QAbstractTextDocumentLayout
     )
-    from PyQt5.QtWebEngineWidgets import QWebEngineView
 except ImportError:
     print("错误: 需要安装 PyQt5")
     print("请运行: pip install PyQt5 PyQtWebEngine")
@@ -54,6 +63,18 @@ except ImportError:
     EXTENSIONS_AVAILABLE = False
     extension_manager = None
 
+# 工具调用解析器、工具注册表和截图后端（CLI 和 GUI 共用）
+from iflow_tool_parser import find_last_tool_call
+from iflow_tool_registry import ToolRegistry, CONFIRM_NEVER
+from iflow_tool_middleware import CacheMiddleware, ProfilerMiddleware
+from iflow_prompt_selector import PromptSelector
+from iflow_fonts import get_font_catalog
+from iflow_startup import get_startup_timer
+from iflow_stream import StreamChunkQueue, StreamScheduler, HTTP_POOL_SIZE
+from iflow_screen_capture import (
+    get_capturer, parse_region, remember_capture, recall_capture, CaptureError
+)
+
 
 # ============ 自定义弹窗 ============
 
@@ -62,6 +83,7 @@ class CustomMessageBox(QDialog):
 
     def __init__(self, parent=None, title="", message="", buttons=QMessageBox.Ok, default_button=QMessageBox.NoButton):
         super().__init__(parent)
+        Theme.apply()
         self.setWindowTitle(title)
         self.setModal(True)
         # 移除窗口边框
@@ -78,43 +100,19 @@ class CustomMessageBox(QDialog):
         # 标题栏
         title_bar = QWidget()
         title_bar.setFixedHeight(40)
-        title_bar.setStyleSheet("""
-            QWidget {
-                background-color: #202123;
-                border-top-left-radius: 8px;
-                border-top-right-radius: 8px;
-            }
-        """)
+        title_bar.setObjectName("messageBoxTitleBar")
         title_layout = QHBoxLayout()
         title_layout.setContentsMargins(20, 0, 20, 0)
 
         title_label = QLabel(title)
-        title_label.setStyleSheet("""
-            QLabel {
-                color: #ECECF1;
-                font-size: 16px;
-                font-weight: bold;
-            }
-        """)
+        title_label.setObjectName("messageBoxTitle")
         title_layout.addWidget(title_label)
         title_layout.addStretch()
 
         # 关闭按钮
         close_btn = QPushButton("×")
         close_btn.setFixedSize(30, 30)
-        close_btn.setStyleSheet("""
-            QPushButton {
-                background-color: transparent;
-                color: #ECECF1;
-                border: none;
-                font-size: 20px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #E74C3C;
-                border-radius: 15px;
-            }
-        """)
+        close_btn.setObjectName("messageBoxClose")
         close_btn.clicked.connect(self.reject)
         title_layout.addWidget(close_btn)
 
@@ -125,29 +123,11 @@ class CustomMessageBox(QDialog):
         scroll = QScrollArea()
         scroll.setWidgetResizable(True)
         scroll.setFrameShape(QFrame.NoFrame)
-        scroll.setStyleSheet("""
-            QScrollArea { background-color: #343541; border: none; }
-            QScrollBar:vertical {
-                background: #2C3E50;
-                width: 8px;
-                border-radius: 4px;
-            }
-            QScrollBar::handle:vertical {
-                background: #4A90E2;
-                border-radius: 4px;
-                min-height: 20px;
-            }
-            QScrollBar::handle:vertical:hover {
-                background: #5DADE2;
-            }
-            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
-                height: 0px;
-            }
-        """)
+        scroll.setObjectName("messageBoxScroll")
 
         # 消息标签容器
         container = QWidget()
-        container.setStyleSheet("background-color: #343541;")
+        container.setObjectName("messageBoxBody")
         container_layout = QVBoxLayout()
         container_layout.setContentsMargins(20, 20, 20, 20)
         container_layout.setSpacing(0)
@@ -159,14 +139,7 @@ class CustomMessageBox(QDialog):
         label.setOpenExternalLinks(True)
         label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
         label.setTextInteractionFlags(Qt.TextSelectableByMouse | Qt.TextSelectableByKeyboard)
-        label.setStyleSheet("""
-            QLabel {
-                color: #ECECF1;
-                font-size: 14px;
-                line-height: 1.8;
-            }
-            QLabel a { color: #4A90E2; text-decoration: underline; }
-        """)
+        label.setObjectName("messageBoxText")
 
         container_layout.addWidget(label)
         container.setLayout(container_layout)
@@ -180,18 +153,7 @@ class CustomMessageBox(QDialog):
         if buttons & QMessageBox.Ok:
             ok_btn = QPushButton("确定")
             ok_btn.clicked.connect(lambda: self.done(QMessageBox.Ok))
-            ok_btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #10A37F;
-                    color: white;
-                    padding: 8px 20px;
-                    border: none;
-                    border-radius: 4px;
-                    font-size: 14px;
-                }
-                QPushButton:hover { background-color: #0D8A6A; }
-                QPushButton:pressed { background-color: #0A7359; }
-            """)
+            ok_btn.setProperty("variant", "dialogAccept")
             if default_button == QMessageBox.Ok:
                 ok_btn.setDefault(True)
             btn_layout.addStretch()
@@ -199,18 +161,7 @@ class CustomMessageBox(QDialog):
         elif buttons & QMessageBox.Yes:
             yes_btn = QPushButton("确定")
             yes_btn.clicked.connect(lambda: self.done(QMessageBox.Yes))
-            yes_btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #10A37F;
-                    color: white;
-                    padding: 8px 20px;
-                    border: none;
-                    border-radius: 4px;
-                    font-size: 14px;
-                }
-                QPushButton:hover { background-color: #0D8A6A; }
-                QPushButton:pressed { background-color: #0A7359; }
-            """)
+            yes_btn.setProperty("variant", "dialogAccept")
             if default_button == QMessageBox.Yes:
                 yes_btn.setDefault(True)
             btn_layout.addStretch()
@@ -218,31 +169,13 @@ class CustomMessageBox(QDialog):
 
             no_btn = QPushButton("取消")
             no_btn.clicked.connect(lambda: self.done(QMessageBox.No))
-            no_btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #444654;
-                    color: #ECECF1;
-                    padding: 8px 20px;
-                    border: none;
-                    border-radius: 4px;
-                    font-size: 14px;
-                }
-                QPushButton:hover { background-color: #565869; }
-                QPushButton:pressed { background-color: #67677A; }
-            """)
+            no_btn.setProperty("variant", "dialogReject")
             if default_button == QMessageBox.No:
                 no_btn.setDefault(True)
             btn_layout.addWidget(no_btn)
 
         layout.addLayout(btn_layout)
 
-        # 设置整体样式
-        self.setStyleSheet("""
-            QDialog {
-                background-color: #343541;
-                border-radius: 8px;
-            }
-        """)
         self.setLayout(layout)
 
         # 设置固定大小为屏幕的三分之一
@@ -299,92 +232,31 @@ class CustomMessageBox(QDialog):
 
 # ============ 字体加载 ============
 def load_custom_fonts():
-    """加载自定义字体"""
-    from PyQt5.QtGui import QFontDatabase
-
-    main_font_family = None
-    main_font_path = None  # 新增：保存字体文件路径
-    genshin_fonts = {}
-
-    try:
-        font_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts')
-
-        # 加载主要中文字体
-        main_font_path = os.path.join(font_dir, 'zh-cn.ttf')
-        if os.path.exists(main_font_path):
-            try:
-                main_font_id = QFontDatabase.addApplicationFont(main_font_path)
-                if main_font_id != -1:
-                    font_families = QFontDatabase.applicationFontFamilies(main_font_id)
-                    if font_families:
-                        main_font_family = font_families[0]
-                        print(f"已加载主要字体: {main_font_family}")
-                        print(f"字体文件 {main_font_path} 包含以下字体系列:")
-                        for family in font_families:
-                            print(f"  - {family}")
-                    else:
-                        print(f"警告: 字体文件 {main_font_path} 没有可用的字体系列")
-                else:
-                    print(f"警告: 无法加载字体文件 {main_font_path}")
-            except Exception as e:
-                print(f"警告: 加载主要字体时出错: {e}")
-        else:
-            print(f"警告: 字体文件不存在 {main_font_path}")
-
-        # 加载 Genshin Impact 彩蛋字体
-        genshin_font_dir = os.path.join(font_dir, 'Genshin-Impact')
-        if os.path.exists(genshin_font_dir):
-            for font_file in os.listdir(genshin_font_dir):
-                if font_file.endswith('.ttf') or font_file.endswith('.otf'):
-                    font_path = os.path.join(genshin_font_dir, font_file)
-                    try:
-                        font_id = QFontDatabase.addApplicationFont(font_path)
-                        if font_id != -1:
-                            font_families = QFontDatabase.applicationFontFamilies(font_id)
-                            if font_families:
-                                font_family = font_families[0]
-                                # 使用文件名（不含扩展名）作为键
-                                font_name = os.path.splitext(font_file)[0]
-                                genshin_fonts[font_name] = font_family
-                                print(f"已加载 Genshin 字体: {font_name} -> {font_family}")
-                            else:
-                                print(f"警告: 字体文件 {font_path} 没有可用的字体系列")
-                        else:
-                            print(f"警告: 无法加载字体文件 {font_path}")
-                    except Exception as e:
-                        print(f"警告: 加载 Genshin 字体 {font_file} 时出错: {e}")
-        else:
-            print(f"警告: Genshin 字体目录不存在 {genshin_font_dir}")
-
-    except Exception as e:
-        print(f"警告: 字体加载失败: {e}")
-        print("将使用默认字体")
-
-    return main_font_family, main_font_path, genshin_fonts
-
-
-# 加载字体（延迟加载）
-_MAIN_FONT_FAMILY = None
-_GENSHIN_FONTS = {}
-_FONTS_LOADED = False
+    """
+    加载自定义字体
+    
+    只注册主要字体，彩蛋字体的字体系列名来自缓存，第一次使用时才注册（见 load_genshin_font）
+    """
+    catalog = get_font_catalog()
+    main_font_family, main_font_path = catalog.main_font()
+    if main_font_family:
+        print(f"已加载主要字体: {main_font_family}")
+    return main_font_family, main_font_path, catalog.easter_egg_fonts()
 
 
 def get_main_font_family():
-    """获取主要字体系列名称"""
-    global _MAIN_FONT_FAMILY, _MAIN_FONT_PATH, _FONTS_LOADED
-    if not _FONTS_LOADED:
-        _MAIN_FONT_FAMILY, _MAIN_FONT_PATH, _GENSHIN_FONTS = load_custom_fonts()
-        _FONTS_LOADED = True
-    return _MAIN_FONT_FAMILY, _MAIN_FONT_PATH
+    """获取主要字体系列名称和字体文件路径"""
+    return get_font_catalog().main_font()
 
 
 def get_genshin_fonts():
-    """获取 Genshin 字体字典"""
-    global _MAIN_FONT_FAMILY, _GENSHIN_FONTS, _FONTS_LOADED
-    if not _FONTS_LOADED:
-        _MAIN_FONT_FAMILY, _GENSHIN_FONTS = load_custom_fonts()
-        _FONTS_LOADED = True
-    return _GENSHIN_FONTS
+    """获取 Genshin 字体字典 {字体名: 字体系列名}（不注册字体）"""
+    return get_font_catalog().easter_egg_fonts()
+
+
+def load_genshin_font(name: str) -> Optional[str]:
+    """使用 Genshin 字体前调用，第一次使用时注册字体，返回字体系列名"""
+    return get_font_catalog().load_easter_egg_font(name)
 
 
 # 向后兼容
@@ -433,23 +305,39 @@ class Theme:
     ERROR = "#ef4444"
     WARNING = "#f59e0b"
     INFO = "#3b82f6"
-
-
-# ============ 自定义组件 ============
-
-class ModernButton(QPushButton):
-    """现代化按钮"""
     
-    def __init__(self, text: str, primary: bool = False, parent=None):
-        super().__init__(text, parent)
-        self.primary = primary
-        self._setup_style()
+    _stylesheet: Optional[str] = None
     
-    def _setup_style(self):
-        if self.primary:
-            self.setStyleSheet(f"""
-                QPushButton {{
-                    background-color: {Theme.ACCENT};
+    @classmethod
+    def stylesheet(cls) -> str:
+        """
+        应用级样式表
+        
+        所有常用控件的样式编译成一份样式表，按对象名和 variant 属性选择，
+        创建控件时只需设置对象名或属性，不再逐个解析样式表
+        """
+        if cls._stylesheet is None:
+            scrollbar = f"""
+                QScrollBar:vertical {{
+                    background: {cls.SCROLLBAR_BG};
+                    width: 8px;
+                    border-radius: 4px;
+                }}
+                QScrollBar::handle:vertical {{
+                    background: {cls.SCROLLBAR_HANDLE};
+                    border-radius: 4px;
+                    min-height: 30px;
+                }}
+                QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {{
+                    height: 0px;
+                }}
+                QScrollBar::add-page:vertical, QScrollBar::sub-page:vertical {{
+                    background: none;
+                }}
+            """
+            cls._stylesheet = f"""
+                QPushButton[variant="primary"] {{
+                    background-color: {cls.ACCENT};
                     color: white;
                     border: none;
                     border-radius: 6px;
@@ -457,40 +345,197 @@ class ModernButton(QPushButton):
                     font-size: 14px;
                     font-weight: 600;
                 }}
-                QPushButton:hover {{
-                    background-color: {Theme.ACCENT_HOVER};
+                QPushButton[variant="primary"]:hover {{
+                    background-color: {cls.ACCENT_HOVER};
                 }}
-                QPushButton:pressed {{
-                    background-color: {Theme.ACCENT_PRESSED};
+                QPushButton[variant="primary"]:pressed {{
+                    background-color: {cls.ACCENT_PRESSED};
                 }}
-                QPushButton:disabled {{
-                    background-color: {Theme.DIVIDER};
-                    color: {Theme.TEXT_DIM};
+                QPushButton[variant="primary"]:disabled {{
+                    background-color: {cls.DIVIDER};
+                    color: {cls.TEXT_DIM};
                 }}
-            """)
-        else:
-            self.setStyleSheet(f"""
-                QPushButton {{
+                QPushButton[variant="secondary"] {{
                     background-color: transparent;
-                    color: {Theme.TEXT_PRIMARY};
-                    border: 1px solid {Theme.BORDER};
+                    color: {cls.TEXT_PRIMARY};
+                    border: 1px solid {cls.BORDER};
                     border-radius: 6px;
                     padding: 8px 12px;
                     font-size: 14px;
                 }}
-                QPushButton:hover {{
-                    background-color: {Theme.ACCENT};
-                    border-color: {Theme.ACCENT};
+                QPushButton[variant="secondary"]:hover {{
+                    background-color: {cls.ACCENT};
+                    border-color: {cls.ACCENT};
+                }}
+                QPushButton[variant="secondary"]:disabled {{
+                    color: {cls.TEXT_DIM};
+                    border-color: {cls.DIVIDER};
+                }}
+                
+                QTextEdit#chatInput {{
+                    background-color: {cls.INPUT_BG};
+                    color: {cls.INPUT_TEXT};
+                    border: 1px solid {cls.BORDER};
+                    border-radius: 12px;
+                    padding: 12px 16px;
+                    font-size: 15px;
+                    selection-background-color: {cls.ACCENT};
+                }}
+                QTextEdit#chatInput:focus {{
+                    border: 2px solid {cls.ACCENT};
+                }}
+                
+                QWidget#sidebar {{
+                    background-color: {cls.SIDEBAR_BG};
                 }}
-                QPushButton:disabled {{
-                    color: {Theme.TEXT_DIM};
-                    border-color: {Theme.DIVIDER};
+                QWidget#chatArea, QWidget#inputBar {{
+                    background-color: {cls.CHAT_BG};
                 }}
-            """)
+                QWidget#chatToolbar {{
+                    background-color: {cls.CHAT_BG};
+                    border-bottom: 1px solid {cls.BORDER};
+                }}
+                QWidget#inputBar {{
+                    border-top: 1px solid {cls.BORDER};
+                }}
+                QListView#transcript {{
+                    background-color: {cls.CHAT_BG};
+                    border: none;
+                    outline: none;
+                }}
+                QListView#conversationList {{
+                    background-color: transparent;
+                    border: none;
+                    outline: none;
+                    padding: 8px;
+                }}
+                QTabWidget#conversationTabs::pane {{
+                    border: none;
+                }}
+                QTabWidget#conversationTabs QTabBar::tab {{
+                    background-color: {cls.SIDEBAR_BG};
+                    color: {cls.TEXT_SECONDARY};
+                    border: none;
+                    border-right: 1px solid {cls.BORDER};
+                    padding: 8px 14px;
+                    font-size: 13px;
+                }}
+                QTabWidget#conversationTabs QTabBar::tab:selected {{
+                    background-color: {cls.CHAT_BG};
+                    color: {cls.TEXT_PRIMARY};
+                }}
+                QTabWidget#conversationTabs QTabBar::tab:hover {{
+                    color: {cls.TEXT_PRIMARY};
+                }}
+                QTabWidget#conversationTabs QToolButton {{
+                    background-color: transparent;
+                    color: {cls.TEXT_PRIMARY};
+                    border: none;
+                    padding: 4px 10px;
+                    font-size: 16px;
+                }}
+                QTabWidget#conversationTabs QToolButton:hover {{
+                    background-color: {cls.ACCENT};
+                    border-radius: 4px;
+                }}
+                {scrollbar.replace("QScrollBar", "QTextEdit#chatInput QScrollBar")}
+                {scrollbar.replace("QScrollBar", "QListView#transcript QScrollBar")}
+                {scrollbar.replace("QScrollBar", "QListView#conversationList QScrollBar")}
+                
+                CustomMessageBox {{
+                    background-color: #343541;
+                    border-radius: 8px;
+                }}
+                QWidget#messageBoxTitleBar {{
+                    background-color: #202123;
+                    border-top-left-radius: 8px;
+                    border-top-right-radius: 8px;
+                }}
+                QLabel#messageBoxTitle {{
+                    color: #ECECF1;
+                    font-size: 16px;
+                    font-weight: bold;
+                }}
+                QPushButton#messageBoxClose {{
+                    background-color: transparent;
+                    color: #ECECF1;
+                    border: none;
+                    font-size: 20px;
+                    font-weight: bold;
+                }}
+                QPushButton#messageBoxClose:hover {{
+                    background-color: #E74C3C;
+                    border-radius: 15px;
+                }}
+                QScrollArea#messageBoxScroll, QWidget#messageBoxBody {{
+                    background-color: #343541;
+                    border: none;
+                }}
+                QScrollArea#messageBoxScroll QScrollBar:vertical {{
+                    background: #2C3E50;
+                    width: 8px;
+                    border-radius: 4px;
+                }}
+                QScrollArea#messageBoxScroll QScrollBar::handle:vertical {{
+                    background: #4A90E2;
+                    border-radius: 4px;
+                    min-height: 20px;
+                }}
+                QScrollArea#messageBoxScroll QScrollBar::handle:vertical:hover {{
+                    background: #5DADE2;
+                }}
+                QScrollArea#messageBoxScroll QScrollBar::add-line:vertical,
+                QScrollArea#messageBoxScroll QScrollBar::sub-line:vertical {{
+                    height: 0px;
+                }}
+                QLabel#messageBoxText {{
+                    color: #ECECF1;
+                    font-size: 14px;
+                    line-height: 1.8;
+                }}
+                QPushButton[variant="dialogAccept"], QPushButton[variant="dialogReject"] {{
+                    padding: 8px 20px;
+                    border: none;
+                    border-radius: 4px;
+                    font-size: 14px;
+                }}
+                QPushButton[variant="dialogAccept"] {{
+                    background-color: #10A37F;
+                    color: white;
+                }}
+                QPushButton[variant="dialogAccept"]:hover {{ background-color: #0D8A6A; }}
+                QPushButton[variant="dialogAccept"]:pressed {{ background-color: #0A7359; }}
+                QPushButton[variant="dialogReject"] {{
+                    background-color: #444654;
+                    color: #ECECF1;
+                }}
+                QPushButton[variant="dialogReject"]:hover {{ background-color: #565869; }}
+                QPushButton[variant="dialogReject"]:pressed {{ background-color: #67677A; }}
+            """
+        return cls._stylesheet
+    
+    @classmethod
+    def apply(cls, app: QApplication = None):
+        """把样式表设置到应用上（已经设置过时不重复解析）"""
+        app = app or QApplication.instance()
+        if app is not None and app.property("iflowTheme") is not True:
+            app.setStyleSheet(app.styleSheet() + cls.stylesheet())
+            app.setProperty("iflowTheme", True)
+
+
+# ============ 自定义组件 ============
+
+class ModernButton(QPushButton):
+    """现代化按钮"""
     
-    def setEnabled(self, enabled: bool):
-        super().setEnabled(enabled)
+    def __init__(self, text: str, primary: bool = False, parent=None):
+        super().__init__(text, parent)
+        self.primary = primary
         self._setup_style()
+    
+    def _setup_style(self):
+        # 样式在应用级样式表中，按 variant 属性选择，禁用状态由 :disabled 处理
+        self.setProperty("variant", "primary" if self.primary else "secondary")
 
 
 class ModernTextEdit(QTextEdit):
@@ -509,33 +554,7 @@ class ModernTextEdit(QTextEdit):
         self.setPlaceholderText(placeholder)
     
     def _setup_style(self):
-        self.setStyleSheet(f"""
-            QTextEdit {{
-                background-color: {Theme.INPUT_BG};
-                color: {Theme.INPUT_TEXT};
-                border: 1px solid {Theme.BORDER};
-                border-radius: 12px;
-                padding: 12px 16px;
-                font-size: 15px;
-                selection-background-color: {Theme.ACCENT};
-            }}
-            QTextEdit:focus {{
-                border: 2px solid {Theme.ACCENT};
-            }}
-            QScrollBar:vertical {{
-                background: {Theme.SCROLLBAR_BG};
-                width: 8px;
-                border-radius: 4px;
-            }}
-            QScrollBar::handle:vertical {{
-                background: {Theme.SCROLLBAR_HANDLE};
-                border-radius: 4px;
-                min-height: 20px;
-            }}
-            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {{
-                height: 0px;
-            }}
-        """)
+        self.setObjectName("chatInput")
     
     def keyPressEvent(self, event):
         # Ctrl+Enter 发送消息
@@ -545,262 +564,557 @@ class ModernTextEdit(QTextEdit):
             super().keyPressEvent(event)
 
 
-class MessageBubble(QWidget):
-    """消息气泡组件"""
+class TranscriptModel(QAbstractListModel):
+    """
+    对话记录模型
+    
+    每条消息只保存角色、内容、时间和缓存的布局高度，不创建任何控件，
+    长对话的内存占用只与文本长度有关
+    """
     
-    def __init__(self, role: str, content: str, timestamp: str = None, parent=None):
+    RoleRole = Qt.UserRole + 1
+    TimeRole = Qt.UserRole + 2
+    
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.role = role
-        self.content = content
-        self.timestamp = timestamp or datetime.now().strftime("%H:%M")
-        self._setup_ui()
+        # 每条消息: [角色, 内容, 时间, 布局缓存对应的宽度, 布局缓存的高度]
+        self._rows: List[list] = []
     
-    def _setup_ui(self):
-        layout = QVBoxLayout()
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(4)
-        
-        # 背景颜色
-        bg_color = Theme.ASSISTANT_MSG_BG if self.role == "assistant" else Theme.USER_MSG_BG
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return entry[1]
+        if role == self.RoleRole:
+            return entry[0]
+        if role == self.TimeRole:
+            return entry[2]
+        return None
+    
+    def entry(self, row: int) -> list:
+        """消息的原始数据（绘制代理读写布局缓存）"""
+        return self._rows[row]
+    
+    def append_message(self, role: str, content: str, timestamp: str = None) -> int:
+        """追加一条消息，返回行号"""
+        row = len(self._rows)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.append([role, content, timestamp or datetime.now().strftime("%H:%M"), 0, 0])
+        self.endInsertRows()
+        return row
+    
+    def prepend_messages(self, messages: List[Tuple[str, str]]):
+        """在开头插入更早的消息（分段显示历史对话）"""
+        if not messages:
+            return
+        timestamp = datetime.now().strftime("%H:%M")
+        self.beginInsertRows(QModelIndex(), 0, len(messages) - 1)
+        self._rows[:0] = [[role, content, timestamp, 0, 0] for role, content in messages]
+        self.endInsertRows()
+    
+    def set_messages(self, messages: List[Tuple[str, str]]):
+        """一次性替换全部消息（加载历史对话时只重置一次模型）"""
+        timestamp = datetime.now().strftime("%H:%M")
+        self.beginResetModel()
+        self._rows = [[role, content, timestamp, 0, 0] for role, content in messages]
+        self.endResetModel()
+    
+    def set_content(self, row: int, content: str):
+        """更新消息内容（流式输出）"""
+        if not 0 <= row < len(self._rows):
+            return
+        entry = self._rows[row]
+        entry[1] = content
+        entry[3] = 0
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+    
+    def append_content(self, row: int, text: str):
+        """向消息末尾追加内容（流式输出）"""
+        if not 0 <= row < len(self._rows):
+            return
+        entry = self._rows[row]
+        entry[1] += text
+        entry[3] = 0
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+    
+    def clear(self):
+        """清空全部消息"""
+        self.beginResetModel()
+        self._rows = []
+        self.endResetModel()
+
+
+class MessageDelegate(QStyledItemDelegate):
+    """
+    消息绘制代理
+    
+    按聊天气泡的样式直接绘制头像、角色、时间和正文，视图只绘制可见的行；
+    正文高度按视图宽度缓存在模型中，滚动和重绘时不再重新计算换行
+    """
+    
+    MARGIN_H = 20
+    MARGIN_V = 12
+    AVATAR_SIZE = 36
+    AVATAR_SPACING = 12
+    PADDING_H = 16
+    PADDING_V = 12
+    HEADER_SPACING = 8
+    TEXT_INSET = 5
+    
+    def __init__(self, view: QListView):
+        super().__init__(view)
+        self.view = view
+        self.role_font = QFont(view.font())
+        self.role_font.setPixelSize(13)
+        self.role_font.setWeight(QFont.DemiBold)
+        self.time_font = QFont(view.font())
+        self.time_font.setPixelSize(12)
+        self.avatar_font = QFont(view.font())
+        self.avatar_font.setPixelSize(14)
+        self.avatar_font.setBold(True)
+        self.text_font = QFont(view.font())
+        self.text_font.setPixelSize(15)
+        self._text_metrics = QFontMetrics(self.text_font)
+        self._header_height = max(QFontMetrics(self.role_font).height(), QFontMetrics(self.time_font).height())
+        # 正在流式输出的行使用文本文档排版，追加内容时只重新排版最后一段
+        self._live_row: Optional[int] = None
+        self._live_doc: Optional[QTextDocument] = None
+        self._live_cursor: Optional[QTextCursor] = None
+    
+    def begin_live(self, row: int, text: str = ""):
+        """开始增量排版某一行"""
+        doc = QTextDocument(self)
+        doc.setDefaultFont(self.text_font)
+        doc.setDocumentMargin(0)
+        doc.setUndoRedoEnabled(False)
+        doc.setPlainText(text)
+        self.end_live()
+        self._live_row, self._live_doc = row, doc
+        self._live_cursor = QTextCursor(doc)
+        self._live_cursor.movePosition(QTextCursor.End)
+    
+    def append_live(self, text: str):
+        """向增量排版的行追加文本"""
+        if self._live_cursor is not None:
+            self._live_cursor.insertText(text)
+    
+    def move_live(self, row: int):
+        """增量排版的行号变化（前面插入了消息）"""
+        self._live_row = row
+    
+    def end_live(self):
+        """结束增量排版，该行之后按普通行计算高度"""
+        if self._live_doc is not None:
+            self._live_doc.deleteLater()
+        self._live_row = self._live_doc = self._live_cursor = None
+    
+    def _text_width(self, width: int) -> int:
+        chrome = 2 * (self.MARGIN_H + self.PADDING_H + self.TEXT_INSET) + self.AVATAR_SIZE + self.AVATAR_SPACING
+        return max(1, width - chrome)
+    
+    def _height_for_text(self, text_height: int) -> int:
+        bubble_height = (2 * (self.PADDING_V + self.TEXT_INSET) + self._header_height
+                         + self.HEADER_SPACING + text_height)
+        return 2 * self.MARGIN_V + max(self.AVATAR_SIZE, bubble_height)
+    
+    def _row_height(self, row: int, entry: list, width: int) -> int:
+        """计算并缓存一行的高度"""
+        if row == self._live_row:
+            self._live_doc.setTextWidth(self._text_width(width))
+            return self._height_for_text(int(self._live_doc.size().height()) + 1)
+        if entry[3] != width:
+            text_rect = self._text_metrics.boundingRect(
+                QRect(0, 0, self._text_width(width), 1 << 24), Qt.TextWordWrap, entry[1] or " "
+            )
+            entry[3] = width
+            entry[4] = self._height_for_text(text_rect.height())
+        return entry[4]
+    
+    def row_height(self, index) -> int:
+        """按当前视图宽度计算一行的高度"""
+        width = self.view.viewport().width()
+        return self._row_height(index.row(), index.model().entry(index.row()), width)
+    
+    def sizeHint(self, option, index) -> QSize:
+        return QSize(self.view.viewport().width(), self.row_height(index))
+    
+    def paint(self, painter, option, index):
+        entry = index.model().entry(index.row())
+        role, content, timestamp = entry[0], entry[1], entry[2]
+        is_assistant = role == "assistant"
+        rect = option.rect
         
-        # 主容器
-        container = QWidget()
-        container.setStyleSheet(f"""
-            QWidget {{
-                background-color: {bg_color};
-                border-radius: 8px;
-            }}
-        """)
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
         
-        container_layout = QVBoxLayout()
-        container_layout.setContentsMargins(16, 12, 16, 12)
-        container_layout.setSpacing(8)
+        # 头像
+        avatar_rect = QRect(rect.left() + self.MARGIN_H, rect.top() + self.MARGIN_V,
+                            self.AVATAR_SIZE, self.AVATAR_SIZE)
+        if is_assistant:
+            gradient = QLinearGradient(QPointF(avatar_rect.topLeft()), QPointF(avatar_rect.bottomRight()))
+            gradient.setColorAt(0, QColor(Theme.ACCENT))
+            gradient.setColorAt(1, QColor(Theme.ACCENT_HOVER))
+            painter.setBrush(QBrush(gradient))
+        else:
+            painter.setBrush(QColor(Theme.TEXT_SECONDARY))
+        painter.setPen(Qt.NoPen)
+        painter.drawEllipse(avatar_rect)
+        painter.setFont(self.avatar_font)
+        painter.setPen(QColor("white" if is_assistant else Theme.BACKGROUND))
+        painter.drawText(avatar_rect, Qt.AlignCenter, "AI" if is_assistant else "你")
+        
+        # 气泡
+        bubble_left = avatar_rect.right() + 1 + self.AVATAR_SPACING
+        bubble_rect = QRect(bubble_left, rect.top() + self.MARGIN_V,
+                            rect.right() - self.MARGIN_H - bubble_left + 1, rect.height() - 2 * self.MARGIN_V)
+        painter.setBrush(QColor(Theme.ASSISTANT_MSG_BG if is_assistant else Theme.USER_MSG_BG))
+        if option.state & QStyle.State_Selected:
+            painter.setPen(QColor(Theme.BORDER))
+        else:
+            painter.setPen(Qt.NoPen)
+        painter.drawRoundedRect(bubble_rect, 8, 8)
         
         # 头部（角色和时间）
-        header_layout = QHBoxLayout()
-        header_layout.setContentsMargins(0, 0, 0, 0)
-        
-        role_name = "助手" if self.role == "assistant" else "你"
-        role_color = Theme.ACCENT if self.role == "assistant" else Theme.TEXT_SECONDARY
-        
-        role_label = QLabel(role_name)
-        role_label.setStyleSheet(f"""
-            QLabel {{
-                color: {role_color};
-                font-size: 13px;
-                font-weight: 600;
-            }}
-        """)
-        
-        time_label = QLabel(self.timestamp)
-        time_label.setStyleSheet(f"""
-            QLabel {{
-                color: {Theme.TEXT_DIM};
-                font-size: 12px;
-            }}
-        """)
-        
-        header_layout.addWidget(role_label)
-        header_layout.addStretch()
-        header_layout.addWidget(time_label)
-        
-        # 内容显示
-        content_label = QLabel()
-        content_label.setWordWrap(True)
-        content_label.setTextFormat(Qt.PlainText)
-        content_label.setText(self.content)
-        content_label.setTextInteractionFlags(Qt.TextSelectableByMouse | Qt.TextSelectableByKeyboard)
-        content_label.setCursor(Qt.IBeamCursor)
-        
-        # 获取背景色
-        bg_color = Theme.ASSISTANT_MSG_BG if self.role == "assistant" else Theme.USER_MSG_BG
-        
-        content_label.setStyleSheet(f"""
-            QLabel {{
-                color: {Theme.TEXT_PRIMARY};
-                font-size: 15px;
-                line-height: 1.6;
-                border: 1px solid {bg_color};
-                border-radius: 4px;
-                padding: 4px;
-            }}
-            QLabel:hover {{
-                border: 1px solid {Theme.BORDER};
-                background-color: {bg_color};
-            }}
-        """)
-        
-        container_layout.addLayout(header_layout)
-        container_layout.addWidget(content_label)
-        
-        container.setLayout(container_layout)
-        layout.addWidget(container)
+        inner = bubble_rect.adjusted(self.PADDING_H, self.PADDING_V, -self.PADDING_H, -self.PADDING_V)
+        header_rect = QRect(inner.left(), inner.top(), inner.width(), self._header_height)
+        painter.setFont(self.role_font)
+        painter.setPen(QColor(Theme.ACCENT if is_assistant else Theme.TEXT_SECONDARY))
+        painter.drawText(header_rect, Qt.AlignLeft | Qt.AlignVCenter, "助手" if is_assistant else "你")
+        painter.setFont(self.time_font)
+        painter.setPen(QColor(Theme.TEXT_DIM))
+        painter.drawText(header_rect, Qt.AlignRight | Qt.AlignVCenter, timestamp)
+        
+        # 正文
+        text_rect = QRect(inner.left() + self.TEXT_INSET,
+                          header_rect.bottom() + 1 + self.HEADER_SPACING + self.TEXT_INSET,
+                          inner.width() - 2 * self.TEXT_INSET, 0)
+        text_rect.setBottom(inner.bottom() - self.TEXT_INSET)
+        if index.row() == self._live_row:
+            self._live_doc.setTextWidth(text_rect.width())
+            painter.translate(text_rect.topLeft())
+            context = QAbstractTextDocumentLayout.PaintContext()
+            context.palette.setColor(QPalette.Text, QColor(Theme.TEXT_PRIMARY))
+            context.clip = QRectF(0, 0, text_rect.width(), text_rect.height())
+            self._live_doc.documentLayout().draw(painter, context)
+        else:
+            painter.setFont(self.text_font)
+            painter.setPen(QColor(Theme.TEXT_PRIMARY))
+            painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignTop | Qt.TextWordWrap, content)
         
-        self.setLayout(layout)
+        painter.restore()
 
 
-class ChatMessageWidget(QWidget):
-    """聊天消息组件（带头像）"""
+class TranscriptView(QListView):
+    """
+    对话记录视图
+    
+    QListView 只为可见的行调用绘制代理，消息数量不影响滚动和重绘的开销；
+    停在底部时内容增长会自动跟随，向上翻看时不会被拉回底部，
+    在开头插入更早的消息时当前看到的消息保持不动；
+    选中消息后可以右键或 Ctrl+C 复制内容
+    """
+    
+    reached_top = pyqtSignal()  # 滚动到顶部（可以加载更早的消息）
     
-    def __init__(self, role: str, content: str, timestamp: str = None, parent=None):
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.role = role
-        self.content = content
-        self.timestamp = timestamp or datetime.now().strftime("%H:%M")
-        self._setup_ui()
+        self._follow_bottom = True
+        # 向上翻看时固定的消息及其在视口中的位置
+        self._anchor: Optional[Tuple[QPersistentModelIndex, int]] = None
+        self._adjusting = False
+        self._stream_row: Optional[int] = None
+        # 最近的重绘耗时（秒）
+        self.paint_times: deque = deque(maxlen=240)
+        self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+        self.verticalScrollBar().rangeChanged.connect(self._on_range_changed)
+        self.setItemDelegate(MessageDelegate(self))
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setResizeMode(QListView.Adjust)
+        # 超长对话分批计算布局，打开对话时不会卡住界面
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(200)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setFrameShape(QFrame.NoFrame)
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.customContextMenuRequested.connect(self._show_context_menu)
+        self.setObjectName("transcript")
     
-    def _setup_ui(self):
-        main_layout = QHBoxLayout()
-        main_layout.setContentsMargins(20, 12, 20, 12)
-        main_layout.setSpacing(12)
-        
-        # 头像
-        avatar = QLabel()
-        avatar.setFixedSize(36, 36)
-        
-        if self.role == "assistant":
-            avatar.setStyleSheet("""
-                QLabel {
-                    background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
-                        stop:0 #10a37f, stop:1 #1a7f64);
-                    border-radius: 18px;
-                }
-            """)
-            avatar.setText("AI")
-            avatar.setAlignment(Qt.AlignCenter)
-            avatar.setStyleSheet(f"""
-                QLabel {{
-                    background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
-                        stop:0 {Theme.ACCENT}, stop:1 {Theme.ACCENT_HOVER});
-                    border-radius: 18px;
-                    color: white;
-                    font-size: 14px;
-                    font-weight: bold;
-                }}
-            """)
+    def setModel(self, model):
+        super().setModel(model)
+        # 内容变化后行高可能改变，通知视图重新布局
+        model.dataChanged.connect(self._on_data_changed)
+        model.modelReset.connect(self._on_model_reset)
+        model.rowsAboutToBeInserted.connect(self._on_rows_about_to_be_inserted)
+        model.rowsInserted.connect(self._on_rows_inserted)
+    
+    def begin_stream(self, row: int):
+        """开始流式输出到某一行"""
+        self._stream_row = row
+        self.itemDelegate().begin_live(row, self.model().entry(row)[1])
+    
+    def append_stream(self, text: str):
+        """追加流式输出的内容"""
+        if self._stream_row is None:
+            return
+        self.itemDelegate().append_live(text)
+        self.model().append_content(self._stream_row, text)
+    
+    def end_stream(self):
+        """结束流式输出，该行改回普通绘制"""
+        row, self._stream_row = self._stream_row, None
+        self.itemDelegate().end_live()
+        if row is not None and row < self.model().rowCount():
+            self.model().set_content(row, self.model().entry(row)[1])
+    
+    def _on_model_reset(self):
+        # 消息被整体替换，正在输出的行已不存在
+        self._stream_row = None
+        self._anchor = None
+        self.itemDelegate().end_live()
+    
+    def _on_rows_about_to_be_inserted(self, parent, first: int, last: int):
+        if first == 0 and not self._follow_bottom and self._anchor is None:
+            self._set_anchor()
+    
+    def _on_rows_inserted(self, parent, first: int, last: int):
+        # 前面插入了消息，正在输出的行号后移
+        if self._stream_row is not None and first <= self._stream_row:
+            self._stream_row += last - first + 1
+            self.itemDelegate().move_live(self._stream_row)
+    
+    def _set_anchor(self):
+        """记住视口顶部的消息，布局变化后保持它的位置"""
+        index = self.indexAt(QPoint(0, 0))
+        self._anchor = (QPersistentModelIndex(index), self.visualRect(index).top()) if index.isValid() else None
+    
+    def _restore_anchor(self):
+        index, offset = self._anchor
+        if not index.isValid():
+            self._anchor = None
+            return
+        delta = self.visualRect(QModelIndex(index)).top() - offset
+        if delta:
+            self._adjusting = True
+            self.verticalScrollBar().setValue(self.verticalScrollBar().value() + delta)
+            self._adjusting = False
+    
+    def paintEvent(self, event):
+        started = time.perf_counter()
+        super().paintEvent(event)
+        self.paint_times.append(time.perf_counter() - started)
+    
+    def _on_data_changed(self, top_left, bottom_right, roles=None):
+        # 重新布局的开销与行数成正比：行高没有变化时（流式输出的大多数帧）只重绘该行
+        delegate = self.itemDelegate()
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            index = top_left.sibling(row, 0)
+            rect = self.visualRect(index)
+            if rect.height() != delegate.row_height(index):
+                delegate.sizeHintChanged.emit(index)
+                return
+            self.viewport().update(rect)
+    
+    def _on_scrolled(self, value: int):
+        if self._adjusting:
+            return
+        bar = self.verticalScrollBar()
+        self._follow_bottom = value >= bar.maximum() - 4
+        if self._follow_bottom:
+            self._anchor = None
+        elif self._anchor is not None:
+            self._set_anchor()
+        if value == bar.minimum() and bar.maximum() > 0:
+            self.reached_top.emit()
+    
+    def _on_range_changed(self, minimum: int, maximum: int):
+        # 分批布局、流式输出和插入更早的消息都会让内容变高
+        if self._follow_bottom:
+            self.verticalScrollBar().setValue(maximum)
+        elif self._anchor is not None:
+            self._restore_anchor()
+    
+    def scroll_to_bottom(self):
+        """滚动到底部并继续跟随新内容"""
+        self._follow_bottom = True
+        self.scrollToBottom()
+    
+    def copy_selected(self):
+        """复制选中的消息"""
+        index = self.currentIndex()
+        if index.isValid():
+            QApplication.clipboard().setText(index.data(Qt.DisplayRole) or "")
+    
+    def _show_context_menu(self, pos):
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return
+        self.setCurrentIndex(index)
+        menu = QMenu(self)
+        copy_action = menu.addAction("复制消息")
+        copy_action.triggered.connect(self.copy_selected)
+        menu.exec_(self.viewport().mapToGlobal(pos))
+    
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy):
+            self.copy_selected()
         else:
-            avatar.setStyleSheet(f"""
-                QLabel {{
-                    background-color: {Theme.TEXT_SECONDARY};
-                    border-radius: 18px;
-                    color: {Theme.BACKGROUND};
-                    font-size: 14px;
-                    font-weight: bold;
-                }}
-            """)
-            avatar.setText("你")
-            avatar.setAlignment(Qt.AlignCenter)
-        
-        # 消息内容
-        message_widget = MessageBubble(self.role, self.content, self.timestamp)
-        message_widget.setStyleSheet(f"""
-            MessageBubble {{
-                background-color: {Theme.ASSISTANT_MSG_BG if self.role == "assistant" else Theme.USER_MSG_BG};
-            }}
-        """)
-        
-        main_layout.addWidget(avatar)
-        main_layout.addWidget(message_widget, 1)
-        
-        self.setLayout(main_layout)
+            super().keyPressEvent(event)
 
 
-class SidebarItem(QWidget):
-    """侧边栏对话项"""
+class ConversationIndex(QAbstractListModel):
+    """
+    对话历史索引
+    
+    按修改时间倒序保存对话文件列表，保存对话时只插入、更新或移动对应的一行，
+    视图通过模型的插入、更新、移动信号增量刷新
+    """
     
-    clicked = pyqtSignal()
+    FileRole = Qt.UserRole + 1
+    TimeRole = Qt.UserRole + 2
     
-    def __init__(self, title: str, timestamp: str, parent=None):
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.title = title
-        self.timestamp = timestamp
-        self._setup_ui()
+        # 每个对话: [文件名, 显示名称, 修改时间]
+        self._rows: List[list] = []
     
-    def _setup_ui(self):
-        self.setFixedHeight(50)
-        self.setCursor(Qt.PointingHandCursor)
-        
-        layout = QHBoxLayout()
-        layout.setContentsMargins(12, 0, 12, 0)
-        
-        # 图标
-        icon_label = QLabel("💬")
-        icon_label.setStyleSheet(f"color: {Theme.TEXT_DIM}; font-size: 16px;")
-        
-        # 标题
-        title_label = QLabel(self.title)
-        title_label.setStyleSheet(f"""
-            QLabel {{
-                color: {Theme.TEXT_PRIMARY};
-                font-size: 14px;
-            }}
-        """)
-        title_label.setWordWrap(True)
-        
-        # 时间
-        time_label = QLabel(self.timestamp)
-        time_label.setStyleSheet(f"""
-            QLabel {{
-                color: {Theme.TEXT_DIM};
-                font-size: 11px;
-            }}
-        """)
-        
-        layout.addWidget(icon_label)
-        layout.addWidget(title_label, 1)
-        layout.addWidget(time_label)
-        
-        self.setLayout(layout)
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return entry[1]
+        if role == self.FileRole:
+            return entry[0]
+        if role == self.TimeRole:
+            return entry[2]
+        return None
+    
+    def set_conversations(self, conversations: List[Tuple[str, str, str]]):
+        """一次性替换全部对话（启动时加载）"""
+        self.beginResetModel()
+        self._rows = sorted((list(c) for c in conversations), key=lambda e: e[2], reverse=True)
+        self.endResetModel()
+    
+    def row_of(self, filename: str) -> Optional[int]:
+        for row, entry in enumerate(self._rows):
+            if entry[0] == filename:
+                return row
+        return None
+    
+    def upsert(self, filename: str, display_name: str, mtime: str):
+        """添加或更新一个对话，按修改时间移动到对应位置"""
+        row = self.row_of(filename)
+        # 除自身外修改时间更新的对话排在前面
+        target = sum(1 for r, entry in enumerate(self._rows) if r != row and entry[2] > mtime)
+        if row is None:
+            self.beginInsertRows(QModelIndex(), target, target)
+            self._rows.insert(target, [filename, display_name, mtime])
+            self.endInsertRows()
+            return
+        if target != row:
+            self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), target if target < row else target + 1)
+            self._rows.insert(target, self._rows.pop(row))
+            self.endMoveRows()
+        self._rows[target][1:] = [display_name, mtime]
+        index = self.index(target)
+        self.dataChanged.emit(index, index)
+    
+    def remove(self, filename: str):
+        row = self.row_of(filename)
+        if row is not None:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._rows[row]
+            self.endRemoveRows()
+
+
+class SidebarDelegate(QStyledItemDelegate):
+    """侧边栏对话项绘制代理，所有行高度相同"""
+    
+    ROW_HEIGHT = 50
+    SPACING = 4
+    PADDING_H = 12
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.icon_font = QFont()
+        self.icon_font.setPixelSize(16)
+        self.title_font = QFont()
+        self.title_font.setPixelSize(14)
+        self.time_font = QFont()
+        self.time_font.setPixelSize(11)
+    
+    def sizeHint(self, option, index) -> QSize:
+        return QSize(option.rect.width(), self.ROW_HEIGHT + self.SPACING)
+    
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = option.rect.adjusted(0, 0, 0, -self.SPACING)
         
         # 悬停效果
-        self.setStyleSheet(f"""
-            SidebarItem {{
-                background-color: transparent;
-                border-radius: 6px;
-            }}
-            SidebarItem:hover {{
-                background-color: {Theme.ACCENT};
-            }}
-        """)
-    
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.clicked.emit()
-        super().mousePressEvent(event)
+        if option.state & QStyle.State_MouseOver:
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(Theme.ACCENT))
+            painter.drawRoundedRect(QRectF(rect), 6, 6)
+        
+        content = rect.adjusted(self.PADDING_H, 0, -self.PADDING_H, 0)
+        painter.setFont(self.icon_font)
+        painter.setPen(QColor(Theme.TEXT_DIM))
+        icon_rect = painter.drawText(content, Qt.AlignLeft | Qt.AlignVCenter, "💬")
+        
+        timestamp = index.data(ConversationIndex.TimeRole) or ""
+        painter.setFont(self.time_font)
+        painter.setPen(QColor(Theme.TEXT_PRIMARY if option.state & QStyle.State_MouseOver else Theme.TEXT_DIM))
+        time_rect = painter.drawText(content, Qt.AlignRight | Qt.AlignVCenter, timestamp)
+        
+        title_rect = QRect(icon_rect.right() + 8, content.top(),
+                           time_rect.left() - icon_rect.right() - 16, content.height())
+        painter.setFont(self.title_font)
+        painter.setPen(QColor(Theme.TEXT_PRIMARY))
+        title = QFontMetrics(self.title_font).elidedText(index.data(Qt.DisplayRole) or "", Qt.ElideRight,
+                                                         max(0, title_rect.width()))
+        painter.drawText(title_rect, Qt.AlignLeft | Qt.AlignVCenter, title)
+        
+        painter.restore()
 
 
-class ModernScrollArea(QScrollArea):
-    """现代化滚动区域"""
+class SidebarView(QListView):
+    """
+    侧边栏对话列表
+    
+    只绘制可见的行，对话数量上千时滚动和更新的开销也不变
+    """
+    
+    conversation_clicked = pyqtSignal(str)  # 点击的对话文件名
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self._setup_style()
-        self.setWidgetResizable(True)
+        self.setItemDelegate(SidebarDelegate(self))
+        # 行高相同，视图不需要逐行计算布局
+        self.setUniformItemSizes(True)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
         self.setFrameShape(QFrame.NoFrame)
+        self.setMouseTracking(True)
+        self.viewport().setCursor(Qt.PointingHandCursor)
+        self.clicked.connect(self._on_clicked)
+        self.setObjectName("conversationList")
     
-    def _setup_style(self):
-        self.setStyleSheet(f"""
-            QScrollArea {{
-                background-color: transparent;
-                border: none;
-            }}
-            QScrollBar:vertical {{
-                background: {Theme.SCROLLBAR_BG};
-                width: 8px;
-                border-radius: 4px;
-            }}
-            QScrollBar::handle:vertical {{
-                background: {Theme.SCROLLBAR_HANDLE};
-                border-radius: 4px;
-                min-height: 30px;
-            }}
-            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {{
-                height: 0px;
-            }}
-            QScrollBar::add-page:vertical, QScrollBar::sub-page:vertical {{
-                background: none;
-            }}
-        """)
+    def _on_clicked(self, index):
+        filename = index.data(ConversationIndex.FileRole)
+        if filename:
+            self.conversation_clicked.emit(filename)
 
 
 # ============ API密钥管理 ============
@@ -884,16 +1198,25 @@ class APIKeyManager:
             json.dump(messages, f, ensure_ascii=False, indent=2)
         return filename
     
+    def conversation_info(self, filename: str) -> Optional[Tuple[str, str, str]]:
+        """单个对话的 (文件名, 显示名称, 修改时间)，文件不存在时返回 None"""
+        filepath = os.path.join(self.HISTORY_DIR, filename)
+        try:
+            mtime = datetime.fromtimestamp(os.path.getmtime(filepath))
+        except OSError:
+            return None
+        display_name = filename[:-5]  # 去掉.json
+        return filename, display_name, mtime.strftime("%Y-%m-%d %H:%M:%S")
+    
     def list_conversations(self) -> List[Tuple[str, str, str]]:
         """列出所有对话历史，返回(文件名, 显示名称, 修改时间)列表"""
         conversations = []
         if os.path.exists(self.HISTORY_DIR):
             for filename in os.listdir(self.HISTORY_DIR):
                 if filename.endswith('.json'):
-                    filepath = os.path.join(self.HISTORY_DIR, filename)
-                    mtime = datetime.fromtimestamp(os.path.getmtime(filepath))
-                    display_name = filename[:-5]  # 去掉.json
-                    conversations.append((filename, display_name, mtime.strftime("%Y-%m-%d %H:%M:%S")))
+                    info = self.conversation_info(filename)
+                    if info:
+                        conversations.append(info)
         # 按修改时间倒序排列
         conversations.sort(key=lambda x: x[2], reverse=True)
         return conversations
@@ -915,12 +1238,13 @@ class APIKeyManager:
 class StreamChatThread(QThread):
     """流式对话线程"""
     
-    message_received = pyqtSignal(str)  # 接收到的消息片段
+    chunks_ready = pyqtSignal()  # 片段队列中有新的片段（从 chunks 中读取）
     chat_finished = pyqtSignal(str)  # 完整消息
     error_occurred = pyqtSignal(str)  # 错误信息
     execution_result = pyqtSignal(str)  # 指令执行结果
     
-    def __init__(self, api_url: str, api_key: str, model: str, messages: List[dict]):
+    def __init__(self, api_url: str, api_key: str, model: str, messages: List[dict],
+                 session: Optional[requests.Session] = None):
         super().__init__()
         self.api_url = api_url
         self.api_key = api_key
@@ -928,8 +1252,27 @@ class StreamChatThread(QThread):
         self.messages = messages
         self.stop_flag = False
         self.lock = threading.Lock()
+        # 共用的 HTTP 会话（连接池），None 时每次请求单独建立连接
+        self.session = session
+        # 收到的片段先放入有上限的队列，界面按通知批量读取
+        self.chunks = StreamChunkQueue()
+        # 首个片段的延迟、总耗时和本线程占用的CPU时间（秒），线程结束后有效
+        self.first_token_latency: Optional[float] = None
+        self.duration = 0.0
+        self.cpu_time = 0.0
+        self._started = 0.0
     
     def run(self):
+        """执行流式对话，记录延迟和CPU时间"""
+        self._started = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            self._stream()
+        finally:
+            self.cpu_time = time.thread_time() - cpu_start
+            self.duration = time.perf_counter() - self._started
+    
+    def _stream(self):
         """执行流式对话"""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -946,7 +1289,7 @@ class StreamChatThread(QThread):
         }
         
         try:
-            response = requests.post(
+            response = (self.session or requests).post(
                 self.api_url,
                 headers=headers,
                 json=payload,
@@ -980,10 +1323,16 @@ class StreamChatThread(QThread):
                                     content = delta.get('content', '')
                                     if content:
                                         assistant_response += content
-                                        self.message_received.emit(content)
+                                        if self.first_token_latency is None:
+                                            self.first_token_latency = time.perf_counter() - self._started
+                                        if self.chunks.put(content):
+                                            self.chunks_ready.emit()
                         except json.JSONDecodeError:
                             continue
             
+            # 提前停止时连接中还有没读完的数据，关闭后连接不会放回连接池
+            response.close()
+            
             if assistant_response:
                 self.chat_finished.emit(assistant_response)
             
@@ -994,10 +1343,387 @@ class StreamChatThread(QThread):
         except Exception as e:
             self.error_occurred.emit(f"发生异常: {e}")
     
-    def stop(self):
-        """停止对话"""
-        with self.lock:
-            self.stop_flag = True
+    def stop(self):
+        """停止对话"""
+        with self.lock:
+            self.stop_flag = True
+
+
+# 打开历史对话时先显示的最近消息数
+HISTORY_INITIAL_MESSAGES = 30
+
+# 之后每次补充显示的更早消息数和间隔（毫秒）
+HISTORY_CHUNK_MESSAGES = 100
+HISTORY_CHUNK_INTERVAL = 16
+
+
+class ConversationLoadThread(QThread):
+    """对话加载线程，读取和解析历史对话文件，不阻塞界面"""
+    
+    loaded = pyqtSignal(str, object, object)  # (文件名, 消息列表, 要显示的 (角色, 内容) 列表)，失败时消息列表为 None
+    
+    def __init__(self, key_manager: 'APIKeyManager', filename: str):
+        super().__init__()
+        self.key_manager = key_manager
+        self.filename = filename
+    
+    def run(self):
+        messages = self.key_manager.load_conversation(self.filename)
+        rows = None
+        if messages:
+            rows = [(msg['role'], msg['content']) for msg in messages if msg.get('role') in ['user', 'assistant']]
+        self.loaded.emit(self.filename, messages, rows)
+
+
+class ToolCallThread(QThread):
+    """
+    工具调用线程，工具执行期间界面和其他标签页的流式输出不受影响
+    
+    阶段性输出和确认请求通过信号转回界面线程；
+    请求确认时工具线程等待界面线程通过 reply.set_result() 给出结果
+    """
+    
+    output_ready = pyqtSignal(str)  # 阶段性输出
+    confirm_requested = pyqtSignal(str, str, object)  # (标题, 内容, concurrent.futures.Future)
+    call_finished = pyqtSignal(bool, str)  # (是否成功, 结果)
+    
+    def __init__(self, registry: ToolRegistry, tool_name: str, tool_args: str):
+        super().__init__()
+        self.registry = registry
+        self.tool_name = tool_name
+        self.tool_args = tool_args
+        # 工具线程消耗的CPU时间（秒）
+        self.cpu_time = 0.0
+    
+    def run(self):
+        cpu_start = time.thread_time()
+        try:
+            success, result = self.registry.invoke(self.tool_name, self.tool_args,
+                                                   self._confirm, self.output_ready.emit)
+        except Exception as e:
+            success, result = False, f"工具执行失败: {str(e)}"
+        self.cpu_time = time.thread_time() - cpu_start
+        self.call_finished.emit(bool(success), str(result))
+    
+    def _confirm(self, title: str, message: str) -> bool:
+        reply = concurrent.futures.Future()
+        self.confirm_requested.emit(title, message, reply)
+        return bool(reply.result())
+
+
+# 流式输出的默认最大刷新帧率
+STREAM_RENDER_FPS = 30
+
+
+class StreamRenderCoalescer(QObject):
+    """
+    流式输出刷新合并器
+    
+    缓存收到的文本片段，按帧率合并后一次性交给界面渲染，
+    同一时间最多只有一个待触发的定时器；记录每帧渲染耗时
+    """
+    
+    def __init__(self, render_callback: Callable[[str], None], fps: int = STREAM_RENDER_FPS, parent=None):
+        super().__init__(parent)
+        self.render_callback = render_callback
+        self._buffer: List[str] = []
+        self._last_flush = 0.0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+        self.set_fps(fps)
+        # 最近的每帧渲染耗时（秒）
+        self.frame_times: deque = deque(maxlen=240)
+        self.deltas = 0
+        self.frames = 0
+    
+    def set_fps(self, fps: int):
+        """设置最大刷新帧率（1-240）"""
+        self.fps = max(1, min(240, int(fps)))
+        self.interval = 1.0 / self.fps
+    
+    def push(self, delta: str):
+        """缓存一个文本片段，距上一帧足够久时尽快刷新"""
+        if not delta:
+            return
+        self._buffer.append(delta)
+        self.deltas += 1
+        if not self._timer.isActive():
+            wait = self.interval - (time.perf_counter() - self._last_flush)
+            self._timer.start(max(0, int(wait * 1000)))
+    
+    def flush(self):
+        """立即渲染缓存的全部片段"""
+        self._timer.stop()
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        started = time.perf_counter()
+        self.render_callback(text)
+        self._last_flush = time.perf_counter()
+        self.frame_times.append(self._last_flush - started)
+        self.frames += 1
+    
+    def reset_stats(self):
+        self.frame_times.clear()
+        self.deltas = 0
+        self.frames = 0
+    
+    @staticmethod
+    def summarize(times) -> Dict[str, float]:
+        """统计耗时序列（毫秒）"""
+        if not times:
+            return {'count': 0, 'avg': 0.0, 'p95': 0.0, 'max': 0.0}
+        ordered = sorted(times)
+        return {
+            'count': len(ordered),
+            'avg': sum(ordered) / len(ordered) * 1000,
+            'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            'max': ordered[-1] * 1000,
+        }
+    
+    def stats(self) -> Dict[str, float]:
+        stats = self.summarize(self.frame_times)
+        stats.update(fps=self.fps, deltas=self.deltas, frames=self.frames)
+        return stats
+    
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (f"{stats['deltas']} 个片段合并为 {stats['frames']} 帧 (上限 {stats['fps']} FPS)，"
+                f"帧耗时 平均 {stats['avg']:.2f}ms / P95 {stats['p95']:.2f}ms / 最大 {stats['max']:.2f}ms")
+
+
+def create_http_session(pool_size: int = HTTP_POOL_SIZE) -> requests.Session:
+    """创建所有标签页共用的 HTTP 会话，同一服务器的连接在连接池中复用"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# ============ 对话标签页 ============
+
+class ConversationTab(QWidget):
+    """
+    对话标签页
+    
+    每个标签页有自己的对话消息、消息显示和流式对话线程，
+    主窗口中对话相关的属性读写的是正在操作的标签页（见 _tab_state）
+    """
+    
+    # 流式对话线程的信号在标签页中过滤后转给主窗口，第一个参数是标签页本身
+    stream_finished = pyqtSignal(object, str)  # 完整回复
+    stream_failed = pyqtSignal(object, str)  # 错误信息
+    stream_ended = pyqtSignal(object)  # 线程已退出
+    conversation_loaded = pyqtSignal(object, str, object, object)  # 同 ConversationLoadThread.loaded
+    # 工具调用线程的信号，同样过滤后转给主窗口
+    tool_output = pyqtSignal(object, str, str)  # (标签页, 工具名, 阶段性输出)
+    tool_confirm = pyqtSignal(object, str, str, object)  # (标签页, 标题, 内容, 回复)
+    tool_finished = pyqtSignal(object, str, bool, str)  # (标签页, 工具名, 是否成功, 结果)
+    
+    def __init__(self, stream_fps: int = STREAM_RENDER_FPS, parent=None):
+        super().__init__(parent)
+        self.messages: List[dict] = []
+        self.current_conversation_name: Optional[str] = None
+        self.is_streaming = False
+        # 达到并发上限，等待开始
+        self.queued = False
+        # 标签页已关闭（进行中的工具调用返回后不再继续对话）
+        self.closed = False
+        
+        # 流式对话线程
+        self.chat_thread: Optional[StreamChatThread] = None
+        self.current_assistant_response = ""
+        self.current_assistant_row: Optional[int] = None
+        # 当前线程的回复或错误已经转给主窗口
+        self.answered = False
+        # 进行中的工具调用
+        self.tool_thread: Optional[ToolCallThread] = None
+        
+        # 消息显示区域（模型/视图，只绘制可见的消息，不为每条消息创建控件）
+        self.transcript_model = TranscriptModel(self)
+        self.transcript_view = TranscriptView()
+        self.transcript_view.setModel(self.transcript_model)
+        self.transcript_view.reached_top.connect(self.render_older_messages)
+        # 合并流式输出片段，按帧率刷新消息显示
+        self.render_coalescer = StreamRenderCoalescer(self.render_stream_delta, stream_fps, parent=self)
+        
+        # 后台加载对话，先显示最近的消息，更早的消息分段补充
+        self.current_load: Optional[ConversationLoadThread] = None
+        self.pending_history: List[Tuple[str, str]] = []
+        self.history_timer = QTimer(self)
+        self.history_timer.setInterval(HISTORY_CHUNK_INTERVAL)
+        self.history_timer.timeout.connect(self.render_older_messages)
+        
+        # 指标：请求次数，最近一次请求的首字延迟和总耗时（秒），
+        # 累计CPU时间（流式对话线程加上工具调用，秒）
+        self.requests = 0
+        self.first_token_latency: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.cpu_time = 0.0
+        self.stream_started: Optional[float] = None
+        
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        layout.addWidget(self.transcript_view)
+        self.setLayout(layout)
+    
+    def title(self) -> str:
+        """标签页标题（进行中显示 ●，排队中显示 ⏳）"""
+        name = self.current_conversation_name or "新对话"
+        if len(name) > 16:
+            name = name[:15] + "…"
+        if self.queued:
+            return f"⏳ {name}"
+        if self.is_streaming:
+            return f"● {name}"
+        return name
+    
+    def format_stats(self) -> str:
+        """延迟和CPU指标"""
+        parts = []
+        if self.queued:
+            parts.append("排队中")
+        elif self.is_streaming and self.stream_started is not None:
+            parts.append(f"输出中 {time.perf_counter() - self.stream_started:.0f}s")
+        if self.first_token_latency is not None:
+            parts.append(f"首字 {self.first_token_latency:.2f}s")
+        if self.last_duration is not None:
+            parts.append(f"耗时 {self.last_duration:.1f}s")
+        parts.append(f"CPU {self.cpu_time:.2f}s")
+        parts.append(f"请求 {self.requests} 次")
+        return " · ".join(parts)
+    
+    def attach_thread(self, thread: StreamChatThread):
+        """使用新的流式对话线程，之前线程的信号不再处理"""
+        self.chat_thread = thread
+        self.answered = False
+        self.stream_started = time.perf_counter()
+        thread.chunks_ready.connect(self._on_chunks_ready)
+        thread.chat_finished.connect(self._on_chat_finished)
+        thread.error_occurred.connect(self._on_error)
+        thread.finished.connect(self._on_thread_finished)
+    
+    def attach_tool_thread(self, thread: ToolCallThread):
+        """使用新的工具调用线程，之前线程的信号不再处理"""
+        self.tool_thread = thread
+        thread.output_ready.connect(self._on_tool_output)
+        thread.confirm_requested.connect(self._on_tool_confirm)
+        thread.call_finished.connect(self._on_tool_finished)
+    
+    def _on_tool_output(self, chunk: str):
+        if self.sender() is self.tool_thread:
+            self.tool_output.emit(self, self.tool_thread.tool_name, chunk)
+    
+    def _on_tool_confirm(self, title: str, message: str, reply):
+        if self.sender() is self.tool_thread and not self.closed:
+            self.tool_confirm.emit(self, title, message, reply)
+        if not reply.done():
+            # 已停止的调用不再询问用户
+            reply.set_result(False)
+    
+    def _on_tool_finished(self, success: bool, result: str):
+        thread = self.sender()
+        if thread is not self.tool_thread:
+            return
+        self.tool_thread = None
+        self.cpu_time += thread.cpu_time
+        self.tool_finished.emit(self, thread.tool_name, success, result)
+    
+    def drain_chunks(self):
+        """把片段队列中的文本交给刷新合并器"""
+        if self.chat_thread is not None:
+            for chunk in self.chat_thread.chunks.drain():
+                self.render_coalescer.push(chunk)
+    
+    def _on_chunks_ready(self):
+        if self.sender() is self.chat_thread:
+            self.drain_chunks()
+    
+    def _on_chat_finished(self, full_response: str):
+        if self.sender() is self.chat_thread:
+            self.drain_chunks()
+            self.answered = True
+            self.stream_finished.emit(self, full_response)
+    
+    def _on_error(self, error_msg: str):
+        if self.sender() is self.chat_thread:
+            self.answered = True
+            self.stream_failed.emit(self, error_msg)
+    
+    def _on_thread_finished(self):
+        thread = self.sender()
+        if thread is not self.chat_thread:
+            return
+        self.requests += 1
+        self.first_token_latency = thread.first_token_latency
+        self.last_duration = thread.duration
+        self.cpu_time += thread.cpu_time
+        self.stream_ended.emit(self)
+    
+    def render_stream_delta(self, text: str):
+        """把合并后的片段追加到消息显示"""
+        self.current_assistant_response += text
+        # 只追加新内容，停在底部时视图会自动跟随
+        self.transcript_view.append_stream(text)
+    
+    def load(self, thread: ConversationLoadThread):
+        """在此标签页中显示后台加载的对话"""
+        self.current_load = thread
+        thread.loaded.connect(self._on_conversation_loaded)
+    
+    def _on_conversation_loaded(self, filename: str, loaded, rows):
+        # 连续点击多个对话时只显示最后一次点击的对话，加载期间新建、导入了对话或开始了对话则放弃
+        if self.sender() is self.current_load and not self.is_streaming:
+            self.conversation_loaded.emit(self, filename, loaded, rows)
+    
+    def clear_display(self):
+        """清空消息显示"""
+        self.current_assistant_row = None
+        self.current_load = None
+        self.stop_history_render()
+        self.transcript_model.clear()
+    
+    def show_rows(self, rows: List[Tuple[str, str]]):
+        """
+        显示整段对话
+        
+        先显示最近的消息，更早的消息在之后的事件循环中分段插入到开头，
+        向上滚动到顶部时立即补充
+        """
+        self.current_assistant_row = None
+        self.current_load = None
+        self.stop_history_render()
+        split = max(0, len(rows) - HISTORY_INITIAL_MESSAGES)
+        self.pending_history = rows[:split]
+        self.transcript_model.set_messages(rows[split:])
+        QTimer.singleShot(50, self.transcript_view.scroll_to_bottom)
+        if self.pending_history:
+            self.history_timer.start()
+    
+    def render_older_messages(self):
+        """补充显示一段更早的消息"""
+        if not self.pending_history:
+            self.history_timer.stop()
+            return
+        chunk = self.pending_history[-HISTORY_CHUNK_MESSAGES:]
+        del self.pending_history[-HISTORY_CHUNK_MESSAGES:]
+        self.transcript_model.prepend_messages(chunk)
+        if not self.pending_history:
+            self.history_timer.stop()
+    
+    def stop_history_render(self):
+        self.history_timer.stop()
+        self.pending_history = []
+
+
+def _tab_state(name: str) -> property:
+    """主窗口中读写正在操作的标签页的同名属性"""
+    return property(lambda self: getattr(self._tab(), name),
+                    lambda self, value: setattr(self._tab(), name, value))
 
 
 # ============ 主窗口 ============
@@ -1005,33 +1731,76 @@ class StreamChatThread(QThread):
 class IflowChatGUI(QMainWindow):
     """心流聊天客户端 - GUI版本"""
     
+    extension_loaded = pyqtSignal(str, object)  # 后台加载完成的扩展 (扩展名, 扩展实例)
+    extension_changed = pyqtSignal(str, object, object)  # 热重载的扩展 (扩展名, 旧实例, 新实例)
+    startup_finished = pyqtSignal()  # 首次绘制后的初始化全部完成
+    
+    # 对话状态属于各个标签页，读写的是正在操作的标签页（见 _tab）
+    messages = _tab_state('messages')
+    current_conversation_name = _tab_state('current_conversation_name')
+    is_streaming = _tab_state('is_streaming')
+    chat_thread = _tab_state('chat_thread')
+    current_assistant_response = _tab_state('current_assistant_response')
+    current_assistant_row = _tab_state('current_assistant_row')
+    transcript_model = _tab_state('transcript_model')
+    transcript_view = _tab_state('transcript_view')
+    render_coalescer = _tab_state('render_coalescer')
+    
     def __init__(self):
         super().__init__()
+        timer = get_startup_timer()
+        # 常用控件的样式编译成一份应用级样式表
+        with timer.phase("应用样式表"):
+            Theme.apply()
         
         # 核心对象
         self.model = "qwen3-coder-plus"
         self.api_url = "https://apis.iflow.cn/v1/chat/completions"
         self.key_manager = APIKeyManager()
-        self.messages: List[dict] = []
         self.debug_mode = False
-        self.is_streaming = False
-        self.current_conversation_name: Optional[str] = None
         self.auto_save = True
         self.ai_control_enabled = False
         self.current_action = None
         self.console_output = ""
         
-        # 流式对话线程
-        self.chat_thread: Optional[StreamChatThread] = None
-        self.current_assistant_response = ""
+        # 对话标签页（处理某个标签页的流式输出时临时指定为该标签页）
+        self._tab_override: Optional[ConversationTab] = None
+        # 所有标签页共用一个连接池，同时进行的对话数有上限
+        self.http_session = create_http_session()
+        self.stream_scheduler = StreamScheduler(self._launch_stream)
+        # 流式输出的最大刷新帧率，所有标签页共用（/fps 设置）
+        self.stream_fps = STREAM_RENDER_FPS
+        # 后台加载线程和已停止但还没退出的流式对话线程、工具调用线程，结束前保留引用
+        self._load_threads: List[ConversationLoadThread] = []
+        self._retired_threads: List[QThread] = []
+        # 有对话进行时每秒刷新标签页的指标
+        self._indicator_timer = QTimer(self)
+        self._indicator_timer.setInterval(1000)
+        self._indicator_timer.timeout.connect(self._refresh_tab_indicators)
         
         # 扩展管理器
         self.extensions = {}
         self.extension_tools = {}
         self.extension_prompts = ""
-        
-        # 调试窗口
+        self._added_extensions = set()
+        # 各扩展的提示词片段，热重载时按扩展替换
+        self._extension_prompt_parts = {}
+        # 按对话内容选择完整发送提示词的扩展，其余扩展只发送一行摘要
+        self.prompt_selector = PromptSelector()
+        
+        # 工具注册表（内置工具优先注册，扩展同名工具会被记录为冲突）
+        self.tool_registry = ToolRegistry()
+        # 工具在各标签页的工具调用线程中执行（见 ToolCallThread），界面线程不等待工具
+        with timer.phase("注册内置工具"):
+            self._register_builtin_tools()
+        
+        # 后台加载的扩展通过信号回到主线程注册
+        self.extension_loaded.connect(self._on_extension_loaded)
+        self.extension_changed.connect(self._on_extension_changed)
+        
+        # 调试窗口和日志缓冲区（print 的输出也写入缓冲区）
         self.debug_window = None
+        self.debug_log = DebugLog()
         
         # 拖动相关变量
         self._drag_position = None
@@ -1040,14 +1809,38 @@ class IflowChatGUI(QMainWindow):
         self._redirect_stdout()
         
         # 初始化UI
-        self._init_ui()
-        
-        # 加载扩展
-        self._load_extensions()
+        with timer.phase("创建界面"):
+            self._init_ui()
         
-        # 初始化消息
+        # 初始化消息（扩展加载后再把扩展提示词追加到system消息）
         self._init_messages()
         
+        # 不影响窗口显示的初始化延后到第一次绘制之后，每步之间让界面处理事件
+        self._first_painted = False
+        self._deferred_steps: List[Tuple[str, Callable[[], object]]] = [
+            ("加载扩展", self._load_extensions),
+            ("加载对话历史列表", self._load_history_list),
+        ]
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._first_painted:
+            self._first_painted = True
+            get_startup_timer().mark("首次绘制")
+            QTimer.singleShot(0, self._run_deferred_step)
+    
+    def _run_deferred_step(self):
+        """执行一步延后的初始化，全部完成后检查API密钥"""
+        timer = get_startup_timer()
+        if self._deferred_steps:
+            name, step = self._deferred_steps.pop(0)
+            with timer.phase(name, "首次绘制后"):
+                step()
+            QTimer.singleShot(0, self._run_deferred_step)
+            return
+        timer.mark("初始化完成")
+        self.startup_finished.emit()
+        
         # 检查API密钥
         QTimer.singleShot(100, self._check_api_key)
     
@@ -1058,27 +1851,143 @@ class IflowChatGUI(QMainWindow):
             return
         
         try:
-            # 加载所有扩展
-            extension_manager.load_extensions()
+            # 加载所有扩展（超出时间预算的扩展在后台加载完成后再注册）
+            extension_manager.load_extensions(
+                on_late_load=lambda ext_name, ext: self.extension_loaded.emit(ext_name, ext)
+            )
             self.extensions = extension_manager.extensions
             
             # 收集所有扩展的工具和提示词
-            for ext_name, ext in self.extensions.items():
-                # 收集工具
-                tools = ext.get_tools()
-                for tool_name, tool_func in tools.items():
-                    self.extension_tools[tool_name] = (ext, tool_func)
-                
-                # 收集提示词
-                prompt = ext.get_prompt()
-                if prompt:
-                    self.extension_prompts += prompt + "\n\n"
+            for ext_name, ext in list(self.extensions.items()):
+                self._add_extension(ext_name, ext)
             
             print(f"已加载 {len(self.extensions)} 个扩展")
             print(f"已加载 {len(self.extension_tools)} 个工具")
         except Exception as e:
             print(f"加载扩展失败: {e}")
     
+    def _add_extension(self, ext_name: str, ext) -> bool:
+        """收集扩展的工具和提示词，已收集过的扩展直接跳过"""
+        if ext_name in self._added_extensions:
+            return False
+        self._added_extensions.add(ext_name)
+        
+        # 收集工具
+        tools = ext.get_tools()
+        for tool_name, tool_func in tools.items():
+            self.extension_tools[tool_name] = (ext, tool_func)
+        self.tool_registry.register_extension(ext_name, ext)
+        
+        # 收集提示词
+        prompt = ext.get_prompt()
+        if prompt:
+            self._extension_prompt_parts[ext_name] = prompt
+            self.extension_prompts += prompt + "\n\n"
+            self.prompt_selector.set_extension(ext_name, ext)
+            # system提示词已生成时追加到末尾（所有标签页）
+            for tab in self._conversation_tabs():
+                if tab.messages and tab.messages[0].get("role") == "system":
+                    tab.messages[0]["content"] += "\n\n" + prompt
+        return True
+    
+    def _on_extension_loaded(self, ext_name: str, ext):
+        """后台加载的扩展完成（主线程）"""
+        if self._add_extension(ext_name, ext):
+            self.status_bar.showMessage(f"✓ 扩展 {ext_name} 已在后台加载完成")
+    
+    def _replace_extension(self, ext_name: str, old, new):
+        """
+        热重载时替换扩展（new 为 None 表示移除）
+        
+        工具表整体替换，system提示词中只替换该扩展的片段，对话中的其他消息保持不变
+        """
+        extension_tools = {name: value for name, value in self.extension_tools.items()
+                           if value[0] is not old}
+        if new is not None:
+            for tool_name, tool_func in new.get_tools().items():
+                extension_tools[tool_name] = (new, tool_func)
+        self.tool_registry.replace_extension(ext_name, new)
+        self.extension_tools = extension_tools
+        if new is None:
+            self._added_extensions.discard(ext_name)
+        else:
+            self._added_extensions.add(ext_name)
+        
+        # 重建提示词片段，保持各扩展原有顺序
+        old_prompt = self._extension_prompt_parts.get(ext_name, "")
+        new_prompt = new.get_prompt() if new is not None else ""
+        if new_prompt:
+            self._extension_prompt_parts[ext_name] = new_prompt
+            self.prompt_selector.set_extension(ext_name, new)
+        else:
+            self._extension_prompt_parts.pop(ext_name, None)
+            self.prompt_selector.remove_extension(ext_name)
+        self.extension_prompts = "".join(p + "\n\n" for p in self._extension_prompt_parts.values())
+        
+        if old_prompt == new_prompt:
+            return
+        fragment = "\n\n" + old_prompt
+        replacement = "\n\n" + new_prompt if new_prompt else ""
+        for tab in self._conversation_tabs():
+            if not tab.messages or tab.messages[0].get("role") != "system":
+                continue
+            content = tab.messages[0]["content"]
+            if old_prompt and fragment in content:
+                content = content.replace(fragment, replacement, 1)
+            else:
+                content += replacement
+            tab.messages[0]["content"] = content
+    
+    def _on_extension_changed(self, ext_name: str, old, new):
+        """文件监视检测到扩展变化（主线程）"""
+        if old is None:
+            self._add_extension(ext_name, new)
+        else:
+            self._replace_extension(ext_name, old, new)
+        action = "已热重载" if new is not None else "已移除"
+        self.status_bar.showMessage(f"✓ 扩展 {ext_name} {action}")
+    
+    def _reload_extension(self, ext_name: str) -> Tuple[bool, str]:
+        """手动重新加载扩展"""
+        if extension_manager is None:
+            return False, "扩展系统不可用"
+        old = self.extensions.get(ext_name)
+        success, message, new = extension_manager.reload_extension(ext_name)
+        if success:
+            self._replace_extension(ext_name, old, new)
+        return success, message
+    
+    def _set_extension_watch(self, enabled: bool):
+        """开启或关闭扩展文件监视（回调经信号回到主线程）"""
+        if extension_manager is None:
+            return
+        if enabled:
+            extension_manager.start_watching(
+                on_change=lambda ext_name, old, new: self.extension_changed.emit(ext_name, old, new)
+            )
+        else:
+            extension_manager.stop_watching()
+    
+    def _register_builtin_tools(self):
+        """注册内置工具"""
+        registry = self.tool_registry
+        registry.register('cmd', self._execute_command, description='执行系统命令', timeout=30)
+        registry.register('mouse_move', self._mouse_move, description='移动鼠标到指定坐标')
+        registry.register('mouse_click', self._mouse_click, description='点击鼠标')
+        registry.register('keyboard', self._keyboard_input, description='键盘输入文本或特殊按键')
+        registry.register('screenshot', self._take_screenshot, description='获取屏幕截图，可指定区域 x,y,宽,高')
+        registry.register('view_screenshot', self._view_screenshot, description='分析指定截图的内容',
+                          cacheable=True)
+        registry.register('wait', self._wait, description='等待指定秒数')
+        # 权限请求自带确认窗口，不再额外询问
+        registry.register('request_control', self._request_computer_control,
+                          description='请求获得电脑操作权限', confirm=CONFIRM_NEVER)
+        # 按扩展和工具统计资源占用（扩展管理中查看），放在最外层，缓存命中的调用也会计入
+        self.profiler = ProfilerMiddleware()
+        registry.add_middleware(self.profiler)
+        # 标记为 cacheable 的工具（如 view_screenshot）在有效期内直接返回上次的结果
+        registry.add_middleware(CacheMiddleware())
+    
     def _init_ui(self):
         """初始化UI"""
         self.setWindowTitle("iFlow Chat - 心流对话")
@@ -1223,11 +2132,7 @@ class IflowChatGUI(QMainWindow):
         sidebar = QWidget()
         sidebar.setMinimumWidth(300)
         sidebar.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
-        sidebar.setStyleSheet(f"""
-            QWidget {{
-                background-color: {Theme.SIDEBAR_BG};
-            }}
-        """)
+        sidebar.setObjectName("sidebar")
         
         layout = QVBoxLayout()
         layout.setContentsMargins(0, 0, 0, 0)
@@ -1267,7 +2172,8 @@ class IflowChatGUI(QMainWindow):
                 background-color: {Theme.ACCENT_HOVER};
             }}
         """)
-        new_chat_btn.clicked.connect(self._new_chat)
+        new_chat_btn.setToolTip("新建标签页 (Ctrl+T)")
+        new_chat_btn.clicked.connect(self._new_tab)
         title_layout.addWidget(new_chat_btn)
         
         title_widget.setLayout(title_layout)
@@ -1279,16 +2185,12 @@ class IflowChatGUI(QMainWindow):
         divider.setStyleSheet(f"background-color: {Theme.BORDER};")
         layout.addWidget(divider)
         
-        # 对话历史列表
-        self.history_list = ModernScrollArea()
-        self.history_content = QWidget()
-        self.history_layout = QVBoxLayout()
-        self.history_layout.setContentsMargins(8, 8, 8, 8)
-        self.history_layout.setSpacing(4)
-        self.history_layout.addStretch()
-        self.history_content.setLayout(self.history_layout)
-        self.history_list.setWidget(self.history_content)
-        layout.addWidget(self.history_list)
+        # 对话历史列表（保存对话时只更新对应的一行）
+        self.conversation_index = ConversationIndex(self)
+        self.history_list = SidebarView()
+        self.history_list.setModel(self.conversation_index)
+        self.history_list.conversation_clicked.connect(self._load_conversation)
+        layout.addWidget(self.history_list, 1)
         
         # 底部按钮区域
         bottom_widget = QWidget()
@@ -1322,19 +2224,13 @@ class IflowChatGUI(QMainWindow):
         
         sidebar.setLayout(layout)
         
-        # 加载对话历史
-        QTimer.singleShot(200, self._load_history_list)
-        
+        # 对话历史在首次绘制后加载（见 _run_deferred_step）
         return sidebar
     
     def _create_chat_area(self) -> QWidget:
         """创建聊天区域"""
         chat_area = QWidget()
-        chat_area.setStyleSheet(f"""
-            QWidget {{
-                background-color: {Theme.CHAT_BG};
-            }}
-        """)
+        chat_area.setObjectName("chatArea")
         
         layout = QVBoxLayout()
         layout.setContentsMargins(0, 0, 0, 0)
@@ -1343,12 +2239,7 @@ class IflowChatGUI(QMainWindow):
         # 顶部工具栏
         toolbar = QWidget()
         toolbar.setFixedHeight(50)
-        toolbar.setStyleSheet(f"""
-            QWidget {{
-                background-color: {Theme.CHAT_BG};
-                border-bottom: 1px solid {Theme.BORDER};
-            }}
-        """)
+        toolbar.setObjectName("chatToolbar")
         toolbar_layout = QHBoxLayout()
         toolbar_layout.setContentsMargins(20, 0, 20, 0)
         
@@ -1405,26 +2296,27 @@ class IflowChatGUI(QMainWindow):
         toolbar.setLayout(toolbar_layout)
         layout.addWidget(toolbar)
         
-        # 消息显示区域
-        self.messages_scroll = ModernScrollArea()
-        self.messages_content = QWidget()
-        self.messages_layout = QVBoxLayout()
-        self.messages_layout.setContentsMargins(0, 20, 0, 20)
-        self.messages_layout.setSpacing(0)
-        self.messages_layout.addStretch()
-        self.messages_content.setLayout(self.messages_layout)
-        self.messages_scroll.setWidget(self.messages_content)
-        layout.addWidget(self.messages_scroll, 1)
+        # 对话标签页（每个标签页有自己的消息显示和流式输出）
+        self.tabs = QTabWidget()
+        self.tabs.setObjectName("conversationTabs")
+        self.tabs.setDocumentMode(True)
+        self.tabs.setTabsClosable(True)
+        self.tabs.setMovable(True)
+        new_tab_btn = QToolButton()
+        new_tab_btn.setText("+")
+        new_tab_btn.setToolTip("新建标签页 (Ctrl+T)")
+        new_tab_btn.clicked.connect(self._new_tab)
+        self.tabs.setCornerWidget(new_tab_btn, Qt.TopRightCorner)
+        self.tabs.tabCloseRequested.connect(self._close_tab)
+        QShortcut(QKeySequence("Ctrl+T"), self, self._new_tab)
+        QShortcut(QKeySequence("Ctrl+W"), self, lambda: self._close_tab(self.tabs.currentIndex()))
+        self._add_tab()
+        layout.addWidget(self.tabs, 1)
         
         # 输入区域
         input_container = QWidget()
         input_container.setFixedHeight(100)
-        input_container.setStyleSheet(f"""
-            QWidget {{
-                background-color: {Theme.CHAT_BG};
-                border-top: 1px solid {Theme.BORDER};
-            }}
-        """)
+        input_container.setObjectName("inputBar")
         input_layout = QHBoxLayout()
         input_layout.setContentsMargins(20, 12, 20, 20)
         input_layout.setSpacing(12)
@@ -1445,12 +2337,15 @@ class IflowChatGUI(QMainWindow):
         self.stop_btn = ModernButton("停止", primary=False)
         self.stop_btn.setFixedSize(80, 60)
         self.stop_btn.setEnabled(False)
-        self.stop_btn.clicked.connect(self._stop_streaming)
+        self.stop_btn.clicked.connect(self._stop_current_tab)
         input_layout.addWidget(self.stop_btn)
         
         input_container.setLayout(input_layout)
         layout.addWidget(input_container)
         
+        # 输入框和按钮跟随当前标签页
+        self.tabs.currentChanged.connect(self._on_tab_changed)
+        
         chat_area.setLayout(layout)
         
         return chat_area
@@ -1501,6 +2396,7 @@ class IflowChatGUI(QMainWindow):
 - @mouse_click(left)
 - @keyboard(Hello World)
 - @screenshot()
+- @screenshot(0,0,800,600)  （只截取 x,y,宽,高 区域，更快，适合放大查看局部）
 - @view_screenshot(screenshot_20250101_120000.png)
 
 重要说明：
@@ -1618,6 +2514,14 @@ class IflowChatGUI(QMainWindow):
         else:
             status_text += "❌ 未设置密钥"
         
+        scheduler = self.stream_scheduler
+        status_text += f" | 并发 {len(scheduler.running)}/{scheduler.limit}"
+        if scheduler.waiting:
+            status_text += f"（排队 {len(scheduler.waiting)}）"
+        tab = self.tabs.currentWidget()
+        if tab is not None and tab.requests:
+            status_text += f" | {tab.format_stats()}"
+        
         self.status_bar.showMessage(status_text)
     
     def mousePressEvent(self, event):
@@ -1640,18 +2544,108 @@ class IflowChatGUI(QMainWindow):
     
     def _load_history_list(self):
         """加载对话历史列表"""
-        # 清空现有列表
-        for i in reversed(range(self.history_layout.count() - 1)):
-            item = self.history_layout.itemAt(i)
-            if item.widget():
-                item.widget().deleteLater()
-        
-        # 加载对话历史
-        conversations = self.key_manager.list_conversations()
-        for filename, name, timestamp in conversations:
-            item = SidebarItem(name, timestamp)
-            item.clicked.connect(lambda f=filename: self._load_conversation(f))
-            self.history_layout.insertWidget(self.history_layout.count() - 1, item)
+        self.conversation_index.set_conversations(self.key_manager.list_conversations())
+    
+    def _update_history_entry(self, filepath: str):
+        """保存对话后只更新侧边栏中对应的一行"""
+        filename = os.path.basename(filepath)
+        info = self.key_manager.conversation_info(filename)
+        if info:
+            self.conversation_index.upsert(*info)
+        else:
+            self.conversation_index.remove(filename)
+    
+    def _tab(self) -> ConversationTab:
+        """正在操作的标签页：处理某个标签页的流式输出时是该标签页，否则是当前标签页"""
+        return self._tab_override or self.tabs.currentWidget()
+    
+    @contextmanager
+    def _on_tab(self, tab: ConversationTab):
+        """在此期间对话相关的属性和方法操作指定的标签页"""
+        previous, self._tab_override = self._tab_override, tab
+        try:
+            yield tab
+        finally:
+            self._tab_override = previous
+    
+    def _conversation_tabs(self) -> List[ConversationTab]:
+        return [self.tabs.widget(i) for i in range(self.tabs.count())]
+    
+    def _add_tab(self) -> ConversationTab:
+        """添加一个空的标签页并切换过去"""
+        tab = ConversationTab(self.stream_fps)
+        tab.stream_finished.connect(self._on_tab_chat_finished)
+        tab.stream_failed.connect(self._on_tab_error)
+        tab.stream_ended.connect(self._on_tab_stream_ended)
+        tab.conversation_loaded.connect(self._on_tab_conversation_loaded)
+        tab.tool_output.connect(self._on_tab_tool_output)
+        tab.tool_confirm.connect(self._on_tab_tool_confirm)
+        tab.tool_finished.connect(self._on_tab_tool_finished)
+        self.tabs.setCurrentIndex(self.tabs.addTab(tab, tab.title()))
+        return tab
+    
+    def _new_tab(self) -> ConversationTab:
+        """新建对话标签页"""
+        tab = self._add_tab()
+        with self._on_tab(tab):
+            self._init_messages()
+        self.input_edit.setFocus()
+        return tab
+    
+    def _close_tab(self, index: int):
+        """关闭标签页（正在对话时先确认并停止），最后一个标签页关闭后新建一个"""
+        tab = self.tabs.widget(index)
+        if tab is None:
+            return
+        if tab.is_streaming:
+            reply = CustomMessageBox.question(
+                self,
+                "关闭标签页",
+                f"“{tab.current_conversation_name or '新对话'}” 正在对话，是否停止并关闭？",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No
+            )
+            if reply != QMessageBox.Yes:
+                return
+            with self._on_tab(tab):
+                self._stop_streaming()
+        tab.closed = True
+        tab.current_load = None
+        tab.stop_history_render()
+        self.tabs.removeTab(self.tabs.indexOf(tab))
+        # 进行中的工具调用线程已在停止对话时保留引用，标签页可以直接释放
+        tab.setParent(None)
+        if self.tabs.count() == 0:
+            self._new_tab()
+    
+    def _on_tab_changed(self, index: int):
+        """切换标签页"""
+        self._update_input_state()
+        self._update_status()
+    
+    def _update_input_state(self):
+        """输入框和发送/停止按钮跟随当前标签页是否在对话中"""
+        tab = self.tabs.currentWidget()
+        streaming = tab is not None and tab.is_streaming
+        self.send_btn.setEnabled(not streaming)
+        self.stop_btn.setEnabled(streaming)
+        self.input_edit.setEnabled(not streaming)
+    
+    def _update_tab_indicator(self, tab: ConversationTab):
+        """刷新标签页的标题和指标提示"""
+        index = self.tabs.indexOf(tab)
+        if index >= 0:
+            self.tabs.setTabText(index, tab.title())
+            self.tabs.setTabToolTip(index, f"{tab.current_conversation_name or '新对话'}\n{tab.format_stats()}")
+        if any(t.is_streaming for t in self._conversation_tabs()):
+            if not self._indicator_timer.isActive():
+                self._indicator_timer.start()
+        else:
+            self._indicator_timer.stop()
+    
+    def _refresh_tab_indicators(self):
+        for tab in self._conversation_tabs():
+            self._update_tab_indicator(tab)
     
     def _new_chat(self):
         """新建对话"""
@@ -1666,123 +2660,194 @@ class IflowChatGUI(QMainWindow):
         
         # 清空消息显示
         self._clear_messages_display()
+        self._update_tab_indicator(self._tab())
         self.status_bar.showMessage("✓ 已创建新对话")
     
     def _clear_messages_display(self):
         """清空消息显示"""
-        for i in reversed(range(self.messages_layout.count() - 1)):
-            item = self.messages_layout.itemAt(i)
-            if item.widget():
-                item.widget().deleteLater()
+        self._tab().clear_display()
+    
+    def _show_messages(self, messages: List[dict], rows: List[Tuple[str, str]] = None):
+        """显示整段对话（先显示最近的消息，更早的消息分段补充）"""
+        if rows is None:
+            rows = [(msg['role'], msg['content']) for msg in messages if msg['role'] in ['user', 'assistant']]
+        self._tab().show_rows(rows)
     
     def _load_conversation(self, filename: str):
-        """加载对话历史"""
-        loaded = self.key_manager.load_conversation(filename)
+        """
+        加载对话历史（在后台线程中读取，完成后显示）
+        
+        已在某个标签页中打开的对话直接切换过去，当前标签页正在对话时在新标签页中打开
+        """
+        name = filename.replace('.json', '')
+        for tab in self._conversation_tabs():
+            if tab.current_conversation_name == name:
+                self.tabs.setCurrentWidget(tab)
+                return
+        tab = self.tabs.currentWidget()
+        if tab.is_streaming:
+            tab = self._new_tab()
+        thread = ConversationLoadThread(self.key_manager, filename)
+        tab.load(thread)
+        thread.finished.connect(self._on_load_thread_finished)
+        # 线程结束前保留引用
+        self._load_threads.append(thread)
+        self.status_bar.showMessage(f"正在加载对话: {filename.replace('.json', '')}...")
+        thread.start()
+    
+    def _on_load_thread_finished(self):
+        thread = self.sender()
+        if thread in self._load_threads:
+            self._load_threads.remove(thread)
+    
+    def _on_tab_conversation_loaded(self, tab: ConversationTab, filename: str, loaded, rows):
+        with self._on_tab(tab):
+            self._on_conversation_loaded(filename, loaded, rows)
+        self._update_tab_indicator(tab)
+    
+    def _on_conversation_loaded(self, filename: str, loaded: Optional[List[dict]], rows):
+        """对话加载完成"""
         if loaded:
             self.messages = loaded
             self.current_conversation_name = filename.replace('.json', '')
             
-            # 清空并重新显示消息
-            self._clear_messages_display()
-            for msg in self.messages:
-                if msg['role'] in ['user', 'assistant']:
-                    self._add_message_widget(msg['role'], msg['content'])
+            # 重新显示消息
+            self._show_messages(self.messages, rows)
             
             self.status_bar.showMessage(f"✓ 已加载对话: {self.current_conversation_name}")
         else:
             CustomMessageBox.warning(self, "错误", "加载对话失败")
     
-    def _add_message_widget(self, role: str, content: str, timestamp: str = None):
-        """添加消息到界面"""
-        widget = ChatMessageWidget(role, content, timestamp)
-        self.messages_layout.insertWidget(self.messages_layout.count() - 1, widget)
+    def _add_message(self, role: str, content: str, timestamp: str = None) -> int:
+        """添加消息到界面，返回消息所在的行"""
+        row = self.transcript_model.append_message(role, content, timestamp)
         
         # 滚动到底部
         QTimer.singleShot(50, self._scroll_to_bottom)
+        return row
     
     def _scroll_to_bottom(self):
         """滚动到底部"""
-        scrollbar = self.messages_scroll.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
+        self.transcript_view.scroll_to_bottom()
     
     def send_message(self):
         """发送消息"""
-        if self.is_streaming:
-            return
-        
-        user_input = self.input_edit.toPlainText().strip()
-        if not user_input:
-            return
-        
-        # 检查API密钥
-        if not self.key_manager.get_api_key():
-            self._input_api_key()
-            return
-        
-        # 处理指令
-        if user_input.startswith('/'):
-            self._handle_command(user_input)
+        # 处理其他标签页的工具调用时也可以在当前标签页中发送
+        with self._on_tab(self.tabs.currentWidget()):
+            if self.is_streaming:
+                return
+            
+            user_input = self.input_edit.toPlainText().strip()
+            if not user_input:
+                return
+            
+            # 检查API密钥
+            if not self.key_manager.get_api_key():
+                self._input_api_key()
+                return
+            
+            # 处理指令
+            if user_input.startswith('/'):
+                self._handle_command(user_input)
+                self.input_edit.clear()
+                return
+            
+            # 添加用户消息
+            self.messages.append({
+                "role": "user",
+                "content": user_input
+            })
+            
+            # 显示用户消息
+            self._add_message("user", user_input)
             self.input_edit.clear()
-            return
-        
-        # 添加用户消息
-        self.messages.append({
-            "role": "user",
-            "content": user_input
-        })
-        
-        # 显示用户消息
-        self._add_message_widget("user", user_input)
-        self.input_edit.clear()
-        
-        # 开始流式对话
-        self._start_streaming()
+            
+            # 开始流式对话
+            self._start_streaming()
+    
+    def _request_messages(self) -> List[dict]:
+        """本次请求发送的消息（与当前对话无关的扩展只发送提示词摘要）"""
+        messages, selection = self.prompt_selector.select_messages(self.messages)
+        if selection is not None:
+            self._log_to_debug(selection.format())
+        return messages
     
     def _start_streaming(self):
-        """开始流式对话"""
+        """开始流式对话（同时进行的对话数达到上限时排队）"""
+        tab = self._tab()
         self.is_streaming = True
         self.current_assistant_response = ""
+        # 放弃尚未完成的对话加载，否则加载结果会覆盖刚发送的消息和正在进行的回复
+        tab.current_load = None
         
         # 更新UI状态
-        self.send_btn.setEnabled(False)
-        self.stop_btn.setEnabled(True)
-        self.input_edit.setEnabled(False)
-        
-        # 添加助手消息占位符
-        self._add_message_widget("assistant", "")
-        self.current_assistant_widget = self.messages_layout.itemAt(self.messages_layout.count() - 2).widget()
-        
-        # 创建并启动流式对话线程
-        self.chat_thread = StreamChatThread(
-            self.api_url,
-            self.key_manager.get_api_key(),
-            self.model,
-            self.messages
-        )
-        self.chat_thread.message_received.connect(self._on_message_received)
-        self.chat_thread.chat_finished.connect(self._on_chat_finished)
-        self.chat_thread.error_occurred.connect(self._on_error)
-        self.chat_thread.start()
-    
-    def _on_message_received(self, content: str):
-        """接收到消息片段"""
-        self.current_assistant_response += content
-        # 更新消息显示
-        if hasattr(self, 'current_assistant_widget') and self.current_assistant_widget:
-            # 更新消息内容
-            message_bubble = self.current_assistant_widget.findChild(MessageBubble)
-            if message_bubble:
-                # 获取内容标签
-                content_label = message_bubble.findChild(QLabel)
-                if content_label:
-                    content_label.setText(self.current_assistant_response)
-                    # 确保自动换行
-                    content_label.setWordWrap(True)
-                    # 自动滚动到底部
-                    QTimer.singleShot(10, self._scroll_to_bottom)
+        self._update_input_state()
+        
+        if self.stream_scheduler.request(tab):
+            self._launch_stream(tab)
+        else:
+            tab.queued = True
+            self._update_tab_indicator(tab)
+            self.status_bar.showMessage(f"⏳ 同时进行的对话已达上限 {self.stream_scheduler.limit}，已排队")
+    
+    def _launch_stream(self, tab: ConversationTab):
+        """创建并启动标签页的流式对话线程（已分配到并发名额）"""
+        with self._on_tab(tab):
+            tab.queued = False
+            
+            # 添加助手消息占位符
+            self.current_assistant_row = self._add_message("assistant", "")
+            self.transcript_view.begin_stream(self.current_assistant_row)
+            self.render_coalescer.reset_stats()
+            
+            # 创建并启动流式对话线程（所有标签页共用连接池）
+            thread = StreamChatThread(
+                self.api_url,
+                self.key_manager.get_api_key(),
+                self.model,
+                self._request_messages(),
+                session=self.http_session
+            )
+            tab.attach_thread(thread)
+            thread.start()
+        self._update_tab_indicator(tab)
+    
+    def _continue_streaming(self, tab: ConversationTab):
+        """发送执行结果后继续对话（期间停止了对话或关闭了标签页则不再继续）"""
+        if tab.is_streaming and not tab.closed:
+            with self._on_tab(tab):
+                self._start_streaming()
+    
+    def _on_tab_chat_finished(self, tab: ConversationTab, full_response: str):
+        with self._on_tab(tab):
+            self._on_chat_finished(full_response)
+    
+    def _on_tab_error(self, tab: ConversationTab, error_msg: str):
+        with self._on_tab(tab):
+            self._on_error(error_msg)
+    
+    def _on_tab_stream_ended(self, tab: ConversationTab):
+        """流式对话线程退出，让出并发名额"""
+        self.stream_scheduler.release(tab)
+        # 没有收到回复（例如回复为空）时也结束对话状态
+        if tab.is_streaming and not tab.answered:
+            with self._on_tab(tab):
+                self._finish_stream_render()
+                self._end_streaming()
+        self._update_tab_indicator(tab)
+    
+    def _finish_stream_render(self):
+        """渲染剩余片段并结束增量显示"""
+        self.render_coalescer.flush()
+        self.transcript_view.end_stream()
+        if self.render_coalescer.frames:
+            self._log_to_debug(f"流式渲染: {self.render_coalescer.format_stats()}")
+        if self.chat_thread is not None and self.chat_thread.chunks.pushed:
+            self._log_to_debug(f"片段队列: {self.chat_thread.chunks.format_stats()}")
     
     def _on_chat_finished(self, full_response: str):
         """对话完成"""
+        self._finish_stream_render()
         # 保存助手回复
         self.messages.append({
             "role": "assistant",
@@ -1793,70 +2858,97 @@ class IflowChatGUI(QMainWindow):
         if self.auto_save:
             if not self.current_conversation_name:
                 self.current_conversation_name = self._generate_conversation_title()
-            self.key_manager.save_conversation(self.messages, self.current_conversation_name)
-            self._load_history_list()
+            filepath = self.key_manager.save_conversation(self.messages, self.current_conversation_name)
+            self._update_history_entry(filepath)
         
-        # 检查AI指令
+        # 检查AI指令（工具在工具调用线程中执行时，调用完成后再发送结果）
         execution_results = self._execute_ai_commands(full_response)
+        if execution_results is not None:
+            self._send_execution_results(execution_results)
+    
+    def _send_execution_results(self, execution_results: str):
+        """把指令执行结果发给AI并继续对话，没有结果时结束对话"""
         if execution_results:
             # 添加执行结果作为用户消息
             self.messages.append({
                 "role": "user",
                 "content": f"指令执行结果：{execution_results}\n\n请根据执行结果继续回复。"
             })
-            self._add_message_widget("user", f"指令执行结果：{execution_results}")
+            self._add_message("user", f"指令执行结果：{execution_results}")
             
             # 继续对话
-            QTimer.singleShot(500, self._start_streaming)
+            QTimer.singleShot(500, lambda tab=self._tab(): self._continue_streaming(tab))
         else:
             self._end_streaming()
     
     def _on_error(self, error_msg: str):
         """发生错误"""
-        self._add_message_widget("assistant", f"❌ {error_msg}")
+        self._finish_stream_render()
+        self._add_message("assistant", f"❌ {error_msg}")
         self._end_streaming()
     
     def _end_streaming(self):
         """结束流式对话"""
+        tab = self._tab()
         self.is_streaming = False
-        self.send_btn.setEnabled(True)
-        self.stop_btn.setEnabled(False)
-        self.input_edit.setEnabled(True)
-        self.input_edit.setFocus()
+        tab.queued = False
+        self._update_tab_indicator(tab)
+        self._update_input_state()
+        if tab is self.tabs.currentWidget():
+            self.input_edit.setFocus()
         self._update_status()
     
+    def _stop_current_tab(self):
+        """停止当前标签页的对话"""
+        with self._on_tab(self.tabs.currentWidget()):
+            self._stop_streaming()
+    
     def _stop_streaming(self):
-        """停止流式对话"""
-        if self.chat_thread:
-            self.chat_thread.stop()
+        """停止流式对话（排队中的对话取消排队）"""
+        self.stream_scheduler.release(self._tab())
+        tool_thread = self._tab().tool_thread
+        if tool_thread is not None:
+            # 工具调用无法中断，结果不再处理
+            self._tab().tool_thread = None
+            self._retire_thread(tool_thread)
+        thread = self.chat_thread
+        if thread is not None and thread.isRunning():
+            thread.stop()
+            self._tab().drain_chunks()
+            # 线程读到下一个片段时才会退出，之后的输出不再显示
+            self.chat_thread = None
+            self._retire_thread(thread)
+            self._finish_stream_render()
+            # 保留已经显示的部分回复
+            if self.current_assistant_response:
+                self.messages.append({
+                    "role": "assistant",
+                    "content": self.current_assistant_response
+                })
+        else:
+            self._finish_stream_render()
         self._end_streaming()
     
-    def _execute_ai_commands(self, response: str) -> str:
-        """执行AI回复中的指令"""
-        cmd_pattern = r'@/(\w+)(?:\s+(.*))?'
-        tool_pattern = r'@(\w+)\((.*?)\)'
-        
-        cmd_matches = list(re.finditer(cmd_pattern, response))
-        tool_matches = list(re.finditer(tool_pattern, response))
-        
-        all_matches = []
-        for match in cmd_matches:
-            all_matches.append((match.start(), 'cmd', match))
-        for match in tool_matches:
-            all_matches.append((match.start(), 'tool', match))
-        
-        all_matches.sort(key=lambda x: x[0])
-        
-        if all_matches:
-            last_match = all_matches[-1]
-            match_type, match_obj = last_match[1], last_match[2]
-            
-            if match_type == 'cmd':
-                cmd = match_obj.group(1)
-                args = match_obj.group(2) if match_obj.group(2) else ""
-                full_cmd = f"/{cmd}"
-                if args:
-                    full_cmd += f" {args}"
+    def _retire_thread(self, thread: QThread):
+        """已停止的线程退出前保留引用"""
+        self._retired_threads.append(thread)
+        thread.finished.connect(self._on_retired_thread_finished)
+        if thread.isFinished():
+            self._retired_threads.remove(thread)
+    
+    def _on_retired_thread_finished(self):
+        thread = self.sender()
+        if thread in self._retired_threads:
+            self._retired_threads.remove(thread)
+    
+    def _execute_ai_commands(self, response: str) -> Optional[str]:
+        """执行AI回复中的指令，返回执行结果；工具在工具调用线程中执行时返回 None"""
+        last_call = find_last_tool_call(response)
+        
+        if last_call:
+            if last_call.is_command():
+                cmd = last_call.name
+                full_cmd = last_call.full_command()
                 
                 if cmd.lower() == 'exit':
                     if self._confirm_action("AI请求退出程序", "是否允许AI退出程序？"):
@@ -1869,24 +2961,29 @@ class IflowChatGUI(QMainWindow):
                     else:
                         return f"[系统] 用户取消了指令 {full_cmd}"
             
-            elif match_type == 'tool':
-                tool_name = match_obj.group(1)
-                tool_args = match_obj.group(2) if match_obj.group(2) else ""
+            elif last_call.is_tool():
+                tool_name = last_call.name
+                tool_args = last_call.args
                 
-                if self._confirm_action(f"AI请求调用工具", f"是否允许调用工具：{tool_name}？"):
-                    success, result = self._handle_ai_tool_call(tool_name, tool_args)
-                    if success:
-                        return f"[工具 {tool_name} 输出]:\n{result}"
-                    else:
-                        return f"[工具 {tool_name}] 执行失败: {result}"
+                # 是否需要确认由工具的确认策略决定
+                need_confirm = self.tool_registry.needs_confirm(tool_name, self.ai_control_enabled)
+                if not need_confirm or self._confirm_action(f"AI请求调用工具", f"是否允许调用工具：{tool_name}？", force=True):
+                    if self.tool_registry.runs_on_main_thread(tool_name):
+                        # 需要创建窗口的工具只能在界面线程中调用
+                        cpu_start = time.thread_time()
+                        success, result = self._handle_ai_tool_call(tool_name, tool_args)
+                        self._tab().cpu_time += time.thread_time() - cpu_start
+                        return self._format_tool_result(tool_name, success, result)
+                    self._start_tool_call(tool_name, tool_args)
+                    return None
                 else:
                     return f"[系统] 用户取消了工具 {tool_name}"
         
         return ""
     
-    def _confirm_action(self, title: str, message: str) -> bool:
-        """确认操作"""
-        if self.ai_control_enabled:
+    def _confirm_action(self, title: str, message: str, force: bool = False) -> bool:
+        """确认操作（force 为 True 时即使已获得AI控制权限也会询问用户）"""
+        if self.ai_control_enabled and not force:
             return True
         
         reply = CustomMessageBox.question(
@@ -1940,6 +3037,17 @@ class IflowChatGUI(QMainWindow):
             self.status_bar.showMessage("请使用左侧边栏管理对话历史")
         elif command == '/clear':
             self._new_chat()
+        elif command == '/fps':
+            if args.strip().isdigit():
+                # 应用到所有标签页，之后新建的标签页也使用这个帧率
+                for tab in self._conversation_tabs():
+                    tab.render_coalescer.set_fps(int(args.strip()))
+                self.stream_fps = self.render_coalescer.fps
+            self.status_bar.showMessage(f"流式输出刷新上限: {self.stream_fps} FPS（所有标签页）")
+        elif command == '/streams':
+            if args.strip().isdigit():
+                self.stream_scheduler.set_limit(int(args.strip()))
+            self.status_bar.showMessage(f"同时进行的对话: {self.stream_scheduler.format_stats()}")
         elif command == '/export':
             if args:
                 self._export_history(args.strip())
@@ -1965,34 +3073,45 @@ class IflowChatGUI(QMainWindow):
         
         return True
     
+    @staticmethod
+    def _format_tool_result(tool_name: str, success: bool, result: str) -> str:
+        if success:
+            return f"[工具 {tool_name} 输出]:\n{result}"
+        return f"[工具 {tool_name}] 执行失败: {result}"
+    
+    def _start_tool_call(self, tool_name: str, tool_args: str):
+        """在工具调用线程中调用工具，完成后由 _on_tab_tool_finished 继续对话"""
+        self.console_output = ""
+        thread = ToolCallThread(self.tool_registry, tool_name, tool_args)
+        self._tab().attach_tool_thread(thread)
+        thread.start()
+    
+    def _on_tab_tool_output(self, tab: ConversationTab, tool_name: str, chunk: str):
+        self._show_tool_output(tool_name, chunk)
+    
+    def _on_tab_tool_confirm(self, tab: ConversationTab, title: str, message: str, reply):
+        reply.set_result(self._confirm_action(title, message))
+    
+    def _on_tab_tool_finished(self, tab: ConversationTab, tool_name: str, success: bool, result: str):
+        # 工具可能改变了权限等状态
+        self._update_status()
+        if tab.is_streaming and not tab.closed:
+            with self._on_tab(tab):
+                self._send_execution_results(self._format_tool_result(tool_name, success, result))
+    
+    def _show_tool_output(self, tool_name: str, chunk: str):
+        """协程和生成器工具的阶段性输出显示在状态栏和调试窗口"""
+        self.console_output = (self.console_output + chunk)[-4000:]
+        lines = self.console_output.strip().splitlines()
+        self.status_bar.showMessage(f"⏳ {tool_name}: {lines[-1] if lines else ''}")
+        self._log_to_debug(f"[工具 {tool_name}] {chunk.rstrip()}")
+    
     def _handle_ai_tool_call(self, tool_name: str, tool_args: str) -> Tuple[bool, str]:
-        """处理AI工具调用"""
-        if tool_name == 'cmd':
-            return self._execute_command(tool_args)
-        elif tool_name == 'mouse_move':
-            return self._mouse_move(tool_args)
-        elif tool_name == 'mouse_click':
-            return self._mouse_click(tool_args)
-        elif tool_name == 'keyboard':
-            return self._keyboard_input(tool_args)
-        elif tool_name == 'screenshot':
-            return self._take_screenshot()
-        elif tool_name == 'view_screenshot':
-            return self._view_screenshot(tool_args)
-        elif tool_name == 'wait':
-            return self._wait(tool_args)
-        elif tool_name == 'request_control':
-            return self._request_computer_control()
-        elif tool_name in self.extension_tools:
-            # 处理扩展工具
-            ext, tool_func = self.extension_tools[tool_name]
-            confirm_callback = lambda title, message: self._confirm_action(title, message)
-            try:
-                return tool_func(tool_args, confirm_callback)
-            except Exception as e:
-                return False, f"扩展工具执行失败: {str(e)}"
-        else:
-            return False, f"未知工具: {tool_name}"
+        """在界面线程中调用工具（只用于必须在界面线程中调用的工具）"""
+        confirm_callback = lambda title, message: self._confirm_action(title, message)
+        self.console_output = ""
+        output_callback = lambda chunk: self._show_tool_output(tool_name, chunk)
+        return self.tool_registry.invoke(tool_name, tool_args, confirm_callback, output_callback)
     
     def _execute_command(self, command: str) -> Tuple[bool, str]:
         """执行系统命令"""
@@ -2016,19 +3135,15 @@ class IflowChatGUI(QMainWindow):
         except Exception as e:
             return False, f"执行失败: {str(e)}"
     
-    def _request_computer_control(self) -> Tuple[bool, str]:
-        """请求AI电脑操作权限"""
-        reply = CustomMessageBox.question(
-            self,
+    def _request_computer_control(self, confirm_callback: Callable = None) -> Tuple[bool, str]:
+        """请求AI电脑操作权限（在工具调用线程中执行，通过 confirm_callback 在界面线程中询问）"""
+        if confirm_callback is None:
+            return False, "无法请求权限"
+        if confirm_callback(
             "AI电脑操作权限请求",
-            "AI请求获得电脑操作权限\n\n允许AI模拟鼠标、键盘操作\n并获取屏幕内容",
-            QMessageBox.Yes | QMessageBox.No,
-            QMessageBox.No
-        )
-        
-        if reply == QMessageBox.Yes:
+            "AI请求获得电脑操作权限\n\n允许AI模拟鼠标、键盘操作\n并获取屏幕内容"
+        ):
             self.ai_control_enabled = True
-            self._update_status()
             return True, "已获得电脑操作权限"
         else:
             return False, "用户拒绝授予权限"
@@ -2092,18 +3207,24 @@ class IflowChatGUI(QMainWindow):
             self.current_action = None
             return False, f"键盘输入失败: {str(e)}"
     
-    def _take_screenshot(self) -> Tuple[bool, str]:
-        """获取屏幕截图"""
-        if pyautogui is None:
-            return False, "pyautogui模块未安装，无法执行截图操作"
+    def _take_screenshot(self, args: str = "") -> Tuple[bool, str]:
+        """获取屏幕截图，args 为可选的区域 "x,y,宽,高"，省略时截取全屏"""
+        try:
+            region = parse_region(args)
+        except ValueError as e:
+            return False, str(e)
         try:
             self.current_action = "正在截图..."
-            screenshot = pyautogui.screenshot()
-            filename = f"screenshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+            capture = get_capturer().grab(region)
+            filename = f"screenshot_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.png"
             filepath = os.path.join(self.key_manager.SCREENSHOT_DIR, filename)
-            screenshot.save(filepath)
+            remember_capture(filename, capture.save(filepath))
+            self.current_action = None
+            area = f"区域 {region}" if region else "全屏"
+            return True, f"屏幕截图已保存到: {filepath}\n截图范围: {area}\n截图尺寸: {capture.size}"
+        except CaptureError as e:
             self.current_action = None
-            return True, f"屏幕截图已保存到: {filepath}\n截图尺寸: {screenshot.size}"
+            return False, f"获取屏幕截图失败: {str(e)}\n建议: pip install mss pillow"
         except Exception as e:
             self.current_action = None
             error_msg = str(e)
@@ -2115,7 +3236,9 @@ class IflowChatGUI(QMainWindow):
     def _view_screenshot(self, filename: str) -> Tuple[bool, str]:
         """查看屏幕截图（让 AI 分析截图内容）"""
         filepath = os.path.join(self.key_manager.SCREENSHOT_DIR, filename)
-        if not os.path.exists(filepath):
+        # 刚截取的图片直接从内存读取
+        img_data = recall_capture(filename)
+        if img_data is None and not os.path.exists(filepath):
             return False, f"截图文件不存在: {filepath}"
         
         try:
@@ -2123,8 +3246,9 @@ class IflowChatGUI(QMainWindow):
             from PIL import Image
             
             # 将截图转换为 base64
-            with open(filepath, 'rb') as f:
-                img_data = f.read()
+            if img_data is None:
+                with open(filepath, 'rb') as f:
+                    img_data = f.read()
             
             import base64
             img_base64 = base64.b64encode(img_data).decode('utf-8')
@@ -2183,7 +3307,7 @@ class IflowChatGUI(QMainWindow):
         }
         
         try:
-            response = requests.post(
+            response = self.http_session.post(
                 self.api_url,
                 headers=headers,
                 json=payload,
@@ -2293,6 +3417,8 @@ class IflowChatGUI(QMainWindow):
             <li>/import &lt;file&gt; - 从文件导入对话</li>
             <li>/stop - 停止当前输出</li>
             <li>/info - 显示当前配置信息</li>
+            <li>/fps &lt;n&gt; - 设置所有标签页流式输出的最大刷新帧率</li>
+            <li>/streams &lt;n&gt; - 设置同时进行的对话数上限（超出时排队）</li>
             <li>/help - 显示此帮助信息</li>
             <li>/exit - 退出程序</li>
         </ul>
@@ -2321,6 +3447,7 @@ class IflowChatGUI(QMainWindow):
             <li>@mouse_click(按钮) - AI点击鼠标（需权限）</li>
             <li>@keyboard(文本或key:按键)  - AI输入键盘文本或特殊按键（需权限）</li>
             <li>@screenshot()   - AI获取屏幕截图并保存到 iflow_screenshots 文件夹（AI可以看到）</li>
+            <li>@screenshot(x,y,宽,高) - AI只截取指定区域</li>
             <li>@view_screenshot(文件名) - AI分析指定截图的内容</li>
             <li>@wait(秒数)     - AI等待指定秒数</li>
             <li>@show_message(标题,内容) - AI显示普通信息框</li>
@@ -2330,6 +3457,8 @@ class IflowChatGUI(QMainWindow):
         <h2>快捷键:</h2>
         <ul>
             <li>Ctrl+Enter - 发送消息</li>
+            <li>Ctrl+T - 新建对话标签页</li>
+            <li>Ctrl+W - 关闭当前标签页</li>
         </ul>
         
         <h2>说明:</h2>
@@ -2377,6 +3506,46 @@ class IflowChatGUI(QMainWindow):
                 tools = ext.get_tools()
                 info_text += f"<p>&nbsp;&nbsp;工具: {', '.join(tools.keys())}</p>"
         
+        # 扩展提示词选择
+        if self.prompt_selector.requests:
+            info_text += "<h2>扩展提示词选择:</h2>"
+            info_text += f"<p>{self.prompt_selector.format_stats()}</p>"
+            if self.prompt_selector.last is not None:
+                info_text += f"<p>最近一次: {self.prompt_selector.last.format()}</p>"
+        
+        # 启动耗时
+        info_text += "<h2>启动耗时:</h2>"
+        info_text += "".join(f"<p>{line.strip()}</p>" for line in get_startup_timer().format())
+        info_text += f"<p>字体: {get_font_catalog().format_stats()}</p>"
+        
+        # 流式渲染帧耗时
+        if self.render_coalescer.frames:
+            paint = StreamRenderCoalescer.summarize(self.transcript_view.paint_times)
+            info_text += "<h2>流式渲染:</h2>"
+            if self.chat_thread is not None:
+                info_text += f"<p>片段队列: {self.chat_thread.chunks.format_stats()}</p>"
+            info_text += f"<p>{self.render_coalescer.format_stats()}</p>"
+            info_text += (f"<p>视图重绘: {paint['count']} 次，平均 {paint['avg']:.2f}ms / "
+                          f"P95 {paint['p95']:.2f}ms / 最大 {paint['max']:.2f}ms</p>")
+        
+        # 对话标签页
+        info_text += "<h2>对话标签页:</h2>"
+        info_text += f"<p>并发: {self.stream_scheduler.format_stats()}</p>"
+        for tab in self._conversation_tabs():
+            info_text += f"<p><b>{tab.title()}</b>: {tab.format_stats()}</p>"
+        
+        # 工具冲突信息
+        if self.tool_registry.conflicts:
+            info_text += "<h2>工具冲突（同名工具已被忽略）:</h2>"
+            for tool_name, kept, ignored in self.tool_registry.conflicts:
+                info_text += f"<p>{tool_name}: 使用 {kept}，忽略 {ignored}</p>"
+        
+        # 扩展加载报告
+        if EXTENSIONS_AVAILABLE and extension_manager is not None and extension_manager.load_stats:
+            info_text += "<h2>扩展加载报告:</h2>"
+            for line in extension_manager.get_load_report():
+                info_text += f"<p>{line}</p>"
+        
         msg = CustomMessageBox(self, "配置信息", info_text, QMessageBox.Ok, QMessageBox.Ok)
         msg.exec_()
     
@@ -2403,10 +3572,7 @@ class IflowChatGUI(QMainWindow):
                 })
             
             self.messages = imported_messages
-            self._clear_messages_display()
-            for msg in self.messages:
-                if msg['role'] in ['user', 'assistant']:
-                    self._add_message_widget(msg['role'], msg['content'])
+            self._show_messages(self.messages)
             
             self.status_bar.showMessage(f"✓ 对话历史已从 {filename} 导入")
         except Exception as e:
@@ -2426,17 +3592,16 @@ class IflowChatGUI(QMainWindow):
     def _redirect_stdout(self):
         """重定向标准输出到调试窗口"""
         import sys
-        from io import StringIO
-        from datetime import datetime
         
         class DebugOutput:
-            def __init__(self, parent):
-                self.parent = parent
+            def __init__(self, debug_log, source):
+                self.debug_log = debug_log
+                self.source = source
             
             def write(self, text):
+                # 只写入缓冲区，可以在任意线程中调用，调试窗口定时批量显示
                 if text.strip():  # 只输出非空内容
-                    timestamp = datetime.now().strftime("%H:%M:%S")
-                    self.parent._log_to_debug(f"{text.rstrip()}")
+                    self.debug_log.append(text.rstrip(), source=self.source)
             
             def flush(self):
                 pass
@@ -2446,8 +3611,8 @@ class IflowChatGUI(QMainWindow):
         self._original_stderr = sys.stderr
         
         # 设置新的输出
-        sys.stdout = DebugOutput(self)
-        sys.stderr = DebugOutput(self)
+        sys.stdout = DebugOutput(self.debug_log, "stdout")
+        sys.stderr = DebugOutput(self.debug_log, "stderr")
     
     def _restore_stdout(self):
         """恢复标准输出"""
@@ -2459,28 +3624,103 @@ class IflowChatGUI(QMainWindow):
     def _show_debug_window(self):
         """显示调试窗口"""
         if self.debug_window is None:
-            self.debug_window = DebugWindow(self)
+            self.debug_window = DebugWindow(self, self.debug_log)
+        self.debug_log.append("=== 调试模式已开启 ===")
         self.debug_window.show()
-        self.debug_window.append_log("=== 调试模式已开启 ===")
     
     def _hide_debug_window(self):
         """隐藏调试窗口"""
         if self.debug_window:
             self.debug_window.hide()
     
-    def _log_to_debug(self, message: str):
-        """记录日志到调试窗口"""
-        if self.debug_window:
-            from datetime import datetime
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            self.debug_window.append_log(f"[{timestamp}] {message}")
+    def _log_to_debug(self, message: str, level: str = None):
+        """记录日志（调试窗口打开后可以看到最近的日志）"""
+        self.debug_log.append(message, level)
+
+
+# 调试日志最多保留的条数
+DEBUG_LOG_CAPACITY = 5000
+
+# 调试窗口刷新日志的间隔（毫秒）
+DEBUG_LOG_FLUSH_INTERVAL = 100
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+_LOG_SOURCE_RE = re.compile(r'^\[([^\]\s]+)')
+
+
+def guess_log_level(text: str) -> str:
+    """按内容推断日志级别"""
+    if "错误" in text or "Error" in text or "Traceback" in text or "失败" in text:
+        return "ERROR"
+    if "警告" in text or "Warning" in text:
+        return "WARNING"
+    if text.startswith("[调试]"):
+        return "DEBUG"
+    return "INFO"
+
+
+class DebugLog:
+    """
+    调试日志环形缓冲区
+    
+    任意线程都可以写入（print 重定向到这里），只保留最近 capacity 条；
+    调试窗口在主线程中按序号批量读取新日志
+    """
+    
+    def __init__(self, capacity: int = DEBUG_LOG_CAPACITY):
+        # 每条日志: (序号, 时间, 级别, 来源, 内容)
+        self._records: deque = deque(maxlen=capacity)
+        self._seq = 0
+        self._lock = threading.Lock()
+        # 出现过的来源（保持出现顺序）
+        self.sources: Dict[str, None] = {}
+    
+    def append(self, text: str, level: str = None, source: str = "app"):
+        """写入一条日志，内容开头的 [标签] 作为来源"""
+        match = _LOG_SOURCE_RE.match(text)
+        if match:
+            source = match.group(1)
+        record_time = datetime.now().strftime("%H:%M:%S")
+        with self._lock:
+            self._seq += 1
+            self._records.append((self._seq, record_time, level or guess_log_level(text), source, text))
+            self.sources.setdefault(source, None)
+    
+    def since(self, seq: int) -> List[tuple]:
+        """序号大于 seq 的日志（已被挤出缓冲区的不再返回）"""
+        with self._lock:
+            if not self._records or self._records[-1][0] <= seq:
+                return []
+            first = self._records[0][0]
+            # 只复制新增的部分，不复制整个缓冲区
+            return list(islice(self._records, max(0, seq + 1 - first), None))
+    
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+    
+    @property
+    def dropped(self) -> int:
+        """被挤出缓冲区的日志数"""
+        with self._lock:
+            return self._seq - len(self._records)
+    
+    def clear(self):
+        with self._lock:
+            self._records.clear()
 
 
 class DebugWindow(QMainWindow):
     """调试窗口 - 显示CLI输出和原始响应"""
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, debug_log: DebugLog = None):
         super().__init__(parent)
+        self.debug_log = debug_log or DebugLog()
+        self._shown_seq = 0
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(DEBUG_LOG_FLUSH_INTERVAL)
+        self._flush_timer.timeout.connect(self.flush)
         self.setWindowTitle("调试窗口")
         self.setGeometry(100, 100, 800, 600)
         
@@ -2588,6 +3828,29 @@ class DebugWindow(QMainWindow):
         
         toolbar_layout.addStretch()
         
+        # 级别和来源过滤
+        combo_style = """
+            QComboBox {
+                background-color: #3c3c3c;
+                color: #ffffff;
+                border: 1px solid #555555;
+                border-radius: 4px;
+                padding: 4px 10px;
+                font-size: 12px;
+            }
+        """
+        self.level_filter = QComboBox()
+        self.level_filter.addItems(["全部级别"] + [f"{level} 及以上" for level in LOG_LEVELS[1:]])
+        self.level_filter.setStyleSheet(combo_style)
+        self.level_filter.currentIndexChanged.connect(self.refresh)
+        toolbar_layout.addWidget(self.level_filter)
+        
+        self.source_filter = QComboBox()
+        self.source_filter.addItem("全部来源")
+        self.source_filter.setStyleSheet(combo_style)
+        self.source_filter.currentIndexChanged.connect(self.refresh)
+        toolbar_layout.addWidget(self.source_filter)
+        
         clear_btn = QPushButton("清空")
         clear_btn.setStyleSheet("""
             QPushButton {
@@ -2608,11 +3871,13 @@ class DebugWindow(QMainWindow):
         toolbar.setLayout(toolbar_layout)
         central_layout.addWidget(toolbar)
         
-        # 日志显示区域
-        self.log_text = QTextEdit()
+        # 日志显示区域（纯文本追加，超过最大行数时自动删除最早的行）
+        self.log_text = QPlainTextEdit()
         self.log_text.setReadOnly(True)
+        self.log_text.setUndoRedoEnabled(False)
+        self.log_text.setMaximumBlockCount(DEBUG_LOG_CAPACITY)
         self.log_text.setStyleSheet("""
-            QTextEdit {
+            QPlainTextEdit {
                 background-color: #1e1e1e;
                 color: #d4d4d4;
                 border: none;
@@ -2657,19 +3922,68 @@ class DebugWindow(QMainWindow):
             event.accept()
     
     def append_log(self, message: str):
-        """添加日志"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        # 直接添加消息，不额外包装
-        self.log_text.append(f"{message}")
-        # 自动滚动到底部
+        """添加日志（下次刷新时显示）"""
+        self.debug_log.append(message)
+    
+    def _accepts(self, record: tuple) -> bool:
+        """日志是否符合当前的过滤条件"""
+        min_level = self.level_filter.currentIndex()
+        if min_level and LOG_LEVELS.index(record[2]) < min_level:
+            return False
+        source = self.source_filter.currentIndex()
+        return source == 0 or record[3] == self.source_filter.currentText()
+    
+    def _update_sources(self):
+        known = {self.source_filter.itemText(i) for i in range(1, self.source_filter.count())}
+        for source in list(self.debug_log.sources):
+            if source not in known:
+                self.source_filter.addItem(source)
+    
+    @staticmethod
+    def _format(record: tuple) -> str:
+        return f"[{record[1]}] {record[4]}"
+    
+    def flush(self):
+        """把新日志一次性追加到显示区域"""
+        records = self.debug_log.since(self._shown_seq)
+        if not records:
+            return
+        self._shown_seq = records[-1][0]
+        self._update_sources()
+        lines = [self._format(r) for r in records if self._accepts(r)]
+        if not lines:
+            return
+        scrollbar = self.log_text.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 4
+        self.log_text.appendPlainText("\n".join(lines))
+        # 停在底部时跟随新日志
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+    
+    def refresh(self):
+        """过滤条件变化后按缓冲区重新显示"""
+        records = self.debug_log.since(0)
+        self._shown_seq = records[-1][0] if records else self.debug_log.last_seq
+        self.log_text.setPlainText("\n".join(self._format(r) for r in records if self._accepts(r)))
         scrollbar = self.log_text.verticalScrollBar()
         scrollbar.setValue(scrollbar.maximum())
     
     def clear_log(self):
         """清空日志"""
+        self.debug_log.clear()
+        self._shown_seq = self.debug_log.last_seq
         self.log_text.clear()
     
+    def showEvent(self, event):
+        # 只在窗口可见时刷新
+        super().showEvent(event)
+        self.flush()
+        self._flush_timer.start()
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._flush_timer.stop()
+    
     def mousePressEvent(self, event):
         """鼠标按下事件"""
         if event.button() == Qt.LeftButton:
@@ -2704,8 +4018,9 @@ class ExtensionManagerDialog(QDialog):
         super().__init__(parent)
         self.extensions = extensions or {}
         self.extension_tools = extension_tools or {}
+        self.profiler = getattr(parent, 'profiler', None)
         self.setWindowTitle("扩展管理")
-        self.setFixedSize(800, 600)
+        self.setFixedSize(900, 600)
         
         # 移除窗口边框
         self.setWindowFlags(self.windowFlags() | Qt.FramelessWindowHint)
@@ -2835,6 +4150,29 @@ class ExtensionManagerDialog(QDialog):
         delete_btn.clicked.connect(self._delete_extension)
         toolbar_layout.addWidget(delete_btn)
         
+        # 重新加载按钮
+        reload_btn = QPushButton("♻️ 重新加载")
+        reload_btn.clicked.connect(self._reload_extension)
+        toolbar_layout.addWidget(reload_btn)
+        
+        # 热重载开关
+        self.watch_btn = QPushButton("👁️ 热重载")
+        self.watch_btn.setCheckable(True)
+        self.watch_btn.setChecked(extension_manager is not None and extension_manager.watcher is not None)
+        self.watch_btn.setToolTip("开启后修改扩展文件会自动重新加载")
+        self.watch_btn.toggled.connect(self._toggle_watch)
+        toolbar_layout.addWidget(self.watch_btn)
+        
+        # 资源统计按钮
+        stats_btn = QPushButton("📊 资源统计")
+        stats_btn.clicked.connect(self._show_stats)
+        toolbar_layout.addWidget(stats_btn)
+        
+        # 导出统计按钮
+        export_stats_btn = QPushButton("💾 导出统计")
+        export_stats_btn.clicked.connect(self._export_stats)
+        toolbar_layout.addWidget(export_stats_btn)
+        
         # 刷新按钮
         refresh_btn = QPushButton("🔄 刷新")
         refresh_btn.clicked.connect(self._load_extensions)
@@ -2895,6 +4233,9 @@ class ExtensionManagerDialog(QDialog):
         
         for name, ext in self.extensions.items():
             item_text = f"{name} - {ext.description}"
+            # 依赖检查走共享缓存，不会导入依赖包
+            if extension_manager is not None and extension_manager.get_missing_dependencies(name):
+                item_text += "  ⚠️ 缺少依赖"
             item = QListWidgetItem(item_text)
             item.setData(Qt.UserRole, name)
             self.extension_list.addItem(item)
@@ -2905,11 +4246,17 @@ class ExtensionManagerDialog(QDialog):
         ext = self.extensions.get(ext_name)
         
         if ext:
+            load_info = extension_manager.format_load_stats(ext_name) if extension_manager is not None else "无加载记录"
+            dependency_info = extension_manager.format_dependencies(ext_name) if extension_manager is not None else "未知"
+            usage_info = self.profiler.format_source(ext_name) if self.profiler is not None else "未启用"
             detail = f"""
 名称: {ext.name}
 描述: {ext.description}
 版本: {ext.version}
 作者: {ext.author}
+加载: {load_info}
+依赖: {dependency_info}
+资源: {usage_info}
 
 工具:
 """
@@ -2919,6 +4266,58 @@ class ExtensionManagerDialog(QDialog):
             
             self.detail_text.setText(detail)
     
+    def _reload_extension(self):
+        """重新加载选中的扩展"""
+        current_item = self.extension_list.currentItem()
+        ext_name = current_item.data(Qt.UserRole) if current_item else None
+        if not ext_name:
+            CustomMessageBox.warning(self, "警告", "请先选择要重新加载的扩展")
+            return
+        
+        parent = self.parent()
+        if parent is None or not hasattr(parent, '_reload_extension'):
+            return
+        success, message = parent._reload_extension(ext_name)
+        if success:
+            self.extension_tools = parent.extension_tools
+            self._load_extensions()
+            CustomMessageBox.information(self, "成功", message)
+        else:
+            CustomMessageBox.warning(self, "错误", message)
+    
+    def _show_stats(self):
+        """在详情区域显示全部扩展的资源统计"""
+        if self.profiler is None:
+            CustomMessageBox.warning(self, "错误", "资源统计不可用")
+            return
+        lines = self.profiler.get_report()
+        header = (f"资源统计（自 {self.profiler.started_at.strftime('%Y-%m-%d %H:%M:%S')} 起，"
+                  f"内存分配统计: {'开启' if self.profiler.track_memory else '关闭'}）")
+        self.detail_text.setText("\n".join([header, ""] + (lines or ["暂无工具调用记录"])))
+    
+    def _export_stats(self):
+        """导出资源统计为JSON"""
+        if self.profiler is None:
+            CustomMessageBox.warning(self, "错误", "资源统计不可用")
+            return
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "导出资源统计", f"iflow_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            "JSON Files (*.json)"
+        )
+        if not filename:
+            return
+        try:
+            self.profiler.export_json(filename)
+            CustomMessageBox.information(self, "成功", f"资源统计已导出到:\n{filename}")
+        except OSError as e:
+            CustomMessageBox.warning(self, "错误", f"导出失败: {str(e)}")
+    
+    def _toggle_watch(self, checked: bool):
+        """切换扩展热重载"""
+        parent = self.parent()
+        if parent is not None and hasattr(parent, '_set_extension_watch'):
+            parent._set_extension_watch(checked)
+    
     def _import_extension(self):
         """导入扩展"""
         filename, _ = QFileDialog.getOpenFileName(
@@ -2928,19 +4327,27 @@ class ExtensionManagerDialog(QDialog):
         if not filename:
             return
         
+        if extension_manager is None:
+            CustomMessageBox.warning(self, "错误", "扩展系统不可用")
+            return
+        
         try:
-            import zipfile
-            import shutil
-            
-            # 获取扩展目录
-            extensions_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "iflow_extensions")
+            # 压缩包直接复制到扩展目录并立即加载，无需解压和重启
+            success, message, ext_name = extension_manager.install_package(filename)
+            if not success:
+                CustomMessageBox.warning(self, "错误", message)
+                return
             
-            # 解压扩展
-            with zipfile.ZipFile(filename, 'r') as zip_ref:
-                # 获取扩展名称（zip文件中的第一个文件夹）
-                zip_ref.extractall(extensions_dir)
-            
-            CustomMessageBox.information(self, "成功", "扩展导入成功！\n请重启程序以加载新扩展。")
+            if ext_name:
+                ext = extension_manager.extensions[ext_name]
+                parent = self.parent()
+                if parent is not None and hasattr(parent, '_add_extension'):
+                    parent._add_extension(ext_name, ext)
+                self.extensions[ext_name] = ext
+                for tool_name, tool_func in ext.get_tools().items():
+                    self.extension_tools[tool_name] = (ext, tool_func)
+                self._load_extensions()
+            CustomMessageBox.information(self, "成功", message)
             
         except Exception as e:
             CustomMessageBox.warning(self, "错误", f"导入失败: {str(e)}")
@@ -2961,24 +4368,18 @@ class ExtensionManagerDialog(QDialog):
         reply = CustomMessageBox.question(
             self,
             "确认删除",
-            f"确定要删除扩展 '{ext_name}' 吗？\n\n此操作将删除扩展文件夹，无法撤销。",
+            f"确定要删除扩展 '{ext_name}' 吗？\n\n此操作将删除扩展文件夹或扩展压缩包，无法撤销。",
             QMessageBox.Yes | QMessageBox.No,
             QMessageBox.No
         )
         
         if reply == QMessageBox.Yes:
             try:
-                ext_dir = os.path.join(
-                    os.path.dirname(os.path.dirname(__file__)),
-                    "iflow_extensions",
-                    ext_name
-                )
-                
-                if os.path.exists(ext_dir):
-                    shutil.rmtree(ext_dir)
+                success, message = extension_manager.remove_extension_files(ext_name)
+                if success:
                     CustomMessageBox.information(self, "成功", "扩展删除成功！\n请重启程序以生效。")
                 else:
-                    CustomMessageBox.warning(self, "错误", "扩展目录不存在")
+                    CustomMessageBox.warning(self, "错误", message)
                     
             except Exception as e:
                 CustomMessageBox.warning(self, "错误", f"删除失败: {str(e)}")
@@ -2988,12 +4389,14 @@ class ExtensionManagerDialog(QDialog):
 
 def main():
     """主函数"""
-    app = QApplication(sys.argv)
-    app.setStyle('Fusion')
+    timer = get_startup_timer()
+    with timer.phase("创建 QApplication"):
+        app = QApplication(sys.argv)
+        app.setStyle('Fusion')
 
-    # 加载自定义字体
-    main_font_family, main_font_path = get_main_font_family()
-    genshin_fonts = get_genshin_fonts()
+    # 加载自定义字体（彩蛋字体在第一次使用时才注册）
+    with timer.phase("加载字体"):
+        main_font_family, main_font_path = get_main_font_family()
 
     # 设置应用字体
     if main_font_family:
@@ -3011,8 +4414,10 @@ def main():
     print(f"[字体] 实际应用的字体: {actual_font.family()}")
 
     # 创建主窗口
-    window = IflowChatGUI()
-    window.show()
+    with timer.phase("创建主窗口"):
+        window = IflowChatGUI()
+    with timer.phase("显示主窗口"):
+        window.show()
 
     sys.exit(app.exec_())
 
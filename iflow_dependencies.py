@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+iFlow 扩展依赖检查
+扩展管理器、扩展管理界面和打包工具共用的依赖检查
+
+- 通过 importlib.util.find_spec 查找模块，不导入依赖包本身（numpy、PIL 等导入很慢）
+- 找不到模块时再按发行包名查找（例如声明的是 pillow 而不是 PIL）
+- 检查结果缓存在 iflow_extensions/__pycache__/dependencies.json 中，
+  缓存键由解释器版本和 site-packages 目录的修改时间组成，安装或卸载包后自动失效
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import threading
+import importlib
+import importlib.util
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+DEPENDENCY_CACHE_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "iflow_extensions", "__pycache__", "dependencies.json"
+)
+
+# 同一进程内重新计算缓存键的最短间隔（秒）
+ENVIRONMENT_CHECK_INTERVAL = 1.0
+
+# 依赖声明中的版本约束和附加选项，例如 "requests>=2.0"、"package[extra]"
+_REQUIREMENT_RE = re.compile(r'^\s*([A-Za-z0-9_.\-]+)')
+
+
+def requirement_name(requirement: str) -> str:
+    """去掉依赖声明中的版本约束"""
+    match = _REQUIREMENT_RE.match(requirement)
+    return match.group(1) if match else requirement.strip()
+
+
+def environment_key() -> str:
+    """
+    计算当前 Python 环境的指纹
+
+    pip 安装或卸载包会修改 site-packages 目录，目录的修改时间随之变化
+    """
+    digest = hashlib.sha1()
+    digest.update(sys.version.encode('utf-8'))
+    digest.update(sys.prefix.encode('utf-8'))
+    for path in _package_dirs():
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = 0
+        digest.update(f"{path}\0{mtime}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _package_dirs() -> List[str]:
+    """pip 安装包的目录（site-packages / dist-packages 和用户目录）"""
+    dirs = [p for p in sys.path if p and os.path.basename(os.path.normpath(p)) in ('site-packages', 'dist-packages')]
+    try:
+        import site
+        user_site = site.getusersitepackages()
+        if user_site not in dirs:
+            dirs.append(user_site)
+    except (ImportError, AttributeError):
+        pass
+    return sorted(set(dirs))
+
+
+def _resolve(requirement: str) -> bool:
+    """检查单个依赖是否已安装（不导入）"""
+    name = requirement_name(requirement)
+    # 只查找顶层模块，find_spec 查找子模块时会导入父包
+    module = name.split('.')[0]
+    try:
+        if importlib.util.find_spec(module) is not None:
+            return True
+    except (ImportError, ValueError):
+        pass
+    try:
+        from importlib import metadata
+        metadata.distribution(name)
+        return True
+    except Exception:
+        return False
+
+
+class DependencyCache:
+    """依赖检查结果的持久化缓存"""
+
+    def __init__(self, cache_file: str = DEPENDENCY_CACHE_FILE):
+        self.cache_file = cache_file
+        self.key = ""
+        self.results: Dict[str, bool] = {}
+        self._checked_at = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        self._loaded = True
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and isinstance(data.get('packages'), dict):
+            self.key = data.get('key', "")
+            self.results = {str(k): bool(v) for k, v in data['packages'].items()}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_file = self.cache_file + ".tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'key': self.key, 'packages': self.results}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            pass
+
+    def _refresh(self):
+        """环境变化时清空缓存（调用方持有锁）"""
+        if not self._loaded:
+            self._load()
+        now = time.monotonic()
+        if self.key and now - self._checked_at < ENVIRONMENT_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        key = environment_key()
+        if key != self.key:
+            if self.key:
+                # 新安装的包需要清空导入系统的目录缓存才能被 find_spec 找到
+                importlib.invalidate_caches()
+            self.key = key
+            self.results = {}
+
+    def check(self, packages: Iterable[str]) -> Tuple[bool, List[str]]:
+        """
+        检查依赖是否已安装
+
+        返回:
+            (all_installed, missing_packages)
+        """
+        packages = [p for p in packages if p and p.strip()]
+        if not packages:
+            return True, []
+        with self._lock:
+            self._refresh()
+            changed = False
+            missing = []
+            for package in packages:
+                installed = self.results.get(package)
+                if installed is None:
+                    installed = _resolve(package)
+                    self.results[package] = installed
+                    changed = True
+                if not installed:
+                    missing.append(package)
+            if changed:
+                self._save()
+        return len(missing) == 0, missing
+
+    def clear(self):
+        """清空缓存（例如安装依赖后立即重新检查）"""
+        with self._lock:
+            self.key = ""
+            self.results = {}
+            self._loaded = True
+            importlib.invalidate_caches()
+            try:
+                os.remove(self.cache_file)
+            except OSError:
+                pass
+
+
+_cache: Optional[DependencyCache] = None
+
+
+def get_dependency_cache() -> DependencyCache:
+    """获取全局依赖缓存"""
+    global _cache
+    if _cache is None:
+        _cache = DependencyCache()
+    return _cache
+
+
+def check_packages(packages: Iterable[str]) -> Tuple[bool, List[str]]:
+    """检查依赖是否已安装，返回 (是否全部已安装, 缺失的包列表)"""
+    return get_dependency_cache().check(packages)
@@ -0,0 +1,599 @@
+# -*- coding: utf-8 -*-
+"""
+iFlow 扩展宿主进程
+让扩展在独立的子进程中运行，工具调用通过管道转发
+
+- 扩展的 CPU 密集型工具不再占用主进程的 GIL，不会卡住流式输出和 Qt 事件循环
+- 扩展崩溃或超时只影响自己的子进程，主进程自动重启子进程
+- 同一扩展可以启动多个子进程组成进程池，并发调用分散到多个 CPU 核心
+- 子进程内存超过上限时在调用结束后回收并重新启动
+
+扩展类通过类属性开启：
+    isolated = True        # 在子进程中运行
+    workers = 2            # 子进程数量（默认 1）
+    memory_limit = 512     # 单个子进程的内存上限（MB，默认不限制）
+
+通信协议：每条消息为 4 字节小端长度 + marshal 编码的元组，只包含基本类型。
+    主进程 -> 子进程: ('call', 调用ID, 工具名, 参数) / ('confirm_reply', 调用ID, 是否允许) / ('stop',)
+                      ('hook', 调用ID, 钩子名, 工具名, 参数, 工具结果或 None)
+    子进程 -> 主进程: ('ready', 进程ID) / ('error', 错误信息)
+                      ('result', 调用ID, 是否成功, 消息, 内存占用)
+                      ('confirm', 调用ID, 标题, 内容)  # 工具请求用户确认
+                      ('output', 调用ID, 文本)  # 协程/生成器工具的阶段性输出
+marshal 格式与解释器版本绑定，子进程始终使用与主进程相同的解释器启动。
+
+没有清单的隔离扩展由 describe_extension 在临时子进程中导入并生成清单（JSON 写到标准输出），
+主进程不导入扩展代码。
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import struct
+import marshal
+import threading
+import subprocess
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from iflow_tool_runtime import ToolExecution, current_output_callback
+
+
+# 子进程启动超时（秒）
+STARTUP_TIMEOUT = 30.0
+# 单次工具调用的默认超时（秒），可通过工具元数据中的 timeout 覆盖
+DEFAULT_CALL_TIMEOUT = 300.0
+# 重启次数统计窗口（秒）和窗口内允许的最大重启次数，超过后停用该扩展
+RESTART_WINDOW = 60.0
+MAX_RESTARTS = 5
+
+_HEADER = struct.Struct('<I')
+
+
+class HostError(Exception):
+    """扩展子进程异常"""
+    pass
+
+
+def write_frame(stream, payload: tuple):
+    """写入一条消息"""
+    data = marshal.dumps(payload)
+    stream.write(_HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def read_frame(stream) -> Optional[tuple]:
+    """读取一条消息，管道关闭时返回 None"""
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    size = _HEADER.unpack(header)[0]
+    data = stream.read(size)
+    if len(data) < size:
+        return None
+    return marshal.loads(data)
+
+
+class _Worker:
+    """单个扩展子进程"""
+
+    def __init__(self, ext_name: str, ext_path: str, cache_dir: Optional[str]):
+        self.ext_name = ext_name
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), ext_path, ext_name, cache_dir or ""],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0),
+        )
+        self.pid = self.process.pid
+        self.memory: Optional[int] = None
+        self.calls = 0
+        self._inbox: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        # 管道读取放在独立线程中，主线程可以带超时等待（Windows 管道不支持 select）
+        self._reader = threading.Thread(target=self._read_loop, name=f"iflow-host-{ext_name}",
+                                        daemon=True)
+        self._reader.start()
+
+        message = self._receive(STARTUP_TIMEOUT)
+        if message is None or message[0] != 'ready':
+            self.kill()
+            reason = message[1] if message and message[0] == 'error' else "子进程启动失败"
+            raise HostError(f"扩展 {ext_name} 启动失败: {reason}")
+
+    def _read_loop(self):
+        stream = self.process.stdout
+        try:
+            while True:
+                message = read_frame(stream)
+                self._inbox.put(message)
+                if message is None:
+                    return
+        except (OSError, ValueError, EOFError):
+            self._inbox.put(None)
+
+    def _receive(self, timeout: Optional[float]) -> Optional[tuple]:
+        try:
+            return self._inbox.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def call(self, call_id: int, request: tuple, timeout: Optional[float],
+             confirm_callback: Callable = None, output_callback: Callable = None) -> Tuple[bool, str]:
+        """
+        转发一次请求（工具调用或钩子调用）
+
+        子进程退出时抛出 HostError，超时时抛出 TimeoutError
+        """
+        try:
+            write_frame(self.process.stdin, request)
+        except OSError:
+            raise HostError("扩展子进程已退出")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            message = self._receive(remaining)
+            if message is None:
+                raise HostError("扩展子进程已退出")
+            if message[0] == 'confirm' and message[1] == call_id:
+                # 等待用户确认的时间不计入超时
+                started = time.monotonic()
+                allowed = bool(confirm_callback(message[2], message[3])) if confirm_callback else False
+                if deadline is not None:
+                    deadline += time.monotonic() - started
+                write_frame(self.process.stdin, ('confirm_reply', call_id, allowed))
+            elif message[0] == 'output' and message[1] == call_id:
+                if output_callback is not None:
+                    output_callback(message[2])
+            elif message[0] == 'result' and message[1] == call_id:
+                self.calls += 1
+                self.memory = message[4]
+                return message[2], message[3]
+
+    def stop(self, timeout: float = 2.0):
+        """通知子进程退出，超时后强制结束"""
+        try:
+            write_frame(self.process.stdin, ('stop',))
+            self.process.stdin.close()
+            self.process.wait(timeout=timeout)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            self.kill()
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.wait(timeout=2.0)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+
+
+class ExtensionHost:
+    """
+    扩展子进程池
+
+    子进程在第一次调用时启动；每个子进程同一时刻只处理一个调用，
+    空闲子进程放在队列中，并发调用会分配到不同的子进程上。
+    """
+
+    def __init__(self, ext_name: str, ext_path: str, workers: int = 1,
+                 memory_limit: Optional[float] = None, cache_dir: Optional[str] = None):
+        """
+        参数:
+            ext_name: 扩展名
+            ext_path: 扩展文件夹或扩展压缩包
+            workers: 子进程数量
+            memory_limit: 单个子进程的内存上限（MB），None 表示不限制
+            cache_dir: 压缩包字节码缓存目录
+        """
+        self.ext_name = ext_name
+        self.ext_path = ext_path
+        self.size = max(1, int(workers))
+        self.memory_limit = memory_limit
+        self.cache_dir = cache_dir
+        self.workers: List[_Worker] = []
+        self.calls = 0
+        self.restarts = 0
+        self.recycled = 0
+        self.disabled_reason = ""
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._starting = 0
+        self._restart_times: List[float] = []
+        self._closed = False
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self.ext_name, self.ext_path, self.cache_dir)
+        with self._lock:
+            self.workers.append(worker)
+        return worker
+
+    def _retire(self, worker: _Worker, kill: bool = False):
+        with self._lock:
+            if worker in self.workers:
+                self.workers.remove(worker)
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+
+    def _record_restart(self):
+        """记录一次异常重启，短时间内重启过多时停用扩展"""
+        now = time.monotonic()
+        with self._lock:
+            self.restarts += 1
+            self._restart_times = [t for t in self._restart_times if now - t < RESTART_WINDOW] + [now]
+            if len(self._restart_times) > MAX_RESTARTS:
+                self.disabled_reason = f"{int(RESTART_WINDOW)} 秒内异常退出超过 {MAX_RESTARTS} 次"
+
+    def _acquire(self) -> _Worker:
+        """取得一个空闲子进程，池未满时启动新的子进程"""
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                spawn = len(self.workers) + self._starting < self.size
+                if spawn:
+                    self._starting += 1
+            if spawn:
+                try:
+                    return self._spawn()
+                finally:
+                    with self._lock:
+                        self._starting -= 1
+            # 池已满时等待其他调用归还子进程；子进程被回收后重新检查是否可以启动新进程
+            try:
+                return self._idle.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def call(self, tool_name: str, args: str, confirm_callback: Callable = None,
+             timeout: Optional[float] = DEFAULT_CALL_TIMEOUT,
+             output_callback: Callable = None) -> Tuple[bool, str]:
+        """在子进程中调用工具，子进程异常时返回 (False, 原因)"""
+        try:
+            return self._dispatch(('call', tool_name, args), tool_name, timeout,
+                                  confirm_callback, output_callback)
+        except HostError as e:
+            return False, str(e)
+
+    def call_hook(self, hook: str, tool_name: str, args: str,
+                  result: Tuple[bool, str] = None) -> Tuple[bool, str]:
+        """
+        在子进程中调用扩展的工具调用钩子（on_before_tool_call / on_after_tool_call）
+
+        子进程启动失败、异常退出、超时或扩展已停止时抛出 HostError，
+        调用方据此区分钩子的拒绝和子进程的故障
+        """
+        payload = (hook, tool_name, args, tuple(result) if result else None)
+        return self._dispatch(('hook',) + payload, tool_name, DEFAULT_CALL_TIMEOUT)
+
+    def _dispatch(self, request: tuple, tool_name: str, timeout: Optional[float],
+                  confirm_callback: Callable = None,
+                  output_callback: Callable = None) -> Tuple[bool, str]:
+        """
+        把请求 (类型, 参数...) 分配给空闲子进程，返回子进程的结果
+
+        子进程不可用、异常退出或超时时抛出 HostError
+        """
+        if self._closed:
+            raise HostError(f"扩展 {self.ext_name} 已停止")
+        if self.disabled_reason:
+            raise HostError(f"扩展 {self.ext_name} 已停用: {self.disabled_reason}")
+        try:
+            worker = self._acquire()
+        except HostError:
+            self._record_restart()
+            raise
+
+        if not worker.alive():
+            # 空闲期间退出的子进程直接替换
+            self._retire(worker, kill=True)
+            self._record_restart()
+            worker = self._spawn()
+
+        with self._lock:
+            self._next_id += 1
+            call_id = self._next_id
+        request = (request[0], call_id) + request[1:]
+        try:
+            success, message = worker.call(call_id, request, timeout, confirm_callback, output_callback)
+        except TimeoutError:
+            self._retire(worker, kill=True)
+            self._record_restart()
+            print(f"[扩展] 扩展 {self.ext_name} 的工具 {tool_name} 超时，已结束子进程 {worker.pid}")
+            raise HostError(f"扩展工具执行超时（{timeout} 秒）")
+        except HostError:
+            self._retire(worker, kill=True)
+            self._record_restart()
+            print(f"[扩展] 扩展 {self.ext_name} 的子进程 {worker.pid} 异常退出，将在下次调用时重启")
+            raise HostError(f"扩展 {self.ext_name} 的子进程异常退出，已自动重启")
+
+        with self._lock:
+            self.calls += 1
+        if self.memory_limit and worker.memory and worker.memory > self.memory_limit * 1024 * 1024:
+            # 超出内存上限的子进程在调用结束后回收
+            print(f"[扩展] 扩展 {self.ext_name} 的子进程 {worker.pid} 内存 "
+                  f"{worker.memory / (1024 * 1024):.1f} MB 超出上限，重新启动")
+            self._retire(worker)
+            with self._lock:
+                self.recycled += 1
+        else:
+            self._idle.put(worker)
+        return success, message
+
+    def shutdown(self):
+        """停止全部子进程"""
+        self._closed = True
+        with self._lock:
+            workers = list(self.workers)
+        for worker in workers:
+            self._retire(worker)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """子进程池状态"""
+        with self._lock:
+            workers = list(self.workers)
+        return {
+            'workers': len(workers),
+            'size': self.size,
+            'pids': [w.pid for w in workers],
+            'calls': self.calls,
+            'memory': [w.memory for w in workers],
+            'restarts': self.restarts,
+            'recycled': self.recycled,
+            'disabled': self.disabled_reason,
+        }
+
+
+_hosts: List[ExtensionHost] = []
+
+
+def _shutdown_all():
+    for host in list(_hosts):
+        host.shutdown()
+
+
+atexit.register(_shutdown_all)
+
+
+class HostedExtension:
+    """
+    在子进程中运行的扩展代理
+
+    名称、工具列表、提示词等来自清单，工具调用转发给 ExtensionHost
+    """
+
+    def __init__(self, ext_name: str, ext_path: str, manifest: Dict[str, Any],
+                 cache_dir: Optional[str] = None):
+        self._ext_name = ext_name
+        self._manifest = manifest
+        self.host = ExtensionHost(ext_name, ext_path, manifest.get('workers', 1),
+                                  manifest.get('memory_limit'), cache_dir)
+        _hosts.append(self.host)
+        self._tools: Optional[Dict[str, Callable]] = None
+
+        self.name = manifest.get('name') or ext_name
+        self.description = manifest.get('description', "")
+        self.version = manifest.get('version', "1.0.0")
+        self.author = manifest.get('author', "")
+        self.enabled = True
+
+    def _make_stub(self, tool_name: str) -> Callable:
+        meta = self._manifest.get('tool_metadata', {}).get(tool_name, {})
+        timeout = meta.get('timeout') or DEFAULT_CALL_TIMEOUT
+
+        def handler(args: str, confirm_callback: Callable = None):
+            return self.host.call(tool_name, args, confirm_callback, timeout,
+                                  output_callback=current_output_callback())
+        handler.__name__ = tool_name
+        return handler
+
+    def get_name(self) -> str:
+        return self.name
+
+    def get_description(self) -> str:
+        return self.description
+
+    def get_version(self) -> str:
+        return self.version
+
+    def get_author(self) -> str:
+        return self.author
+
+    def is_enabled(self) -> bool:
+        return self.enabled
+
+    def is_loaded(self) -> bool:
+        """是否已有子进程在运行"""
+        return bool(self.host.workers)
+
+    def get_tools(self) -> Dict[str, Callable]:
+        if self._tools is None:
+            names = self._manifest.get('tool_names') or list(self._manifest.get('tools', {}).keys())
+            self._tools = {name: self._make_stub(name) for name in names}
+        return self._tools
+
+    def get_tool_descriptions(self) -> Dict[str, str]:
+        return dict(self._manifest.get('tools', {}))
+
+    def get_tool_metadata(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self._manifest.get('tool_metadata', {}))
+
+    def get_tool_hooks(self) -> List[str]:
+        return list(self._manifest.get('hooks', []))
+
+    def on_before_tool_call(self, tool_name: str, args: str) -> Tuple[bool, str]:
+        try:
+            return self.host.call_hook('on_before_tool_call', tool_name, args)
+        except HostError:
+            # 子进程崩溃、超时、重启中或扩展已停用：与进程内钩子抛出异常时一样放行，
+            # 只有钩子明确返回拒绝时才拦截
+            return True, ""
+
+    def on_after_tool_call(self, tool_name: str, args: str, result: Tuple[bool, str]):
+        try:
+            self.host.call_hook('on_after_tool_call', tool_name, args, result)
+        except HostError:
+            pass
+
+    def get_prompt(self) -> str:
+        return self._manifest.get('prompt', "")
+
+    def get_dependencies(self) -> List[str]:
+        return list(self._manifest.get('dependencies', []))
+
+    def check_dependencies(self) -> Tuple[bool, List[str]]:
+        from iflow_extensions import check_dependencies
+        return check_dependencies(self.get_dependencies())
+
+    def on_load(self):
+        pass
+
+    def on_unload(self):
+        """停止子进程（子进程退出前会调用扩展自身的 on_unload）"""
+        self.host.shutdown()
+        if self.host in _hosts:
+            _hosts.remove(self.host)
+
+    def __repr__(self):
+        return f"<HostedExtension {self._ext_name} ({self.host.size} 个子进程)>"
+
+
+def describe_extension(ext_path: str, ext_name: str,
+                       cache_dir: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    在临时子进程中导入扩展并生成清单，主进程不导入扩展代码
+
+    返回:
+        (清单, 耗时) - 耗时包含 import_time 和 init_time（秒）
+
+    导入失败或超时时抛出 HostError
+    """
+    try:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--describe", ext_path, ext_name, cache_dir or ""],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            timeout=STARTUP_TIMEOUT,
+            creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0),
+        )
+    except subprocess.TimeoutExpired:
+        raise HostError(f"扩展 {ext_name} 生成清单超时")
+    try:
+        reply = json.loads(completed.stdout.decode('utf-8'))
+    except ValueError:
+        raise HostError(f"扩展 {ext_name} 生成清单失败: 子进程退出码 {completed.returncode}")
+    if 'error' in reply:
+        raise HostError(f"扩展 {ext_name} 生成清单失败: {reply['error']}")
+    return reply['manifest'], reply['timings']
+
+
+def _claim_stdout():
+    """协议使用原始 stdout，扩展中的 print 输出改写到 stderr，避免破坏消息"""
+    channel_out = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+    return channel_out
+
+
+def _describe(ext_path: str, ext_name: str, cache_dir: str):
+    """子进程入口：导入扩展，把清单以 JSON 写到标准输出"""
+    channel_out = _claim_stdout()
+    from iflow_extensions import instantiate_extension, build_manifest
+    try:
+        extension, stats = instantiate_extension(ext_path, ext_name, cache_dir or None)
+        if extension is None:
+            raise ImportError("缺少 Extension 类")
+        reply = {
+            'manifest': build_manifest(extension),
+            'timings': {'import_time': stats['import_time'], 'init_time': stats['init_time']},
+        }
+    except Exception as e:
+        reply = {'error': str(e)}
+    channel_out.write(json.dumps(reply, ensure_ascii=False).encode('utf-8'))
+    channel_out.flush()
+
+
+def _serve(ext_path: str, ext_name: str, cache_dir: str):
+    """子进程入口：导入扩展并循环处理调用"""
+    channel_out = _claim_stdout()
+    channel_in = sys.stdin.buffer
+    sys.stdin = open(os.devnull, 'r')
+
+    from iflow_extensions import instantiate_extension, memory_usage
+    try:
+        extension, _ = instantiate_extension(ext_path, ext_name, cache_dir or None)
+        if extension is None:
+            raise ImportError("缺少 Extension 类")
+        tools = extension.get_tools()
+    except Exception as e:
+        write_frame(channel_out, ('error', str(e)))
+        return
+    write_frame(channel_out, ('ready', os.getpid()))
+
+    try:
+        from iflow_tool_registry import adapt_handler
+        tools = {name: adapt_handler(func) for name, func in tools.items()}
+    except ImportError:
+        pass
+
+    while True:
+        message = read_frame(channel_in)
+        if message is None or message[0] == 'stop':
+            break
+        if message[0] == 'hook':
+            _, call_id, hook, tool_name, args, result = message
+            try:
+                if hook == 'on_before_tool_call':
+                    allowed, text = extension.on_before_tool_call(tool_name, args)
+                else:
+                    extension.on_after_tool_call(tool_name, args, result)
+                    allowed, text = True, ""
+            except Exception as e:
+                allowed, text = True, f"钩子执行失败: {e}"
+            write_frame(channel_out, ('result', call_id, bool(allowed), str(text or ""), memory_usage()))
+            continue
+        if message[0] != 'call':
+            continue
+        _, call_id, tool_name, args = message
+
+        def confirm(title, text, call_id=call_id):
+            write_frame(channel_out, ('confirm', call_id, str(title), str(text)))
+            while True:
+                reply = read_frame(channel_in)
+                if reply is None:
+                    return False
+                if reply[0] == 'confirm_reply' and reply[1] == call_id:
+                    return bool(reply[2])
+
+        def output(chunk, call_id=call_id):
+            write_frame(channel_out, ('output', call_id, chunk))
+
+        handler = tools.get(tool_name)
+        if handler is None:
+            success, result = False, f"扩展 {ext_name} 未提供工具: {tool_name}"
+        else:
+            try:
+                success, result = ToolExecution(confirm, output).run(handler, args)
+            except Exception as e:
+                success, result = False, f"扩展工具执行失败: {str(e)}"
+        write_frame(channel_out, ('result', call_id, bool(success), str(result), memory_usage()))
+
+    try:
+        extension.on_unload()
+    except Exception:
+        pass
+
+
+if __name__ == "__main__":
+    if sys.argv[1] == "--describe":
+        _describe(sys.argv[2], sys.argv[3], sys.argv[4] if len(sys.argv) > 4 else "")
+    else:
+        _serve(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else "")
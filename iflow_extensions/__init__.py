@@ -2,79 +2,1102 @@
 """
 iFlow 扩展系统
 支持动态加载扩展，每个扩展可以提供工具和提示词
+
+扩展目录中可以附带静态清单 manifest.json（工具名、描述、提示词、依赖等），
+启动时只读取清单，不导入扩展代码；扩展模块在第一次调用其工具时才导入。
+没有清单或清单已过期（extension.py 内容变化）的扩展会立即导入，并自动重新生成清单。
+
+扩展也可以是打包工具生成的 .zip 文件，直接放在扩展目录中即可，无需解压：
+代码通过 zipimport 从压缩包中读取，编译后的字节码缓存在 __pycache__/packages 中。
+同名扩展存在多个版本时使用版本号最高的压缩包，扩展文件夹优先于压缩包。
+
+扩展类设置 isolated = True 时在独立的子进程中运行（见 iflow_extension_host），
+崩溃、超时和 CPU 密集型工具都不会影响主进程。isolated 需要写成类属性常量：
+扩展管理器在导入前静态检查 extension.py，隔离的扩展只在子进程中导入，
+没有清单时由子进程生成清单，主进程从不导入或实例化它。
+
+开发扩展时可以启用文件监视（ExtensionManager.start_watching），
+修改、新增或删除扩展后只重新导入发生变化的扩展，无需重启程序。
 """
 
 import os
+import re
+import ast
+import sys
+import json
+import time
+import types
+import shutil
+import marshal
+import hashlib
+import zipfile
+import zipimport
+import threading
 import importlib.util
-from typing import Dict, List, Callable, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Callable, Any, Optional, Tuple, Set
+
+try:
+    from iflow_tool_registry import adapt_handler, tool_hooks
+except ImportError:
+    adapt_handler = None
+    tool_hooks = None
+
+try:
+    from iflow_extension_host import HostedExtension, describe_extension
+except ImportError:
+    HostedExtension = None
+    describe_extension = None
+
+try:
+    from iflow_dependencies import check_packages
+except ImportError:
+    check_packages = None
+
+
+# 扩展清单文件名
+MANIFEST_FILE = "manifest.json"
+# 清单格式版本
+MANIFEST_VERSION = 1
+
+# 扩展压缩包后缀和字节码缓存目录（相对于扩展目录）
+PACKAGE_SUFFIX = ".zip"
+PACKAGE_CACHE_DIR = os.path.join("__pycache__", "packages")
+# 扩展导入耗时的本地缓存（相对于扩展目录）；耗时与机器有关，不写入随扩展分发的清单
+LOAD_TIMES_FILE = os.path.join("__pycache__", "load_times.json")
+
+# 打包工具生成的文件名: 扩展名_v版本号_时间戳.zip
+_PACKAGE_NAME_RE = re.compile(r'^(?P<name>.+?)_v(?P<version>\d+(?:\.\d+)*)(?:_\d{8}_\d{6})?$')
+
+# 文件监视的轮询间隔（秒）
+DEFAULT_WATCH_INTERVAL = 1.0
+
+# 启动时等待扩展加载的时间预算（秒），超出预算的扩展在后台继续加载
+DEFAULT_LOAD_BUDGET = 3.0
+# 并行加载扩展的线程数
+DEFAULT_LOAD_WORKERS = 4
+
+
+def is_package(ext_path: str) -> bool:
+    """是否为扩展压缩包"""
+    return ext_path.lower().endswith(PACKAGE_SUFFIX) and os.path.isfile(ext_path)
+
+
+def parse_package_name(filename: str) -> Tuple[str, Tuple[int, ...]]:
+    """
+    从压缩包文件名解析扩展名和版本号
+    
+    返回:
+        (扩展名, 版本号元组)；文件名不符合打包工具的命名规则时整个文件名作为扩展名，版本为 (0,)
+    """
+    stem = os.path.basename(filename)[:-len(PACKAGE_SUFFIX)]
+    match = _PACKAGE_NAME_RE.match(stem)
+    if not match:
+        return stem, (0,)
+    return match.group('name'), tuple(int(v) for v in match.group('version').split('.'))
+
+
+def read_package_entry(zip_path: str, entry: str) -> Optional[bytes]:
+    """读取压缩包中的文件，不存在时返回 None"""
+    with zipfile.ZipFile(zip_path) as zf:
+        try:
+            return zf.read(entry)
+        except KeyError:
+            return None
+
+
+def read_extension_source(ext_path: str) -> bytes:
+    """读取扩展文件夹或压缩包中 extension.py 的内容"""
+    if is_package(ext_path):
+        return read_package_entry(ext_path, "extension.py") or b""
+    if os.path.isdir(ext_path):
+        ext_path = os.path.join(ext_path, "extension.py")
+    with open(ext_path, 'rb') as f:
+        return f.read()
+
+
+def source_hash(ext_path: str) -> str:
+    """计算 extension.py 的内容摘要，用于判断清单是否过期"""
+    return hashlib.sha1(read_extension_source(ext_path)).hexdigest()
+
+
+def declares_isolated(ext_path: str) -> bool:
+    """
+    静态检查扩展类是否设置了 isolated = True，只解析 extension.py，不导入
+    
+    支持 Extension = XxxExtension 形式的别名，以及同一文件中定义的基类
+    """
+    try:
+        tree = ast.parse(read_extension_source(ext_path))
+    except (OSError, SyntaxError, ValueError, zipfile.BadZipFile):
+        return False
+    classes = {}
+    aliases = {}
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            classes[node.name] = node
+        elif (isinstance(node, ast.Assign) and isinstance(node.value, ast.Name)
+              and any(isinstance(t, ast.Name) and t.id == 'Extension' for t in node.targets)):
+            aliases['Extension'] = node.value.id
+    
+    def class_flag(name: str, seen: Set[str]) -> Optional[bool]:
+        node = classes.get(name)
+        if node is None or name in seen:
+            return None
+        seen.add(name)
+        for stmt in node.body:
+            if isinstance(stmt, ast.Assign):
+                targets = [t.id for t in stmt.targets if isinstance(t, ast.Name)]
+            elif isinstance(stmt, ast.AnnAssign) and isinstance(stmt.target, ast.Name) and stmt.value:
+                targets = [stmt.target.id]
+            else:
+                continue
+            if 'isolated' in targets and isinstance(stmt.value, ast.Constant):
+                return bool(stmt.value.value)
+        for base in node.bases:
+            if isinstance(base, ast.Name):
+                flag = class_flag(base.id, seen)
+                if flag is not None:
+                    return flag
+        return None
+    
+    return bool(class_flag(aliases.get('Extension', 'Extension'), set()))
+
+
+def import_extension_module(ext_file: str, ext_name: str):
+    """导入扩展模块"""
+    spec = importlib.util.spec_from_file_location(f"{ext_name}.extension", ext_file)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_package_code(zip_path: str, ext_name: str, cache_dir: Optional[str]):
+    """
+    获取压缩包中 extension.py 的字节码
+    
+    字节码按 CRC 和文件大小缓存在 cache_dir 中，压缩包内容不变时不再重新编译；
+    同一扩展的旧缓存会在写入新缓存时清理。
+    """
+    with zipfile.ZipFile(zip_path) as zf:
+        info = zf.getinfo("extension.py")
+        prefix = f"{ext_name}-"
+        cache_name = f"{prefix}{info.CRC:08x}-{info.file_size}.{sys.implementation.cache_tag}.pyc"
+        cache_file = os.path.join(cache_dir, cache_name) if cache_dir else None
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'rb') as f:
+                    data = f.read()
+                if data[:len(importlib.util.MAGIC_NUMBER)] == importlib.util.MAGIC_NUMBER:
+                    return marshal.loads(data[len(importlib.util.MAGIC_NUMBER):])
+            except (OSError, ValueError, EOFError, TypeError):
+                pass
+        source = zf.read(info)
+    
+    code = compile(source, os.path.join(zip_path, "extension.py"), 'exec', dont_inherit=True)
+    if cache_file:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            for old in os.listdir(cache_dir):
+                if old.startswith(prefix) and old != cache_name:
+                    os.remove(os.path.join(cache_dir, old))
+            tmp_file = cache_file + ".tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(importlib.util.MAGIC_NUMBER + marshal.dumps(code))
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+    return code
+
+
+def import_package_module(zip_path: str, ext_name: str, cache_dir: Optional[str] = None):
+    """从压缩包导入扩展模块，不解压"""
+    code = load_package_code(zip_path, ext_name, cache_dir)
+    module = types.ModuleType(f"{ext_name}.extension")
+    module.__file__ = os.path.join(zip_path, "extension.py")
+    # zipimporter 作为 loader，扩展可以通过 __loader__.get_data() 读取包内资源
+    module.__loader__ = zipimport.zipimporter(zip_path)
+    # 压缩包加入搜索路径，扩展可以导入包内的其他模块
+    if zip_path not in sys.path:
+        sys.path.append(zip_path)
+    exec(code, module.__dict__)
+    return module
+
+
+def check_dependencies(packages: List[str]) -> Tuple[bool, List[str]]:
+    """检查依赖是否已安装，不导入依赖包；结果按 Python 环境持久缓存"""
+    if check_packages is not None:
+        return check_packages(packages)
+    missing = [pkg for pkg in packages if importlib.util.find_spec(pkg.split('.')[0]) is None]
+    return len(missing) == 0, missing
+
+
+def memory_usage() -> Optional[int]:
+    """当前进程占用的物理内存（字节），无法获取时返回 None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError, IndexError):
+        return None
+
+
+def instantiate_extension(ext_path: str, ext_name: str,
+                          cache_dir: Optional[str] = None) -> Tuple[Any, Dict[str, Any]]:
+    """
+    导入扩展模块并创建扩展实例
+    
+    参数:
+        ext_path: 扩展文件夹或扩展压缩包
+        ext_name: 扩展名
+        cache_dir: 压缩包字节码缓存目录
+    
+    返回:
+        (extension, stats) - 扩展实例（模块缺少 Extension 时为 None）和加载统计：
+        import_time 模块导入耗时、init_time 实例化耗时（秒）
+    """
+    start = time.perf_counter()
+    if is_package(ext_path):
+        module = import_package_module(ext_path, ext_name, cache_dir)
+    else:
+        module = import_extension_module(os.path.join(ext_path, "extension.py"), ext_name)
+    imported = time.perf_counter()
+    extension = module.Extension() if hasattr(module, 'Extension') else None
+    finished = time.perf_counter()
+    stats = {
+        'import_time': imported - start,
+        'init_time': finished - imported,
+    }
+    return extension, stats
+
+
+def build_manifest(extension, digest: str = "") -> Dict[str, Any]:
+    """
+    根据扩展实例生成清单
+    
+    参数:
+        extension: 扩展实例
+        digest: extension.py 的内容摘要
+    """
+    metadata = {}
+    if hasattr(extension, 'get_tool_metadata'):
+        metadata = extension.get_tool_metadata() or {}
+    dependencies = []
+    if hasattr(extension, 'get_dependencies'):
+        dependencies = list(extension.get_dependencies())
+    return {
+        'manifest_version': MANIFEST_VERSION,
+        'name': extension.name,
+        'description': extension.description,
+        'version': extension.version,
+        'author': extension.author,
+        'lazy': True,
+        'isolated': bool(getattr(extension, 'isolated', False)),
+        'workers': int(getattr(extension, 'workers', 1)),
+        'memory_limit': getattr(extension, 'memory_limit', None),
+        'tools': dict(extension.get_tool_descriptions()),
+        'tool_names': list(extension.get_tools().keys()),
+        'tool_metadata': metadata,
+        'hooks': tool_hooks(extension) if tool_hooks is not None else [],
+        'prompt': extension.get_prompt(),
+        'dependencies': dependencies,
+        'source_hash': digest,
+    }
+
+
+def load_manifest(ext_path: str) -> Optional[Dict[str, Any]]:
+    """读取扩展清单（扩展文件夹或压缩包），不存在或格式错误时返回 None"""
+    manifest_file = os.path.join(ext_path, MANIFEST_FILE)
+    try:
+        if is_package(ext_path):
+            data = read_package_entry(ext_path, MANIFEST_FILE)
+            if data is None:
+                return None
+            manifest = json.loads(data.decode('utf-8'))
+        else:
+            if not os.path.exists(manifest_file):
+                return None
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        print(f"[扩展] 读取清单失败: {manifest_file} ({e})")
+        return None
+    if manifest.get('manifest_version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def write_manifest(ext_path: str, manifest: Dict[str, Any]):
+    """写入扩展清单"""
+    manifest_file = os.path.join(ext_path, MANIFEST_FILE)
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def generate_manifest(ext_path: str, ext_name: str = None) -> Dict[str, Any]:
+    """导入扩展目录中的 extension.py 并生成清单（供打包工具使用）"""
+    ext_name = ext_name or os.path.basename(os.path.normpath(ext_path))
+    extension, stats = instantiate_extension(ext_path, ext_name)
+    if extension is None:
+        raise ValueError(f"扩展 {ext_name} 缺少 Extension 类")
+    return build_manifest(extension, source_hash(ext_path))
+
+
+class LoadTimes:
+    """
+    扩展导入耗时的本地缓存，用于启动报告估算延迟加载节省的时间
+    
+    按扩展名记录 extension.py 的内容摘要和上次导入的耗时，代码变化后对应的记录失效
+    """
+    
+    def __init__(self, cache_file: str):
+        self.cache_file = cache_file
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+    
+    def _load(self):
+        """读取缓存文件（调用方持有锁）"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+        self._entries = data if isinstance(data, dict) else {}
+    
+    def get(self, ext_name: str, digest: str) -> Tuple[float, float]:
+        """返回 (导入耗时, 实例化耗时)，没有记录或代码已变化时返回 (0.0, 0.0)"""
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            entry = self._entries.get(ext_name)
+        if not isinstance(entry, dict) or entry.get('source_hash') != digest:
+            return 0.0, 0.0
+        return float(entry.get('import_time', 0.0)), float(entry.get('init_time', 0.0))
+    
+    def record(self, ext_name: str, digest: str, import_time: float, init_time: float):
+        """记录一次导入的耗时并写入缓存文件"""
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            self._entries[ext_name] = {
+                'source_hash': digest,
+                'import_time': round(import_time, 6),
+                'init_time': round(init_time, 6),
+            }
+            try:
+                os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+                tmp_file = self.cache_file + ".tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self._entries, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_file, self.cache_file)
+            except OSError:
+                pass
+
+
+class LazyExtension:
+    """
+    延迟加载的扩展代理
+    
+    名称、描述、工具列表、提示词等直接来自清单；
+    第一次调用工具或访问清单之外的属性时才导入真正的扩展模块。
+    """
+    
+    def __init__(self, manager: 'ExtensionManager', ext_name: str, ext_path: str,
+                 manifest: Dict[str, Any]):
+        self._manager = manager
+        self._ext_name = ext_name
+        self._ext_path = ext_path
+        self._manifest = manifest
+        self._extension = None
+        self._lock = threading.Lock()
+        self._tools: Optional[Dict[str, Callable]] = None
+        self._resolved: Dict[str, Callable] = {}
+        
+        self.name = manifest.get('name') or ext_name
+        self.description = manifest.get('description', "")
+        self.version = manifest.get('version', "1.0.0")
+        self.author = manifest.get('author', "")
+        self.enabled = True
+    
+    def is_loaded(self) -> bool:
+        """扩展模块是否已导入"""
+        return self._extension is not None
+    
+    def load(self):
+        """导入并返回真正的扩展实例"""
+        if self._extension is None:
+            with self._lock:
+                if self._extension is None:
+                    self._extension = self._manager._materialize(self._ext_name, self._ext_path)
+        return self._extension
+    
+    def _tool_names(self) -> List[str]:
+        return self._manifest.get('tool_names') or list(self._manifest.get('tools', {}).keys())
+    
+    def _make_stub(self, tool_name: str) -> Callable:
+        """生成工具占位函数，首次调用时导入扩展并转发"""
+        def handler(args: str, confirm_callback: Callable = None):
+            func = self._resolved.get(tool_name)
+            if func is None:
+                tools = self.load().get_tools()
+                if tool_name not in tools:
+                    return False, f"扩展 {self._ext_name} 未提供工具: {tool_name}（清单可能已过期）"
+                func = tools[tool_name]
+                if adapt_handler is not None:
+                    func = adapt_handler(func)
+                self._resolved[tool_name] = func
+            return func(args, confirm_callback)
+        handler.__name__ = tool_name
+        return handler
+    
+    def get_name(self) -> str:
+        return self.name
+    
+    def get_description(self) -> str:
+        return self.description
+    
+    def get_version(self) -> str:
+        return self.version
+    
+    def get_author(self) -> str:
+        return self.author
+    
+    def is_enabled(self) -> bool:
+        return self.enabled
+    
+    def get_tools(self) -> Dict[str, Callable]:
+        """获取工具处理函数（未导入时返回占位函数）"""
+        if self._tools is None:
+            self._tools = {name: self._make_stub(name) for name in self._tool_names()}
+        return self._tools
+    
+    def get_tool_descriptions(self) -> Dict[str, str]:
+        return dict(self._manifest.get('tools', {}))
+    
+    def get_tool_metadata(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self._manifest.get('tool_metadata', {}))
+    
+    def get_tool_hooks(self) -> List[str]:
+        """扩展重写的工具调用钩子，调用钩子时才导入扩展"""
+        return list(self._manifest.get('hooks', []))
+    
+    def get_prompt(self) -> str:
+        return self._manifest.get('prompt', "")
+    
+    def get_dependencies(self) -> List[str]:
+        return list(self._manifest.get('dependencies', []))
+    
+    def check_dependencies(self) -> Tuple[bool, List[str]]:
+        """检查依赖是否已安装（只查找，不导入）"""
+        return check_dependencies(self.get_dependencies())
+    
+    def __getattr__(self, item):
+        # 清单之外的属性转交给真正的扩展实例
+        if item.startswith('_'):
+            raise AttributeError(item)
+        return getattr(self.load(), item)
+    
+    def __repr__(self):
+        state = "已加载" if self.is_loaded() else "未加载"
+        return f"<LazyExtension {self._ext_name} ({state})>"
 
 
 class ExtensionManager:
     """扩展管理器"""
     
-    def __init__(self, extensions_dir: str = "iflow_extensions"):
+    def __init__(self, extensions_dir: str = "iflow_extensions", lazy: bool = True,
+                 load_budget: float = DEFAULT_LOAD_BUDGET, max_workers: int = DEFAULT_LOAD_WORKERS):
+        """
+        参数:
+            extensions_dir: 扩展目录
+            lazy: 是否根据清单延迟加载扩展
+            load_budget: 启动时等待扩展加载的时间预算（秒），None 表示等待全部加载完成
+            max_workers: 并行加载扩展的线程数，1 表示逐个加载
+        """
         self.extensions_dir = extensions_dir
+        self.lazy = lazy
+        self.load_budget = load_budget
+        self.max_workers = max_workers
         self.extensions: Dict[str, 'BaseExtension'] = {}
         self.tool_handlers: Dict[str, Callable] = {}
         self.extension_prompts: List[str] = []
+        # 加载统计: {扩展名: {'mode': 'lazy'/'eager', 'load_time': 秒, 'import_time': 秒,
+        #                     'init_time': 秒, 'loaded': bool, 'late': bool}}
+        self.load_stats: Dict[str, Dict[str, Any]] = {}
+        self.startup_time = 0.0
+        # 超出时间预算、仍在后台加载的扩展
+        self.pending: Set[str] = set()
+        # 扩展来源: {扩展名: 扩展文件夹或压缩包路径}
+        self.sources: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._on_late_load: Optional[Callable] = None
+        self.watcher: Optional['ExtensionWatcher'] = None
+        self.load_times = LoadTimes(os.path.join(extensions_dir, LOAD_TIMES_FILE))
+    
+    @property
+    def package_cache_dir(self) -> str:
+        """压缩包扩展的字节码缓存目录"""
+        return os.path.join(self.extensions_dir, PACKAGE_CACHE_DIR)
+    
+    def _discover(self, verbose: bool = True) -> List[Tuple[str, str]]:
+        """
+        查找扩展文件夹和扩展压缩包，返回 [(扩展名, 路径), ...]
         
-    def load_extensions(self):
-        """加载所有扩展"""
-        if not os.path.exists(self.extensions_dir):
-            print(f"[扩展] 扩展目录不存在: {self.extensions_dir}")
-            return
-        
-        # 遍历扩展目录
-        for item in os.listdir(self.extensions_dir):
+        同名扩展只保留一个：扩展文件夹优先，其次是版本号最高的压缩包
+        """
+        log = print if verbose else (lambda *args: None)
+        folders = {}
+        packages = {}
+        for item in sorted(os.listdir(self.extensions_dir)):
             ext_path = os.path.join(self.extensions_dir, item)
             
             # 跳过__init__.py和base_extension.py
             if item.startswith('__') or item.startswith('base_'):
                 continue
             
-            # 只处理目录
             if os.path.isdir(ext_path):
-                self._load_extension(ext_path, item)
+                folders[item] = ext_path
+            elif is_package(ext_path):
+                ext_name, version = parse_package_name(item)
+                current = packages.get(ext_name)
+                if current is None or version > current[0]:
+                    if current is not None:
+                        log(f"[扩展] 忽略旧版本压缩包: {os.path.basename(current[1])}")
+                    packages[ext_name] = (version, ext_path)
+                else:
+                    log(f"[扩展] 忽略旧版本压缩包: {item}")
+        
+        found = dict(folders)
+        for ext_name, (version, ext_path) in packages.items():
+            if ext_name in found:
+                log(f"[扩展] 扩展文件夹 {ext_name} 已存在，忽略压缩包: {os.path.basename(ext_path)}")
+                continue
+            found[ext_name] = ext_path
+        return sorted(found.items())
+        
+    def load_extensions(self, budget: Optional[float] = None, on_late_load: Callable = None):
+        """
+        加载所有扩展
+        
+        扩展在线程池中并行导入。超过时间预算仍未完成的扩展不会阻塞启动，
+        在后台加载完成后再注册，并通过 on_late_load 通知调用方。
+        
+        参数:
+            budget: 时间预算（秒），默认使用 self.load_budget
+            on_late_load: 后台加载完成时的回调 on_late_load(ext_name, extension)，在加载线程中调用
+        """
+        if not os.path.exists(self.extensions_dir):
+            print(f"[扩展] 扩展目录不存在: {self.extensions_dir}")
+            return
+        
+        if budget is None:
+            budget = self.load_budget
+        self._on_late_load = on_late_load
+        start = time.perf_counter()
+        found = self._discover()
+        self.sources.update(found)
+        
+        if self.max_workers <= 1 or len(found) <= 1:
+            for ext_name, ext_path in found:
+                self._load_extension(ext_path, ext_name)
+        else:
+            executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(found)),
+                                          thread_name_prefix="iflow-ext")
+            futures = [(ext_name, executor.submit(self._prepare_extension, ext_path, ext_name))
+                       for ext_name, ext_path in found]
+            done, _ = wait([f for _, f in futures], timeout=budget)
+            
+            # 按目录顺序注册已完成的扩展，保证工具冲突的处理结果稳定
+            for ext_name, future in futures:
+                if future in done:
+                    self._commit(future.result())
+                else:
+                    with self._lock:
+                        self.pending.add(ext_name)
+                    future.add_done_callback(lambda f, name=ext_name: self._on_background_loaded(name, f))
+            executor.shutdown(wait=False)
+        
+        self.startup_time = time.perf_counter() - start
+        for line in self.get_load_report()[:2]:
+            print(f"[扩展] {line}")
+        if self.pending:
+            print(f"[扩展] 以下扩展超出加载时间预算，将在后台继续加载: {', '.join(sorted(self.pending))}")
     
     def _load_extension(self, ext_path: str, ext_name: str):
         """加载单个扩展"""
+        self._commit(self._prepare_extension(ext_path, ext_name))
+    
+    def _prepare_extension(self, ext_path: str, ext_name: str):
+        """
+        导入扩展或读取清单（可在工作线程中执行，不修改注册表）
+        
+        返回:
+            (ext_name, extension, stats)，失败时返回 None
+        """
         try:
             # 查找extension.py文件
-            ext_file = os.path.join(ext_path, "extension.py")
-            if not os.path.exists(ext_file):
+            packaged = is_package(ext_path)
+            if packaged:
+                with zipfile.ZipFile(ext_path) as zf:
+                    has_entry = "extension.py" in zf.namelist()
+            else:
+                has_entry = os.path.exists(os.path.join(ext_path, "extension.py"))
+            if not has_entry:
                 print(f"[扩展] 扩展 {ext_name} 缺少 extension.py 文件")
-                return
+                return None
+            
+            start = time.perf_counter()
+            digest = ""
+            manifest = None
+            if self.lazy:
+                digest = source_hash(ext_path)
+                manifest = load_manifest(ext_path)
+                if manifest is not None and manifest.get('source_hash') != digest:
+                    print(f"[扩展] 扩展 {ext_name} 的清单已过期，重新导入")
+                    manifest = None
+            
+            # 隔离的扩展只在子进程中导入：有清单时直接使用，没有清单时由子进程生成
+            isolated = manifest.get('isolated') if manifest is not None else declares_isolated(ext_path)
+            if isolated and HostedExtension is not None and manifest is None:
+                extension, stats = self._load_isolated(ext_path, ext_name)
+                stats['load_time'] = time.perf_counter() - start
+                return ext_name, extension, stats
+            
+            if isolated and HostedExtension is not None:
+                # 在子进程中运行，主进程只保留清单中的信息
+                extension = HostedExtension(ext_name, ext_path, manifest, self.package_cache_dir)
+                import_time, init_time = self.load_times.get(ext_name, digest)
+                stats = {
+                    'mode': 'lazy',
+                    'load_time': time.perf_counter() - start,
+                    'import_time': import_time,
+                    'init_time': init_time,
+                    'loaded': False,
+                    'isolated': True,
+                }
+                return ext_name, extension, stats
+            
+            if manifest is not None and manifest.get('lazy', True):
+                # 只读取清单，首次调用工具时再导入
+                extension = LazyExtension(self, ext_name, ext_path, manifest)
+                import_time, init_time = self.load_times.get(ext_name, digest)
+                stats = {
+                    'mode': 'lazy',
+                    'load_time': time.perf_counter() - start,
+                    'import_time': import_time,
+                    'init_time': init_time,
+                    'loaded': False,
+                }
+                return ext_name, extension, stats
             
             # 动态加载模块
-            spec = importlib.util.spec_from_file_location(f"{ext_name}.extension", ext_file)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
+            extension, stats = instantiate_extension(ext_path, ext_name, self.package_cache_dir)
             
             # 获取扩展类
-            if hasattr(module, 'Extension'):
-                extension = module.Extension()
-                
-                # 注册扩展
-                self.extensions[ext_name] = extension
-                
-                # 注册工具
-                tools = extension.get_tools()
-                for tool_name, tool_handler in tools.items():
-                    self.tool_handlers[tool_name] = tool_handler
-                    print(f"[扩展] 已注册工具: {tool_name} (来自 {ext_name})")
-                
-                # 收集提示词
-                prompt = extension.get_prompt()
-                if prompt:
-                    self.extension_prompts.append(prompt)
-                    print(f"[扩展] 已加载提示词: {ext_name}")
-                
-                print(f"[扩展] 扩展 {ext_name} 加载成功")
-            else:
+            if extension is None:
                 print(f"[扩展] 扩展 {ext_name} 缺少 Extension 类")
+                return None
+            
+            stats.update(mode='eager', load_time=time.perf_counter() - start, loaded=True)
+            
+            if self.lazy:
+                self.load_times.record(ext_name, digest, stats['import_time'], stats['init_time'])
+            # 没有清单或清单已过期时重新生成，下次启动即可延迟加载（压缩包只读，不写入清单）
+            if self.lazy and manifest is None and not packaged:
+                self._refresh_manifest(ext_path, ext_name, extension, digest)
+            return ext_name, extension, stats
                 
         except Exception as e:
             print(f"[扩展] 加载扩展 {ext_name} 失败: {e}")
+            return None
+    
+    def _commit(self, result, late: bool = False) -> bool:
+        """
+        注册加载完成的扩展（已导入的扩展先调用 on_load，延迟加载的扩展在导入时调用）
+        
+        on_load 在持有锁之前调用，扩展的初始化代码不会阻塞其他线程访问注册表
+        """
+        if result is None:
+            return False
+        ext_name, extension, stats = result
+        self._call_hook(ext_name, extension, 'on_load')
+        if late:
+            stats['late'] = True
+        with self._lock:
+            self._register_extension(ext_name, extension)
+            self.load_stats[ext_name] = stats
+        if stats['mode'] == 'lazy':
+            print(f"[扩展] 扩展 {ext_name} 已按清单注册（延迟加载）")
+        else:
+            print(f"[扩展] 扩展 {ext_name} 加载成功")
+        missing = self.get_missing_dependencies(ext_name)
+        if missing:
+            print(f"[扩展] 扩展 {ext_name} 缺少依赖: {', '.join(missing)}")
+        return True
+    
+    def _on_background_loaded(self, ext_name: str, future):
+        """超出时间预算的扩展在后台加载完成"""
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"[扩展] 后台加载扩展 {ext_name} 失败: {e}")
+            result = None
+        try:
+            committed = self._commit(result, late=True)
+        finally:
+            # 注册完成后才移出 pending，wait_pending 返回时扩展已经可用
+            with self._lock:
+                self.pending.discard(ext_name)
+        if not committed:
+            return
+        print(f"[扩展] 扩展 {ext_name} 已在后台加载完成")
+        if self._on_late_load is not None:
+            try:
+                self._on_late_load(ext_name, result[1])
+            except Exception as e:
+                print(f"[扩展] 注册后台加载的扩展 {ext_name} 失败: {e}")
+    
+    def wait_pending(self, timeout: float = None) -> bool:
+        """等待后台加载的扩展完成，返回是否已全部完成"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while self.pending:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+    
+    def _register_extension(self, ext_name: str, extension):
+        """注册扩展的工具和提示词"""
+        self.extensions[ext_name] = extension
+        
+        # 注册工具
+        tools = extension.get_tools()
+        for tool_name, tool_handler in tools.items():
+            self.tool_handlers[tool_name] = tool_handler
+            print(f"[扩展] 已注册工具: {tool_name} (来自 {ext_name})")
+        
+        # 收集提示词
+        prompt = extension.get_prompt()
+        if prompt:
+            self.extension_prompts.append(prompt)
+            print(f"[扩展] 已加载提示词: {ext_name}")
+    
+    def _refresh_manifest(self, ext_path: str, ext_name: str, extension, digest: str):
+        """根据已导入的扩展实例重新生成清单"""
+        manifest = build_manifest(extension, digest)
+        self._save_manifest(ext_path, ext_name, manifest)
+    
+    def _save_manifest(self, ext_path: str, ext_name: str, manifest: Dict[str, Any]):
+        """写入扩展清单，保留原清单中的 lazy 设置"""
+        old = load_manifest(ext_path) or {}
+        manifest['lazy'] = old.get('lazy', True)
+        try:
+            write_manifest(ext_path, manifest)
+            print(f"[扩展] 已生成清单: {ext_name}")
+        except OSError as e:
+            print(f"[扩展] 写入清单失败: {ext_name} ({e})")
+    
+    def _materialize(self, ext_name: str, ext_path: str):
+        """导入延迟加载的扩展并调用 on_load（由 LazyExtension 在首次使用时调用）"""
+        extension, loaded = instantiate_extension(ext_path, ext_name, self.package_cache_dir)
+        if extension is None:
+            raise ImportError(f"扩展 {ext_name} 缺少 Extension 类")
+        self._call_hook(ext_name, extension, 'on_load')
+        with self._lock:
+            stats = self.load_stats.setdefault(ext_name, {'mode': 'lazy', 'load_time': 0.0})
+            stats.update(loaded)
+            stats['loaded'] = True
+        self.load_times.record(ext_name, source_hash(ext_path), loaded['import_time'], loaded['init_time'])
+        elapsed = loaded['import_time'] + loaded['init_time']
+        print(f"[扩展] 首次使用，已导入扩展 {ext_name}（耗时 {elapsed * 1000:.1f} ms）")
+        return extension
+    
+    def reload_extension(self, ext_name: str, ext_path: str = None) -> Tuple[bool, str, Any]:
+        """
+        重新导入单个扩展并替换注册表中的旧实例
+        
+        旧实例先调用 on_unload()，新实例导入后调用 on_load()；
+        新的工具表和提示词列表构建完成后才替换引用，分发中的调用不会看到半更新的状态。
+        导入失败时保留旧实例。
+        
+        返回:
+            (是否成功, 消息, 新的扩展实例)
+        """
+        with self._lock:
+            old = self.extensions.get(ext_name)
+            ext_path = ext_path or self.sources.get(ext_name)
+        if not ext_path or not os.path.exists(ext_path):
+            return False, f"找不到扩展文件: {ext_name}", None
+        
+        # 压缩包中的其他模块可能被缓存，重新导入前清掉
+        sys.path_importer_cache.pop(ext_path, None)
+        try:
+            if HostedExtension is not None and declares_isolated(ext_path):
+                extension, stats = self._load_isolated(ext_path, ext_name)
+            else:
+                extension, stats = instantiate_extension(ext_path, ext_name, self.package_cache_dir)
+        except Exception as e:
+            return False, f"重新导入扩展 {ext_name} 失败，继续使用旧版本: {e}", None
+        if extension is None:
+            return False, f"扩展 {ext_name} 缺少 Extension 类，继续使用旧版本", None
+        if not stats.get('isolated'):
+            stats.update(mode='eager', load_time=stats['import_time'] + stats['init_time'], loaded=True)
+            if self.lazy:
+                digest = source_hash(ext_path)
+                self.load_times.record(ext_name, digest, stats['import_time'], stats['init_time'])
+                if not is_package(ext_path):
+                    self._refresh_manifest(ext_path, ext_name, extension, digest)
+        
+        if old is not None:
+            self._call_hook(ext_name, old, 'on_unload')
+        self._call_hook(ext_name, extension, 'on_load')
+        with self._lock:
+            self._swap_extension(ext_name, old, extension)
+            self.load_stats[ext_name] = stats
+            self.sources[ext_name] = ext_path
+        action = "已重新加载" if old is not None else "已加载新扩展"
+        return True, f"{action}: {ext_name}", extension
+    
+    def unload_extension(self, ext_name: str) -> Tuple[bool, str]:
+        """卸载扩展（调用 on_unload 并移除其工具和提示词），不删除文件"""
+        with self._lock:
+            old = self.extensions.get(ext_name)
+        if old is None:
+            return False, f"扩展未加载: {ext_name}"
+        self._call_hook(ext_name, old, 'on_unload')
+        with self._lock:
+            self._swap_extension(ext_name, old, None)
+            self.load_stats.pop(ext_name, None)
+            ext_path = self.sources.pop(ext_name, None)
+        if ext_path in sys.path:
+            sys.path.remove(ext_path)
+        return True, f"已卸载扩展: {ext_name}"
+    
+    def _load_isolated(self, ext_path: str, ext_name: str) -> Tuple[Any, Dict[str, Any]]:
+        """
+        在临时子进程中导入隔离的扩展并生成清单，主进程不导入扩展代码
+        
+        返回:
+            (子进程代理, 加载统计)
+        """
+        start = time.perf_counter()
+        manifest, timings = describe_extension(ext_path, ext_name, self.package_cache_dir)
+        manifest['source_hash'] = digest = source_hash(ext_path)
+        if self.lazy:
+            self.load_times.record(ext_name, digest, timings['import_time'], timings['init_time'])
+            if not is_package(ext_path):
+                self._save_manifest(ext_path, ext_name, dict(manifest))
+        stats = {
+            'mode': 'eager',
+            'load_time': time.perf_counter() - start,
+            'import_time': timings['import_time'],
+            'init_time': timings['init_time'],
+            'loaded': False,
+            'isolated': True,
+        }
+        return HostedExtension(ext_name, ext_path, manifest, self.package_cache_dir), stats
+    
+    @staticmethod
+    def _call_hook(ext_name: str, extension, hook: str):
+        """调用扩展的生命周期方法；未导入的延迟加载扩展不会为此导入"""
+        if isinstance(extension, LazyExtension):
+            if not extension.is_loaded():
+                return
+            extension = extension.load()
+        try:
+            getattr(extension, hook)()
+        except Exception as e:
+            print(f"[扩展] 扩展 {ext_name} 的 {hook} 执行失败: {e}")
+    
+    def _swap_extension(self, ext_name: str, old, new):
+        """用新实例替换旧实例的工具和提示词（new 为 None 表示移除），调用方持有锁"""
+        old_tools = set(old.get_tools()) if old is not None else set()
+        tool_handlers = {name: handler for name, handler in self.tool_handlers.items()
+                         if name not in old_tools}
+        if new is not None:
+            tool_handlers.update(new.get_tools())
+        
+        extensions = dict(self.extensions)
+        if new is None:
+            extensions.pop(ext_name, None)
+        else:
+            extensions[ext_name] = new
+        prompts = [p for p in (ext.get_prompt() for ext in extensions.values()) if p]
+        
+        self.tool_handlers = tool_handlers
+        self.extension_prompts = prompts
+        # extensions 字典被界面直接引用，原地更新
+        if new is None:
+            self.extensions.pop(ext_name, None)
+        else:
+            self.extensions[ext_name] = new
+    
+    def start_watching(self, on_change: Callable = None,
+                       interval: float = DEFAULT_WATCH_INTERVAL) -> 'ExtensionWatcher':
+        """
+        启动文件监视，扩展被修改、新增或删除时自动重新加载
+        
+        参数:
+            on_change: 回调 on_change(ext_name, old_extension, new_extension)，在监视线程中调用；
+                       新增扩展时 old_extension 为 None，删除扩展时 new_extension 为 None
+            interval: 轮询间隔（秒）
+        """
+        self.stop_watching()
+        self.watcher = ExtensionWatcher(self, on_change, interval)
+        self.watcher.start()
+        return self.watcher
+    
+    def stop_watching(self):
+        """停止文件监视"""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+    
+    def install_package(self, package_file: str) -> Tuple[bool, str, Optional[str]]:
+        """
+        安装扩展压缩包
+        
+        压缩包原样复制到扩展目录，不解压，并立即加载；
+        压缩包根目录没有 extension.py 时（例如手动打包的文件夹）退回为解压安装。
+        
+        返回:
+            (是否成功, 消息, 扩展名)
+        """
+        try:
+            with zipfile.ZipFile(package_file) as zf:
+                names = zf.namelist()
+        except (OSError, zipfile.BadZipFile) as e:
+            return False, f"无法读取压缩包: {e}", None
+        
+        filename = os.path.basename(package_file)
+        if not filename.lower().endswith(PACKAGE_SUFFIX):
+            filename += PACKAGE_SUFFIX
+        ext_name, _ = parse_package_name(filename)
+        with self._lock:
+            if ext_name in self.extensions or ext_name in self.pending:
+                return False, f"扩展 {ext_name} 已加载，请先删除旧版本或重启程序", ext_name
+        
+        os.makedirs(self.extensions_dir, exist_ok=True)
+        if "extension.py" not in names:
+            with zipfile.ZipFile(package_file) as zf:
+                zf.extractall(self.extensions_dir)
+            return True, "扩展已解压到扩展目录，请重启程序以加载新扩展", None
+        
+        # 先写入临时文件再替换，避免加载到写了一半的压缩包
+        target = os.path.join(self.extensions_dir, filename)
+        tmp_file = target + ".tmp"
+        shutil.copyfile(package_file, tmp_file)
+        os.replace(tmp_file, target)
+        
+        result = self._prepare_extension(target, ext_name)
+        if not self._commit(result):
+            return False, f"扩展包已复制，但加载失败: {filename}", ext_name
+        with self._lock:
+            self.sources[ext_name] = target
+        return True, f"扩展 {ext_name} 已安装并加载", ext_name
+    
+    def remove_extension_files(self, ext_name: str) -> Tuple[bool, str]:
+        """
+        删除扩展文件（扩展文件夹或压缩包），需要重启程序后生效
+        
+        返回:
+            (是否成功, 消息)
+        """
+        ext_path = self.sources.get(ext_name) or os.path.join(self.extensions_dir, ext_name)
+        if not os.path.exists(ext_path):
+            return False, f"找不到扩展文件: {ext_name}"
+        try:
+            if os.path.isdir(ext_path):
+                shutil.rmtree(ext_path)
+            else:
+                os.remove(ext_path)
+                if ext_path in sys.path:
+                    sys.path.remove(ext_path)
+        except OSError as e:
+            return False, f"删除扩展失败: {e}"
+        with self._lock:
+            self.sources.pop(ext_name, None)
+        return True, f"已删除扩展: {os.path.basename(ext_path)}"
+    
+    def get_missing_dependencies(self, ext_name: str) -> List[str]:
+        """
+        获取扩展缺少的依赖
+        
+        直接使用扩展声明的依赖列表和共享的依赖缓存，不调用扩展自己的 check_dependencies()，
+        因此不会导入延迟加载的扩展，也不会导入依赖包
+        """
+        extension = self.extensions.get(ext_name)
+        if extension is None:
+            return []
+        try:
+            packages = list(extension.get_dependencies()) if hasattr(extension, 'get_dependencies') else []
+        except Exception:
+            return []
+        return check_dependencies(packages)[1]
+    
+    def format_dependencies(self, ext_name: str) -> str:
+        """格式化扩展的依赖状态"""
+        extension = self.extensions.get(ext_name)
+        if extension is None or not hasattr(extension, 'get_dependencies') or not extension.get_dependencies():
+            return "无"
+        missing = self.get_missing_dependencies(ext_name)
+        if missing:
+            return f"缺少 {', '.join(missing)}"
+        return f"已满足（{', '.join(extension.get_dependencies())}）"
+    
+    def format_load_stats(self, ext_name: str) -> str:
+        """格式化单个扩展的加载统计"""
+        stats = self.load_stats.get(ext_name)
+        if stats is None:
+            return "后台加载中" if ext_name in self.pending else "无加载记录"
+        parts = []
+        if stats['mode'] == 'lazy':
+            parts.append("延迟加载，" + ("已导入" if stats.get('loaded') else "未导入"))
+            parts.append(f"读取清单 {stats['load_time'] * 1000:.1f} ms")
+        else:
+            parts.append("立即导入" + ("（后台完成）" if stats.get('late') else ""))
+        extension = self.extensions.get(ext_name)
+        if stats.get('isolated') and HostedExtension is not None and isinstance(extension, HostedExtension):
+            host = extension.host.get_stats()
+            parts.append(f"独立进程 {host['workers']}/{host['size']} 个，调用 {host['calls']} 次，"
+                         f"重启 {host['restarts']} 次" + (f"，已停用: {host['disabled']}" if host['disabled'] else ""))
+        parts.append(f"导入 {stats.get('import_time', 0.0) * 1000:.1f} ms")
+        parts.append(f"初始化 {stats.get('init_time', 0.0) * 1000:.1f} ms")
+        return "，".join(parts)
+    
+    def get_load_report(self) -> List[str]:
+        """
+        获取启动加载报告
+        
+        返回:
+            报告行列表，前两行为汇总，之后为每个扩展的明细
+        """
+        with self._lock:
+            stats_items = list(self.load_stats.items())
+            pending = sorted(self.pending)
+        lazy = [s for _, s in stats_items if s['mode'] == 'lazy']
+        eager = [s for _, s in stats_items if s['mode'] == 'eager']
+        # 延迟加载且尚未导入的扩展，按清单中记录的完整导入耗时估算节省的时间
+        skipped = sum(s.get('import_time', 0.0) + s.get('init_time', 0.0) for s in lazy if not s.get('loaded'))
+        summary = (f"启动加载 {len(stats_items)} 个扩展，耗时 {self.startup_time * 1000:.1f} ms"
+                   f"（延迟加载 {len(lazy)} 个，立即导入 {len(eager)} 个")
+        if pending:
+            summary += f"，后台加载中 {len(pending)} 个"
+        lines = [
+            summary + "）",
+            f"延迟加载跳过的导入耗时约 {skipped * 1000:.1f} ms"
+            f"（完整导入约 {(self.startup_time + skipped) * 1000:.1f} ms）",
+        ]
+        for ext_name, _ in stats_items:
+            lines.append(f"{ext_name}: {self.format_load_stats(ext_name)}")
+        for ext_name in pending:
+            lines.append(f"{ext_name}: 后台加载中")
+        return lines
     
     def get_tool_handler(self, tool_name: str) -> Optional[Callable]:
         """获取工具处理器"""
@@ -157,5 +1180,122 @@ class BaseExtension:
         pass
 
 
+class ExtensionWatcher:
+    """
+    扩展目录的文件监视器
+    
+    轮询扩展文件夹中 .py/.json 文件和扩展压缩包的修改时间与大小，不依赖第三方库。
+    检测到变化后等到下一次轮询文件不再变化时才重新加载，避免读到编辑器写了一半的文件。
+    """
+    
+    # 扩展文件夹中参与比较的文件类型
+    WATCHED_SUFFIXES = ('.py', '.json')
+    
+    def __init__(self, manager: ExtensionManager, on_change: Callable = None,
+                 interval: float = DEFAULT_WATCH_INTERVAL):
+        self.manager = manager
+        self.on_change = on_change
+        self.interval = interval
+        self._snapshot: Dict[str, Tuple[str, Any]] = {}
+        self._unstable: Dict[str, Any] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _signature(self, ext_path: str):
+        """计算扩展文件的签名，内容变化时签名随之变化"""
+        try:
+            if not os.path.isdir(ext_path):
+                st = os.stat(ext_path)
+                return st.st_mtime_ns, st.st_size
+            entries = []
+            for root, dirs, files in os.walk(ext_path):
+                dirs[:] = [d for d in dirs if not d.startswith('__') and not d.startswith('.')]
+                for filename in files:
+                    # 清单由重新加载自身生成，不参与比较
+                    if filename == MANIFEST_FILE or not filename.endswith(self.WATCHED_SUFFIXES):
+                        continue
+                    file_path = os.path.join(root, filename)
+                    st = os.stat(file_path)
+                    entries.append((os.path.relpath(file_path, ext_path), st.st_mtime_ns, st.st_size))
+            return tuple(sorted(entries))
+        except OSError:
+            return None
+    
+    def _current(self) -> Dict[str, Tuple[str, Any]]:
+        if not os.path.isdir(self.manager.extensions_dir):
+            return {}
+        return {ext_name: (ext_path, self._signature(ext_path))
+                for ext_name, ext_path in self.manager._discover(verbose=False)}
+    
+    def start(self):
+        """记录当前状态并启动监视线程"""
+        self._snapshot = self._current()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="iflow-ext-watcher", daemon=True)
+        self._thread.start()
+        print(f"[扩展] 已启动文件监视，轮询间隔 {self.interval} 秒")
+    
+    def stop(self):
+        """停止监视线程"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 1)
+        self._thread = None
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"[扩展] 文件监视出错: {e}")
+    
+    def poll(self) -> List[str]:
+        """
+        检查一次扩展目录，重新加载已稳定的变化
+        
+        返回:
+            本次重新加载、新增或移除的扩展名
+        """
+        current = self._current()
+        changed = []
+        for ext_name in sorted(set(current) | set(self._snapshot)):
+            new_state = current.get(ext_name)
+            if new_state == self._snapshot.get(ext_name):
+                self._unstable.pop(ext_name, None)
+                continue
+            # 文件仍在变化（或刚开始变化）时等待下一次轮询
+            if self._unstable.get(ext_name) != new_state:
+                self._unstable[ext_name] = new_state
+                continue
+            self._unstable.pop(ext_name, None)
+            self._snapshot[ext_name] = new_state
+            if new_state is None:
+                self._snapshot.pop(ext_name)
+            if self._apply(ext_name, new_state):
+                changed.append(ext_name)
+        return changed
+    
+    def _apply(self, ext_name: str, new_state) -> bool:
+        """重新加载或移除单个扩展，并通知回调"""
+        manager = self.manager
+        old = manager.extensions.get(ext_name)
+        if new_state is None:
+            if old is None:
+                return False
+            success, message = manager.unload_extension(ext_name)
+            new = None
+        else:
+            success, message, new = manager.reload_extension(ext_name, new_state[0])
+        print(f"[扩展] {message}")
+        if not success:
+            return False
+        if self.on_change is not None:
+            try:
+                self.on_change(ext_name, old, new)
+            except Exception as e:
+                print(f"[扩展] 更新扩展 {ext_name} 失败: {e}")
+        return True
+
+
 # 全局扩展管理器实例
 extension_manager = ExtensionManager()
\ No newline at end of file
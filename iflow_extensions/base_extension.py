@@ -108,6 +108,15 @@ class BaseExtension:
             except Exception as e:
                 return False, f"操作失败: {str(e)}"
         
+        耗时较长的工具可以写成协程函数或生成器函数（见 iflow_tool_runtime）：
+        协程在共用的事件循环中执行，不占用调用线程；生成器每次 yield 的文本
+        会实时显示在界面和状态窗口中，最后 yield (success, message) 作为结果。
+        
+        async def download(args: str):
+            async for percent in fetch(args):
+                yield f"已下载 {percent}%\n"
+            yield True, "下载完成"
+        
         return {
             'tool1': my_tool,
             'tool2': another_tool,
@@ -240,13 +249,14 @@ class BaseExtension:
             all_installed: bool - 所有依赖是否都已安装
             missing_packages: List[str] - 未安装的包列表
         """
-        missing = []
-        for package in self.get_dependencies():
-            try:
-                __import__(package)
-            except ImportError:
-                missing.append(package)
-        return len(missing) == 0, missing
+        # 只查找不导入，结果按 Python 环境缓存（见 iflow_dependencies）
+        try:
+            from iflow_dependencies import check_packages
+        except ImportError:
+            import importlib.util
+            missing = [p for p in self.get_dependencies() if importlib.util.find_spec(p.split('.')[0]) is None]
+            return len(missing) == 0, missing
+        return check_packages(self.get_dependencies())
     
     def get_ui_components(self) -> Dict[str, Any]:
         """
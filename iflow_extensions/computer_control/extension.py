@@ -5,8 +5,11 @@
 """
 
 import os
+import re
 import sys
-from typing import Dict, Callable, Tuple
+import time
+import hashlib
+from typing import Dict, Callable, List, Optional, Tuple
 from datetime import datetime
 
 # 导入父目录的基类
@@ -22,6 +25,28 @@ try:
 except ImportError:
     PYAUTOGUI_AVAILABLE = False
 
+# 尝试导入共用的截图后端（mss 等快速后端），不可用时退回 pyautogui
+try:
+    from iflow_screen_capture import (
+        get_capturer, parse_region, remember_capture, recall_capture, CaptureError
+    )
+    CAPTURE_AVAILABLE = True
+except ImportError:
+    CAPTURE_AVAILABLE = False
+
+
+# 宏步骤分隔符（\; 表示字面分号）
+_MACRO_SPLIT_RE = re.compile(r'(?<!\\);')
+
+# 宏默认步骤间隔和鼠标移动耗时（秒）
+MACRO_DEFAULT_PACE = 0.05
+MACRO_DEFAULT_MOVE_DURATION = 0.0
+
+# wait_until 默认超时、最大超时和轮询间隔（秒）
+WAIT_UNTIL_DEFAULT_TIMEOUT = 10.0
+WAIT_UNTIL_MAX_TIMEOUT = 120.0
+WAIT_UNTIL_DEFAULT_INTERVAL = 0.2
+
 
 class ComputerControlExtension(BaseExtension):
     """电脑控制扩展"""
@@ -36,6 +61,9 @@ class ComputerControlExtension(BaseExtension):
         # 控制权限状态
         self.control_enabled = False
         
+        # 单步 mouse_move 的移动耗时（秒）
+        self.move_duration = 0.5
+        
         # 截图目录
         self.screenshot_dir = "iflow_screenshots"
         self._ensure_screenshot_dir()
@@ -58,8 +86,21 @@ class ComputerControlExtension(BaseExtension):
 - @keyboard(key:按键) - 按下特殊按键，例如 @keyboard(key:enter)
   特殊按键包括：enter, space, tab, esc, shift, ctrl, alt, up, down, left, right, f1-f12, backspace, delete 等
 - @screenshot() - 获取屏幕截图并保存，AI可以看到截图内容
+- @screenshot(x,y,宽,高) - 只截取指定区域，速度更快，适合放大查看局部，例如 @screenshot(0,0,800,600)
 - @view_screenshot(文件名) - 分析指定的屏幕截图内容
 - @wait(秒数) - 等待指定秒数，例如 @wait(2)
+- @wait_until(条件; 超时秒数; 轮询间隔) - 等待条件满足后立即返回，超时和间隔可省略（默认 10 秒、0.2 秒）
+  条件包括：
+  change:x,y,宽,高 - 屏幕区域内容发生变化
+  pixel:x,y,r,g,b - 指定像素变为某个颜色
+  image:图片路径 - 屏幕上出现指定图片
+  file:文件路径 - 文件出现
+  exit:进程ID - 进程退出
+  例如 @wait_until(change:0,0,800,600; 5)
+- @macro(步骤1; 步骤2; ...) - 一次调用连续执行多个操作，返回合并结果
+  步骤包括：move x,y / click 按钮 / type 文本 / key 按键 / wait 秒数 / screenshot [x,y,宽,高] / pace 秒数
+  例如 @macro(move 500,300; click left; type Hello; key enter; wait 0.5; screenshot)
+  pace 设置之后每个步骤的间隔（默认 0.05 秒），文本中的分号写作 \\;
 - @request_computer_control() - 请求获得电脑操作权限，获得权限后所有工具和指令自动允许，无需用户确认
 
 重要说明：
@@ -73,7 +114,8 @@ class ComputerControlExtension(BaseExtension):
    d. 在每一步操作前，必须先调用 @screenshot() 查看当前屏幕状态
    e. 依次执行控制操作（@mouse_move, @mouse_click, @keyboard 等）
    f. 完成操作后，必须调用 @screenshot() 查看操作结果，确认是否成功
-   g. 如果需要等待界面响应，可以使用 @wait(秒数) 等待指定时间
+   g. 如果需要等待界面响应，优先使用 @wait_until(条件) 等待界面变化，只有无法描述条件时才使用 @wait(秒数)
+   h. 已知坐标的连续操作（如点击输入框、输入文本、回车）应合并为一次 @macro(...) 调用，减少往返次数
 
 示例流程：
 - 用户说"帮我点击屏幕上的某个按钮" -> 先 @screenshot() 查看屏幕，然后 @request_computer_control() 获取权限，再 @screenshot() 确认位置，最后 @mouse_move() 和 @mouse_click() 执行操作，完成后 @screenshot() 查看结果
@@ -89,6 +131,8 @@ class ComputerControlExtension(BaseExtension):
             'screenshot': self.take_screenshot,
             'view_screenshot': self.view_screenshot,
             'wait': self.wait,
+            'wait_until': self.wait_until,
+            'macro': self.run_macro,
             'request_computer_control': self.request_computer_control,
         }
     
@@ -98,9 +142,11 @@ class ComputerControlExtension(BaseExtension):
             'mouse_move': '移动鼠标到指定坐标，格式: @mouse_move(x,y)',
             'mouse_click': '点击鼠标，格式: @mouse_click(按钮)，按钮可选: left/right/middle',
             'keyboard': '键盘输入，格式: @keyboard(文本) 或 @keyboard(key:按键)',
-            'screenshot': '获取屏幕截图，格式: @screenshot()',
+            'screenshot': '获取屏幕截图，格式: @screenshot() 或 @screenshot(x,y,宽,高)',
             'view_screenshot': '分析屏幕截图，格式: @view_screenshot(文件名)',
             'wait': '等待指定秒数，格式: @wait(秒数)',
+            'wait_until': '等待条件满足，格式: @wait_until(条件; 超时秒数; 轮询间隔)，条件: change/pixel/image/file/exit',
+            'macro': '连续执行多个操作，格式: @macro(move x,y; click left; type 文本; key enter; wait 秒数; screenshot)',
             'request_computer_control': '请求获得电脑操作权限，格式: @request_computer_control()',
         }
     
@@ -151,11 +197,15 @@ class ComputerControlExtension(BaseExtension):
         if not self.control_enabled:
             return False, "需要先调用 @request_computer_control() 获取电脑操作权限"
         
+        return self._move_to(args, self.move_duration)
+    
+    def _move_to(self, args: str, duration: float) -> Tuple[bool, str]:
+        """移动鼠标（不检查权限）"""
         try:
             parts = args.split(',')
             if len(parts) == 2:
                 x, y = int(parts[0].strip()), int(parts[1].strip())
-                pyautogui.moveTo(x, y, duration=0.5)
+                pyautogui.moveTo(x, y, duration=duration)
                 return True, f"鼠标已移动到 ({x}, {y})"
             else:
                 return False, "参数格式错误，应为: x,y"
@@ -218,23 +268,39 @@ class ComputerControlExtension(BaseExtension):
         except Exception as e:
             return False, f"键盘输入失败: {str(e)}"
     
-    def take_screenshot(self) -> Tuple[bool, str]:
+    def take_screenshot(self, args: str = "") -> Tuple[bool, str]:
         """
         获取屏幕截图
         
+        参数:
+            args: 可选的截图区域 "x,y,宽,高"，省略时截取全屏
+        
         返回:
             (success, message) - 成功时message包含截图文件路径
         """
-        if not PYAUTOGUI_AVAILABLE:
+        if not CAPTURE_AVAILABLE and not PYAUTOGUI_AVAILABLE:
             return False, "pyautogui模块未安装，无法执行截图操作"
         
         try:
-            screenshot = pyautogui.screenshot()
-            filename = f"screenshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+            filename = f"screenshot_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.png"
             filepath = os.path.join(self.screenshot_dir, filename)
-            screenshot.save(filepath)
-            return True, f"屏幕截图已保存到: {filepath}\n截图尺寸: {screenshot.size}"
+            if CAPTURE_AVAILABLE:
+                region = _parse_region(args)
+                capture = get_capturer().grab(region)
+                remember_capture(filename, capture.save(filepath))
+                size = capture.size
+            else:
+                region = _parse_region(args)
+                screenshot = pyautogui.screenshot(region=region)
+                screenshot.save(filepath)
+                size = screenshot.size
+            area = f"区域 {region}" if region else "全屏"
+            return True, f"屏幕截图已保存到: {filepath}\n截图范围: {area}\n截图尺寸: {size}"
+        except ValueError as e:
+            return False, str(e)
         except Exception as e:
+            if CAPTURE_AVAILABLE and isinstance(e, CaptureError):
+                return False, f"获取屏幕截图失败: {str(e)}\n建议: pip install mss pillow"
             error_msg = str(e)
             if "pyscreeze" in error_msg or "Pillow" in error_msg:
                 return False, f"获取屏幕截图失败: pyautogui依赖不兼容\n建议: pip install --upgrade pillow pyscreeze pyautogui\n错误详情: {error_msg}"
@@ -252,13 +318,16 @@ class ComputerControlExtension(BaseExtension):
             (success, message) - 成功时message包含base64编码的图像数据
         """
         filepath = os.path.join(self.screenshot_dir, filename)
-        if not os.path.exists(filepath):
+        # 刚截取的图片直接从内存读取
+        img_data = recall_capture(filename) if CAPTURE_AVAILABLE else None
+        if img_data is None and not os.path.exists(filepath):
             return False, f"截图文件不存在: {filepath}"
         
         try:
             # 读取截图并转换为base64
-            with open(filepath, 'rb') as f:
-                img_data = f.read()
+            if img_data is None:
+                with open(filepath, 'rb') as f:
+                    img_data = f.read()
             
             import base64
             img_base64 = base64.b64encode(img_data).decode('utf-8')
@@ -291,6 +360,210 @@ class ComputerControlExtension(BaseExtension):
         except Exception as e:
             return False, f"等待失败: {str(e)}"
     
+    def _build_condition(self, spec: str) -> Tuple[Optional[Callable[[], bool]], str]:
+        """
+        根据条件描述构建检查函数
+        
+        返回:
+            (check, message) - check 为无参函数，返回条件是否满足；
+                               解析失败时 check 为 None，message 为错误信息
+        """
+        kind, _, value = spec.partition(':')
+        kind = kind.strip().lower()
+        value = value.strip()
+        if not value:
+            return None, "条件格式错误，应为: 类型:参数"
+        
+        if kind == 'file':
+            return (lambda: os.path.exists(value)), f"文件 {value} 出现"
+        
+        if kind == 'exit':
+            try:
+                pid = int(value)
+            except ValueError:
+                return None, "进程ID必须为整数"
+            return (lambda: not _pid_alive(pid)), f"进程 {pid} 退出"
+        
+        if kind not in ('change', 'pixel', 'image'):
+            return None, f"未知条件类型: {kind}，可选: change/pixel/image/file/exit"
+        
+        if kind == 'change':
+            if not CAPTURE_AVAILABLE and not PYAUTOGUI_AVAILABLE:
+                return None, "pyautogui模块未安装，无法检测屏幕内容"
+            try:
+                region = _parse_region(value)
+            except ValueError as e:
+                return None, str(e)
+            # 只保存区域像素的摘要，避免每次轮询保留整张图片
+            baseline = _region_digest(region)
+            return (lambda: _region_digest(region) != baseline), f"区域 {region} 发生变化"
+        
+        # 以下条件需要 pyautogui
+        if not PYAUTOGUI_AVAILABLE:
+            return None, "pyautogui模块未安装，无法检测屏幕内容"
+        
+        if kind == 'pixel':
+            try:
+                x, y, r, g, b = (int(v.strip()) for v in value.split(','))
+            except ValueError:
+                return None, "像素格式错误，应为: x,y,r,g,b"
+            return (lambda: pyautogui.pixelMatchesColor(x, y, (r, g, b), tolerance=10)), \
+                f"像素 ({x}, {y}) 变为 ({r}, {g}, {b})"
+        
+        # image
+        if not os.path.exists(value):
+            return None, f"图片文件不存在: {value}"
+        
+        def image_on_screen():
+            try:
+                return pyautogui.locateOnScreen(value) is not None
+            except Exception:
+                # 新版 pyscreeze 找不到图片时抛出异常
+                return False
+        return image_on_screen, f"屏幕出现图片 {value}"
+    
+    def wait_until(self, args: str) -> Tuple[bool, str]:
+        """
+        等待条件满足
+        
+        以较短的间隔轮询条件，条件满足后立即返回，不必按固定时长等待。
+        
+        参数:
+            args: "条件; 超时秒数; 轮询间隔"，后两项可省略
+                  条件: change:x,y,宽,高 / pixel:x,y,r,g,b / image:图片路径 /
+                        file:文件路径 / exit:进程ID
+        
+        返回:
+            (success, message) - message 包含实际等待时间
+        """
+        parts = [p.strip() for p in args.split(';')]
+        try:
+            timeout = float(parts[1]) if len(parts) > 1 and parts[1] else WAIT_UNTIL_DEFAULT_TIMEOUT
+            interval = float(parts[2]) if len(parts) > 2 and parts[2] else WAIT_UNTIL_DEFAULT_INTERVAL
+        except ValueError:
+            return False, "参数格式错误，超时和轮询间隔应为秒数（数字）"
+        if timeout <= 0 or interval <= 0:
+            return False, "超时和轮询间隔必须大于0"
+        timeout = min(timeout, WAIT_UNTIL_MAX_TIMEOUT)
+        
+        try:
+            check, description = self._build_condition(parts[0])
+            if check is None:
+                return False, description
+            
+            start_time = time.time()
+            deadline = start_time + timeout
+            polls = 0
+            while True:
+                polls += 1
+                if check():
+                    elapsed = time.time() - start_time
+                    return True, f"条件已满足: {description}，实际等待 {elapsed:.2f} 秒（检查 {polls} 次）"
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                time.sleep(min(interval, remaining))
+            
+            elapsed = time.time() - start_time
+            return False, f"等待超时: {description} 在 {elapsed:.2f} 秒内未满足（检查 {polls} 次）"
+        except Exception as e:
+            return False, f"等待失败: {str(e)}"
+    
+    def _parse_macro(self, args: str) -> List[Tuple[str, str]]:
+        """
+        解析宏步骤
+        
+        返回:
+            [(动作, 参数), ...]，动作统一为小写
+        """
+        steps = []
+        for raw in _MACRO_SPLIT_RE.split(args):
+            raw = raw.strip()
+            if not raw:
+                continue
+            parts = raw.split(None, 1)
+            action = parts[0].lower()
+            step_args = parts[1].replace('\\;', ';') if len(parts) > 1 else ""
+            steps.append((action, step_args))
+        return steps
+    
+    def run_macro(self, args: str) -> Tuple[bool, str]:
+        """
+        连续执行一组输入操作
+        
+        一次调用完成多个鼠标、键盘操作，步骤之间按 pace 间隔执行，
+        避免每一步都需要一次模型往返。遇到失败的步骤立即停止。
+        
+        参数:
+            args: 以分号分隔的步骤，例如 "move 500,300; click left; type Hello; key enter"
+                  支持的动作: move x,y / click [按钮] / type 文本 / key 按键 /
+                  wait 秒数 / screenshot / pace 秒数
+        
+        返回:
+            (success, message) - message 为每个步骤结果的汇总
+        """
+        if not PYAUTOGUI_AVAILABLE:
+            return False, "pyautogui模块未安装，无法执行宏操作"
+        
+        if not self.control_enabled:
+            return False, "需要先调用 @request_computer_control() 获取电脑操作权限"
+        
+        steps = self._parse_macro(args)
+        if not steps:
+            return False, "宏为空，格式: @macro(move x,y; click left; type 文本)"
+        
+        handlers = {
+            'move': lambda a: self._move_to(a, MACRO_DEFAULT_MOVE_DURATION),
+            'click': self.mouse_click,
+            'type': self.keyboard_input,
+            'key': lambda a: self.keyboard_input(f"key:{a}"),
+            'wait': self.wait,
+            'screenshot': self.take_screenshot,
+        }
+        
+        # 由宏自身控制步骤间隔，暂时关闭 pyautogui 每次调用后的默认停顿
+        pace = MACRO_DEFAULT_PACE
+        old_pause = pyautogui.PAUSE
+        pyautogui.PAUSE = 0
+        results = []
+        success = True
+        executed = 0
+        start_time = time.time()
+        try:
+            for index, (action, step_args) in enumerate(steps, 1):
+                if action == 'pace':
+                    try:
+                        pace = max(0.0, float(step_args))
+                        results.append(f"{index}. pace: 步骤间隔设为 {pace} 秒")
+                        executed += 1
+                        continue
+                    except ValueError:
+                        ok, message = False, "参数格式错误，应为秒数（数字）"
+                else:
+                    handler = handlers.get(action)
+                    if handler is None:
+                        ok, message = False, f"未知动作: {action}"
+                    else:
+                        ok, message = handler(step_args)
+                
+                results.append(f"{index}. {action}: {message}")
+                executed += 1
+                if not ok:
+                    success = False
+                    skipped = len(steps) - index
+                    if skipped:
+                        results.append(f"步骤 {index} 失败，已跳过剩余 {skipped} 个步骤")
+                    break
+                
+                if pace and index < len(steps):
+                    time.sleep(pace)
+        finally:
+            pyautogui.PAUSE = old_pause
+        
+        elapsed = time.time() - start_time
+        results.append(f"共执行 {executed} / {len(steps)} 个步骤，耗时 {elapsed:.2f} 秒")
+        return success, "\n".join(results)
+    
     def is_control_enabled(self) -> bool:
         """检查是否已获得控制权限"""
         return self.control_enabled
@@ -300,5 +573,75 @@ class ComputerControlExtension(BaseExtension):
         self.control_enabled = enabled
 
 
+def _parse_region(text: str) -> Optional[Tuple[int, int, int, int]]:
+    """解析区域参数 "x,y,宽,高"，空字符串返回 None，格式错误时抛出 ValueError"""
+    if CAPTURE_AVAILABLE:
+        return parse_region(text)
+    text = (text or "").strip()
+    if not text:
+        return None
+    try:
+        region = tuple(int(v.strip()) for v in text.split(','))
+    except ValueError:
+        region = ()
+    if len(region) != 4:
+        raise ValueError("区域格式错误，应为: x,y,宽,高")
+    return region
+
+
+def _region_digest(region: Tuple[int, int, int, int]) -> bytes:
+    """计算屏幕区域像素的摘要（优先使用快速截图后端，只截取该区域）"""
+    if CAPTURE_AVAILABLE:
+        return get_capturer().grab(region).digest()
+    image = pyautogui.screenshot(region=region)
+    return hashlib.md5(image.tobytes()).digest()
+
+
+def _pid_alive(pid: int) -> bool:
+    """检查进程是否仍在运行（已退出但未被回收的僵尸进程视为已退出）"""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess:
+            return False
+        except psutil.AccessDenied:
+            return True
+    
+    if os.name == 'nt':
+        # Windows 上 os.kill 会结束进程，改为查询进程退出码
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    
+    try:
+        # Linux 上僵尸进程仍然可以被 os.kill 探测到，从 /proc 读取进程状态
+        with open(f"/proc/{pid}/stat") as f:
+            if f.read().rpartition(')')[2].split()[0] == 'Z':
+                return False
+    except (OSError, IndexError):
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
 # 扩展实例
 Extension = ComputerControlExtension
\ No newline at end of file
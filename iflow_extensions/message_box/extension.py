@@ -79,6 +79,13 @@ class MessageBoxExtension(BaseExtension):
             'show_advanced_message': '显示高级信息框，格式: @show_advanced_message(标题,内容,按钮列表)',
         }
     
+    def get_tool_metadata(self) -> Dict[str, Dict]:
+        """信息框是界面窗口，GUI 需要在界面线程中调用这两个工具"""
+        return {
+            'show_message': {'main_thread': True},
+            'show_advanced_message': {'main_thread': True},
+        }
+    
     def show_message(self, args: str, confirm_callback: Callable = None) -> Tuple[bool, str]:
         """
         显示普通信息框
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+iFlow 字体加载
+GUI 使用的自定义字体按需注册到 QFontDatabase
+
+- 主要中文字体（fonts/zh-cn.ttf）在启动时注册
+- Genshin Impact 彩蛋字体在第一次使用时才注册
+- 每个字体文件的字体系列名缓存在 fonts/__pycache__/fonts.json 中，
+  以文件修改时间校验，列出彩蛋字体时不需要逐个注册文件来读取字体系列名
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+
+# 主要中文字体
+MAIN_FONT_FILE = "zh-cn.ttf"
+
+# 彩蛋字体目录（每个字体一个子目录，其中有 ttf/otf 等格式）
+EASTER_EGG_DIR = "Genshin-Impact"
+
+FONT_CACHE_FILE = os.path.join(FONT_DIR, "__pycache__", "fonts.json")
+
+# 同名字体有多种格式时优先使用靠前的格式
+_FONT_EXTENSIONS = ('.ttf', '.otf')
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class FontCatalog:
+    """字体目录，记录字体文件、字体系列名和注册状态"""
+
+    def __init__(self, font_dir: str = FONT_DIR, cache_file: str = FONT_CACHE_FILE):
+        self.font_dir = font_dir
+        self.cache_file = cache_file
+        # {相对路径: {'mtime': 修改时间, 'families': [字体系列名]}}
+        self.entries: Dict[str, dict] = {}
+        # 本进程中已注册的字体文件 {相对路径: [字体系列名]}
+        self.registered: Dict[str, List[str]] = {}
+        # 各步骤耗时（秒）
+        self.timings: Dict[str, float] = {}
+        self.cache_hits = 0
+        self.probed = 0
+        self._main: Optional[Tuple[Optional[str], Optional[str]]] = None
+        self._easter_eggs: Optional[Dict[str, str]] = None
+        self._easter_egg_paths: Dict[str, str] = {}
+        self._loaded = False
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def _load_cache(self):
+        self._loaded = True
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and isinstance(data.get('fonts'), dict):
+            self.entries = {
+                str(path): {'mtime': entry.get('mtime'), 'families': [str(f) for f in entry.get('families', [])]}
+                for path, entry in data['fonts'].items() if isinstance(entry, dict)
+            }
+
+    def _save_cache(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_file = self.cache_file + ".tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'fonts': self.entries}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            pass
+
+    def _timed(self, step: str, start: float):
+        self.timings[step] = self.timings.get(step, 0.0) + time.perf_counter() - start
+
+    def _register(self, rel_path: str) -> List[str]:
+        """注册字体文件，返回其中的字体系列名"""
+        from PyQt5.QtGui import QFontDatabase
+
+        families = self.registered.get(rel_path)
+        if families is not None:
+            return families
+        start = time.perf_counter()
+        font_id = QFontDatabase.addApplicationFont(os.path.join(self.font_dir, rel_path))
+        families = list(QFontDatabase.applicationFontFamilies(font_id)) if font_id != -1 else []
+        self.registered[rel_path] = families
+        self._timed('register', start)
+        return families
+
+    def _families(self, rel_path: str, register: bool) -> List[str]:
+        """
+        字体文件中的字体系列名
+
+        缓存有效时直接返回缓存的字体系列名（register 为 False 时不注册字体），
+        否则注册字体读取字体系列名并更新缓存（调用方持有锁）
+        """
+        if not self._loaded:
+            self._load_cache()
+        mtime = _mtime(os.path.join(self.font_dir, rel_path))
+        if mtime is None:
+            return []
+        cached = self.entries.get(rel_path)
+        if cached is not None and cached['mtime'] == mtime:
+            self.cache_hits += 1
+            if register:
+                self._register(rel_path)
+            return cached['families']
+        families = self._register(rel_path)
+        self.probed += 1
+        self.entries[rel_path] = {'mtime': mtime, 'families': families}
+        self._dirty = True
+        return families
+
+    def main_font(self) -> Tuple[Optional[str], Optional[str]]:
+        """
+        注册主要字体
+
+        返回:
+            (字体系列名, 字体文件路径)，字体文件不存在或无法加载时字体系列名为 None
+        """
+        with self._lock:
+            if self._main is None:
+                start = time.perf_counter()
+                path = os.path.join(self.font_dir, MAIN_FONT_FILE)
+                families = self._families(MAIN_FONT_FILE, register=True)
+                self._save_cache()
+                self._timed('main', start)
+                if not os.path.exists(path):
+                    print(f"警告: 字体文件不存在 {path}")
+                    self._main = (None, None)
+                elif not families:
+                    print(f"警告: 无法加载字体文件 {path}")
+                    self._main = (None, path)
+                else:
+                    self._main = (families[0], path)
+            return self._main
+
+    def _easter_egg_files(self) -> Dict[str, str]:
+        """查找彩蛋字体文件，返回 {字体名（文件名去掉扩展名）: 相对路径}"""
+        found: Dict[str, Tuple[int, str]] = {}
+        root = os.path.join(self.font_dir, EASTER_EGG_DIR)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                name, ext = os.path.splitext(filename)
+                ext = ext.lower()
+                if ext not in _FONT_EXTENSIONS:
+                    continue
+                rank = _FONT_EXTENSIONS.index(ext)
+                if name not in found or rank < found[name][0]:
+                    found[name] = (rank, os.path.relpath(os.path.join(dirpath, filename), self.font_dir))
+        return {name: rel_path for name, (_, rel_path) in sorted(found.items())}
+
+    def easter_egg_fonts(self) -> Dict[str, str]:
+        """彩蛋字体 {字体名: 字体系列名}（缓存有效时不注册字体）"""
+        with self._lock:
+            if self._easter_eggs is None:
+                start = time.perf_counter()
+                self._easter_eggs = {}
+                self._easter_egg_paths = self._easter_egg_files()
+                for name, rel_path in self._easter_egg_paths.items():
+                    families = self._families(rel_path, register=False)
+                    if families:
+                        self._easter_eggs[name] = families[0]
+                self._save_cache()
+                self._timed('easter_eggs', start)
+            return dict(self._easter_eggs)
+
+    def load_easter_egg_font(self, name: str) -> Optional[str]:
+        """第一次使用彩蛋字体时注册，返回字体系列名"""
+        fonts = self.easter_egg_fonts()
+        if name not in fonts:
+            return None
+        with self._lock:
+            families = self._register(self._easter_egg_paths[name])
+        return families[0] if families else fonts[name]
+
+    def format_stats(self) -> str:
+        """耗时统计"""
+        steps = {'main': "主要字体", 'easter_eggs': "彩蛋字体目录", 'register': "其中注册字体"}
+        parts = [f"{label} {self.timings[key] * 1000:.1f}ms" for key, label in steps.items() if key in self.timings]
+        return (f"已注册 {len(self.registered)} 个字体文件，缓存命中 {self.cache_hits} 次，"
+                f"读取 {self.probed} 次" + (f"；{'，'.join(parts)}" if parts else ""))
+
+
+_catalog: Optional[FontCatalog] = None
+
+
+def get_font_catalog() -> FontCatalog:
+    """获取全局字体目录"""
+    global _catalog
+    if _catalog is None:
+        _catalog = FontCatalog()
+    return _catalog
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+iFlow 扩展提示词选择
+按当前对话内容挑选需要完整提示词的扩展，其余扩展只保留一行摘要
+
+- 每个扩展的提示词、描述、工具名和工具描述建成一个 BM25 索引（纯本地计算，不调用 API）
+- 查询文本取最近几条对话消息，得分最高的几个扩展发送完整提示词
+- 最近消息中调用过（@工具名）或提到扩展名、工具名的扩展总是发送完整提示词
+- 只在发送请求时替换 system 消息中的提示词片段，保存的对话内容不变
+
+用法:
+    selector = PromptSelector()
+    selector.set_extension(ext_name, ext)
+    messages, report = selector.select_messages(self.messages)
+    print(report.format())
+"""
+
+import re
+import math
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# 查询使用的最近消息条数
+DEFAULT_HISTORY = 4
+
+# 最多发送完整提示词的扩展数
+DEFAULT_TOP_K = 3
+
+# BM25 得分低于该值的扩展不算相关
+DEFAULT_MIN_SCORE = 1.0
+
+_WORD_RE = re.compile(r'[a-z0-9_]+|[一-鿿]+')
+_CJK_RE = re.compile(r'[぀-ヿ㐀-䶿一-鿿가-힯＀-￯]')
+_TOOL_CALL_RE = re.compile(r'@([A-Za-z_][A-Za-z0-9_]*)\s*\(')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    切分检索词
+
+    英文和数字按单词切分（下划线连接的工具名同时保留各部分），中文按相邻两字切分
+    """
+    tokens = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word[0] < '一':
+            if len(word) > 1:
+                tokens.append(word)
+            if '_' in word:
+                tokens.extend(part for part in word.split('_') if len(part) > 1)
+        elif len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数
+
+    不依赖分词器：中日韩字符按每字 1 个 token，其他字符按每 4 个字符 1 个 token
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def build_summary(ext_name: str, description: str, tool_names: Iterable[str]) -> str:
+    """生成扩展的一行摘要"""
+    line = f"【扩展 {ext_name}】{description or '无描述'}"
+    tools = ", ".join(f"@{name}()" for name in tool_names)
+    if tools:
+        line += f" 工具: {tools}（需要时可直接调用，详细用法会在相关对话中提供）"
+    return line
+
+
+class PromptSelection:
+    """一次请求的提示词选择结果"""
+
+    def __init__(self, full: List[str], summarized: List[str], full_tokens: int, sent_tokens: int):
+        self.full = full
+        self.summarized = summarized
+        self.full_tokens = full_tokens
+        self.sent_tokens = sent_tokens
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.full_tokens - self.sent_tokens
+
+    def format(self) -> str:
+        """格式化为一行日志"""
+        if not self.summarized:
+            return f"扩展提示词: 全部完整发送 {len(self.full)} 个，约 {self.sent_tokens} tokens"
+        percent = self.saved_tokens * 100 // self.full_tokens if self.full_tokens else 0
+        full = ", ".join(self.full) if self.full else "无"
+        return (f"扩展提示词: 完整 {len(self.full)} 个 ({full})，摘要 {len(self.summarized)} 个，"
+                f"system 约 {self.sent_tokens}/{self.full_tokens} tokens，节省约 {self.saved_tokens} tokens ({percent}%)")
+
+
+class _Entry:
+    """一个扩展的索引数据"""
+
+    __slots__ = ('prompt', 'summary', 'tools', 'names', 'terms', 'length')
+
+    def __init__(self, ext_name: str, prompt: str, summary: str, tools: Dict[str, str], description: str):
+        self.prompt = prompt
+        self.summary = summary
+        self.tools = set(tools)
+        # 对话中出现这些词时总是发送完整提示词
+        self.names = {ext_name.lower()} | {name.lower() for name in tools}
+        text = " ".join([ext_name, description, prompt] + [f"{k} {v}" for k, v in tools.items()])
+        self.terms = Counter(tokenize(text))
+        self.length = sum(self.terms.values())
+
+
+class PromptSelector:
+    """
+    扩展提示词选择器
+
+    扩展加载、热重载和移除时更新索引，发送请求前调用 select_messages()
+    """
+
+    def __init__(self, top_k: int = DEFAULT_TOP_K, min_score: float = DEFAULT_MIN_SCORE,
+                 history: int = DEFAULT_HISTORY, k1: float = 1.2, b: float = 0.75):
+        """
+        参数:
+            top_k: 最多发送完整提示词的扩展数
+            min_score: 相关的最低 BM25 得分
+            history: 查询使用的最近消息条数
+            k1, b: BM25 参数
+        """
+        self.top_k = top_k
+        self.min_score = min_score
+        self.history = history
+        self.k1 = k1
+        self.b = b
+        self.enabled = True
+        self._entries: Dict[str, _Entry] = {}
+        self._idf: Dict[str, float] = {}
+        self._avg_length = 0.0
+        self._lock = threading.Lock()
+        # 累计统计
+        self.requests = 0
+        self.total_full_tokens = 0
+        self.total_sent_tokens = 0
+        self.last: Optional[PromptSelection] = None
+
+    def set_extension(self, ext_name: str, ext):
+        """添加或更新扩展（没有提示词的扩展不参与选择）"""
+        prompt = ext.get_prompt() if ext is not None else ""
+        if not prompt:
+            self.remove_extension(ext_name)
+            return
+        description = getattr(ext, 'description', "") or ""
+        try:
+            tools = dict(ext.get_tool_descriptions())
+        except Exception:
+            tools = {}
+        for tool_name in ext.get_tools():
+            tools.setdefault(tool_name, "")
+        entry = _Entry(ext_name, prompt, build_summary(ext_name, description, tools), tools, description)
+        with self._lock:
+            self._entries[ext_name] = entry
+            self._rebuild()
+
+    def remove_extension(self, ext_name: str):
+        with self._lock:
+            if self._entries.pop(ext_name, None) is not None:
+                self._rebuild()
+
+    def _rebuild(self):
+        """重新计算 IDF（调用方持有锁）"""
+        count = len(self._entries)
+        df = Counter()
+        for entry in self._entries.values():
+            df.update(entry.terms.keys())
+        self._idf = {term: math.log(1 + (count - n + 0.5) / (n + 0.5)) for term, n in df.items()}
+        self._avg_length = sum(e.length for e in self._entries.values()) / count if count else 0.0
+
+    def score(self, query: str) -> Dict[str, float]:
+        """计算每个扩展对查询文本的 BM25 得分"""
+        terms = Counter(tokenize(query))
+        with self._lock:
+            scores = {}
+            for ext_name, entry in self._entries.items():
+                norm = self.k1 * (1 - self.b + self.b * entry.length / (self._avg_length or 1))
+                total = 0.0
+                for term in terms:
+                    tf = entry.terms.get(term)
+                    if tf:
+                        total += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+                scores[ext_name] = total
+            return scores
+
+    def select(self, messages: List[dict]) -> List[str]:
+        """按最近的对话内容选出需要完整提示词的扩展"""
+        recent = [str(m.get('content') or "") for m in messages if m.get('role') != 'system'][-self.history:]
+        query = "\n".join(recent)
+        if not query.strip():
+            return []
+        words = set(tokenize(query))
+        called = set(_TOOL_CALL_RE.findall(query))
+        with self._lock:
+            pinned = [name for name, entry in self._entries.items()
+                      if entry.tools & called or entry.names & words]
+        ranked = sorted(((s, name) for name, s in self.score(query).items()
+                         if s >= self.min_score and name not in pinned), reverse=True)
+        return pinned + [name for _, name in ranked[:max(0, self.top_k - len(pinned))]]
+
+    def select_messages(self, messages: List[dict]) -> Tuple[List[dict], Optional[PromptSelection]]:
+        """
+        生成本次请求发送的消息列表
+
+        返回:
+            (messages, selection)，没有可选择的扩展时原样返回消息列表，selection 为 None
+        """
+        if not self.enabled or not messages or messages[0].get('role') != 'system':
+            return messages, None
+        content = messages[0].get('content') or ""
+        with self._lock:
+            entries = dict(self._entries)
+        if not entries:
+            return messages, None
+
+        chosen = set(self.select(messages))
+        full, summarized = [], []
+        sent = content
+        for ext_name, entry in entries.items():
+            fragment = "\n\n" + entry.prompt
+            if ext_name in chosen or fragment not in sent:
+                # 旧对话的 system 消息可能不含该扩展的提示词，保持原样
+                full.append(ext_name)
+                continue
+            sent = sent.replace(fragment, "\n\n" + entry.summary, 1)
+            summarized.append(ext_name)
+
+        selection = PromptSelection(full, summarized, estimate_tokens(content), estimate_tokens(sent))
+        with self._lock:
+            self.requests += 1
+            self.total_full_tokens += selection.full_tokens
+            self.total_sent_tokens += selection.sent_tokens
+            self.last = selection
+        if not summarized:
+            return messages, selection
+        return [dict(messages[0], content=sent)] + list(messages[1:]), selection
+
+    def format_stats(self) -> str:
+        """累计节省统计"""
+        saved = self.total_full_tokens - self.total_sent_tokens
+        percent = saved * 100 // self.total_full_tokens if self.total_full_tokens else 0
+        return f"{self.requests} 次请求，累计节省约 {saved} tokens ({percent}%)"
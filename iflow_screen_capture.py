@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+iFlow 屏幕截图后端
+CLI、GUI 和 computer_control 扩展共用的截图层
+
+- 后端可插拔，按优先级自动选择第一个可用的后端：
+  mss（Linux 上使用 XShm，Windows 上使用 BitBlt，最快）> PIL.ImageGrab > pyautogui
+- 支持只截取指定区域 (x, y, 宽, 高)，区域越小越快
+- 截图结果直接引用后端返回的像素数据，不复制；只有需要发送或写入文件时才编码为 PNG
+- 截图文件立即写入磁盘，内存中只保留最近几张截图的 PNG 数据，供 view_screenshot 直接读取
+"""
+
+import io
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+
+# 区域: (x, y, 宽, 高)
+Region = Tuple[int, int, int, int]
+
+# 内存中保留的最近截图数量（供 view_screenshot 直接读取）
+RECENT_CAPTURE_LIMIT = 4
+
+
+class CaptureError(Exception):
+    """截图失败"""
+    pass
+
+
+class CaptureBackend:
+    """
+    截图后端基类
+
+    子类实现 is_available() 和 grab()，grab 返回 (宽, 高, 像素格式, 原始像素数据)，
+    像素格式为 'BGRA' 或 'RGB'
+    """
+
+    name = ""
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """检查后端依赖是否可用"""
+        return False
+
+    def grab(self, region: Optional[Region] = None):
+        raise NotImplementedError
+
+
+class MssBackend(CaptureBackend):
+    """mss 后端，直接读取显示服务器的共享内存"""
+
+    name = "mss"
+
+    def __init__(self):
+        import mss
+        self._mss = mss
+        # mss 实例不能跨线程使用，每个线程各自创建
+        self._local = threading.local()
+
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            import mss  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def grab(self, region: Optional[Region] = None):
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            sct = self._mss.mss()
+            self._local.sct = sct
+        if region:
+            x, y, width, height = region
+            monitor = {'left': x, 'top': y, 'width': width, 'height': height}
+        else:
+            # 全屏时截取主显示器，与 pyautogui.screenshot() 一致
+            monitor = sct.monitors[1] if len(sct.monitors) > 1 else sct.monitors[0]
+        shot = sct.grab(monitor)
+        return shot.width, shot.height, 'BGRA', shot.raw
+
+
+class ImageGrabBackend(CaptureBackend):
+    """PIL.ImageGrab 后端"""
+
+    name = "pil"
+
+    def __init__(self):
+        from PIL import ImageGrab
+        self._grab = ImageGrab.grab
+
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            from PIL import ImageGrab  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def grab(self, region: Optional[Region] = None):
+        bbox = None
+        if region:
+            x, y, width, height = region
+            bbox = (x, y, x + width, y + height)
+        image = self._grab(bbox=bbox)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return image.width, image.height, 'RGB', image.tobytes()
+
+
+class PyAutoGUIBackend(CaptureBackend):
+    """pyautogui 后端（Linux 上通过 scrot/PIL，最慢，作为兜底）"""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            import pyautogui  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def grab(self, region: Optional[Region] = None):
+        image = self._pyautogui.screenshot(region=region)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return image.width, image.height, 'RGB', image.tobytes()
+
+
+# 后端注册表，按优先级排列
+_BACKENDS: List[Tuple[str, type]] = [
+    (MssBackend.name, MssBackend),
+    (ImageGrabBackend.name, ImageGrabBackend),
+    (PyAutoGUIBackend.name, PyAutoGUIBackend),
+]
+
+
+def register_backend(name: str, backend_cls: type, first: bool = False):
+    """
+    注册截图后端
+
+    参数:
+        name: 后端名称
+        backend_cls: CaptureBackend 子类
+        first: 是否放在最高优先级
+    """
+    global _BACKENDS
+    _BACKENDS = [(n, c) for n, c in _BACKENDS if n != name]
+    if first:
+        _BACKENDS.insert(0, (name, backend_cls))
+    else:
+        _BACKENDS.append((name, backend_cls))
+
+
+def available_backends() -> List[str]:
+    """列出当前环境可用的后端名称"""
+    return [name for name, cls in _BACKENDS if cls.is_available()]
+
+
+class Capture:
+    """
+    一次截图的结果
+
+    pixels 是后端返回的原始像素数据的只读视图（不复制），保留截图即保留这块数据
+    """
+
+    __slots__ = ('width', 'height', 'mode', 'pixels', 'region', 'backend')
+
+    def __init__(self, width: int, height: int, mode: str, pixels: memoryview,
+                 region: Optional[Region], backend: str):
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.pixels = pixels
+        self.region = region
+        self.backend = backend
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+    def copy(self) -> 'Capture':
+        """复制像素数据"""
+        return Capture(self.width, self.height, self.mode, memoryview(bytes(self.pixels)),
+                       self.region, self.backend)
+
+    def digest(self) -> bytes:
+        """像素摘要，用于快速判断画面是否变化"""
+        return hashlib.md5(self.pixels).digest()
+
+    def rgb_bytes(self) -> bytes:
+        """转换为 RGB 像素数据"""
+        if self.mode == 'RGB':
+            return bytes(self.pixels)
+        # BGRA -> RGB，切片赋值在 C 层完成，不逐像素循环
+        raw = self.pixels
+        rgb = bytearray(self.width * self.height * 3)
+        rgb[0::3] = raw[2::4]
+        rgb[1::3] = raw[1::4]
+        rgb[2::3] = raw[0::4]
+        return bytes(rgb)
+
+    def to_image(self):
+        """转换为 PIL.Image（需要 Pillow）"""
+        from PIL import Image
+        if self.mode == 'BGRA':
+            return Image.frombuffer('RGB', self.size, bytes(self.pixels), 'raw', 'BGRX', 0, 1)
+        return Image.frombuffer('RGB', self.size, bytes(self.pixels), 'raw', 'RGB', 0, 1)
+
+    def to_png(self) -> bytes:
+        """编码为 PNG"""
+        try:
+            image = self.to_image()
+        except ImportError:
+            image = None
+        if image is not None:
+            buffer = io.BytesIO()
+            # 截图以速度优先，压缩级别取低值
+            image.save(buffer, format='PNG', compress_level=1)
+            return buffer.getvalue()
+        try:
+            import mss.tools
+        except ImportError:
+            raise CaptureError("保存截图需要安装 Pillow 或 mss")
+        return mss.tools.to_png(self.rgb_bytes(), self.size)
+
+    def save(self, filepath: str) -> bytes:
+        """保存为 PNG 文件，返回编码后的数据"""
+        data = self.to_png()
+        with open(filepath, 'wb') as f:
+            f.write(data)
+        return data
+
+
+class ScreenCapturer:
+    """截图器，持有后端实例"""
+
+    def __init__(self, backend: Optional[str] = None):
+        """
+        参数:
+            backend: 指定后端名称，None 表示自动选择第一个可用的后端
+        """
+        self.backend = self._create_backend(backend)
+
+    @staticmethod
+    def _create_backend(name: Optional[str]) -> CaptureBackend:
+        for backend_name, cls in _BACKENDS:
+            if name and backend_name != name:
+                continue
+            if cls.is_available():
+                return cls()
+        if name:
+            raise CaptureError(f"截图后端不可用: {name}")
+        raise CaptureError("没有可用的截图后端，请安装 mss、Pillow 或 pyautogui")
+
+    @property
+    def backend_name(self) -> str:
+        return self.backend.name
+
+    def grab(self, region: Optional[Region] = None) -> Capture:
+        """
+        截取屏幕
+
+        参数:
+            region: (x, y, 宽, 高)，None 表示全屏
+        """
+        if region is not None:
+            x, y, width, height = region
+            if width <= 0 or height <= 0:
+                raise CaptureError("截图区域的宽和高必须大于0")
+        width, height, mode, raw = self.backend.grab(region)
+        # 后端每次返回新的像素数据，直接引用，不再复制到共享缓冲区
+        return Capture(width, height, mode, memoryview(raw).toreadonly(), region, self.backend.name)
+
+
+_capturer: Optional[ScreenCapturer] = None
+# 最近保存的截图 PNG 数据: {文件名: 数据}；GUI 中截图工具在各标签页的线程中调用，读写需要加锁
+_recent_captures: "OrderedDict[str, bytes]" = OrderedDict()
+_recent_lock = threading.Lock()
+
+
+def get_capturer() -> ScreenCapturer:
+    """获取全局截图器（首次调用时选择后端）"""
+    global _capturer
+    if _capturer is None:
+        _capturer = ScreenCapturer()
+    return _capturer
+
+
+def remember_capture(filename: str, png_data: bytes):
+    """在内存中保留最近的截图，view_screenshot 可以不再读盘"""
+    with _recent_lock:
+        _recent_captures[filename] = png_data
+        _recent_captures.move_to_end(filename)
+        while len(_recent_captures) > RECENT_CAPTURE_LIMIT:
+            _recent_captures.popitem(last=False)
+
+
+def recall_capture(filename: str) -> Optional[bytes]:
+    """获取内存中保留的截图 PNG 数据，不存在时返回 None"""
+    with _recent_lock:
+        return _recent_captures.get(filename)
+
+
+def parse_region(text: str) -> Optional[Region]:
+    """
+    解析区域参数
+
+    参数:
+        text: "x,y,宽,高"，空字符串表示全屏
+
+    返回:
+        (x, y, 宽, 高) 或 None；格式错误时抛出 ValueError
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    parts = [p.strip() for p in text.split(',')]
+    if len(parts) != 4:
+        raise ValueError("区域格式错误，应为: x,y,宽,高")
+    x, y, width, height = (int(p) for p in parts)
+    if width <= 0 or height <= 0:
+        raise ValueError("区域的宽和高必须大于0")
+    return x, y, width, height
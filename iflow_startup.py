@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+iFlow 启动耗时统计
+记录启动过程中各阶段的耗时，调试模式或 --profile-startup 时打印，GUI 的 /info 中也可以查看
+
+用法:
+    timer = get_startup_timer()
+    with timer.phase("加载字体"):
+        ...
+    timer.mark("首次绘制")
+    print("\n".join(timer.format()))
+
+阶段可以嵌套，嵌套的阶段缩进显示，不计入总耗时；
+mark 记录从起点到某个时刻（如首次绘制、初始化完成）经过的时间
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+
+class StartupTimer:
+    """启动阶段计时"""
+
+    def __init__(self):
+        # 以导入本模块的时间作为起点
+        self.started = time.perf_counter()
+        # [(阶段名, 耗时（秒）, 备注, 嵌套层级)]
+        self.phases: List[Tuple[str, float, str, int]] = []
+        # [(时刻名, 距起点的时间（秒）)]
+        self.marks: List[Tuple[str, float]] = []
+        self._depth = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str, note: str = ""):
+        """记录一个阶段的耗时（在主线程中使用）"""
+        depth = self._depth
+        self._depth += 1
+        # 先占位，嵌套的阶段显示在外层阶段之后
+        with self._lock:
+            index = len(self.phases)
+            self.phases.append((name, 0.0, note, depth))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth = depth
+            with self._lock:
+                self.phases[index] = (name, time.perf_counter() - start, note, depth)
+
+    def record(self, name: str, seconds: float, note: str = "", depth: int = 0):
+        with self._lock:
+            self.phases.append((name, seconds, note, depth))
+
+    def mark(self, name: str):
+        """记录到达某个时刻的时间，同名时刻只记录第一次"""
+        with self._lock:
+            if all(mark != name for mark, _ in self.marks):
+                self.marks.append((name, self.elapsed()))
+
+    def elapsed(self) -> float:
+        """从起点到现在的时间（秒）"""
+        return time.perf_counter() - self.started
+
+    def total(self) -> float:
+        """已记录阶段的总耗时（秒，只计算最外层的阶段）"""
+        with self._lock:
+            return sum(seconds for _, seconds, _, depth in self.phases if depth == 0)
+
+    def format(self) -> List[str]:
+        """格式化为多行文本"""
+        with self._lock:
+            phases = list(self.phases)
+            marks = list(self.marks)
+        if not phases:
+            return ["启动耗时: 无记录"]
+        width = max(len(name) + depth * 2 for name, _, _, depth in phases)
+        total = sum(seconds for _, seconds, _, depth in phases if depth == 0)
+        lines = [f"启动耗时: 共 {total * 1000:.1f}ms"]
+        for name, seconds, note, depth in phases:
+            label = "  " * depth + name
+            line = f"  {label.ljust(width)}  {seconds * 1000:8.1f}ms"
+            if note:
+                line += f"  ({note})"
+            lines.append(line)
+        for name, at in marks:
+            lines.append(f"  {name}: 启动后 {at * 1000:.1f}ms")
+        return lines
+
+
+_timer: Optional[StartupTimer] = None
+
+
+def get_startup_timer() -> StartupTimer:
+    """获取全局启动计时器"""
+    global _timer
+    if _timer is None:
+        _timer = StartupTimer()
+    return _timer
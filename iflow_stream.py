@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+iFlow 流式对话的片段队列和并发调度
+不依赖 Qt，GUI 的流式对话线程和标签页使用
+
+- StreamChunkQueue: 流式对话线程写入、界面线程读取的片段队列，有容量上限，界面卡住时不会堆积通知
+- StreamScheduler: 所有标签页共用的并发限制，超出上限的对话按发起顺序排队
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Callable, Dict, List
+
+
+# 流式对话线程和界面之间的片段队列最多保存的片段数，满了以后新片段合并到最后一个片段
+STREAM_QUEUE_CAPACITY = 256
+
+
+class StreamChunkQueue:
+    """
+    流式输出片段队列（流式对话线程写入，界面线程读取）
+
+    队列有容量上限，满了以后新片段合并到最后一个片段中，文本不会丢弃；
+    队列由空变为非空时才通知界面，事件循环中最多只有一个待处理的通知，
+    界面卡住（模态对话框、重新布局等）时积压的只是队列中的文本，不会堆积信号
+    """
+
+    def __init__(self, capacity: int = STREAM_QUEUE_CAPACITY):
+        self.capacity = max(1, int(capacity))
+        self._items: deque = deque()
+        # 已通知界面但界面还没有读取
+        self._notified = False
+        # 队列中最早的片段写入的时间
+        self._first_put = 0.0
+        self._lock = threading.Lock()
+        # 指标：写入的片段数、队列满时合并的片段数、通知界面的次数、
+        # 最大队列深度和片段在队列中等待的最长时间（秒）
+        self.pushed = 0
+        self.merged = 0
+        self.notifications = 0
+        self.max_depth = 0
+        self.max_wait = 0.0
+
+    def put(self, chunk: str) -> bool:
+        """写入片段，返回 True 表示需要通知界面读取"""
+        with self._lock:
+            self.pushed += 1
+            items = self._items
+            if not items:
+                self._first_put = time.perf_counter()
+            if len(items) >= self.capacity:
+                items[-1] += chunk
+                self.merged += 1
+            else:
+                items.append(chunk)
+                self.max_depth = max(self.max_depth, len(items))
+            if self._notified:
+                return False
+            self._notified = True
+            self.notifications += 1
+            return True
+
+    def drain(self) -> List[str]:
+        """取出全部片段（界面线程）"""
+        with self._lock:
+            items = list(self._items)
+            self._items.clear()
+            self._notified = False
+            if items:
+                self.max_wait = max(self.max_wait, time.perf_counter() - self._first_put)
+        return items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'pushed': self.pushed,
+            'merged': self.merged,
+            'dropped': 0,
+            'notifications': self.notifications,
+            'max_depth': self.max_depth,
+            'capacity': self.capacity,
+            'max_wait': self.max_wait * 1000,
+        }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (f"{stats['pushed']} 个片段，通知界面 {stats['notifications']} 次，"
+                f"最大深度 {stats['max_depth']}/{stats['capacity']}，队列满时合并 {stats['merged']} 个，"
+                f"丢弃 {stats['dropped']} 个，最长等待 {stats['max_wait']:.1f}ms")
+
+
+# 同时进行的流式对话数上限（超出时排队），可以用 /streams 修改
+MAX_CONCURRENT_STREAMS = 3
+
+# HTTP 连接池大小，也是并发上限可以设置的最大值
+HTTP_POOL_SIZE = 8
+
+
+class StreamScheduler:
+    """
+    流式对话并发限制（所有标签页共用）
+
+    进行中的对话数达到上限时，后发起的对话排队，
+    有对话结束或上限提高时按发起顺序开始
+    """
+
+    def __init__(self, start_callback: Callable[[object], None], limit: int = MAX_CONCURRENT_STREAMS):
+        """
+        参数:
+            start_callback: 排队的对话轮到时调用，参数为发起对话的标签页
+            limit: 并发上限
+        """
+        self.start_callback = start_callback
+        self.running: List[object] = []
+        self.waiting: deque = deque()
+        self.set_limit(limit)
+
+    def set_limit(self, limit: int):
+        """设置并发上限（1 到连接池大小），提高上限时立即开始排队的对话"""
+        self.limit = max(1, min(HTTP_POOL_SIZE, int(limit)))
+        self._dispatch()
+
+    def request(self, owner) -> bool:
+        """申请开始对话，返回 True 表示可以立即开始，否则已排队"""
+        if owner in self.running:
+            return True
+        if len(self.running) < self.limit and not self.waiting:
+            self.running.append(owner)
+            return True
+        if owner not in self.waiting:
+            self.waiting.append(owner)
+        return False
+
+    def release(self, owner):
+        """对话结束或取消排队"""
+        if owner in self.running:
+            self.running.remove(owner)
+        elif owner in self.waiting:
+            self.waiting.remove(owner)
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.waiting and len(self.running) < self.limit:
+            owner = self.waiting.popleft()
+            self.running.append(owner)
+            self.start_callback(owner)
+
+    def format_stats(self) -> str:
+        return f"进行中 {len(self.running)}，排队 {len(self.waiting)}，上限 {self.limit}"
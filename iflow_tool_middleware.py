@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+"""
+iFlow 工具调用中间件
+可以挂到 ToolRegistry 上的通用中间件：计时、资源统计、结果缓存、限流、审计日志
+
+用法:
+    registry.add_middleware(TimingMiddleware())
+    registry.add_middleware(ProfilerMiddleware(track_memory=True))
+    registry.add_middleware(CacheMiddleware(ttl=60))
+
+中间件只作用于 applies_to() 返回 True 的工具，列表在注册时计算好，
+不相关的工具调用不会经过这些中间件。
+"""
+
+import json
+import time
+import threading
+import tracemalloc
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from iflow_tool_registry import ToolMiddleware, ToolSpec
+
+
+class _CallClock:
+    """按线程记录调用开始时间，before/after 之间不共享状态也能计算耗时"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def start(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(time.perf_counter())
+
+    def stop(self) -> float:
+        stack = getattr(self._local, 'stack', None)
+        if not stack:
+            return 0.0
+        return time.perf_counter() - stack.pop()
+
+
+class TimingMiddleware(ToolMiddleware):
+    """统计每个工具的调用次数、失败次数和耗时"""
+
+    name = "timing"
+
+    def __init__(self):
+        self._clock = _CallClock()
+        self._lock = threading.Lock()
+        # {工具名: {'calls': 次数, 'failures': 失败次数, 'total': 总耗时, 'max': 最长耗时}}
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def before(self, spec: ToolSpec, args: str) -> Optional[Tuple[bool, str]]:
+        self._clock.start()
+        return None
+
+    def after(self, spec: ToolSpec, args: str, result: Tuple[bool, str]) -> Tuple[bool, str]:
+        elapsed = self._clock.stop()
+        with self._lock:
+            stats = self.stats.setdefault(spec.name, {'calls': 0, 'failures': 0, 'total': 0.0, 'max': 0.0})
+            stats['calls'] += 1
+            if not result[0]:
+                stats['failures'] += 1
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+        return result
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """返回统计数据的副本（附带平均耗时）"""
+        with self._lock:
+            return {name: dict(s, avg=s['total'] / s['calls'] if s['calls'] else 0.0)
+                    for name, s in self.stats.items()}
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class ProfilerMiddleware(ToolMiddleware):
+    """
+    按扩展和工具统计资源占用：调用次数、失败次数、耗时、CPU 时间、内存分配和结果大小
+
+    - CPU 时间是调用线程的 CPU 时间；协程工具在事件循环线程中、isolated 扩展在子进程中执行的部分不计入
+    - 内存分配通过 tracemalloc 统计调用期间的峰值增量，开启后所有 Python 内存分配都会变慢，默认关闭；
+      tracemalloc 的计数是整个进程共享的，只统计没有与其他调用重叠的调用，
+      重叠期间的调用（包括在工具中嵌套的调用）不计入内存分配
+    - 耗时超过 slow_threshold 的调用记录在 slow_calls 中
+    """
+
+    name = "profiler"
+
+    def __init__(self, track_memory: bool = False, slow_threshold: float = 2.0, max_slow_calls: int = 50):
+        """
+        参数:
+            track_memory: 是否开启 tracemalloc 统计内存分配
+            slow_threshold: 慢调用阈值（秒）
+            max_slow_calls: 最多保留的慢调用记录数
+        """
+        self.slow_threshold = slow_threshold
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started_tracing = False
+        self.track_memory = False
+        # 正在进行的调用数，以及与其他调用重叠的调用次数（用于判断内存统计是否受到干扰）
+        self._active = 0
+        self._overlaps = 0
+        # {工具名: {'source': 来源, 'calls': 次数, 'failures': 失败次数, 'wall': 总耗时, 'max_wall': 最长耗时,
+        #           'cpu': CPU 时间, 'memory': 内存分配总量, 'max_memory': 单次最大分配, 'result_bytes': 结果总大小}}
+        self.tools: Dict[str, Dict[str, Any]] = {}
+        self.slow_calls: deque = deque(maxlen=max_slow_calls)
+        self.started_at = datetime.now()
+        if track_memory:
+            self.set_memory_tracking(True)
+
+    def set_memory_tracking(self, enabled: bool):
+        """开启或关闭内存分配统计（只停止由自己启动的 tracemalloc）"""
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        elif not enabled and self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self.track_memory = enabled
+
+    def before(self, spec: ToolSpec, args: str) -> Optional[Tuple[bool, str]]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        with self._lock:
+            self._active += 1
+            if self._active > 1:
+                self._overlaps += 1
+            alone = self._active == 1
+            overlaps = self._overlaps
+        memory = None
+        if alone and self.track_memory and tracemalloc.is_tracing():
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            memory = tracemalloc.get_traced_memory()[0]
+        stack.append((time.perf_counter(), time.thread_time(), memory, overlaps))
+        return None
+
+    def after(self, spec: ToolSpec, args: str, result: Tuple[bool, str]) -> Tuple[bool, str]:
+        stack = getattr(self._local, 'stack', None)
+        if not stack:
+            return result
+        started, cpu_started, memory, overlaps = stack.pop()
+        wall = time.perf_counter() - started
+        cpu = time.thread_time() - cpu_started
+        with self._lock:
+            self._active -= 1
+            # 调用期间开始了其他调用时，进程级的内存计数包含了它们的分配，不再计入
+            if self._overlaps != overlaps:
+                memory = None
+        allocated = 0
+        if memory is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            allocated = max(0, (peak if hasattr(tracemalloc, 'reset_peak') else current) - memory)
+        result_bytes = len(str(result[1]).encode('utf-8', 'ignore'))
+
+        with self._lock:
+            stats = self.tools.get(spec.name)
+            if stats is None or stats['source'] != spec.source:
+                stats = self.tools[spec.name] = {
+                    'source': spec.source, 'calls': 0, 'failures': 0, 'wall': 0.0, 'max_wall': 0.0,
+                    'cpu': 0.0, 'memory': 0, 'max_memory': 0, 'result_bytes': 0,
+                }
+            stats['calls'] += 1
+            if not result[0]:
+                stats['failures'] += 1
+            stats['wall'] += wall
+            stats['max_wall'] = max(stats['max_wall'], wall)
+            stats['cpu'] += cpu
+            stats['memory'] += allocated
+            stats['max_memory'] = max(stats['max_memory'], allocated)
+            stats['result_bytes'] += result_bytes
+            if wall >= self.slow_threshold:
+                self.slow_calls.append({
+                    'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'tool': spec.name,
+                    'source': spec.source,
+                    'args': args[:200],
+                    'success': bool(result[0]),
+                    'wall': round(wall, 6),
+                    'cpu': round(cpu, 6),
+                })
+        return result
+
+    def report(self) -> Dict[str, Any]:
+        """
+        返回统计数据的副本
+
+        返回:
+            {'tools': {工具名: 统计}, 'extensions': {来源: 统计}, 'slow_calls': [...]}，统计中附带平均耗时
+        """
+        with self._lock:
+            tools = {name: dict(s) for name, s in self.tools.items()}
+            slow_calls = list(self.slow_calls)
+        extensions: Dict[str, Dict[str, Any]] = {}
+        for name, s in tools.items():
+            s['avg_wall'] = s['wall'] / s['calls'] if s['calls'] else 0.0
+            total = extensions.setdefault(s['source'], {
+                'tools': [], 'calls': 0, 'failures': 0, 'wall': 0.0, 'max_wall': 0.0,
+                'cpu': 0.0, 'memory': 0, 'max_memory': 0, 'result_bytes': 0,
+            })
+            total['tools'].append(name)
+            for key in ('calls', 'failures', 'wall', 'cpu', 'memory', 'result_bytes'):
+                total[key] += s[key]
+            total['max_wall'] = max(total['max_wall'], s['max_wall'])
+            total['max_memory'] = max(total['max_memory'], s['max_memory'])
+        for total in extensions.values():
+            total['avg_wall'] = total['wall'] / total['calls'] if total['calls'] else 0.0
+        return {'tools': tools, 'extensions': extensions, 'slow_calls': slow_calls}
+
+    @staticmethod
+    def format_stats(stats: Dict[str, Any]) -> str:
+        """格式化单个扩展或工具的统计"""
+        text = (f"调用 {stats['calls']} 次（失败 {stats['failures']}），耗时 {stats['wall']:.2f}s"
+                f"（平均 {stats['avg_wall'] * 1000:.1f}ms，最长 {stats['max_wall'] * 1000:.1f}ms），"
+                f"CPU {stats['cpu']:.2f}s，结果 {_format_bytes(stats['result_bytes'])}")
+        if stats['memory']:
+            text += f"，内存分配 {_format_bytes(stats['memory'])}（单次最多 {_format_bytes(stats['max_memory'])}）"
+        return text
+
+    def format_source(self, source: str) -> str:
+        """格式化某个扩展的汇总统计"""
+        total = self.report()['extensions'].get(source)
+        return self.format_stats(total) if total else "暂无调用记录"
+
+    def get_report(self, source: str = None) -> List[str]:
+        """生成文本报告（按总耗时排序），指定 source 时只包含该扩展"""
+        data = self.report()
+        lines = []
+        extensions = sorted(data['extensions'].items(), key=lambda item: item[1]['wall'], reverse=True)
+        for ext_name, total in extensions:
+            if source is not None and ext_name != source:
+                continue
+            lines.append(f"{ext_name}: {self.format_stats(total)}")
+            tools = sorted(total['tools'], key=lambda name: data['tools'][name]['wall'], reverse=True)
+            for tool_name in tools:
+                lines.append(f"  @{tool_name}: {self.format_stats(data['tools'][tool_name])}")
+        if source is None and data['slow_calls']:
+            lines.append(f"慢调用（超过 {self.slow_threshold:g} 秒）:")
+            for call in data['slow_calls'][-10:]:
+                lines.append(f"  [{call['time']}] {call['source']} @{call['tool']} {call['wall']:.2f}s")
+        return lines
+
+    def export_json(self, path: str):
+        """导出统计数据为 JSON，用于离线分析"""
+        data = self.report()
+        data.update({
+            'started_at': self.started_at.strftime("%Y-%m-%d %H:%M:%S"),
+            'exported_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'memory_tracking': self.track_memory,
+            'slow_threshold': self.slow_threshold,
+        })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self.tools.clear()
+            self.slow_calls.clear()
+            self.started_at = datetime.now()
+
+
+class CacheMiddleware(ToolMiddleware):
+    """
+    缓存工具结果
+
+    只作用于注册时标记为 cacheable 的工具，相同参数在有效期内直接返回上次的成功结果
+    """
+
+    name = "cache"
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 128):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Tuple[bool, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def applies_to(self, spec: ToolSpec) -> bool:
+        return spec.cacheable
+
+    def before(self, spec: ToolSpec, args: str) -> Optional[Tuple[bool, str]]:
+        key = (spec.name, args)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return None
+
+    def after(self, spec: ToolSpec, args: str, result: Tuple[bool, str]) -> Tuple[bool, str]:
+        if result[0]:
+            with self._lock:
+                self._entries[(spec.name, args)] = (time.monotonic(), result)
+                self._entries.move_to_end((spec.name, args))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RateLimitMiddleware(ToolMiddleware):
+    """
+    限制工具调用频率（滑动窗口）
+
+    每个工具单独计数，超出限制的调用直接返回失败，不执行工具
+    """
+
+    name = "rate_limit"
+
+    def __init__(self, max_calls: int, period: float = 60.0, tools: Iterable[str] = None):
+        """
+        参数:
+            max_calls: 窗口内允许的最大调用次数
+            period: 窗口长度（秒）
+            tools: 只限制这些工具，None 表示限制全部工具
+        """
+        self.max_calls = max_calls
+        self.period = period
+        self.tools = set(tools) if tools is not None else None
+        self._calls: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def applies_to(self, spec: ToolSpec) -> bool:
+        return self.tools is None or spec.name in self.tools
+
+    def before(self, spec: ToolSpec, args: str) -> Optional[Tuple[bool, str]]:
+        now = time.monotonic()
+        with self._lock:
+            calls = self._calls.setdefault(spec.name, deque())
+            while calls and now - calls[0] >= self.period:
+                calls.popleft()
+            if len(calls) >= self.max_calls:
+                wait = self.period - (now - calls[0])
+                return False, f"工具 {spec.name} 调用过于频繁，请 {wait:.1f} 秒后再试"
+            calls.append(now)
+        return None
+
+
+class AuditMiddleware(ToolMiddleware):
+    """把每次工具调用写入审计日志（JSON Lines）"""
+
+    name = "audit"
+
+    def __init__(self, log_file: str, max_args: int = 500):
+        """
+        参数:
+            log_file: 日志文件路径
+            max_args: 参数和结果在日志中保留的最大长度
+        """
+        self.log_file = log_file
+        self.max_args = max_args
+        self._clock = _CallClock()
+        self._lock = threading.Lock()
+
+    def before(self, spec: ToolSpec, args: str) -> Optional[Tuple[bool, str]]:
+        self._clock.start()
+        return None
+
+    def after(self, spec: ToolSpec, args: str, result: Tuple[bool, str]) -> Tuple[bool, str]:
+        record = {
+            'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'tool': spec.name,
+            'source': spec.source,
+            'args': args[:self.max_args],
+            'success': bool(result[0]),
+            'result': str(result[1])[:self.max_args],
+            'elapsed': round(self._clock.stop(), 6),
+        }
+        try:
+            with self._lock:
+                with open(self.log_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+        return result
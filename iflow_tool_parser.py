@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+iFlow 工具调用解析器
+CLI 和 GUI 共用的 AI 指令/工具调用扫描器
+
+语法定义（单遍扫描，不回溯）:
+
+    call      := command | tool
+    command   := '@/' NAME [HSPACE+ REST_OF_LINE]
+    tool      := '@' NAME '(' args ')'
+    args      := { CHAR | ESCAPE | '(' args ')' }
+    ESCAPE    := '\\(' | '\\)'              # 转义括号，不参与嵌套计数
+    NAME      := [A-Za-z0-9_]+
+
+说明:
+- 指令参数只取到行尾，不会吞掉下一行的内容
+- 工具参数支持嵌套括号，例如 @cmd(echo (a)) 的参数为 "echo (a)"
+- 工具参数中的 \\( 和 \\) 会被还原为字面括号；其他反斜杠原样保留（兼容 Windows 路径）
+- 行内最后一个右括号是 \\) 且之后没有未转义的括号时，它就是参数的右括号，
+  例如 @list_dir(C:\\Users\\) 和 @cmd(echo \\\\) 的参数以反斜杠结尾
+- \\) 之后同一行还有 @工具名( 时，\\) 就是右括号，后面的调用单独解析，
+  例如 @cmd(dir C:\\) then @cmd(whoami) 是两个调用，不会合并成一个
+- 工具参数不能跨行；括号不配对时退回到行内第一个 ")"，与旧版正则行为一致
+- 已被某个调用消耗的文本不会再被扫描，参数中的 @xxx(...) 不会被误识别为新的调用
+"""
+
+import re
+from typing import List, Optional
+
+
+# 调用主模式（预编译），一次 search 直接跳到下一个调用：
+#   group(1)/group(2): @/指令名 及其行内参数
+#   group(3)/group(4)/group(5): @工具名、不含括号和反斜杠的简单参数、右括号
+# 简单参数直接由正则完成；右括号未匹配（lastindex == 4）说明参数中有嵌套括号、
+# 转义或未闭合，此时再交给 _scan_tool_args 逐字符处理
+_CALL_RE = re.compile(r'@(?:/(\w+)(?:[ \t]+([^\n]*))?|(\w+)\(([^()\\\n]*)(\))?)')
+_SLOW_PATH = 4
+# 工具参数中的关键字符，用于在参数内部跳跃扫描
+_ARG_TOKEN_RE = re.compile(r'[()\\\n]')
+# 工具调用的开头，用于判断 \) 之后是否还有新的调用
+_TOOL_START_RE = re.compile(r'@\w+\(')
+
+
+class ToolCall:
+    """一次解析出的指令或工具调用"""
+
+    __slots__ = ('kind', 'name', 'args', 'start', 'end')
+
+    KIND_COMMAND = 'cmd'
+    KIND_TOOL = 'tool'
+
+    def __init__(self, kind: str, name: str, args: str, start: int, end: int):
+        self.kind = kind
+        self.name = name
+        self.args = args
+        self.start = start
+        self.end = end
+
+    def is_command(self) -> bool:
+        """是否为 @/指令"""
+        return self.kind == self.KIND_COMMAND
+
+    def is_tool(self) -> bool:
+        """是否为 @工具(参数)"""
+        return self.kind == self.KIND_TOOL
+
+    def full_command(self) -> str:
+        """还原为 /指令 参数 的形式（仅对指令有效）"""
+        if self.args:
+            return f"/{self.name} {self.args}"
+        return f"/{self.name}"
+
+    def __repr__(self):
+        return f"ToolCall({self.kind!r}, {self.name!r}, {self.args!r}, {self.start}, {self.end})"
+
+    def __eq__(self, other):
+        if not isinstance(other, ToolCall):
+            return NotImplemented
+        return (self.kind, self.name, self.args, self.start, self.end) == \
+               (other.kind, other.name, other.args, other.start, other.end)
+
+
+def _unescape(raw: str) -> str:
+    return raw.replace('\\(', '(').replace('\\)', ')')
+
+
+def _scan_tool_args(text: str, pos: int):
+    """
+    从左括号之后开始扫描工具参数
+
+    行内最后一个右括号是 \\) 且之后没有未转义的括号时，把它当作真正的右括号，
+    反斜杠保留在参数中，例如 @list_dir(C:\\Users\\) 的参数为 "C:\\Users\\"；
+    \\) 之后同一行还有 @工具名( 时同样在此闭合，避免把后面的调用吞进参数
+
+    返回:
+        (args, end) - 参数字符串和右括号之后的位置；无法闭合时返回 (None, pos)
+    """
+    depth = 1
+    pieces = []
+    seg_start = pos
+    first_close = -1
+    # 最后一个被转义的右括号，以及它之后是否出现过未转义的括号
+    last_escaped = -1
+    trailing_escaped = False
+    # 本行内下一个 @工具名( 的位置，按需向后推进
+    line_end = text.find('\n', pos)
+    if line_end < 0:
+        line_end = len(text)
+    next_call = pos - 1
+    for token in _ARG_TOKEN_RE.finditer(text, pos):
+        ch = token.group()
+        idx = token.start()
+        if ch == '\n':
+            break
+        if ch == '\\':
+            nxt = text[idx + 1:idx + 2]
+            if nxt in ('(', ')'):
+                pieces.append(text[seg_start:idx])
+                seg_start = idx + 1
+            continue
+        if idx > pos and text[idx - 1] == '\\':
+            # 被转义的括号
+            if ch == ')':
+                last_escaped = idx
+                trailing_escaped = True
+                if depth == 1:
+                    while 0 <= next_call < idx:
+                        m = _TOOL_START_RE.search(text, next_call + 1, line_end)
+                        next_call = m.start() if m else -1
+                    if next_call > idx:
+                        # 后面还有新的调用：与旧版正则一样在第一个右括号处闭合
+                        return _unescape(text[pos:idx - 1]) + '\\', idx + 1
+            continue
+        trailing_escaped = False
+        if ch == '(':
+            depth += 1
+        else:
+            if first_close < 0:
+                first_close = idx
+            depth -= 1
+            if depth == 0:
+                pieces.append(text[seg_start:idx])
+                return ''.join(pieces), idx + 1
+
+    # 以反斜杠结尾的参数（如 Windows 目录）：最后的 \\) 是右括号
+    if trailing_escaped and depth == 1:
+        return _unescape(text[pos:last_escaped - 1]) + '\\', last_escaped + 1
+    # 括号不配对：退回到第一个右括号（旧版非贪婪匹配的行为）
+    if first_close >= 0:
+        return _unescape(text[pos:first_close]), first_close + 1
+    if last_escaped >= 0:
+        return _unescape(text[pos:last_escaped - 1]) + '\\', last_escaped + 1
+    return None, pos
+
+
+def _scan(text: str):
+    """
+    单遍扫描，按顺序产出调用
+
+    快速路径直接产出正则匹配对象，慢速路径产出 (类型, 名称, 参数, 起始位置, 结束位置)，
+    由 _to_call 统一转换，避免为不需要的调用创建对象
+    """
+    finditer = _CALL_RE.finditer
+    pos = 0
+    while True:
+        for m in finditer(text, pos):
+            if m.lastindex != _SLOW_PATH:
+                yield m
+                continue
+            # 参数中有嵌套括号、转义或未闭合，逐字符扫描后从新位置继续
+            args, end = _scan_tool_args(text, m.start(4))
+            if args is None:
+                pos = m.start() + 1
+            else:
+                yield ToolCall.KIND_TOOL, m.group(3), args, m.start(), end
+                pos = end
+            break
+        else:
+            return
+
+
+def _to_call(item) -> ToolCall:
+    """将扫描结果转换为 ToolCall"""
+    if isinstance(item, tuple):
+        return ToolCall(*item)
+    name = item.group(1)
+    if name is not None:
+        args = item.group(2)
+        args = args.rstrip('\r') if args else ""
+        return ToolCall(ToolCall.KIND_COMMAND, name, args, item.start(), item.end())
+    return ToolCall(ToolCall.KIND_TOOL, item.group(3), item.group(4), item.start(), item.end())
+
+
+def iter_tool_calls(text: str):
+    """按出现顺序逐个产出回复中的指令和工具调用"""
+    if not text:
+        return
+    for item in _scan(text):
+        yield _to_call(item)
+
+
+def parse_tool_calls(text: str) -> List[ToolCall]:
+    """解析回复中的全部指令和工具调用"""
+    return list(iter_tool_calls(text))
+
+
+def find_last_tool_call(text: str) -> Optional[ToolCall]:
+    """
+    获取回复末尾的指令或工具调用
+
+    与 AI 约定只执行回复中最后一个调用，其他位置的调用不会被执行
+    """
+    if not text:
+        return None
+    last = None
+    for last in _scan(text):
+        pass
+    if last is None:
+        return None
+    return _to_call(last)
@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""
+iFlow 工具注册表
+在启动时把内置工具和扩展工具统一注册到一张表中，按名称 O(1) 分发
+
+CLI、GUI 以及其他不带界面的调用方共用同一套注册和分发逻辑：
+- 每个工具带有元数据：确认策略、超时时间、结果是否可缓存、是否必须在主线程中调用、来源
+- 注册时检测同名冲突，先注册者生效，冲突会被记录并打印；
+  被忽略的同名工具也会保留，生效的来源被移除后由下一个来源接替
+- 处理函数统一为 handler(args, confirm_callback) -> (success, message) 调用；
+  处理函数也可以是协程函数或生成器函数，阶段性输出实时转发给调用方（见 iflow_tool_runtime）
+- 每次调用经过中间件管线：注册的中间件（计时、缓存、限流、审计等，见 iflow_tool_middleware）
+  以及扩展的 on_before_tool_call / on_after_tool_call 钩子。
+  每个工具的中间件列表在注册时预先计算好，没有中间件的工具直接调用处理函数
+"""
+
+import inspect
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+from iflow_tool_runtime import ToolExecution
+
+
+# 确认策略
+CONFIRM_ALWAYS = 'always'                  # 每次调用都需要用户确认
+CONFIRM_UNLESS_CONTROL = 'unless_control'  # 获得电脑控制权限后自动允许（默认）
+CONFIRM_NEVER = 'never'                    # 无需确认（工具自身负责询问用户）
+
+# 内置工具的来源名称
+BUILTIN_SOURCE = 'builtin'
+
+# 扩展的工具调用钩子
+TOOL_HOOKS = ('on_before_tool_call', 'on_after_tool_call')
+
+
+class ToolSpec:
+    """工具定义及元数据"""
+
+    __slots__ = ('name', 'handler', 'source', 'description', 'confirm',
+                 'timeout', 'cacheable', 'extension', 'main_thread', 'middleware')
+
+    def __init__(self, name: str, handler: Callable, source: str = BUILTIN_SOURCE,
+                 description: str = "", confirm: str = CONFIRM_UNLESS_CONTROL,
+                 timeout: Optional[float] = None, cacheable: bool = False,
+                 extension: Any = None, main_thread: bool = False):
+        self.name = name
+        self.handler = handler
+        self.source = source
+        self.description = description
+        self.confirm = confirm
+        self.timeout = timeout
+        self.cacheable = cacheable
+        self.extension = extension
+        # 处理函数会创建窗口等界面对象，GUI 必须在界面线程中调用
+        self.main_thread = main_thread
+        # 预先计算的中间件列表，空元组表示直接调用处理函数
+        self.middleware: Tuple['ToolMiddleware', ...] = ()
+
+    def is_builtin(self) -> bool:
+        """是否为内置工具"""
+        return self.source == BUILTIN_SOURCE
+
+    def needs_confirm(self, control_enabled: bool) -> bool:
+        """根据确认策略判断本次调用是否需要用户确认"""
+        if self.confirm == CONFIRM_ALWAYS:
+            return True
+        if self.confirm == CONFIRM_NEVER:
+            return False
+        return not control_enabled
+
+    def __repr__(self):
+        return f"ToolSpec({self.name!r}, source={self.source!r}, confirm={self.confirm!r})"
+
+
+def adapt_handler(func: Callable) -> Callable:
+    """
+    将处理函数统一为 handler(args, confirm_callback) 的形式
+
+    现有工具的签名并不统一，例如 take_screenshot() 不接受参数，
+    request_computer_control(confirm_callback=None) 只接受回调。
+    这里根据参数名在注册时一次性完成适配，分发时不再做判断。
+    """
+    try:
+        params = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return func
+
+    if any(p.kind == p.VAR_POSITIONAL for p in params):
+        return func
+    names = [p.name for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+
+    if not names:
+        return lambda args, confirm_callback=None: func()
+    if names[0] == 'confirm_callback':
+        return lambda args, confirm_callback=None: func(confirm_callback=confirm_callback)
+    if len(names) == 1:
+        return lambda args, confirm_callback=None: func(args)
+    return func
+
+
+def tool_hooks(extension) -> List[str]:
+    """
+    列出扩展重写了的工具调用钩子
+
+    BaseExtension 中的默认实现什么也不做，不计入；
+    延迟加载和子进程中的扩展通过 get_tool_hooks() 从清单中读取，不会因此导入扩展
+    """
+    if hasattr(type(extension), 'get_tool_hooks'):
+        return list(extension.get_tool_hooks())
+    hooks = []
+    for hook in TOOL_HOOKS:
+        for cls in type(extension).__mro__:
+            if hook in cls.__dict__:
+                if cls.__name__ != 'BaseExtension':
+                    hooks.append(hook)
+                break
+    return hooks
+
+
+class ToolMiddleware:
+    """
+    工具调用中间件基类
+
+    before() 返回 (success, message) 时跳过工具本身（以及后面的中间件），直接使用该结果，
+    此时只有外层中间件的 after() 会执行；after() 可以修改结果。
+    中间件按注册顺序执行 before，按相反顺序执行 after
+    """
+
+    name = ""
+
+    def applies_to(self, spec: ToolSpec) -> bool:
+        """是否作用于该工具，注册时调用一次"""
+        return True
+
+    def before(self, spec: ToolSpec, args: str) -> Optional[Tuple[bool, str]]:
+        return None
+
+    def after(self, spec: ToolSpec, args: str, result: Tuple[bool, str]) -> Tuple[bool, str]:
+        return result
+
+
+class ExtensionHookMiddleware(ToolMiddleware):
+    """调用扩展的 on_before_tool_call / on_after_tool_call 钩子"""
+
+    def __init__(self, ext_name: str, extension, hooks: List[str]):
+        self.name = f"hooks:{ext_name}"
+        self.ext_name = ext_name
+        self.extension = extension
+        self.has_before = 'on_before_tool_call' in hooks
+        self.has_after = 'on_after_tool_call' in hooks
+
+    def before(self, spec: ToolSpec, args: str) -> Optional[Tuple[bool, str]]:
+        if not self.has_before:
+            return None
+        try:
+            decision = self.extension.on_before_tool_call(spec.name, args)
+            # 没有返回值视为允许
+            allowed, message = decision if decision is not None else (True, "")
+        except Exception as e:
+            print(f"[工具] 扩展 {self.ext_name} 的 on_before_tool_call 执行失败: {e}")
+            return None
+        if not allowed:
+            return False, message or f"工具调用被扩展 {self.ext_name} 阻止"
+        return None
+
+    def after(self, spec: ToolSpec, args: str, result: Tuple[bool, str]) -> Tuple[bool, str]:
+        if self.has_after:
+            try:
+                self.extension.on_after_tool_call(spec.name, args, result)
+            except Exception as e:
+                print(f"[工具] 扩展 {self.ext_name} 的 on_after_tool_call 执行失败: {e}")
+        return result
+
+
+class ToolRegistry:
+    """工具注册表"""
+
+    def __init__(self):
+        self.tools: Dict[str, ToolSpec] = {}
+        # 冲突记录: (工具名, 生效来源, 被忽略的来源)
+        self.conflicts: List[Tuple[str, str, str]] = []
+        # 因冲突被忽略的工具 {工具名: [ToolSpec]}，生效的来源被移除时接替
+        self.shadowed: Dict[str, List[ToolSpec]] = {}
+        # 来源第一次注册的顺序，同名工具由顺序靠前的来源提供（热重载不改变顺序）
+        self._source_order: Dict[str, int] = {}
+        # 全局中间件（按注册顺序，最先注册的在最外层）
+        self.middlewares: List[ToolMiddleware] = []
+        # 扩展钩子: {扩展名: ExtensionHookMiddleware}，只包含重写了钩子的扩展
+        self.hooks: Dict[str, ExtensionHookMiddleware] = {}
+        # 等待异步工具期间周期性调用（GUI 在这里处理界面事件）
+        self.idle_callback: Optional[Callable[[], None]] = None
+
+    def register(self, name: str, handler: Callable, source: str = BUILTIN_SOURCE,
+                 description: str = "", confirm: str = CONFIRM_UNLESS_CONTROL,
+                 timeout: Optional[float] = None, cacheable: bool = False,
+                 extension: Any = None, main_thread: bool = False) -> bool:
+        """
+        注册工具
+
+        返回:
+            是否注册成功；同名工具已存在时记录冲突并返回 False
+        """
+        self._source_order.setdefault(source, len(self._source_order))
+        spec = ToolSpec(
+            name, adapt_handler(handler), source, description,
+            confirm, timeout, cacheable, extension, main_thread
+        )
+        existing = self.tools.get(name)
+        if existing is not None:
+            if self._source_order[source] < self._source_order[existing.source]:
+                # 顺序靠前的来源重新注册（热重载），替换原来生效的工具
+                self.shadowed.setdefault(name, []).append(existing)
+                spec.middleware = self._chain_for(spec)
+                self.tools[name] = spec
+                self._update_conflicts()
+                return True
+            self.shadowed.setdefault(name, []).append(spec)
+            self._update_conflicts()
+            print(f"[工具] 工具冲突: {name} 已由 {existing.source} 提供，忽略 {source} 中的同名工具")
+            return False
+
+        spec.middleware = self._chain_for(spec)
+        self.tools[name] = spec
+        return True
+
+    def _update_conflicts(self):
+        self.conflicts = [(name, self.tools[name].source, spec.source)
+                          for name, specs in self.shadowed.items() for spec in specs]
+
+    def _remove_source(self, source: str) -> List[str]:
+        """
+        移除某个来源的全部工具（包括被忽略的同名工具），
+        被移除的生效工具由顺序最靠前的同名工具接替；返回被移除的生效工具名
+        """
+        removed = [name for name, spec in self.tools.items() if spec.source == source]
+        for name in removed:
+            del self.tools[name]
+        shadowed = {}
+        for name, specs in self.shadowed.items():
+            specs = [spec for spec in specs if spec.source != source]
+            if name not in self.tools and specs:
+                specs.sort(key=lambda spec: self._source_order[spec.source])
+                winner = specs.pop(0)
+                winner.middleware = self._chain_for(winner)
+                self.tools[name] = winner
+            if specs:
+                shadowed[name] = specs
+        self.shadowed = shadowed
+        self._update_conflicts()
+        return removed
+
+    def _chain_for(self, spec: ToolSpec) -> Tuple[ToolMiddleware, ...]:
+        """计算单个工具的中间件列表：全局中间件在外层，扩展钩子在内层"""
+        chain = [m for m in self.middlewares if m.applies_to(spec)]
+        chain.extend(self.hooks.values())
+        return tuple(chain)
+
+    def _rebuild_chains(self):
+        for spec in self.tools.values():
+            spec.middleware = self._chain_for(spec)
+
+    def add_middleware(self, middleware: ToolMiddleware):
+        """注册全局中间件"""
+        self.middlewares.append(middleware)
+        self._rebuild_chains()
+
+    def remove_middleware(self, middleware: ToolMiddleware):
+        """移除全局中间件"""
+        if middleware in self.middlewares:
+            self.middlewares.remove(middleware)
+            self._rebuild_chains()
+
+    def _set_hooks(self, ext_name: str, extension):
+        """记录扩展重写的钩子（不重建中间件列表）"""
+        self.hooks.pop(ext_name, None)
+        if extension is None:
+            return
+        hooks = tool_hooks(extension)
+        if hooks:
+            self.hooks[ext_name] = ExtensionHookMiddleware(ext_name, extension, hooks)
+
+    def register_extension(self, ext_name: str, extension) -> int:
+        """
+        注册扩展提供的全部工具
+
+        扩展可以通过可选的 get_tool_metadata() 返回
+        {工具名: {'confirm': ..., 'timeout': ..., 'cacheable': ..., 'main_thread': ...}}
+        返回成功注册的工具数量
+        """
+        tools = extension.get_tools()
+        descriptions = extension.get_tool_descriptions()
+        metadata = {}
+        if hasattr(extension, 'get_tool_metadata'):
+            metadata = extension.get_tool_metadata() or {}
+
+        # 钩子作用于所有工具，先记录钩子再注册本扩展的工具
+        had_hooks = ext_name in self.hooks
+        self._set_hooks(ext_name, extension)
+        if had_hooks or ext_name in self.hooks:
+            self._rebuild_chains()
+
+        count = 0
+        for tool_name, handler in tools.items():
+            meta = metadata.get(tool_name, {})
+            if self.register(
+                tool_name, handler, source=ext_name,
+                description=descriptions.get(tool_name, ""),
+                confirm=meta.get('confirm', CONFIRM_UNLESS_CONTROL),
+                timeout=meta.get('timeout'),
+                cacheable=meta.get('cacheable', False),
+                extension=extension,
+                main_thread=meta.get('main_thread', False)
+            ):
+                count += 1
+        return count
+
+    def unregister_source(self, source: str) -> List[str]:
+        """移除某个来源注册的全部工具，返回被移除的工具名"""
+        removed = self._remove_source(source)
+        if self.hooks.pop(source, None) is not None:
+            self._rebuild_chains()
+        return removed
+
+    def replace_extension(self, ext_name: str, extension=None) -> int:
+        """
+        替换某个扩展的全部工具（extension 为 None 表示移除），用于热重载
+
+        新的工具表在副本上构建，完成后一次性替换引用，
+        正在分发的调用要么使用旧表，要么使用新表，不会看到半更新的状态。
+        返回成功注册的工具数量
+        """
+        staged = ToolRegistry()
+        staged.tools = dict(self.tools)
+        staged.shadowed = {name: list(specs) for name, specs in self.shadowed.items()}
+        staged._source_order = self._source_order
+        staged.middlewares = self.middlewares
+        staged.hooks = {name: hook for name, hook in self.hooks.items() if name != ext_name}
+        staged.idle_callback = self.idle_callback
+        staged._remove_source(ext_name)
+        count = staged.register_extension(ext_name, extension) if extension is not None else 0
+        if ext_name in self.hooks and ext_name not in staged.hooks:
+            staged._rebuild_chains()
+        self.tools, self.shadowed, self.conflicts, self.hooks = \
+            staged.tools, staged.shadowed, staged.conflicts, staged.hooks
+        return count
+
+    def get(self, name: str) -> Optional[ToolSpec]:
+        """获取工具定义"""
+        return self.tools.get(name)
+
+    def has_tool(self, name: str) -> bool:
+        """检查是否存在某个工具"""
+        return name in self.tools
+
+    def needs_confirm(self, name: str, control_enabled: bool) -> bool:
+        """判断调用是否需要用户确认；未知工具按默认策略处理"""
+        spec = self.tools.get(name)
+        if spec is None:
+            return not control_enabled
+        return spec.needs_confirm(control_enabled)
+
+    def runs_on_main_thread(self, name: str) -> bool:
+        """工具是否必须在界面线程中调用"""
+        spec = self.tools.get(name)
+        return spec is not None and spec.main_thread
+
+    def tools_from(self, source: str) -> List[str]:
+        """列出某个来源提供的工具名"""
+        return [name for name, spec in self.tools.items() if spec.source == source]
+
+    def invoke(self, name: str, args: str, confirm_callback: Callable = None,
+               output_callback: Callable[[str], None] = None) -> Tuple[bool, str]:
+        """
+        调用工具
+
+        参数:
+            output_callback: 协程和生成器工具的阶段性输出回调，在调用线程中执行
+
+        返回:
+            (success, message)；未知工具或处理函数抛出异常时返回 (False, 错误信息)
+        """
+        spec = self.tools.get(name)
+        if spec is None:
+            return False, f"未知工具: {name}"
+        chain = spec.middleware
+        if not chain:
+            return self._call(spec, args, confirm_callback, output_callback)
+
+        result = None
+        entered = 0
+        for middleware in chain:
+            result = middleware.before(spec, args)
+            if result is not None:
+                break
+            entered += 1
+        if result is None:
+            result = self._call(spec, args, confirm_callback, output_callback)
+        for middleware in reversed(chain[:entered]):
+            result = middleware.after(spec, args, result)
+        return result
+
+    def _call(self, spec: ToolSpec, args: str, confirm_callback: Callable,
+              output_callback: Callable[[str], None]) -> Tuple[bool, str]:
+        try:
+            call = ToolExecution(confirm_callback, output_callback, spec.timeout, self.idle_callback)
+            return call.run(spec.handler, args)
+        except Exception as e:
+            if spec.is_builtin():
+                return False, f"工具执行失败: {str(e)}"
+            return False, f"扩展工具执行失败: {str(e)}"
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+iFlow 工具执行
+让扩展工具除了同步函数外，还可以是协程函数或生成器函数
+
+    def build(self, args):                 # 同步工具
+        return True, "完成"
+
+    async def download(self, args):        # 协程工具，在共用的事件循环中执行
+        await asyncio.sleep(1)
+        return True, "完成"
+
+    def compile(self, args):               # 生成器工具，每次 yield 的文本实时显示
+        yield "编译中...\\n"
+        yield True, "编译完成"
+
+    async def fetch(self, args):           # 异步生成器工具
+        async for chunk in stream():
+            yield chunk
+
+生成器 yield 的字符串是阶段性输出，会立即转发给界面；yield (是否成功, 消息) 表示调用结束。
+没有给出最终结果时，全部输出拼接起来作为工具结果。协程返回 (是否成功, 消息)、字符串或 None。
+
+协程和异步生成器在后台线程的事件循环中执行（所有工具共用一个线程），
+输出和确认请求会转回调用线程处理，界面回调始终在调用线程中执行。
+"""
+
+import time
+import queue
+import asyncio
+import inspect
+import threading
+import concurrent.futures
+from typing import Any, Callable, List, Optional, Tuple
+
+
+# 等待异步工具时检查超时、调用空闲回调的间隔（秒）
+POLL_INTERVAL = 0.05
+
+_context = threading.local()
+
+
+def current_output_callback() -> Optional[Callable[[str], None]]:
+    """当前工具调用的输出回调（在调用线程中有效），转发子进程输出时使用"""
+    return getattr(_context, 'output', None)
+
+
+def _is_result(item: Any) -> bool:
+    return isinstance(item, tuple) and len(item) == 2 and isinstance(item[0], bool)
+
+
+def _final_result(value: Any, chunks: List[str]) -> Tuple[bool, str]:
+    """把协程返回值或生成器的结束值统一为 (是否成功, 消息)"""
+    if _is_result(value):
+        return value
+    if value is None:
+        return True, "".join(chunks)
+    return True, str(value)
+
+
+class ToolLoop:
+    """在后台线程中运行的 asyncio 事件循环，所有协程工具共用"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """获取事件循环，第一次使用时启动线程"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._run, args=(self._loop,),
+                                                name="iflow-tool-loop", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """在事件循环中执行协程"""
+        return asyncio.run_coroutine_threadsafe(coro, self.get_loop())
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def shutdown(self):
+        """停止事件循环（未完成的协程会被放弃）"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(loop.stop)
+
+
+_tool_loop: Optional[ToolLoop] = None
+
+
+def get_tool_loop() -> ToolLoop:
+    """获取全局工具事件循环"""
+    global _tool_loop
+    if _tool_loop is None:
+        _tool_loop = ToolLoop()
+    return _tool_loop
+
+
+class ToolExecution:
+    """
+    一次工具调用的执行过程（解析出的调用本身见 iflow_tool_parser.ToolCall）
+
+    执行处理函数，按返回值的类型等待协程或逐块读取生成器，
+    阶段性输出通过 output_callback 转发，超时后放弃调用并返回失败
+    """
+
+    def __init__(self, confirm_callback: Callable = None, output_callback: Callable[[str], None] = None,
+                 timeout: Optional[float] = None, idle_callback: Callable[[], None] = None):
+        """
+        参数:
+            confirm_callback: 用户确认回调
+            output_callback: 阶段性输出回调，参数为输出的文本
+            timeout: 超时（秒），None 表示不限制；同步工具无法中断，只在输出之间检查
+            idle_callback: 等待异步工具期间周期性调用（例如让 GUI 处理事件）
+        """
+        self.confirm_callback = confirm_callback
+        self.output_callback = output_callback
+        self.timeout = timeout
+        self.idle_callback = idle_callback
+        self._owner = threading.get_ident()
+        self._events: Optional[queue.Queue] = None
+        self._deadline = None
+
+    def run(self, handler: Callable, args: str) -> Tuple[bool, str]:
+        """执行处理函数，处理函数抛出的异常由调用方处理"""
+        if self.timeout:
+            self._deadline = time.monotonic() + self.timeout
+        previous = current_output_callback()
+        _context.output = self.output
+        try:
+            result = handler(args, self.confirm if self.confirm_callback else None)
+        finally:
+            _context.output = previous
+        if inspect.isgenerator(result):
+            return self._drain(result)
+        if inspect.isasyncgen(result) or inspect.isawaitable(result):
+            return self._wait(result)
+        return result
+
+    def output(self, chunk: Any):
+        """转发阶段性输出（其他线程中的输出排队后在调用线程中转发）"""
+        if threading.get_ident() != self._owner and self._events is not None:
+            self._events.put(('output', chunk))
+        elif self.output_callback is not None:
+            self.output_callback(chunk if isinstance(chunk, str) else str(chunk))
+
+    def confirm(self, title: str, message: str) -> bool:
+        """用户确认（事件循环中发起的确认在调用线程中弹出）"""
+        if threading.get_ident() == self._owner or self._events is None:
+            return bool(self.confirm_callback(title, message))
+        reply = concurrent.futures.Future()
+        self._events.put(('confirm', title, message, reply))
+        return reply.result()
+
+    def _expired(self) -> bool:
+        return self._deadline is not None and time.monotonic() > self._deadline
+
+    def _drain(self, generator) -> Tuple[bool, str]:
+        """逐块读取生成器"""
+        chunks = []
+        try:
+            while True:
+                try:
+                    item = next(generator)
+                except StopIteration as stop:
+                    return _final_result(stop.value, chunks)
+                if _is_result(item):
+                    return item
+                chunk = item if isinstance(item, str) else str(item)
+                chunks.append(chunk)
+                self.output(chunk)
+                if self._expired():
+                    return False, f"工具执行超时（{self.timeout} 秒），已输出:\n{''.join(chunks)}"
+        finally:
+            generator.close()
+
+    def _wait(self, awaitable) -> Tuple[bool, str]:
+        """在事件循环中执行协程或异步生成器，在调用线程中转发输出"""
+        self._events = events = queue.Queue()
+
+        async def consume():
+            if not inspect.isasyncgen(awaitable):
+                return await awaitable
+            try:
+                async for item in awaitable:
+                    if _is_result(item):
+                        return item
+                    events.put(('output', item))
+            finally:
+                await awaitable.aclose()
+            return None
+
+        chunks = []
+        future = get_tool_loop().submit(consume())
+        future.add_done_callback(lambda f: events.put(('done',)))
+        while True:
+            try:
+                event = events.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                event = None
+            if event is None:
+                pass
+            elif event[0] == 'done':
+                break
+            elif event[0] == 'output':
+                chunk = event[1] if isinstance(event[1], str) else str(event[1])
+                chunks.append(chunk)
+                if self.output_callback is not None:
+                    self.output_callback(chunk)
+            elif event[0] == 'confirm':
+                reply = event[3]
+                try:
+                    reply.set_result(bool(self.confirm_callback(event[1], event[2])))
+                except Exception as e:
+                    reply.set_exception(e)
+            # 输出不断的工具也要检查超时，不能只在队列空闲时检查
+            if self._expired():
+                future.cancel()
+                return False, f"工具执行超时（{self.timeout} 秒），已输出:\n{''.join(chunks)}"
+            if self.idle_callback is not None:
+                self.idle_callback()
+        if future.cancelled():
+            return False, "工具调用已取消"
+        return _final_result(future.result(), chunks)
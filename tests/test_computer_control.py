@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""电脑控制扩展测试（宏解析、wait_until 超时、进程状态），不依赖 pyautogui"""
+
+import os
+import subprocess
+import sys
+import time
+import types
+
+import pytest
+
+from iflow_extensions import import_extension_module
+
+EXTENSION_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              "iflow_extensions", "computer_control", "extension.py")
+
+
+@pytest.fixture
+def module():
+    return import_extension_module(EXTENSION_FILE, "computer_control")
+
+
+@pytest.fixture
+def extension(module, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    extension = module.Extension()
+    extension.control_enabled = True
+    return extension
+
+
+class FakeClock:
+    """替换扩展模块中的 time，sleep 只推进时间"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(module, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(module, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def macro(module, extension, clock, monkeypatch):
+    """宏步骤只记录调用，不操作鼠标键盘"""
+    performed = []
+
+    def record(action):
+        def handler(args, *rest):
+            performed.append((action, args))
+            return True, f"{action} 完成"
+        return handler
+
+    monkeypatch.setattr(module, 'PYAUTOGUI_AVAILABLE', True)
+    monkeypatch.setattr(module, 'pyautogui', types.SimpleNamespace(PAUSE=0.1), raising=False)
+    monkeypatch.setattr(extension, '_move_to', record('move'))
+    monkeypatch.setattr(extension, 'mouse_click', record('click'))
+    monkeypatch.setattr(extension, 'keyboard_input', record('keyboard'))
+    return performed
+
+
+def test_parse_macro_splits_on_unescaped_semicolons(extension):
+    steps = extension._parse_macro(r"move 500,300;  CLICK left ; type a\;b;;key enter")
+    assert steps == [('move', '500,300'), ('click', 'left'), ('type', 'a;b'), ('key', 'enter')]
+
+
+def test_run_macro_executes_steps_with_pace(module, extension, clock, macro):
+    success, message = extension.run_macro("move 1,2; pace 0.5; type hi; key enter")
+    assert success
+    assert macro == [('move', '1,2'), ('keyboard', 'hi'), ('keyboard', 'key:enter')]
+    # 默认间隔，pace 之后改为 0.5 秒；pace 本身和最后一步之后不等待
+    assert clock.sleeps == [module.MACRO_DEFAULT_PACE, 0.5]
+    assert "共执行 4 / 4 个步骤" in message
+    assert module.pyautogui.PAUSE == 0.1
+
+
+def test_run_macro_stops_at_unknown_step(extension, clock, macro):
+    success, message = extension.run_macro("click left; jump 3; type never")
+    assert not success
+    assert macro == [('click', 'left')]
+    assert "2. jump: 未知动作: jump" in message
+    assert "已跳过剩余 1 个步骤" in message
+
+
+def test_run_macro_rejects_bad_pace(extension, clock, macro):
+    success, message = extension.run_macro("pace fast; click left")
+    assert not success
+    assert macro == []
+    assert "1. pace: 参数格式错误" in message
+
+
+def test_run_macro_requires_control(extension, macro):
+    extension.control_enabled = False
+    success, message = extension.run_macro("click left")
+    assert not success and "request_computer_control" in message
+    assert macro == []
+
+
+@pytest.mark.parametrize("args, waited", [
+    ("file:{missing}", 10.0),
+    ("file:{missing}; 999", 120.0),
+    ("file:{missing}; 3; 1", 3.0),
+])
+def test_wait_until_timeout_is_clamped(module, extension, clock, tmp_path, args, waited):
+    success, message = extension.wait_until(args.format(missing=tmp_path / "missing"))
+    assert not success
+    assert f"在 {waited:.2f} 秒内未满足" in message
+    assert clock.now - 1000.0 == pytest.approx(waited)
+
+
+def test_wait_until_returns_when_condition_met(extension, clock, tmp_path):
+    target = tmp_path / "done"
+    target.write_text("")
+    success, message = extension.wait_until(f"file:{target}")
+    assert success and "检查 1 次" in message
+    assert clock.sleeps == []
+
+
+def test_wait_until_rejects_bad_arguments(extension):
+    assert extension.wait_until("file:x; soon") == (False, "参数格式错误，超时和轮询间隔应为秒数（数字）")
+    assert extension.wait_until("file:x; 0") == (False, "超时和轮询间隔必须大于0")
+    assert not extension.wait_until("unknown:1")[0]
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="Windows 上没有僵尸进程")
+def test_zombie_process_counts_as_exited(module):
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    try:
+        # 进程退出后不回收，保持僵尸状态
+        deadline = time.monotonic() + 5
+        while module._pid_alive(process.pid) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not module._pid_alive(process.pid)
+    finally:
+        process.wait()
+    assert module._pid_alive(os.getpid())
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""依赖检查缓存测试"""
+
+import os
+import sys
+
+import pytest
+
+import iflow_dependencies
+from iflow_dependencies import DependencyCache, requirement_name
+
+
+@pytest.fixture
+def resolved(tmp_path, monkeypatch):
+    """把 site-packages 换成临时目录，记录实际检查过的依赖"""
+    site_dir = tmp_path / "site-packages"
+    site_dir.mkdir()
+    calls = []
+
+    def resolve(requirement):
+        calls.append(requirement)
+        return requirement != "missing"
+
+    monkeypatch.setattr(iflow_dependencies, '_package_dirs', lambda: [str(site_dir)])
+    monkeypatch.setattr(iflow_dependencies, '_resolve', resolve)
+    monkeypatch.setattr(iflow_dependencies, 'ENVIRONMENT_CHECK_INTERVAL', 0.0)
+    return site_dir, calls
+
+
+def touch(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_requirement_name():
+    assert requirement_name("requests>=2.0") == "requests"
+    assert requirement_name("package[extra]") == "package"
+
+
+def test_results_cached_until_site_packages_change(tmp_path, resolved):
+    site_dir, calls = resolved
+    cache = DependencyCache(str(tmp_path / "dependencies.json"))
+    assert cache.check(["numpy", "missing"]) == (False, ["missing"])
+    assert cache.check(["numpy", "missing"]) == (False, ["missing"])
+    assert calls == ["numpy", "missing"]
+
+    # pip 安装或卸载包后目录的修改时间变化
+    touch(site_dir)
+    cache.check(["numpy"])
+    assert calls == ["numpy", "missing", "numpy"]
+
+
+def test_results_persist_for_same_interpreter(tmp_path, resolved, monkeypatch):
+    _, calls = resolved
+    cache_file = str(tmp_path / "dependencies.json")
+    DependencyCache(cache_file).check(["numpy"])
+    assert DependencyCache(cache_file).check(["numpy"]) == (True, [])
+    assert calls == ["numpy"]
+
+    # 换了解释器后之前的结果不再使用
+    monkeypatch.setattr(sys, 'prefix', str(tmp_path / "other-venv"))
+    assert DependencyCache(cache_file).check(["numpy"]) == (True, [])
+    assert calls == ["numpy", "numpy"]
+
+
+def test_clear_forces_recheck(tmp_path, resolved):
+    _, calls = resolved
+    cache_file = tmp_path / "dependencies.json"
+    cache = DependencyCache(str(cache_file))
+    cache.check(["numpy"])
+    cache.clear()
+    assert not cache_file.exists()
+    cache.check(["numpy"])
+    assert calls == ["numpy", "numpy"]
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""扩展加载测试（清单、压缩包、隔离扩展）"""
+
+import os
+import zipfile
+import threading
+
+import pytest
+
+from iflow_extensions import (
+    ExtensionManager, LazyExtension, LOAD_TIMES_FILE, MANIFEST_FILE, declares_isolated,
+    load_manifest, source_hash
+)
+from iflow_extension_host import HostedExtension
+
+
+SHIPPED_EXTENSIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                      "iflow_extensions")
+
+EXTENSION_SOURCE = '''
+import os
+
+# 记录导入扩展模块的进程
+with open({marker!r}, "a") as f:
+    f.write(f"{{os.getpid()}}\\n")
+
+
+class {class_name}:
+    isolated = {isolated}
+
+    def __init__(self):
+        self.name = "{name}"
+        self.description = "测试扩展"
+        self.version = "1.0.0"
+        self.author = "tests"
+
+    def get_prompt(self):
+        return ""
+
+    def get_tools(self):
+        return {{"{name}_pid": self.pid}}
+
+    def get_tool_descriptions(self):
+        return {{"{name}_pid": "返回进程ID"}}
+
+    def pid(self, args):
+        return True, str(os.getpid())
+
+    def on_load(self):
+        with open({marker!r} + ".loads", "a") as f:
+            f.write("load\\n")
+
+    def on_unload(self):
+        pass
+
+
+Extension = {class_name}
+'''
+
+
+def extension_source(tmp_path, name, isolated=False):
+    marker = str(tmp_path / f"{name}.imports")
+    return EXTENSION_SOURCE.format(marker=marker, class_name="Sample", isolated=isolated, name=name)
+
+
+def make_folder(tmp_path, name, isolated=False):
+    ext_dir = tmp_path / "extensions" / name
+    ext_dir.mkdir(parents=True)
+    (ext_dir / "extension.py").write_text(extension_source(tmp_path, name, isolated), encoding="utf-8")
+    return ext_dir
+
+
+def make_package(tmp_path, name, isolated=False, manifest=None):
+    ext_root = tmp_path / "extensions"
+    ext_root.mkdir(exist_ok=True)
+    package = ext_root / f"{name}_v1.0.0.zip"
+    with zipfile.ZipFile(package, "w") as zf:
+        zf.writestr("extension.py", extension_source(tmp_path, name, isolated))
+        if manifest is not None:
+            zf.writestr(MANIFEST_FILE, manifest)
+    return package
+
+
+def importers(tmp_path, name):
+    marker = tmp_path / f"{name}.imports"
+    if not marker.exists():
+        return []
+    return [int(line) for line in marker.read_text().split()]
+
+
+def load_calls(tmp_path, name):
+    loads = tmp_path / f"{name}.imports.loads"
+    return len(loads.read_text().split()) if loads.exists() else 0
+
+
+def load(tmp_path, lazy=True):
+    manager = ExtensionManager(str(tmp_path / "extensions"), lazy=lazy, load_budget=None, max_workers=1)
+    manager.load_extensions()
+    return manager
+
+
+def unload_all(manager):
+    for ext_name in list(manager.extensions):
+        manager.unload_extension(ext_name)
+
+
+def test_folder_manifest_written_then_used_lazily(tmp_path):
+    ext_dir = make_folder(tmp_path, "plain")
+    manager = load(tmp_path)
+    assert importers(tmp_path, "plain") == [os.getpid()]
+    manifest = load_manifest(str(ext_dir))
+    assert manifest["tool_names"] == ["plain_pid"]
+    assert not manifest["isolated"]
+
+    manager = load(tmp_path)
+    extension = manager.extensions["plain"]
+    assert isinstance(extension, LazyExtension)
+    assert not extension.is_loaded()
+    assert len(importers(tmp_path, "plain")) == 1
+
+    assert manager.get_tool_handler("plain_pid")("") == (True, str(os.getpid()))
+    assert extension.is_loaded()
+
+
+def test_stale_manifest_is_regenerated(tmp_path):
+    ext_dir = make_folder(tmp_path, "plain")
+    load(tmp_path)
+    with open(ext_dir / "extension.py", "a", encoding="utf-8") as f:
+        f.write("\n# 修改\n")
+    manager = load(tmp_path)
+    assert not isinstance(manager.extensions["plain"], LazyExtension)
+    assert len(importers(tmp_path, "plain")) == 2
+
+
+def test_load_times_kept_out_of_manifest(tmp_path):
+    ext_dir = make_folder(tmp_path, "plain")
+    load(tmp_path)
+    manifest = load_manifest(str(ext_dir))
+    assert "import_time" not in manifest and "init_time" not in manifest
+    assert (tmp_path / "extensions" / LOAD_TIMES_FILE).exists()
+
+    manager = load(tmp_path)
+    assert manager.load_stats["plain"]["mode"] == "lazy"
+    assert manager.load_stats["plain"]["import_time"] > 0
+
+    # 代码变化后旧的耗时记录不再使用
+    with open(ext_dir / "extension.py", "a", encoding="utf-8") as f:
+        f.write("\n# 修改\n")
+    assert manager.load_times.get("plain", source_hash(str(ext_dir))) == (0.0, 0.0)
+
+
+@pytest.mark.parametrize("name", sorted(
+    name for name in os.listdir(SHIPPED_EXTENSIONS_DIR)
+    if os.path.exists(os.path.join(SHIPPED_EXTENSIONS_DIR, name, MANIFEST_FILE))
+))
+def test_shipped_manifest_matches_source(name):
+    ext_dir = os.path.join(SHIPPED_EXTENSIONS_DIR, name)
+    manifest = load_manifest(ext_dir)
+    assert manifest is not None
+    assert manifest["source_hash"] == source_hash(ext_dir)
+    assert "import_time" not in manifest and "init_time" not in manifest
+
+
+def test_package_without_manifest_is_imported(tmp_path):
+    make_package(tmp_path, "zipped")
+    manager = load(tmp_path)
+    assert manager.get_tool_handler("zipped_pid")("") == (True, str(os.getpid()))
+    # 压缩包只读，不写入清单
+    assert sorted(os.listdir(tmp_path / "extensions"))[-1] == "zipped_v1.0.0.zip"
+
+
+@pytest.mark.parametrize("lazy", [True, False])
+def test_isolated_folder_never_imported_in_parent(tmp_path, lazy):
+    ext_dir = make_folder(tmp_path, "boxed", isolated=True)
+    manager = load(tmp_path, lazy=lazy)
+    try:
+        extension = manager.extensions["boxed"]
+        assert isinstance(extension, HostedExtension)
+        success, pid = manager.get_tool_handler("boxed_pid")("")
+        assert success and int(pid) != os.getpid()
+        assert os.getpid() not in importers(tmp_path, "boxed")
+        assert (load_manifest(str(ext_dir)) is not None) == lazy
+    finally:
+        unload_all(manager)
+
+
+def test_isolated_package_without_manifest(tmp_path):
+    make_package(tmp_path, "boxed", isolated=True)
+    manager = load(tmp_path)
+    try:
+        assert isinstance(manager.extensions["boxed"], HostedExtension)
+        assert "boxed_pid" in manager.tool_handlers
+        assert os.getpid() not in importers(tmp_path, "boxed")
+    finally:
+        unload_all(manager)
+
+
+def test_reload_isolated_extension_stays_out_of_parent(tmp_path):
+    make_folder(tmp_path, "boxed", isolated=True)
+    manager = load(tmp_path)
+    try:
+        success, _, extension = manager.reload_extension("boxed")
+        assert success
+        assert isinstance(extension, HostedExtension)
+        assert os.getpid() not in importers(tmp_path, "boxed")
+    finally:
+        unload_all(manager)
+
+
+def test_declares_isolated_static_check(tmp_path):
+    cases = {
+        "direct": "class Extension:\n    isolated = True\n",
+        "alias": "class Real:\n    isolated = True\n\nExtension = Real\n",
+        "inherited": "class Base:\n    isolated = True\n\nclass Real(Base):\n    pass\n\nExtension = Real\n",
+        "override": "class Base:\n    isolated = True\n\nclass Extension(Base):\n    isolated = False\n",
+        "plain": "class Extension:\n    pass\n",
+    }
+    results = {}
+    for name, source in cases.items():
+        ext_dir = tmp_path / name
+        ext_dir.mkdir()
+        (ext_dir / "extension.py").write_text(source, encoding="utf-8")
+        results[name] = declares_isolated(str(ext_dir))
+    assert results == {"direct": True, "alias": True, "inherited": True, "override": False, "plain": False}
+
+
+def test_on_load_runs_on_first_load_and_materialization(tmp_path):
+    make_folder(tmp_path, "plain")
+    load(tmp_path)
+    assert load_calls(tmp_path, "plain") == 1
+
+    manager = load(tmp_path)
+    assert load_calls(tmp_path, "plain") == 1
+    manager.get_tool_handler("plain_pid")("")
+    manager.get_tool_handler("plain_pid")("")
+    assert load_calls(tmp_path, "plain") == 2
+
+    manager.reload_extension("plain")
+    assert load_calls(tmp_path, "plain") == 3
+
+
+HOOK_EXTENSION_SOURCE = '''
+import os
+
+
+class Extension:
+    isolated = True
+
+    def __init__(self):
+        self.name = "guard"
+        self.description = "拦截工具调用"
+        self.version = "1.0.0"
+        self.author = "tests"
+
+    def get_prompt(self):
+        return ""
+
+    def get_tools(self):
+        return {}
+
+    def get_tool_descriptions(self):
+        return {}
+
+    def on_before_tool_call(self, tool_name, args):
+        if args == "deny":
+            return False, "拒绝执行"
+        # 模拟子进程崩溃
+        os._exit(1)
+'''
+
+
+def test_crashing_isolated_hook_does_not_block_tools(tmp_path):
+    ext_dir = tmp_path / "extensions" / "guard"
+    ext_dir.mkdir(parents=True)
+    (ext_dir / "extension.py").write_text(HOOK_EXTENSION_SOURCE, encoding="utf-8")
+    manager = load(tmp_path)
+    try:
+        extension = manager.extensions["guard"]
+        assert isinstance(extension, HostedExtension)
+        assert extension.get_tool_hooks() == ["on_before_tool_call"]
+        assert extension.on_before_tool_call("cmd", "deny") == (False, "拒绝执行")
+        assert extension.on_before_tool_call("cmd", "dir") == (True, "")
+        assert extension.host.restarts == 1
+        assert extension.on_before_tool_call("cmd", "deny") == (False, "拒绝执行")
+    finally:
+        unload_all(manager)
+
+
+def test_slow_extension_finishes_loading_in_background(tmp_path):
+    make_folder(tmp_path, "fast")
+    slow_dir = make_folder(tmp_path, "slow")
+    source = (slow_dir / "extension.py").read_text(encoding="utf-8")
+    (slow_dir / "extension.py").write_text("import time\ntime.sleep(0.5)\n" + source, encoding="utf-8")
+
+    manager = ExtensionManager(str(tmp_path / "extensions"), lazy=False, load_budget=0.1, max_workers=2)
+    lock_free = []
+    call_hook = manager._call_hook
+
+    def probe_lock():
+        acquired = manager._lock.acquire(timeout=1)
+        lock_free.append(acquired)
+        if acquired:
+            manager._lock.release()
+
+    def checking_hook(ext_name, extension, hook):
+        # 其他线程在 on_load 期间应当可以访问注册表
+        if hook == 'on_load':
+            probe = threading.Thread(target=probe_lock)
+            probe.start()
+            probe.join()
+        call_hook(ext_name, extension, hook)
+
+    manager._call_hook = checking_hook
+    late = []
+    registered = threading.Event()
+
+    def on_late_load(ext_name, extension):
+        late.append((ext_name, extension))
+        registered.set()
+
+    manager.load_extensions(on_late_load=on_late_load)
+    assert "fast" in manager.extensions
+    assert manager.pending == {"slow"}
+    assert "slow" not in manager.extensions
+
+    assert manager.wait_pending(5)
+    assert registered.wait(5)
+    assert late == [("slow", manager.extensions["slow"])]
+    assert manager.get_tool_handler("slow_pid")("") == (True, str(os.getpid()))
+    assert manager.load_stats["slow"]["late"]
+    assert not manager.load_stats["fast"].get("late")
+    assert load_calls(tmp_path, "slow") == 1
+    assert lock_free == [True, True]
+
+
+def test_failed_background_load_clears_pending(tmp_path):
+    make_folder(tmp_path, "fast")
+    broken_dir = tmp_path / "extensions" / "broken"
+    broken_dir.mkdir()
+    (broken_dir / "extension.py").write_text("import time\ntime.sleep(0.5)\nraise RuntimeError('损坏')\n",
+                                             encoding="utf-8")
+
+    manager = ExtensionManager(str(tmp_path / "extensions"), lazy=False, load_budget=0.1, max_workers=2)
+    manager.load_extensions()
+    assert manager.pending == {"broken"}
+    assert manager.wait_pending(5)
+    assert "broken" not in manager.extensions
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""扩展提示词选择测试"""
+
+from iflow_prompt_selector import PromptSelector, build_summary, tokenize
+
+
+class PromptExtension:
+    """只提供提示词和工具描述的扩展"""
+
+    def __init__(self, description, prompt, tools):
+        self.description = description
+        self._prompt = prompt
+        self._tools = tools
+
+    def get_prompt(self):
+        return self._prompt
+
+    def get_tools(self):
+        return {name: None for name in self._tools}
+
+    def get_tool_descriptions(self):
+        return dict(self._tools)
+
+
+WEATHER_PROMPT = "【天气扩展】\n查询城市天气预报，使用 @weather(城市) 获取温度和降雨概率"
+EXCEL_PROMPT = ("【表格扩展】\n读取和编辑 Excel 表格，使用 @read_sheet(文件) 读取工作表。\n"
+                "1. 文件路径可以是绝对路径或相对于工作目录的路径\n"
+                "2. 读取结果按行输出，单元格之间用制表符分隔\n"
+                "3. 工作表很大时只返回前 200 行，请提示用户缩小范围\n"
+                "4. 修改表格前必须先读取并向用户确认要修改的单元格")
+
+
+def make_selector():
+    selector = PromptSelector(top_k=1)
+    selector.set_extension("weather", PromptExtension(
+        "天气预报", WEATHER_PROMPT, {"weather": "查询城市天气"}))
+    selector.set_extension("excel", PromptExtension(
+        "Excel 表格", EXCEL_PROMPT, {"read_sheet": "读取 Excel 工作表"}))
+    return selector
+
+
+def conversation(user_text):
+    system = "你是助手" + "\n\n" + WEATHER_PROMPT + "\n\n" + EXCEL_PROMPT
+    return [{"role": "system", "content": system}, {"role": "user", "content": user_text}]
+
+
+def test_tokenize_splits_words_and_cjk_bigrams():
+    assert tokenize("read_sheet 天气预报") == ["read_sheet", "read", "sheet", "天气", "气预", "预报"]
+
+
+def test_relevant_extension_keeps_full_prompt():
+    messages = conversation("明天北京的天气预报怎么样")
+    sent, selection = make_selector().select_messages(messages)
+    assert selection.full == ["weather"]
+    assert selection.summarized == ["excel"]
+    assert WEATHER_PROMPT in sent[0]["content"]
+    assert sent[1:] == messages[1:]
+
+
+def test_irrelevant_extension_replaced_by_summary():
+    messages = conversation("明天北京的天气预报怎么样")
+    sent, selection = make_selector().select_messages(messages)
+    summary = build_summary("excel", "Excel 表格", ["read_sheet"])
+    assert EXCEL_PROMPT not in sent[0]["content"]
+    assert sent[0]["content"].endswith("\n\n" + summary)
+    assert selection.saved_tokens > 0
+    # 保存的对话内容不变
+    assert EXCEL_PROMPT in messages[0]["content"]
+
+
+def test_called_tool_pins_extension():
+    sent, selection = make_selector().select_messages(conversation("@read_sheet(data.xlsx)"))
+    assert "excel" in selection.full
+
+
+def test_system_message_without_prompt_passes_through():
+    messages = [{"role": "system", "content": "你是助手"}, {"role": "user", "content": "你好"}]
+    sent, selection = make_selector().select_messages(messages)
+    assert sent is messages
+    assert selection.summarized == []
+
+
+def test_no_system_message_passes_through():
+    messages = [{"role": "user", "content": "天气"}]
+    assert make_selector().select_messages(messages) == (messages, None)
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""截图缓存测试（不依赖截图后端）"""
+
+import iflow_screen_capture as sc
+from iflow_screen_capture import Capture, remember_capture, recall_capture
+
+
+def test_save_writes_file_before_returning(tmp_path, monkeypatch):
+    capture = Capture(1, 1, 'RGB', memoryview(b"\x01\x02\x03"), None, 'test')
+    monkeypatch.setattr(Capture, 'to_png', lambda self: b"png:" + bytes(self.pixels))
+    path = tmp_path / "shot.png"
+    data = capture.save(str(path))
+    assert path.read_bytes() == data == b"png:\x01\x02\x03"
+
+
+def test_recent_captures_keep_png_bytes(monkeypatch):
+    monkeypatch.setattr(sc, '_recent_captures', type(sc._recent_captures)())
+    monkeypatch.setattr(sc, 'RECENT_CAPTURE_LIMIT', 2)
+    for i in range(3):
+        remember_capture(f"shot{i}.png", b"png%d" % i)
+    assert recall_capture("shot0.png") is None
+    assert recall_capture("shot1.png") == b"png1"
+    assert recall_capture("shot2.png") == b"png2"
+    assert all(isinstance(data, bytes) for data in sc._recent_captures.values())
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""流式对话片段队列和并发调度测试"""
+
+import threading
+
+from iflow_stream import StreamChunkQueue, StreamScheduler, HTTP_POOL_SIZE
+
+
+def test_queue_notifies_once_until_drained():
+    queue = StreamChunkQueue()
+    assert queue.put("a")
+    assert not queue.put("b")
+    assert queue.drain() == ["a", "b"]
+    assert queue.drain() == []
+    assert queue.put("c")
+    assert queue.notifications == 2
+
+
+def test_full_queue_merges_into_last_chunk():
+    queue = StreamChunkQueue(capacity=2)
+    for chunk in "abcd":
+        queue.put(chunk)
+    assert len(queue) == 2
+    assert queue.drain() == ["a", "bcd"]
+    stats = queue.stats()
+    assert stats['pushed'] == 4
+    assert stats['merged'] == 2
+    assert stats['max_depth'] == 2
+    assert stats['dropped'] == 0
+
+
+def test_queue_keeps_all_text_across_threads():
+    queue = StreamChunkQueue(capacity=8)
+    received = []
+
+    def produce():
+        for i in range(1000):
+            queue.put(f"{i},")
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+    while thread.is_alive():
+        received.extend(queue.drain())
+    thread.join()
+    received.extend(queue.drain())
+    assert "".join(received) == "".join(f"{i}," for i in range(1000))
+
+
+def test_scheduler_queues_beyond_limit_in_order():
+    started = []
+    scheduler = StreamScheduler(started.append, limit=2)
+    assert scheduler.request("a")
+    assert scheduler.request("b")
+    assert not scheduler.request("c")
+    assert not scheduler.request("d")
+    assert scheduler.request("a")
+
+    scheduler.release("a")
+    assert started == ["c"]
+    assert scheduler.running == ["b", "c"]
+
+    # 取消排队不会开始任何对话
+    scheduler.release("d")
+    assert started == ["c"]
+    assert scheduler.format_stats() == "进行中 2，排队 0，上限 2"
+
+
+def test_scheduler_raising_limit_starts_waiting():
+    started = []
+    scheduler = StreamScheduler(started.append, limit=1)
+    scheduler.request("a")
+    scheduler.request("b")
+    scheduler.request("c")
+    scheduler.set_limit(3)
+    assert started == ["b", "c"]
+
+
+def test_scheduler_limit_is_clamped():
+    scheduler = StreamScheduler(lambda owner: None, limit=0)
+    assert scheduler.limit == 1
+    scheduler.set_limit(HTTP_POOL_SIZE + 10)
+    assert scheduler.limit == HTTP_POOL_SIZE
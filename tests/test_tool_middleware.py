@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""工具调用中间件测试"""
+
+import json
+import threading
+
+import pytest
+
+from iflow_tool_middleware import (
+    AuditMiddleware, CacheMiddleware, ProfilerMiddleware, RateLimitMiddleware, TimingMiddleware
+)
+from iflow_tool_registry import ToolRegistry
+
+
+def counting_tool(calls, success=True):
+    def handler(args):
+        calls.append(args)
+        return success, f"结果:{args}"
+    return handler
+
+
+@pytest.fixture
+def profiler():
+    profiler = ProfilerMiddleware(slow_threshold=0.0)
+    yield profiler
+    profiler.set_memory_tracking(False)
+
+
+def test_timing_counts_calls_and_failures():
+    registry = ToolRegistry()
+    registry.register('ok', counting_tool([]))
+    registry.register('bad', counting_tool([], success=False))
+    timing = TimingMiddleware()
+    registry.add_middleware(timing)
+    registry.invoke('ok', 'a')
+    registry.invoke('ok', 'b')
+    registry.invoke('bad', 'c')
+    report = timing.report()
+    assert (report['ok']['calls'], report['ok']['failures']) == (2, 0)
+    assert (report['bad']['calls'], report['bad']['failures']) == (1, 1)
+    assert report['ok']['avg'] == report['ok']['total'] / 2
+
+
+def test_profiler_groups_by_source(profiler):
+    registry = ToolRegistry()
+    registry.register('ok', counting_tool([]), source='ext')
+    registry.register('bad', counting_tool([], success=False), source='ext')
+    registry.add_middleware(profiler)
+    registry.invoke('ok', 'a')
+    registry.invoke('bad', 'b')
+    report = profiler.report()
+    assert report['tools']['ok']['result_bytes'] == len("结果:a".encode('utf-8'))
+    total = report['extensions']['ext']
+    assert sorted(total['tools']) == ['bad', 'ok']
+    assert (total['calls'], total['failures']) == (2, 1)
+    assert [call['tool'] for call in report['slow_calls']] == ['ok', 'bad']
+    assert profiler.get_report(source='ext')[0].startswith("ext: 调用 2 次（失败 1）")
+
+
+def test_profiler_tracks_memory_of_single_call(profiler):
+    def allocate(args):
+        data = bytearray(1 << 20)
+        return True, str(len(data))
+
+    registry = ToolRegistry()
+    registry.register('allocate', allocate)
+    registry.add_middleware(profiler)
+    profiler.set_memory_tracking(True)
+    registry.invoke('allocate', '')
+    assert profiler.report()['tools']['allocate']['memory'] >= 1 << 20
+
+
+def test_profiler_skips_memory_of_overlapping_calls(profiler):
+    barrier = threading.Barrier(2)
+
+    def allocate(args):
+        barrier.wait(timeout=5)
+        data = bytearray(1 << 20)
+        barrier.wait(timeout=5)
+        return True, str(len(data))
+
+    registry = ToolRegistry()
+    registry.register('allocate', allocate)
+    registry.add_middleware(profiler)
+    profiler.set_memory_tracking(True)
+    threads = [threading.Thread(target=registry.invoke, args=('allocate', str(i))) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = profiler.report()['tools']['allocate']
+    assert stats['calls'] == 2
+    assert stats['memory'] == 0
+
+    # 重叠结束后恢复统计
+    registry.register('alone', lambda args: (True, str(len(bytearray(1 << 20)))))
+    registry.invoke('alone', '')
+    assert profiler.report()['tools']['alone']['memory'] >= 1 << 20
+
+
+def test_cache_reuses_successful_results():
+    calls = []
+    registry = ToolRegistry()
+    registry.register('cached', counting_tool(calls), cacheable=True)
+    registry.register('plain', counting_tool(calls))
+    registry.register('failing', counting_tool(calls, success=False), cacheable=True)
+    cache = CacheMiddleware(ttl=60, max_entries=2)
+    registry.add_middleware(cache)
+
+    assert registry.invoke('cached', 'a') == registry.invoke('cached', 'a') == (True, "结果:a")
+    registry.invoke('plain', 'a')
+    registry.invoke('plain', 'a')
+    registry.invoke('failing', 'a')
+    registry.invoke('failing', 'a')
+    assert calls == ['a', 'a', 'a', 'a', 'a']
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    # 超出容量时淘汰最久未使用的结果
+    registry.invoke('cached', 'b')
+    registry.invoke('cached', 'c')
+    registry.invoke('cached', 'a')
+    assert calls[-3:] == ['b', 'c', 'a']
+
+
+def test_cache_entries_expire():
+    calls = []
+    registry = ToolRegistry()
+    registry.register('cached', counting_tool(calls), cacheable=True)
+    registry.add_middleware(CacheMiddleware(ttl=0))
+    registry.invoke('cached', 'a')
+    registry.invoke('cached', 'a')
+    assert calls == ['a', 'a']
+
+
+def test_rate_limit_rejects_without_running_tool():
+    calls = []
+    registry = ToolRegistry()
+    registry.register('limited', counting_tool(calls))
+    registry.register('free', counting_tool(calls))
+    registry.add_middleware(RateLimitMiddleware(max_calls=2, period=60, tools=['limited']))
+    assert registry.invoke('limited', '1')[0]
+    assert registry.invoke('limited', '2')[0]
+    success, message = registry.invoke('limited', '3')
+    assert not success and "调用过于频繁" in message
+    for i in range(3):
+        assert registry.invoke('free', str(i))[0]
+    assert calls == ['1', '2', '0', '1', '2']
+
+
+def test_audit_writes_json_lines(tmp_path):
+    log_file = tmp_path / "audit.jsonl"
+    registry = ToolRegistry()
+    registry.register('tool', counting_tool([]), source='ext')
+    registry.add_middleware(AuditMiddleware(str(log_file), max_args=4))
+    registry.invoke('tool', 'abcdefgh')
+    records = [json.loads(line) for line in log_file.read_text(encoding='utf-8').splitlines()]
+    assert len(records) == 1
+    record = records[0]
+    assert (record['tool'], record['source'], record['args'], record['success']) == ('tool', 'ext', 'abcd', True)
+    assert record['result'] == "结果:a"
+    assert record['elapsed'] >= 0
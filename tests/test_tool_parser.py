@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""工具调用解析器测试"""
+
+import re
+
+import pytest
+
+from iflow_tool_parser import ToolCall, find_last_tool_call, parse_tool_calls
+
+
+def legacy_tool_args(text: str):
+    """旧版正则的工具参数"""
+    match = re.search(r'@(\w+)\((.*?)\)', text)
+    return match.group(2) if match else None
+
+
+def test_command_args_stop_at_line_end():
+    call = find_last_tool_call("好的\n@/export chat.json\n")
+    assert call == ToolCall('cmd', 'export', 'chat.json', 3, 21)
+    assert call.full_command() == "/export chat.json"
+
+
+def test_simple_tool_call():
+    assert find_last_tool_call("@cmd(dir)") == ToolCall('tool', 'cmd', 'dir', 0, 9)
+
+
+def test_nested_parentheses():
+    assert find_last_tool_call("@cmd(echo (a))").args == "echo (a)"
+
+
+def test_escaped_parentheses():
+    assert find_last_tool_call(r"@cmd(echo \(a\))").args == "echo (a)"
+    assert find_last_tool_call(r"@cmd(a\)b)").args == "a)b"
+
+
+@pytest.mark.parametrize("text, args", [
+    (r"@list_dir(C:\Users\)", "C:\\Users\\"),
+    (r"@cmd(echo \\)", "echo \\\\"),
+    (r"@cmd(dir C:\) 然后继续", "dir C:\\"),
+    (r"@cmd(dir (x) C:\)", "dir (x) C:\\"),
+])
+def test_trailing_backslash_before_close(text, args):
+    call = find_last_tool_call(text)
+    assert call is not None
+    assert call.args == args
+
+
+@pytest.mark.parametrize("text", [
+    r"@list_dir(C:\Users\)",
+    r"@cmd(echo \\)",
+    r"@cmd(type C:\Users\wayne\test.txt)",
+    "@cmd(dir)",
+])
+def test_matches_legacy_regex_for_backslashes(text):
+    assert find_last_tool_call(text).args == legacy_tool_args(text)
+
+
+def test_escaped_close_does_not_swallow_next_call():
+    call = find_last_tool_call(r"@cmd(dir C:\) then @cmd(whoami)")
+    assert (call.name, call.args) == ('cmd', 'whoami')
+    calls = parse_tool_calls(r"@cmd(dir C:\) then @cmd(whoami)")
+    assert [c.args for c in calls] == ['dir C:\\', 'whoami']
+
+
+def test_unbalanced_falls_back_to_first_close():
+    assert find_last_tool_call("@cmd(echo (a)").args == "echo (a"
+
+
+def test_unclosed_call_is_ignored():
+    assert find_last_tool_call("@cmd(echo\n)") is None
+
+
+def test_calls_inside_args_are_not_rescanned():
+    calls = parse_tool_calls("@cmd(echo @wait(1)) 然后 @/info")
+    assert [(c.kind, c.name) for c in calls] == [('tool', 'cmd'), ('cmd', 'info')]
+
+
+def test_email_is_not_a_call():
+    assert find_last_tool_call("联系 dev@example.com") is None
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""工具注册表测试"""
+
+from iflow_tool_registry import (
+    ToolRegistry, ToolMiddleware, CONFIRM_ALWAYS, CONFIRM_NEVER, adapt_handler
+)
+
+
+class FakeExtension:
+    """只提供工具的扩展"""
+
+    def __init__(self, tools, hooks=None):
+        self._tools = tools
+        self._hooks = hooks or {}
+
+    def get_tools(self):
+        return dict(self._tools)
+
+    def get_tool_descriptions(self):
+        return {name: f"{name} 工具" for name in self._tools}
+
+
+class BlockingExtension(FakeExtension):
+    """阻止调用 blocked 工具"""
+
+    def on_before_tool_call(self, tool_name, args):
+        if tool_name == 'blocked':
+            return False, "不允许"
+        return None
+
+
+def reply(text):
+    return lambda args: (True, f"{text}:{args}")
+
+
+def test_builtin_wins_name_conflict():
+    registry = ToolRegistry()
+    registry.register('cmd', reply('builtin'))
+    assert registry.register_extension('ext', FakeExtension({'cmd': reply('ext')})) == 0
+    assert registry.invoke('cmd', 'x') == (True, 'builtin:x')
+    assert registry.conflicts == [('cmd', 'builtin', 'ext')]
+
+
+def test_removing_winner_promotes_shadowed_tool():
+    registry = ToolRegistry()
+    registry.register_extension('a', FakeExtension({'hello': reply('a')}))
+    registry.register_extension('b', FakeExtension({'hello': reply('b')}))
+    assert registry.invoke('hello', '1') == (True, 'a:1')
+
+    registry.replace_extension('a', None)
+    assert registry.invoke('hello', '1') == (True, 'b:1')
+    assert registry.conflicts == []
+
+    registry.unregister_source('b')
+    assert not registry.has_tool('hello')
+
+
+def test_reload_keeps_registration_order():
+    registry = ToolRegistry()
+    registry.register_extension('a', FakeExtension({'hello': reply('a')}))
+    registry.register_extension('b', FakeExtension({'hello': reply('b')}))
+
+    registry.replace_extension('a', FakeExtension({'hello': reply('a2')}))
+    assert registry.invoke('hello', '') == (True, 'a2:')
+    assert registry.conflicts == [('hello', 'a', 'b')]
+
+    registry.replace_extension('b', FakeExtension({'hello': reply('b2')}))
+    registry.replace_extension('a', None)
+    assert registry.invoke('hello', '') == (True, 'b2:')
+
+
+def test_unknown_tool_and_handler_errors():
+    registry = ToolRegistry()
+
+    def broken(args):
+        raise RuntimeError("坏了")
+
+    registry.register('broken', broken)
+    assert registry.invoke('missing', '') == (False, "未知工具: missing")
+    assert registry.invoke('broken', '') == (False, "工具执行失败: 坏了")
+
+
+def test_confirm_policies():
+    registry = ToolRegistry()
+    registry.register('default', reply('d'))
+    registry.register('always', reply('a'), confirm=CONFIRM_ALWAYS)
+    registry.register('never', reply('n'), confirm=CONFIRM_NEVER)
+    assert registry.needs_confirm('default', control_enabled=False)
+    assert not registry.needs_confirm('default', control_enabled=True)
+    assert registry.needs_confirm('always', control_enabled=True)
+    assert not registry.needs_confirm('never', control_enabled=False)
+
+
+def test_adapt_handler_signatures():
+    assert adapt_handler(lambda: (True, "无参数"))("x", None) == (True, "无参数")
+    assert adapt_handler(lambda args: (True, args))("x", None) == (True, "x")
+    handler = adapt_handler(lambda confirm_callback=None: (confirm_callback("t", "m"), ""))
+    assert handler("x", lambda title, message: True) == (True, "")
+
+
+def test_middleware_order_and_short_circuit():
+    calls = []
+
+    class Recorder(ToolMiddleware):
+        def __init__(self, name, skip=False):
+            self.name = name
+            self.skip = skip
+
+        def before(self, spec, args):
+            calls.append(f"before:{self.name}")
+            return (True, "缓存") if self.skip else None
+
+        def after(self, spec, args, result):
+            calls.append(f"after:{self.name}")
+            return result
+
+    registry = ToolRegistry()
+    registry.register('tool', reply('t'))
+    registry.add_middleware(Recorder('outer'))
+    registry.add_middleware(Recorder('inner', skip=True))
+    assert registry.invoke('tool', '') == (True, "缓存")
+    assert calls == ['before:outer', 'before:inner', 'after:outer']
+
+
+def test_extension_hooks_can_block_calls():
+    registry = ToolRegistry()
+    registry.register('blocked', reply('b'))
+    registry.register_extension('guard', BlockingExtension({}))
+    assert registry.invoke('blocked', '') == (False, "不允许")
+
+    registry.replace_extension('guard', None)
+    assert registry.invoke('blocked', '') == (True, "b:")
+
+
+def test_main_thread_metadata():
+    class WindowExtension(FakeExtension):
+        def get_tool_metadata(self):
+            return {'dialog': {'main_thread': True}}
+
+    registry = ToolRegistry()
+    registry.register_extension('ui', WindowExtension({'dialog': reply('d'), 'plain': reply('p')}))
+    assert registry.runs_on_main_thread('dialog')
+    assert not registry.runs_on_main_thread('plain')
+    assert not registry.runs_on_main_thread('missing')
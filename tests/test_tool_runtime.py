@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""工具执行测试"""
+
+import asyncio
+
+from iflow_tool_runtime import ToolExecution, current_output_callback
+
+
+def run(handler, args="", **kwargs):
+    outputs = []
+    call = ToolExecution(output_callback=outputs.append, **kwargs)
+    return call.run(lambda a, confirm: handler(a), args), outputs
+
+
+def test_sync_tool():
+    assert run(lambda args: (True, args), "x") == ((True, "x"), [])
+
+
+def test_generator_tool_streams_output():
+    def compile_(args):
+        yield "编译中\n"
+        yield True, "完成"
+
+    assert run(compile_) == ((True, "完成"), ["编译中\n"])
+
+
+def test_generator_without_result_joins_output():
+    def steps(args):
+        yield "a"
+        yield "b"
+
+    assert run(steps) == ((True, "ab"), ["a", "b"])
+
+
+def test_coroutine_tool():
+    async def download(args):
+        await asyncio.sleep(0)
+        return True, f"下载 {args}"
+
+    assert run(download, "f") == ((True, "下载 f"), [])
+
+
+def test_async_generator_tool():
+    async def fetch(args):
+        for part in ("1", "2"):
+            await asyncio.sleep(0)
+            yield part
+
+    assert run(fetch) == ((True, "12"), ["1", "2"])
+
+
+def test_slow_coroutine_times_out():
+    async def hang(args):
+        await asyncio.sleep(10)
+
+    (success, message), _ = run(hang, timeout=0.1)
+    assert not success
+    assert "超时" in message
+
+
+def test_chatty_async_generator_times_out():
+    # 输出间隔小于轮询间隔，队列从不空闲，也必须按时超时
+    async def chatty(args):
+        while True:
+            await asyncio.sleep(0.005)
+            yield "."
+
+    idle_calls = []
+    (success, message), outputs = run(chatty, timeout=0.2, idle_callback=lambda: idle_calls.append(1))
+    assert not success
+    assert "超时" in message
+    assert outputs
+    assert idle_calls
+
+
+def test_confirm_from_event_loop_runs_in_caller():
+    async def ask(args, confirm_callback):
+        return True, "允许" if confirm_callback("标题", "内容") else "拒绝"
+
+    asked = []
+    call = ToolExecution(confirm_callback=lambda title, message: asked.append(title) or True)
+    assert call.run(ask, "") == (True, "允许")
+    assert asked == ["标题"]
+
+
+def test_output_callback_context():
+    seen = []
+
+    def tool(args):
+        seen.append(current_output_callback())
+        return True, ""
+
+    call = ToolExecution(output_callback=print)
+    call.run(lambda a, confirm: tool(a), "")
+    assert seen == [call.output]
+    assert current_output_callback() is None